@@ -0,0 +1,33 @@
+"""add_payment_collection_tracking
+
+Revision ID: a7c3e9d2f5b8
+Revises: f4a8c2e6b1d9
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d2f5b8'
+down_revision = 'f4a8c2e6b1d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Asynchronous MoMo request-to-pay tracking
+    op.add_column('payments', sa.Column('provider_reference', sa.String(), nullable=True))
+    op.add_column('payments', sa.Column('requested_at', sa.DateTime(), nullable=True))
+    op.add_column('payments', sa.Column('status_checked_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_payments_provider_reference'), 'payments', ['provider_reference'], unique=True)
+    op.create_index('ix_payments_status_checked', 'payments', ['status', 'status_checked_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payments_status_checked', table_name='payments')
+    op.drop_index(op.f('ix_payments_provider_reference'), table_name='payments')
+    op.drop_column('payments', 'status_checked_at')
+    op.drop_column('payments', 'requested_at')
+    op.drop_column('payments', 'provider_reference')
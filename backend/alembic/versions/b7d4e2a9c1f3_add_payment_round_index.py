@@ -0,0 +1,29 @@
+"""add_payment_round_index
+
+Revision ID: b7d4e2a9c1f3
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d4e2a9c1f3'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Composite index for per-round paid count aggregation
+    op.create_index(
+        'ix_payments_group_round_status',
+        'payments',
+        ['group_id', 'round_number', 'status']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payments_group_round_status', table_name='payments')
@@ -0,0 +1,56 @@
+"""add_group_round_stats
+
+Revision ID: b8d4f0a2c6e1
+Revises: a7c3e9d2f5b8
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4f0a2c6e1'
+down_revision = 'a7c3e9d2f5b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Running contribution counters per group round
+    op.create_table(
+        'group_round_stats',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('group_id', sa.Integer(), nullable=False),
+        sa.Column('round_number', sa.Integer(), nullable=False),
+        sa.Column('paid_count', sa.Integer(), nullable=False),
+        sa.Column('collected_amount', sa.Float(), nullable=False),
+        sa.Column('active_member_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('group_id', 'round_number', name='uq_group_round_stats_group_round')
+    )
+    op.create_index(op.f('ix_group_round_stats_id'), 'group_round_stats', ['id'], unique=False)
+
+    # Backfill the current round of every group
+    op.execute("""
+        INSERT INTO group_round_stats
+            (group_id, round_number, paid_count, collected_amount, active_member_count, updated_at)
+        SELECT
+            g.id,
+            g.current_round,
+            (SELECT COUNT(*) FROM payments p
+             WHERE p.group_id = g.id AND p.round_number = g.current_round AND p.status = 'SUCCESS'),
+            (SELECT COALESCE(SUM(p.amount), 0) FROM payments p
+             WHERE p.group_id = g.id AND p.round_number = g.current_round AND p.status = 'SUCCESS'),
+            (SELECT COUNT(*) FROM memberships m
+             WHERE m.group_id = g.id AND m.is_active = TRUE),
+            CURRENT_TIMESTAMP
+        FROM groups g
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_group_round_stats_id'), table_name='group_round_stats')
+    op.drop_table('group_round_stats')
@@ -0,0 +1,27 @@
+"""add_payout_provider_reference
+
+Revision ID: b8d4f2a6c9e1
+Revises: f5b9d1e3a7c6
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d4f2a6c9e1'
+down_revision = 'f5b9d1e3a7c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # MTN disbursement X-Reference-Id, stored before the transfer is sent
+    op.add_column('payouts', sa.Column('provider_reference', sa.String(), nullable=True))
+    op.create_index(op.f('ix_payouts_provider_reference'), 'payouts', ['provider_reference'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_payouts_provider_reference'), table_name='payouts')
+    op.drop_column('payouts', 'provider_reference')
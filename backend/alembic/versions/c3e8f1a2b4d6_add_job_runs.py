@@ -0,0 +1,47 @@
+"""add_job_runs
+
+Revision ID: c3e8f1a2b4d6
+Revises: b7d4e2a9c1f3
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8f1a2b4d6'
+down_revision = 'b7d4e2a9c1f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Scheduler job run history
+    op.create_table(
+        'job_runs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('job_id', sa.String(), nullable=False),
+        sa.Column('worker_id', sa.String(), nullable=False),
+        sa.Column('status', sa.Enum('RUNNING', 'SUCCESS', 'FAILED', name='jobrunstatus'), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.Column('duration_seconds', sa.Float(), nullable=True),
+        sa.Column('rows_scanned', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('payments_attempted', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('successes', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failures', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_job_runs_id'), 'job_runs', ['id'], unique=False)
+    op.create_index(op.f('ix_job_runs_job_id'), 'job_runs', ['job_id'], unique=False)
+    op.create_index(op.f('ix_job_runs_started_at'), 'job_runs', ['started_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_job_runs_started_at'), table_name='job_runs')
+    op.drop_index(op.f('ix_job_runs_job_id'), table_name='job_runs')
+    op.drop_index(op.f('ix_job_runs_id'), table_name='job_runs')
+    op.drop_table('job_runs')
+    sa.Enum(name='jobrunstatus').drop(op.get_bind(), checkfirst=True)
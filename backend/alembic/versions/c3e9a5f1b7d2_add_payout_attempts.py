@@ -0,0 +1,34 @@
+"""add_payout_attempts
+
+Revision ID: c3e9a5f1b7d2
+Revises: b8d4f2a6c9e1
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e9a5f1b7d2'
+down_revision = 'b8d4f2a6c9e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Payouts that need manual action are BLOCKED instead of re-queued forever
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE payoutstatus ADD VALUE IF NOT EXISTS 'BLOCKED' AFTER 'FAILED'")
+
+    op.add_column('payouts', sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('payouts', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.add_column('payouts', sa.Column('last_error', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('payouts', 'last_error')
+    op.drop_column('payouts', 'next_attempt_at')
+    op.drop_column('payouts', 'attempts')
+    # PostgreSQL cannot drop enum values; BLOCKED is left in payoutstatus
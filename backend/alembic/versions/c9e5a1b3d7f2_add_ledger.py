@@ -0,0 +1,72 @@
+"""add_ledger
+
+Revision ID: c9e5a1b3d7f2
+Revises: b8d4f0a2c6e1
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9e5a1b3d7f2'
+down_revision = 'b8d4f0a2c6e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Double-entry ledger; existing history is posted by backfill_ledger.py
+    op.create_table(
+        'ledger_accounts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('account_type', sa.Enum('MEMBER', 'GROUP', 'PLATFORM', name='ledgeraccounttype'), nullable=False),
+        sa.Column('owner_id', sa.Integer(), nullable=False),
+        sa.Column('balance', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('total_debits', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('total_credits', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('account_type', 'owner_id', name='uq_ledger_accounts_type_owner')
+    )
+    op.create_index(op.f('ix_ledger_accounts_id'), 'ledger_accounts', ['id'], unique=False)
+
+    op.create_table(
+        'ledger_entries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('transaction_ref', sa.String(length=36), nullable=False),
+        sa.Column('account_id', sa.Integer(), nullable=False),
+        sa.Column('entry_type', sa.String(), nullable=False),
+        sa.Column('channel', sa.String(), nullable=True),
+        sa.Column('payment_id', sa.Integer(), nullable=True),
+        sa.Column('payout_id', sa.Integer(), nullable=True),
+        sa.Column('debit', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('credit', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('balance_after', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['account_id'], ['ledger_accounts.id'], ),
+        sa.ForeignKeyConstraint(['payment_id'], ['payments.id'], ),
+        sa.ForeignKeyConstraint(['payout_id'], ['payouts.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ledger_entries_id'), 'ledger_entries', ['id'], unique=False)
+    op.create_index(op.f('ix_ledger_entries_transaction_ref'), 'ledger_entries', ['transaction_ref'], unique=False)
+    op.create_index(op.f('ix_ledger_entries_account_id'), 'ledger_entries', ['account_id'], unique=False)
+    op.create_index(op.f('ix_ledger_entries_payment_id'), 'ledger_entries', ['payment_id'], unique=False)
+    op.create_index(op.f('ix_ledger_entries_payout_id'), 'ledger_entries', ['payout_id'], unique=False)
+    op.create_index('ix_ledger_entries_type_created', 'ledger_entries', ['entry_type', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ledger_entries_type_created', table_name='ledger_entries')
+    op.drop_index(op.f('ix_ledger_entries_payout_id'), table_name='ledger_entries')
+    op.drop_index(op.f('ix_ledger_entries_payment_id'), table_name='ledger_entries')
+    op.drop_index(op.f('ix_ledger_entries_account_id'), table_name='ledger_entries')
+    op.drop_index(op.f('ix_ledger_entries_transaction_ref'), table_name='ledger_entries')
+    op.drop_index(op.f('ix_ledger_entries_id'), table_name='ledger_entries')
+    op.drop_table('ledger_entries')
+    op.drop_index(op.f('ix_ledger_accounts_id'), table_name='ledger_accounts')
+    op.drop_table('ledger_accounts')
+    sa.Enum(name='ledgeraccounttype').drop(op.get_bind(), checkfirst=True)
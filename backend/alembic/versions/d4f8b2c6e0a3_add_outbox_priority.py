@@ -0,0 +1,43 @@
+"""add_outbox_priority
+
+Revision ID: d4f8b2c6e0a3
+Revises: c3e9a5f1b7d2
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f8b2c6e0a3'
+down_revision = 'c3e9a5f1b7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Messages whose deadline passed are EXPIRED instead of sent late
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE outboxstatus ADD VALUE IF NOT EXISTS 'EXPIRED' AFTER 'FAILED'")
+
+    # Existing messages get NOTIFICATION priority
+    op.add_column('outbox_messages', sa.Column('priority', sa.Integer(), nullable=False, server_default='2'))
+    op.add_column('outbox_messages', sa.Column('expires_at', sa.DateTime(), nullable=True))
+
+    op.drop_index('ix_outbox_messages_status_next_attempt', table_name='outbox_messages')
+    op.create_index(
+        'ix_outbox_messages_status_priority_next_attempt',
+        'outbox_messages',
+        ['status', 'priority', 'next_attempt_at'],
+        unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_messages_status_priority_next_attempt', table_name='outbox_messages')
+    op.create_index('ix_outbox_messages_status_next_attempt', 'outbox_messages', ['status', 'next_attempt_at'], unique=False)
+    op.drop_column('outbox_messages', 'expires_at')
+    op.drop_column('outbox_messages', 'priority')
+    # PostgreSQL cannot drop enum values; EXPIRED is left in outboxstatus
@@ -0,0 +1,25 @@
+"""add_assigned_pay_day
+
+Revision ID: d9a4c6e8f0b2
+Revises: c3e8f1a2b4d6
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9a4c6e8f0b2'
+down_revision = 'c3e8f1a2b4d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Load-balanced collection day assigned when auto_pay_day is unset
+    op.add_column('payment_preferences', sa.Column('assigned_pay_day', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('payment_preferences', 'assigned_pay_day')
@@ -0,0 +1,26 @@
+"""add_group_completed_at
+
+Revision ID: e2f7b9c1d3a5
+Revises: d9a4c6e8f0b2
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f7b9c1d3a5'
+down_revision = 'd9a4c6e8f0b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('groups', sa.Column('completed_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_groups_status', 'groups', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_groups_status', table_name='groups')
+    op.drop_column('groups', 'completed_at')
@@ -0,0 +1,34 @@
+"""add_payout_claims
+
+Revision ID: e3a7c9d1f5b4
+Revises: d1f6b2c8e4a7
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c9d1f5b4'
+down_revision = 'd1f6b2c8e4a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Payouts claimed by a disbursement worker stay PROCESSING until recorded
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.execute("ALTER TYPE payoutstatus ADD VALUE IF NOT EXISTS 'PROCESSING' AFTER 'APPROVED'")
+
+    op.add_column('payouts', sa.Column('claimed_at', sa.DateTime(), nullable=True))
+    op.add_column('payouts', sa.Column('claimed_by', sa.String(), nullable=True))
+    op.create_index('ix_payouts_status_created', 'payouts', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_payouts_status_created', table_name='payouts')
+    op.drop_column('payouts', 'claimed_by')
+    op.drop_column('payouts', 'claimed_at')
+    # PostgreSQL cannot drop enum values; PROCESSING is left in payoutstatus
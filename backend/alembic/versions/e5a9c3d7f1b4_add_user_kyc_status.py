@@ -0,0 +1,29 @@
+"""add_user_kyc_status
+
+Revision ID: e5a9c3d7f1b4
+Revises: d4f8b2c6e0a3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a9c3d7f1b4'
+down_revision = 'd4f8b2c6e0a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    kyc_status = sa.Enum('PENDING', 'VERIFIED', 'UNVERIFIED', 'ERROR', name='kycstatus')
+    kyc_status.create(op.get_bind(), checkfirst=True)
+
+    # Existing users keep NULL: their KYC state is kyc_verified alone
+    op.add_column('users', sa.Column('kyc_status', kyc_status, nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'kyc_status')
+    sa.Enum(name='kycstatus').drop(op.get_bind(), checkfirst=True)
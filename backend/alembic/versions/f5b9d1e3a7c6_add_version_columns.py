@@ -0,0 +1,29 @@
+"""add_version_columns
+
+Revision ID: f5b9d1e3a7c6
+Revises: e3a7c9d1f5b4
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b9d1e3a7c6'
+down_revision = 'e3a7c9d1f5b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Optimistic concurrency: every ORM update checks and bumps version_id
+    op.add_column('payments', sa.Column('version_id', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('payouts', sa.Column('version_id', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('groups', sa.Column('version_id', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('groups', 'version_id')
+    op.drop_column('payouts', 'version_id')
+    op.drop_column('payments', 'version_id')
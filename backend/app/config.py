@@ -41,9 +41,19 @@ class Settings(BaseSettings):
     MTN_MOMO_SUBSCRIPTION_KEY: Optional[str] = None
     MTN_MOMO_API_USER: Optional[str] = None
     MTN_MOMO_API_KEY: Optional[str] = None
+    MTN_MOMO_DISBURSEMENT_SUBSCRIPTION_KEY: Optional[str] = None  # Disbursement product; defaults to the collection key
+    MTN_MOMO_DISBURSEMENT_API_USER: Optional[str] = None  # Defaults to MTN_MOMO_API_USER
+    MTN_MOMO_DISBURSEMENT_API_KEY: Optional[str] = None  # Defaults to MTN_MOMO_API_KEY
     MTN_MOMO_TARGET_ENVIRONMENT: str = "sandbox"  # or "production"
     MTN_MOMO_BASE_URL: str = "https://sandbox.momodeveloper.mtn.com"
     MTN_MOMO_CURRENCY: str = "GHS"  # Ghana Cedis
+    MTN_MOMO_CALLBACK_URL: Optional[str] = None  # e.g. https://api.example.com/payments/momo/callback
+    
+    # MoMo collection status poller
+    MOMO_STATUS_POLL_INTERVAL_MINUTES: int = 5  # Also the minimum age before a pending request is polled
+    MOMO_STATUS_POLL_BATCH_SIZE: int = 100  # Pending requests checked per run
+    MOMO_STATUS_POLL_CONCURRENCY: int = 8  # Parallel status requests
+    MOMO_COLLECTION_TIMEOUT_MINUTES: int = 60  # Pending requests older than this are failed
     
     # Enable/Disable MTN Services
     ENABLE_MTN_USSD: bool = True
@@ -55,14 +65,80 @@ class Settings(BaseSettings):
     ENABLE_MTN_KYC: bool = True
     MTN_KYC_BASE_URL: str = "https://api.mtn.com/v1"
     REQUIRE_KYC_FOR_PAYMENTS: bool = True
+    KYC_CACHE_TTL_SECONDS: int = 86400  # Reuse a passed MTN KYC check this long (0 disables)
+    KYC_CACHE_FAILED_TTL_SECONDS: int = 300  # Reuse a failed check this long (0 disables)
+    KYC_CACHE_MAX_ENTRIES: int = 100000
+    KYC_BULK_CONCURRENCY: int = 16  # Users checked with MTN in parallel by bulk verification
+    KYC_BULK_BATCH_SIZE: int = 500  # Users loaded and committed together by bulk verification
+    
+    # MTN HTTP connection pooling (shared by all MTN integrations)
+    MTN_HTTP_POOL_CONNECTIONS: int = 4  # Hosts kept in the pool (MoMo, SMS/USSD, KYC)
+    MTN_HTTP_POOL_MAXSIZE: int = 20  # Keep-alive connections per host; cover the largest worker concurrency
+    MTN_HTTP_CONNECT_TIMEOUT_SECONDS: float = 3.05
+    MTN_HTTP_READ_TIMEOUT_SECONDS: float = 15.0
+    MTN_HTTP_MAX_RETRIES: int = 3  # Retries for idempotent requests (GET) on connection errors and 429/5xx
+    MTN_HTTP_BACKOFF_FACTOR: float = 0.5  # Retry delay: factor * 2^(retry - 1) seconds
+    MTN_HTTP_ASYNC_MAX_CONNECTIONS: int = 200  # Concurrent requests per worker through the async clients
+    MTN_HTTP_ASYNC_MAX_KEEPALIVE: int = 50  # Idle keep-alive connections kept by the async clients
+    MTN_TOKEN_REFRESH_MARGIN_SECONDS: int = 300  # Refresh OAuth tokens this long before they expire
+    MTN_TOKEN_LOCK_TIMEOUT_SECONDS: int = 10  # Max wait for another worker's token refresh (Redis)
     
     # Scheduler
     ENABLE_SCHEDULER: bool = True
     PAYMENT_CHECK_HOUR: int = 6  # 6:00 AM
     RETRY_INTERVAL_HOURS: int = 6
     PAYOUT_CHECK_INTERVAL_HOURS: int = 2
+    PAYOUT_DISBURSEMENT_CONCURRENCY: int = 10  # Parallel MoMo transfers
+    PAYOUT_DISBURSEMENT_BATCH_SIZE: int = 200  # Transfers recorded per commit
+    PAYOUT_CLAIM_TIMEOUT_MINUTES: int = 30  # PROCESSING payouts older than this need reconciling
+    PAYOUT_SETTLE_INTERVAL_MINUTES: int = 5  # Also the minimum claim age before an unsettled transfer is polled
+    PAYOUT_SETTLE_BATCH_SIZE: int = 100  # Unsettled transfers checked per run
+    PAYOUT_MAX_ATTEMPTS: int = 5  # Payouts are blocked after this many failed transfers
+    PAYOUT_RETRY_BASE_MINUTES: int = 60  # Re-queue delay after a failed transfer, doubled each attempt
+    COLLECTION_SPREAD_DAYS: int = 28  # Members without a chosen auto-pay day are spread over days 1..N
+    REMINDER_HOUR: int = 9  # 9:00 AM
+    ROUND_STATS_RECONCILE_HOUR: int = 3  # 3:00 AM
+    JOB_RUN_RETENTION_DAYS: int = 30  # Job run history is purged after this many days
+    
+    # Reconciliation with provider records
+    RECONCILIATION_MEMORY_ROWS: int = 500000  # Provider records joined in memory before spilling to disk
+    RECONCILIATION_PARTITIONS: int = 64  # Temporary partition files used when spilling
+    RECONCILIATION_FETCH_SIZE: int = 5000  # Rows streamed per database fetch
+    RECONCILIATION_SAMPLE_SIZE: int = 100  # Mismatches included in the summary
+    
+    # Bulk SMS
+    MTN_SMS_BATCH_LIMIT: int = 100  # Max recipients per MTN SMS request
+    AT_SMS_BATCH_LIMIT: int = 1000  # Max recipients per AfricaTalking SMS request
+    SMS_SEND_CONCURRENCY: int = 8  # Personalized messages sent in parallel
+    SMS_PROVIDER_REQUESTS_PER_SECOND: float = 10.0  # Request rate limit per SMS provider (0 disables)
+    SMS_INTERACTIVE_HEADROOM: float = 3.0  # Provider rate-limit tokens bulk SMS leaves for OTPs and confirmations
+    
+    # SMS provider circuit breakers
+    SMS_BREAKER_WINDOW_SIZE: int = 20  # Recent calls scored per provider
+    SMS_BREAKER_MIN_CALLS: int = 5  # Calls in the window before the error rate can open the breaker
+    SMS_BREAKER_ERROR_RATE: float = 0.5  # Error rate that opens the breaker
+    SMS_BREAKER_FAILURE_THRESHOLD: int = 3  # Consecutive failures that open the breaker
+    SMS_BREAKER_COOLDOWN_SECONDS: int = 30  # Wait before probing an open provider; doubles after a failed probe
+    SMS_BREAKER_MAX_COOLDOWN_SECONDS: int = 300
+    SMS_LATENCY_TARGET_SECONDS: float = 2.0  # Providers slower than this on average lose their priority
+    
+    # Idempotency keys
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24  # How long stored responses are replayed
+    
+    # Optimistic concurrency (version_id on payments, payouts and groups)
+    OPTIMISTIC_RETRY_ATTEMPTS: int = 3  # Attempts before a version conflict is returned as 409
+    OPTIMISTIC_RETRY_BACKOFF_SECONDS: float = 0.05  # Max jittered pause, scaled by attempt
+    
+    # Outbox (SMS and notifications sent after commit)
+    OUTBOX_DISPATCH_INTERVAL_SECONDS: int = 15
+    OUTBOX_INTERACTIVE_DISPATCH_INTERVAL_SECONDS: int = 2  # OTP and transactional lane, kept fast under bulk load
+    OUTBOX_BATCH_SIZE: int = 200  # Messages claimed per dispatch run
+    OUTBOX_MAX_ATTEMPTS: int = 5  # Messages are marked failed after this many attempts
+    OUTBOX_RETRY_BASE_SECONDS: int = 30  # Retry delay, doubled after each attempt
+    OUTBOX_LEASE_SECONDS: int = 300  # Claimed messages are skipped by other dispatchers this long
+    OUTBOX_RETENTION_DAYS: int = 7  # Sent messages are purged after this many days
     
-    # Redis (for USSD session state)
+    # Redis (for USSD session state and shared MTN tokens)
     REDIS_URL: str = "redis://localhost:6379/0"
     USE_REDIS: bool = False  # Use in-memory dict for MVP
     
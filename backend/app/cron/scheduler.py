@@ -5,8 +5,15 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 
 from ..database import SessionLocal
-from ..services import PaymentService, PayoutService
-from ..models import Group, Membership, Payment, GroupStatus
+from ..services import PaymentService, PayoutService, GroupService
+from ..services.job_run_service import JobRunService
+from ..services.collection_service import CollectionService
+from ..services.reminder_service import ReminderService
+from ..services.idempotency_service import IdempotencyService
+from ..services.momo_collection_service import MoMoCollectionService
+from ..services.disbursement_service import DisbursementService
+from ..services.round_stats_service import RoundStatsService
+from ..services.outbox_service import OutboxService
 from ..config import settings
 
 
@@ -49,6 +56,70 @@ class SusuScheduler:
             replace_existing=True
         )
         
+        # Payment reminders once a day
+        self.scheduler.add_job(
+            func=self.send_payment_reminders,
+            trigger=CronTrigger(hour=settings.REMINDER_HOUR, minute=0),
+            id="send_payment_reminders",
+            name="Send Payment Reminders",
+            replace_existing=True
+        )
+        
+        # Pending MoMo collection status poll
+        self.scheduler.add_job(
+            func=self.poll_pending_collections,
+            trigger=IntervalTrigger(minutes=settings.MOMO_STATUS_POLL_INTERVAL_MINUTES),
+            id="poll_pending_collections",
+            name="Poll Pending MoMo Collections",
+            replace_existing=True
+        )
+        
+        # Payout transfers MTN reported as pending
+        self.scheduler.add_job(
+            func=self.settle_payout_transfers,
+            trigger=IntervalTrigger(minutes=settings.PAYOUT_SETTLE_INTERVAL_MINUTES),
+            id="settle_payout_transfers",
+            name="Settle Pending Payout Transfers",
+            replace_existing=True
+        )
+        
+        # Expired idempotency keys and old job runs cleanup every hour
+        self.scheduler.add_job(
+            func=self.purge_idempotency_keys,
+            trigger=IntervalTrigger(hours=1),
+            id="purge_idempotency_keys",
+            name="Purge Expired Idempotency Keys and Job Runs",
+            replace_existing=True
+        )
+        
+        # Outbox dispatch (SMS and notifications) every few seconds
+        self.scheduler.add_job(
+            func=self.dispatch_outbox,
+            trigger=IntervalTrigger(seconds=settings.OUTBOX_DISPATCH_INTERVAL_SECONDS),
+            id="dispatch_outbox",
+            name="Dispatch Outbox",
+            replace_existing=True
+        )
+        
+        # Interactive lane (OTP and transactional SMS) every couple of seconds,
+        # so they are not delayed by a bulk dispatch run
+        self.scheduler.add_job(
+            func=self.dispatch_interactive_outbox,
+            trigger=IntervalTrigger(seconds=settings.OUTBOX_INTERACTIVE_DISPATCH_INTERVAL_SECONDS),
+            id="dispatch_interactive_outbox",
+            name="Dispatch Interactive Outbox",
+            replace_existing=True
+        )
+        
+        # Round counter reconciliation once a day
+        self.scheduler.add_job(
+            func=self.reconcile_round_stats,
+            trigger=CronTrigger(hour=settings.ROUND_STATS_RECONCILE_HOUR, minute=0),
+            id="reconcile_round_stats",
+            name="Reconcile Round Stats",
+            replace_existing=True
+        )
+        
         self.scheduler.start()
         print("✅ Scheduler started successfully")
     
@@ -60,41 +131,28 @@ class SusuScheduler:
     @staticmethod
     def daily_payment_check():
         """
-        Daily job to trigger payments for all group members.
+        Daily job to trigger payments for members due today.
         Runs at 6:00 AM to initiate MoMo debits.
+        
+        Members are collected on their chosen auto-pay day, or on a
+        load-balanced day assigned by the collection planner.
         """
         print(f"\n🕐 Running daily payment check at {datetime.utcnow()}")
         db: Session = SessionLocal()
         
-        try:
-            # Get all active groups
-            active_groups = db.query(Group).filter(
-                Group.status == GroupStatus.ACTIVE
-            ).all()
-            
-            for group in active_groups:
-                print(f"Processing group: {group.name} (Round {group.current_round}/{group.num_cycles})")
-                
-                # Get all active members
-                memberships = db.query(Membership).filter(
-                    Membership.group_id == group.id,
-                    Membership.is_active == True
-                ).all()
-                
-                for membership in memberships:
-                    # Check if member already paid for current round
-                    existing_payment = db.query(Payment).filter(
-                        Payment.user_id == membership.user_id,
-                        Payment.group_id == group.id,
-                        Payment.round_number == group.current_round,
-                        Payment.status.in_(['success', 'pending'])
-                    ).first()
-                    
-                    if existing_payment:
-                        print(f"  - User {membership.user_id}: Already paid/pending")
-                        continue
-                    
+        with JobRunService.track("daily_payment_check") as run:
+            try:
+                # Give new members a collection day before planning
+                CollectionService.assign_collection_days(db)
+                
+                due = CollectionService.get_due_collections(db)
+                run.rows_scanned = len(due)
+                
+                print(f"Found {len(due)} members due for collection today")
+                
+                for membership, group in due:
                     # Trigger payment
+                    run.payments_attempted += 1
                     try:
                         payment = PaymentService.process_payment(
                             db=db,
@@ -102,98 +160,292 @@ class SusuScheduler:
                             group_id=group.id,
                             round_number=group.current_round
                         )
-                        print(f"  - User {membership.user_id}: Payment initiated - {payment.status}")
+                        run.successes += 1
+                        print(f"  - {group.name} / User {membership.user_id}: Payment initiated - {payment.status}")
                     
                     except Exception as e:
-                        print(f"  - User {membership.user_id}: Payment failed - {str(e)}")
+                        run.failures += 1
+                        print(f"  - {group.name} / User {membership.user_id}: Payment failed - {str(e)}")
                         continue
+                
+                print(f"✅ Daily payment check completed\n")
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error in daily payment check: {str(e)}")
             
-            print(f"✅ Daily payment check completed\n")
+            finally:
+                db.close()
+    
+    @staticmethod
+    def send_payment_reminders():
+        """
+        Daily job to remind members of upcoming collections.
+        Runs at 9:00 AM and queues the reminders in the outbox.
+        """
+        print(f"\n🔔 Running payment reminder job at {datetime.utcnow()}")
+        db: Session = SessionLocal()
         
-        except Exception as e:
-            print(f"❌ Error in daily payment check: {str(e)}")
+        with JobRunService.track("send_payment_reminders") as run:
+            try:
+                stats = ReminderService.send_due_reminders(db)
+                run.rows_scanned = stats["due"]
+                run.successes = stats["queued"]
+                
+                print(f"Queued {stats['queued']} reminders ({stats['duplicates']} already queued)")
+                print(f"✅ Payment reminder job completed\n")
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error in payment reminder job: {str(e)}")
+            
+            finally:
+                db.close()
+    
+    @staticmethod
+    def poll_pending_collections():
+        """
+        Settle MoMo collections still awaiting the member's approval.
+        Runs every 5 minutes as a fallback for missed MTN callbacks.
+        """
+        db: Session = SessionLocal()
         
-        finally:
-            db.close()
+        with JobRunService.track("poll_pending_collections") as run:
+            try:
+                stats = MoMoCollectionService.poll_pending(db)
+                run.rows_scanned = stats["checked"]
+                run.payments_attempted = stats["checked"]
+                run.successes = stats["success"]
+                run.failures = stats["failed"]
+                
+                if stats["checked"]:
+                    print(
+                        f"🔎 Polled {stats['checked']} pending collections: "
+                        f"{stats['success']} succeeded, {stats['failed']} failed"
+                    )
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error polling pending collections: {str(e)}")
+            
+            finally:
+                db.close()
     
     @staticmethod
-    def retry_failed_payments():
+    def settle_payout_transfers():
         """
-        Retry failed payments (max 3 attempts).
-        Runs every 6 hours.
+        Settle payout transfers MTN accepted but had not completed when sent.
+        Runs every 5 minutes so recipients are not left waiting on PROCESSING.
+        """
+        db: Session = SessionLocal()
+        
+        with JobRunService.track("settle_payout_transfers") as run:
+            try:
+                stats = DisbursementService.settle_transfers(db)
+                run.rows_scanned = stats["checked"]
+                run.payments_attempted = stats["checked"]
+                run.successes = stats["paid"]
+                run.failures = stats["failed"]
+                
+                if stats["checked"]:
+                    print(
+                        f"🔎 Checked {stats['checked']} pending payout transfers: "
+                        f"{stats['paid']} paid, {stats['failed']} failed, "
+                        f"{stats['unsettled']} still pending"
+                    )
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error settling payout transfers: {str(e)}")
+            
+            finally:
+                db.close()
+    
+    @staticmethod
+    def purge_idempotency_keys():
+        """
+        Delete idempotency keys past their expiry and job runs older than
+        JOB_RUN_RETENTION_DAYS.
+        Runs every hour.
         """
-        print(f"\n🔄 Running payment retry job at {datetime.utcnow()}")
         db: Session = SessionLocal()
         
-        try:
-            failed_payments = PaymentService.get_failed_payments_for_retry(db)
+        with JobRunService.track("purge_idempotency_keys") as run:
+            try:
+                run.rows_scanned = IdempotencyService.purge_expired(db)
+                run.rows_scanned += JobRunService.purge_old_runs(db)
             
-            print(f"Found {len(failed_payments)} failed payments to retry")
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error purging idempotency keys: {str(e)}")
             
-            for payment in failed_payments:
-                try:
-                    PaymentService.retry_failed_payment(db, payment.id)
-                    print(f"  - Payment {payment.id}: Retry successful")
+            finally:
+                db.close()
+    
+    @staticmethod
+    def dispatch_outbox():
+        """
+        Deliver pending outbox messages and purge old sent ones.
+        Runs every OUTBOX_DISPATCH_INTERVAL_SECONDS.
+        """
+        db: Session = SessionLocal()
+        
+        with JobRunService.track("dispatch_outbox") as run:
+            try:
+                stats = OutboxService.dispatch(db)
+                run.rows_scanned = stats["claimed"]
+                run.successes = stats["sent"]
+                run.failures = stats["retried"] + stats["failed"]
                 
-                except Exception as e:
-                    print(f"  - Payment {payment.id}: Retry failed - {str(e)}")
-                    continue
+                OutboxService.purge_sent(db)
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error dispatching outbox: {str(e)}")
             
-            print(f"✅ Payment retry job completed\n")
+            finally:
+                db.close()
+    
+    @staticmethod
+    def dispatch_interactive_outbox():
+        """
+        Deliver pending OTP and transactional messages.
+        Runs every OUTBOX_INTERACTIVE_DISPATCH_INTERVAL_SECONDS.
+        """
+        with JobRunService.track("dispatch_interactive_outbox") as run:
+            try:
+                stats = OutboxService.dispatch_interactive()
+                run.rows_scanned = stats["claimed"]
+                run.successes = stats["sent"]
+                run.failures = stats["retried"] + stats["failed"]
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error dispatching interactive outbox: {str(e)}")
+    
+    @staticmethod
+    def reconcile_round_stats():
+        """
+        Recompute the current-round counters of active groups and fix drift.
+        Runs once a day.
+        """
+        db: Session = SessionLocal()
         
-        except Exception as e:
-            print(f"❌ Error in payment retry job: {str(e)}")
+        with JobRunService.track("reconcile_round_stats") as run:
+            try:
+                stats = RoundStatsService.reconcile(db)
+                run.rows_scanned = stats["checked"]
+                
+                if stats["corrected"] or stats["created"]:
+                    print(
+                        f"🧮 Round stats reconciled: {stats['corrected']} corrected, "
+                        f"{stats['created']} created"
+                    )
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error reconciling round stats: {str(e)}")
+            
+            finally:
+                db.close()
+    
+    @staticmethod
+    def retry_failed_payments():
+        """
+        Retry failed payments (max 3 attempts).
+        Runs every 6 hours.
+        """
+        print(f"\n🔄 Running payment retry job at {datetime.utcnow()}")
+        db: Session = SessionLocal()
         
-        finally:
-            db.close()
+        with JobRunService.track("retry_failed_payments") as run:
+            try:
+                failed_payments = PaymentService.get_failed_payments_for_retry(db)
+                run.rows_scanned = len(failed_payments)
+                
+                print(f"Found {len(failed_payments)} failed payments to retry")
+                
+                for payment in failed_payments:
+                    run.payments_attempted += 1
+                    try:
+                        PaymentService.retry_failed_payment(db, payment.id)
+                        run.successes += 1
+                        print(f"  - Payment {payment.id}: Retry successful")
+                    
+                    except Exception as e:
+                        run.failures += 1
+                        print(f"  - Payment {payment.id}: Retry failed - {str(e)}")
+                        continue
+                
+                print(f"✅ Payment retry job completed\n")
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error in payment retry job: {str(e)}")
+            
+            finally:
+                db.close()
     
     @staticmethod
     def process_pending_payouts():
         """
         Check for completed rounds and process payouts.
         Runs every 2 hours.
+        
+        Only groups that received a payment since the previous successful run
+        (or still have an unpaid payout) are considered. The previous run is
+        read from the job run history, so restarts and other workers share
+        it; with no successful run on record every active group is scanned.
         """
         print(f"\n💰 Running payout processing job at {datetime.utcnow()}")
         db: Session = SessionLocal()
         
-        try:
-            # Get all active groups
-            active_groups = db.query(Group).filter(
-                Group.status == GroupStatus.ACTIVE
-            ).all()
-            
-            for group in active_groups:
-                # Check if current round is complete
-                round_complete = PayoutService.check_round_complete(
-                    db, group.id, group.current_round
-                )
+        with JobRunService.track("process_pending_payouts") as run:
+            try:
+                last_check = JobRunService.last_success_started_at(db, "process_pending_payouts")
+                
+                # Retire groups that ran past their final round
+                completed = GroupService.complete_finished_groups(db)
+                if completed:
+                    print(f"Completed {completed} finished groups")
                 
-                if round_complete:
+                complete_rounds = PayoutService.find_complete_rounds(db, since=last_check)
+                run.rows_scanned = len(complete_rounds)
+                
+                for group, stats in complete_rounds:
                     print(f"Group {group.name}: Round {group.current_round} complete")
-                    
-                    # Create payout if it doesn't exist
-                    payout = PayoutService.create_payout_for_round(
-                        db, group.id, group.current_round
+                
+                # Create missing payouts in one transaction
+                payouts = PayoutService.create_payouts_for_rounds(db, complete_rounds)
+                
+                # Auto-process payouts through the disbursement queue
+                PayoutService.queue_for_disbursement(db, payouts)
+                stats = DisbursementService.disburse_queue(db)
+                run.payments_attempted = stats["attempted"]
+                run.successes = stats["paid"]
+                run.failures = stats["failed"] + stats["kyc_blocked"]
+                
+                print(
+                    f"  - {stats['paid']} payouts executed, {stats['failed']} failed, "
+                    f"{stats['unsettled']} awaiting MoMo, "
+                    f"{stats['kyc_blocked']} awaiting KYC, {stats['deferred']} deferred"
+                )
+                
+                stale = DisbursementService.get_stale_claims(db)
+                if stale:
+                    print(
+                        f"⚠️  {len(stale)} payouts stuck in processing need reconciling: "
+                        f"{[payout.id for payout in stale]}"
                     )
-                    
-                    if payout:
-                        print(f"  - Payout created: ID {payout.id}, Status: {payout.status}")
-                        
-                        # Auto-process payout
-                        try:
-                            PayoutService.execute_payout(db, payout.id)
-                            print(f"  - Payout executed successfully")
-                        
-                        except Exception as e:
-                            print(f"  - Payout execution failed: {str(e)}")
-            
-            print(f"✅ Payout processing job completed\n")
-        
-        except Exception as e:
-            print(f"❌ Error in payout processing job: {str(e)}")
-        
-        finally:
-            db.close()
+                
+                print(f"✅ Payout processing job completed\n")
+            
+            except Exception as e:
+                run.error = str(e)
+                print(f"❌ Error in payout processing job: {str(e)}")
+            
+            finally:
+                db.close()
 
 
 # Global scheduler instance
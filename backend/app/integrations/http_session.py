@@ -0,0 +1,151 @@
+"""
+Pooled HTTP session for the MTN APIs.
+
+Every MTN integration sends its requests through one long-lived
+requests.Session so TCP and TLS connections are kept alive and reused
+between calls instead of being opened per request.
+
+- Connections are pooled per host, up to MTN_HTTP_POOL_MAXSIZE each
+- Requests without an explicit timeout get (connect, read) timeouts
+- Idempotent requests (GET, HEAD, ...) are retried with exponential backoff
+  on connection errors and 429/5xx responses. POSTs are never retried here:
+  a debit or transfer must not be sent twice without a status check.
+
+The async clients share one pooled httpx.AsyncClient per event loop. It only
+retries failed connection attempts, which never reach MTN and are safe for
+every method.
+"""
+
+import asyncio
+import threading
+import logging
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class MTNSession(requests.Session):
+    """
+    requests.Session that applies default connect and read timeouts.
+    """
+    
+    def __init__(self, timeout: tuple):
+        super().__init__()
+        self.timeout = timeout
+    
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def build_session() -> MTNSession:
+    """
+    Build a pooled session with keep-alive, timeouts and retries.
+    
+    Returns:
+        Configured MTNSession
+    """
+    retry = Retry(
+        total=settings.MTN_HTTP_MAX_RETRIES,
+        connect=settings.MTN_HTTP_MAX_RETRIES,
+        read=settings.MTN_HTTP_MAX_RETRIES,
+        status=settings.MTN_HTTP_MAX_RETRIES,
+        backoff_factor=settings.MTN_HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.MTN_HTTP_POOL_CONNECTIONS,
+        pool_maxsize=settings.MTN_HTTP_POOL_MAXSIZE,
+        max_retries=retry
+    )
+    
+    session = MTNSession(
+        timeout=(settings.MTN_HTTP_CONNECT_TIMEOUT_SECONDS, settings.MTN_HTTP_READ_TIMEOUT_SECONDS)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session: Optional[MTNSession] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> MTNSession:
+    """
+    Get the process-wide MTN session, creating it on first use.
+    
+    Returns:
+        Shared MTNSession
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+                logger.info(
+                    f"MTN HTTP session created - pool size {settings.MTN_HTTP_POOL_MAXSIZE} per host"
+                )
+    return _session
+
+
+def close_session() -> None:
+    """Close the shared session and its pooled connections."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Get the pooled httpx client for the running event loop.
+    
+    Returns:
+        Shared httpx.AsyncClient
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.MTN_HTTP_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.MTN_HTTP_ASYNC_MAX_KEEPALIVE
+            ),
+            timeout=httpx.Timeout(
+                settings.MTN_HTTP_READ_TIMEOUT_SECONDS,
+                connect=settings.MTN_HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=settings.MTN_HTTP_MAX_RETRIES)
+        )
+        _async_client_loop = loop
+        logger.info(
+            f"MTN async HTTP client created - {settings.MTN_HTTP_ASYNC_MAX_CONNECTIONS} connections"
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the shared async client and its pooled connections."""
+    global _async_client, _async_client_loop
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+        _async_client_loop = None
@@ -1,10 +1,15 @@
 import json
+import logging
+import os
 import random
+import threading
 import uuid
 from datetime import datetime
 from typing import Dict, Optional
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
 
 class InsufficientFundsError(Exception):
     """Exception raised when wallet has insufficient funds."""
@@ -17,25 +22,108 @@ class InvalidAccountError(Exception):
 
 
 class MoMoMockAPI:
-    """Mock implementation of MTN Mobile Money API for testing."""
+    """
+    Mock implementation of MTN Mobile Money API for testing.
+    
+    Transactions are appended to a JSON Lines log and indexed in memory by
+    transaction ID, so recording or looking up a transaction costs the same
+    however long the history is. Failed attempts have no transaction ID and
+    are only kept for auditing; once they outnumber both `compact_after`
+    and the successful transactions, the log is rewritten without them.
+    """
     
-    def __init__(self, transactions_file: str = "momo_transactions.json"):
+    def __init__(self, transactions_file: str = "momo_transactions.jsonl", compact_after: int = 10000):
         self.transactions_file = Path(transactions_file)
-        self.transactions = self._load_transactions()
+        self.compact_after = compact_after
+        # Successful transactions by ID, in log order
+        self._index: Dict[str, Dict] = {}
+        # Failed attempts in the log since the last compaction
+        self._failed = 0
+        # Append handle, opened on the first write
+        self._log = None
         # Mock wallet balances (phone_number -> balance)
         self.wallets: Dict[str, float] = {}
+        # Transfers may be submitted from several threads; the lock covers
+        # each balance check, balance update and transaction log write
+        self._lock = threading.Lock()
+        self._load_transactions()
+    
+    def _load_transactions(self):
+        """
+        Index the existing transaction log.
+        
+        A log left in the old JSON array format (momo_transactions.json) is
+        converted to JSON Lines once. A partially written last line, left by
+        a crash mid-append, is skipped.
+        """
+        legacy_file = self.transactions_file.with_suffix(".json")
+        if not self.transactions_file.exists() and legacy_file.exists():
+            with open(legacy_file, 'r') as f:
+                records = json.load(f)
+            self._rewrite(records)
+            logger.info(f"Converted {legacy_file} to {self.transactions_file}")
+            return
+        
+        if not self.transactions_file.exists():
+            return
+        
+        with open(self.transactions_file, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    self._index_transaction(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Skipping unreadable line in {self.transactions_file}")
     
-    def _load_transactions(self) -> list:
-        """Load existing transactions from file."""
-        if self.transactions_file.exists():
-            with open(self.transactions_file, 'r') as f:
-                return json.load(f)
-        return []
+    def _index_transaction(self, transaction: Dict):
+        """Add a logged transaction to the in-memory index."""
+        if transaction.get("transaction_id"):
+            self._index[transaction["transaction_id"]] = transaction
+        else:
+            self._failed += 1
+    
+    def _record(self, transaction: Dict):
+        """Append a transaction to the log; the caller holds the lock."""
+        if self._log is None:
+            self.transactions_file.parent.mkdir(parents=True, exist_ok=True)
+            self._log = open(self.transactions_file, 'a')
+        
+        self._log.write(json.dumps(transaction, default=str) + "\n")
+        self._log.flush()
+        self._index_transaction(transaction)
+        
+        # Compacting only once failures outnumber the kept transactions keeps
+        # the rewrite cost constant per recorded transaction
+        if self._failed > max(self.compact_after, len(self._index)):
+            self._rewrite(list(self._index.values()))
+    
+    def _rewrite(self, transactions: list):
+        """
+        Replace the log with the given transactions; the caller holds the lock.
+        
+        The new log is written next to the old one and swapped in atomically.
+        """
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        
+        self.transactions_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.transactions_file.with_suffix(".jsonl.tmp")
+        with open(temp_file, 'w') as f:
+            for transaction in transactions:
+                f.write(json.dumps(transaction, default=str) + "\n")
+        os.replace(temp_file, self.transactions_file)
+        
+        self._index = {}
+        self._failed = 0
+        for transaction in transactions:
+            self._index_transaction(transaction)
     
-    def _save_transactions(self):
-        """Save transactions to file."""
-        with open(self.transactions_file, 'w') as f:
-            json.dump(self.transactions, f, indent=2, default=str)
+    def compact(self):
+        """Rewrite the transaction log with only its successful transactions."""
+        with self._lock:
+            self._rewrite(list(self._index.values()))
     
     def _generate_transaction_id(self) -> str:
         """Generate a mock transaction ID."""
@@ -94,57 +182,55 @@ class MoMoMockAPI:
         # Validate account
         self.validate_account(phone_number)
         
-        # Simulate random failures
-        if self._simulate_failure():
-            transaction = {
-                "transaction_id": None,
-                "type": "debit",
-                "phone_number": phone_number,
-                "amount": amount,
-                "status": "failed",
-                "reason": "Network error or insufficient funds",
-                "reference": reference,
-                "timestamp": datetime.utcnow().isoformat()
-            }
-            self.transactions.append(transaction)
-            self._save_transactions()
-            raise InsufficientFundsError("Simulated payment failure")
-        
-        # Check balance
-        balance = self._get_wallet_balance(phone_number)
-        if balance < amount:
+        with self._lock:
+            # Simulate random failures
+            if self._simulate_failure():
+                transaction = {
+                    "transaction_id": None,
+                    "type": "debit",
+                    "phone_number": phone_number,
+                    "amount": amount,
+                    "status": "failed",
+                    "reason": "Network error or insufficient funds",
+                    "reference": reference,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+                self._record(transaction)
+                raise InsufficientFundsError("Simulated payment failure")
+            
+            # Check balance
+            balance = self._get_wallet_balance(phone_number)
+            if balance < amount:
+                transaction = {
+                    "transaction_id": None,
+                    "type": "debit",
+                    "phone_number": phone_number,
+                    "amount": amount,
+                    "status": "failed",
+                    "reason": "Insufficient funds",
+                    "balance": balance,
+                    "reference": reference,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+                self._record(transaction)
+                raise InsufficientFundsError(f"Insufficient funds. Balance: {balance}, Required: {amount}")
+            
+            # Process debit
+            self.wallets[phone_number] = balance - amount
+            transaction_id = self._generate_transaction_id()
+            
             transaction = {
-                "transaction_id": None,
+                "transaction_id": transaction_id,
                 "type": "debit",
                 "phone_number": phone_number,
                 "amount": amount,
-                "status": "failed",
-                "reason": "Insufficient funds",
-                "balance": balance,
+                "status": "success",
+                "new_balance": self.wallets[phone_number],
                 "reference": reference,
                 "timestamp": datetime.utcnow().isoformat()
             }
-            self.transactions.append(transaction)
-            self._save_transactions()
-            raise InsufficientFundsError(f"Insufficient funds. Balance: {balance}, Required: {amount}")
-        
-        # Process debit
-        self.wallets[phone_number] = balance - amount
-        transaction_id = self._generate_transaction_id()
-        
-        transaction = {
-            "transaction_id": transaction_id,
-            "type": "debit",
-            "phone_number": phone_number,
-            "amount": amount,
-            "status": "success",
-            "new_balance": self.wallets[phone_number],
-            "reference": reference,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        self.transactions.append(transaction)
-        self._save_transactions()
+            
+            self._record(transaction)
         
         return transaction_id
     
@@ -166,49 +252,45 @@ class MoMoMockAPI:
         # Validate account
         self.validate_account(phone_number)
         
-        # Simulate random failures (lower rate for credits)
-        if random.random() < 0.02:  # 2% failure rate for credits
+        with self._lock:
+            # Simulate random failures (lower rate for credits)
+            if random.random() < 0.02:  # 2% failure rate for credits
+                transaction = {
+                    "transaction_id": None,
+                    "type": "credit",
+                    "phone_number": phone_number,
+                    "amount": amount,
+                    "status": "failed",
+                    "reason": "Network error",
+                    "reference": reference,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+                self._record(transaction)
+                raise Exception("Simulated credit failure")
+            
+            # Process credit
+            balance = self._get_wallet_balance(phone_number)
+            self.wallets[phone_number] = balance + amount
+            transaction_id = self._generate_transaction_id()
+            
             transaction = {
-                "transaction_id": None,
+                "transaction_id": transaction_id,
                 "type": "credit",
                 "phone_number": phone_number,
                 "amount": amount,
-                "status": "failed",
-                "reason": "Network error",
+                "status": "success",
+                "new_balance": self.wallets[phone_number],
                 "reference": reference,
                 "timestamp": datetime.utcnow().isoformat()
             }
-            self.transactions.append(transaction)
-            self._save_transactions()
-            raise Exception("Simulated credit failure")
-        
-        # Process credit
-        balance = self._get_wallet_balance(phone_number)
-        self.wallets[phone_number] = balance + amount
-        transaction_id = self._generate_transaction_id()
-        
-        transaction = {
-            "transaction_id": transaction_id,
-            "type": "credit",
-            "phone_number": phone_number,
-            "amount": amount,
-            "status": "success",
-            "new_balance": self.wallets[phone_number],
-            "reference": reference,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        self.transactions.append(transaction)
-        self._save_transactions()
+            
+            self._record(transaction)
         
         return transaction_id
     
     def get_transaction(self, transaction_id: str) -> Optional[Dict]:
         """Get transaction details by ID."""
-        for txn in self.transactions:
-            if txn.get("transaction_id") == transaction_id:
-                return txn
-        return None
+        return self._index.get(transaction_id)
 
 
 # Singleton instance
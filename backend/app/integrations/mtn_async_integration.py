@@ -0,0 +1,64 @@
+"""
+Async MTN Integrations
+
+Async versions of the MTN MoMo, SMS and KYC clients for async endpoints and
+bulk jobs. They keep the interfaces of the blocking clients (same method
+names, arguments and result dicts) but return coroutines, and send their
+requests through one pooled httpx.AsyncClient so a worker can have hundreds
+of provider calls in flight without a thread for each.
+
+The API operations themselves (request building, response parsing, token
+handling) are shared with the blocking clients; these classes only swap
+the transport that runs them (see mtn_transport).
+"""
+
+import logging
+from typing import Any
+
+from .http_session import get_async_client
+from .mtn_transport import Operation, run_async
+from .mtn_momo_integration import MTNMoMoIntegration
+from .mtn_sms_integration import MTNSMSIntegration
+from .mtn_kyc_integration import MTNKYCIntegration
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncMTNMoMoIntegration(MTNMoMoIntegration):
+    """
+    Async MTN Mobile Money client.
+    """
+    
+    async def _execute(self, operation: Operation) -> Any:
+        """Run an API operation on the shared async client."""
+        return await run_async(operation, get_async_client())
+
+
+class AsyncMTNSMSIntegration(MTNSMSIntegration):
+    """
+    Async MTN SMS client.
+    """
+    
+    async def _execute(self, operation: Operation) -> Any:
+        """Run an API operation on the shared async client."""
+        return await run_async(operation, get_async_client())
+
+
+class AsyncMTNKYCIntegration(MTNKYCIntegration):
+    """
+    Async MTN Customer KYC client.
+    """
+    
+    async def _execute(self, operation: Operation) -> Any:
+        """Run an API operation on the shared async client."""
+        return await run_async(operation, get_async_client())
+    
+    def _momo(self):
+        """MoMo client whose account validation the KYC check reuses."""
+        return async_mtn_momo_service
+
+
+# Singleton instances
+async_mtn_momo_service = AsyncMTNMoMoIntegration()
+async_mtn_sms_service = AsyncMTNSMSIntegration()
+async_mtn_kyc_service = AsyncMTNKYCIntegration()
@@ -7,11 +7,14 @@ Supports phone number verification and MoMo account validation for compliance.
 MTN KYC API Documentation: https://developers.mtn.com/products/mtn-customer-kyc-api-v1-product
 """
 
-import requests
 import logging
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+from typing import Any, Dict
+from datetime import datetime
 from ..config import settings
+from .http_session import MTNSession, get_session
+from .mtn_transport import (
+    ApiRequest, Concurrent, Operation, TokenRequest, api_operation, operation_steps, run
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,16 +36,28 @@ class MTNKYCIntegration:
         self.environment = settings.MTN_ENVIRONMENT
         self.enabled = settings.ENABLE_MTN_KYC
         
-        # Token caching
-        self._access_token = None
-        self._token_expires_at = None
-        
         logger.info(f"MTN KYC Integration initialized - Environment: {self.environment}")
     
-    def _get_oauth_token(self) -> str:
+    @property
+    def session(self) -> MTNSession:
+        """Pooled keep-alive session shared by all MTN integrations, looked up per call."""
+        return get_session()
+    
+    def _execute(self, operation: Operation) -> Any:
+        """Run an API operation on the blocking session."""
+        return run(operation, self.session)
+    
+    def _momo(self):
+        """MoMo client whose account validation the KYC check reuses."""
+        # Import here to avoid circular dependency
+        from .mtn_momo_integration import mtn_momo_service
+        return mtn_momo_service
+    
+    @api_operation
+    def _get_oauth_token(self) -> Operation:
         """
         Get OAuth 2.0 Bearer token for MTN API authentication.
-        Implements token caching to reduce API calls.
+        Tokens are shared through the token manager and refreshed before expiry.
         
         Returns:
             Bearer token string
@@ -50,48 +65,42 @@ class MTNKYCIntegration:
         Raises:
             Exception: If token request fails
         """
-        # Return cached token if still valid
-        if self._access_token and self._token_expires_at:
-            if datetime.utcnow() < self._token_expires_at:
-                logger.debug("Using cached OAuth token")
-                return self._access_token
-        
         if not self.consumer_key or not self.consumer_secret:
             raise Exception("MTN API credentials not configured")
         
-        # MTN OAuth 2.0 token endpoint
-        url = f"{self.base_url}/oauth/token"
+        return (yield TokenRequest(
+            "mtn-oauth",
+            (self.base_url, self.consumer_key, self.consumer_secret),
+            self._request_oauth_token
+        ))
+    
+    def _request_oauth_token(self) -> Operation:
+        """
+        Request a new Bearer token from the MTN OAuth 2.0 endpoint.
         
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
+        Returns:
+            Tuple of (access token, lifetime in seconds)
+        """
+        # Use basic auth with consumer key and secret
+        response = yield ApiRequest(
+            "POST",
+            f"{self.base_url}/oauth/token",
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            data={"grant_type": "client_credentials"},
+            auth=(self.consumer_key, self.consumer_secret)
+        )
         
-        payload = {
-            "grant_type": "client_credentials"
-        }
+        if not response.ok:
+            logger.error(f"Failed to obtain MTN OAuth token: {response.error}")
+            raise Exception(f"MTN authentication failed: {response.error}")
         
-        # Use basic auth with consumer key and secret
-        auth = (self.consumer_key, self.consumer_secret)
+        token_data = response.body or {}
         
-        try:
-            response = requests.post(url, headers=headers, data=payload, auth=auth, timeout=10)
-            response.raise_for_status()
-            
-            token_data = response.json()
-            self._access_token = token_data.get("access_token")
-            
-            # Cache token (typically valid for 1 hour, we'll cache for 55 minutes)
-            expires_in = token_data.get("expires_in", 3600)
-            self._token_expires_at = datetime.utcnow() + timedelta(seconds=expires_in - 300)
-            
-            logger.info("Successfully obtained MTN OAuth token")
-            return self._access_token
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to obtain MTN OAuth token: {e}")
-            raise Exception(f"MTN authentication failed: {e}")
+        logger.info("Successfully obtained MTN OAuth token")
+        return token_data.get("access_token"), token_data.get("expires_in", 3600)
     
-    def verify_phone_number(self, phone_number: str) -> Dict:
+    @api_operation
+    def verify_phone_number(self, phone_number: str) -> Operation:
         """
         Verify if a phone number is a valid MTN number.
         
@@ -112,58 +121,58 @@ class MTNKYCIntegration:
         # Clean phone number
         clean_phone = self._clean_phone_number(phone_number)
         
-        try:
-            access_token = self._get_oauth_token()
-            
-            # MTN KYC phone verification endpoint
-            url = f"{self.base_url}/customer/v1/msisdn/{clean_phone}/verify"
-            
-            headers = {
+        access_token = yield from operation_steps(self._get_oauth_token)
+        
+        # MTN KYC phone verification endpoint
+        response = yield ApiRequest(
+            "GET",
+            f"{self.base_url}/customer/v1/msisdn/{clean_phone}/verify",
+            headers={
                 "Authorization": f"Bearer {access_token}",
                 "Content-Type": "application/json"
             }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                logger.info(f"Phone number {clean_phone} verified successfully")
-                return {
-                    "verified": True,
-                    "phone_number": clean_phone,
-                    "is_mtn": True,
-                    "message": "Phone number verified",
-                    "provider": "MTN"
-                }
-            elif response.status_code == 404:
-                logger.warning(f"Phone number {clean_phone} not found in MTN network")
-                return {
-                    "verified": False,
-                    "phone_number": clean_phone,
-                    "is_mtn": False,
-                    "message": "Phone number not found in MTN network",
-                    "provider": "unknown"
-                }
-            else:
-                logger.error(f"Phone verification failed with status {response.status_code}")
-                return {
-                    "verified": False,
-                    "message": f"Verification failed: {response.status_code}",
-                    "provider": "error"
-                }
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to verify phone number: {e}")
+        )
+        
+        if response.status_code == 200:
+            logger.info(f"Phone number {clean_phone} verified successfully")
+            return {
+                "verified": True,
+                "phone_number": clean_phone,
+                "is_mtn": True,
+                "message": "Phone number verified",
+                "provider": "MTN"
+            }
+        elif response.status_code == 404:
+            logger.warning(f"Phone number {clean_phone} not found in MTN network")
+            return {
+                "verified": False,
+                "phone_number": clean_phone,
+                "is_mtn": False,
+                "message": "Phone number not found in MTN network",
+                "provider": "unknown"
+            }
+        elif response.status_code is None:
+            logger.error(f"Failed to verify phone number: {response.error}")
+            return {
+                "verified": False,
+                "error": True,
+                "message": response.error,
+                "provider": "error"
+            }
+        else:
+            logger.error(f"Phone verification failed with status {response.status_code}")
             return {
                 "verified": False,
-                "message": str(e),
+                "error": True,
+                "message": f"Verification failed: {response.status_code}",
                 "provider": "error"
             }
     
-    def verify_momo_account(self, phone_number: str) -> Dict:
+    @api_operation
+    def verify_momo_account(self, phone_number: str) -> Operation:
         """
         Verify if a phone number has an active MoMo account.
-        Reuses the MoMo integration's validate_account method.
+        Reuses the MoMo integration's validate_account operation.
         
         Args:
             phone_number: Phone number to validate
@@ -178,15 +187,13 @@ class MTNKYCIntegration:
                 "message": "MTN KYC is disabled"
             }
         
-        # Import here to avoid circular dependency
-        from .mtn_momo_integration import mtn_momo_service
-        
         try:
-            result = mtn_momo_service.validate_account(phone_number)
+            result = yield from operation_steps(self._momo().validate_account, phone_number)
             
             return {
                 "valid": result.get("valid", False),
                 "has_momo": result.get("valid", False),
+                "error": result.get("error", False),
                 "phone_number": result.get("phone_number"),
                 "message": result.get("message", "MoMo account validated")
             }
@@ -196,15 +203,19 @@ class MTNKYCIntegration:
             return {
                 "valid": False,
                 "has_momo": False,
+                "error": True,
                 "message": str(e)
             }
     
-    def perform_kyc_verification(self, phone_number: str) -> Dict:
+    @api_operation
+    def perform_kyc_verification(self, phone_number: str) -> Operation:
         """
         Perform complete KYC verification including:
         1. Phone number verification
         2. MoMo account validation
         
+        Both checks run concurrently.
+        
         Args:
             phone_number: Phone number to verify
             
@@ -223,12 +234,28 @@ class MTNKYCIntegration:
         
         logger.info(f"Starting KYC verification for {phone_number}")
         
-        # Step 1: Verify phone number
-        phone_result = self.verify_phone_number(phone_number)
-        phone_verified = phone_result.get("verified", False)
+        phone_result, momo_result = yield Concurrent([
+            operation_steps(self.verify_phone_number, phone_number),
+            operation_steps(self.verify_momo_account, phone_number)
+        ])
         
-        # Step 2: Verify MoMo account
-        momo_result = self.verify_momo_account(phone_number)
+        return self._combine_kyc_results(phone_number, phone_result, momo_result)
+    
+    def _combine_kyc_results(self, phone_number: str, phone_result: Dict, momo_result: Dict) -> Dict:
+        """
+        Combine the phone and MoMo checks into one KYC verification result.
+        
+        Args:
+            phone_number: Phone number being verified
+            phone_result: Result of verify_phone_number
+            momo_result: Result of verify_momo_account
+            
+        Returns:
+            Dict with complete verification status; "error" is set when a
+            check could not get an answer from MTN, so the outcome is not a
+            definitive rejection
+        """
+        phone_verified = phone_result.get("verified", False)
         momo_verified = momo_result.get("valid", False)
         
         # Overall verification: both checks must pass
@@ -250,6 +277,13 @@ class MTNKYCIntegration:
         if overall_verified:
             logger.info(f"KYC verification successful for {phone_number}")
             verification_result["message"] = "KYC verification successful"
+        elif phone_result.get("error") or momo_result.get("error"):
+            logger.warning(f"KYC verification incomplete for {phone_number}: MTN did not answer")
+            verification_result["error"] = True
+            verification_result["message"] = "; ".join(
+                check.get("message") or "MTN check failed"
+                for check in (phone_result, momo_result) if check.get("error")
+            )
         else:
             logger.warning(f"KYC verification failed for {phone_number}")
             messages = []
@@ -7,16 +7,48 @@ Supports Collections (receiving payments) and Disbursements (sending payouts).
 MTN MoMo API Documentation: https://momodeveloper.mtn.com/
 """
 
-import requests
 import uuid
 import logging
-from typing import Dict, Optional
-from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
 from ..config import settings
+from .http_session import MTNSession, get_session
+from .mtn_transport import (
+    ApiRequest, Operation, TokenRequest, api_operation, operation_steps, run
+)
 
 logger = logging.getLogger(__name__)
 
 
+def request_error_status(status_code: Optional[int]) -> str:
+    """
+    Classify a failed MoMo API request by its HTTP status code.
+    
+    Args:
+        status_code: Response status, or None if no response was received
+    
+    Returns:
+        "pending" if MTN already has the X-Reference-Id (409), "rejected" for
+        other client errors, or "error" when the outcome is unknown
+        (timeouts, connection errors, throttling and server errors)
+    """
+    if status_code == 409:
+        return "pending"
+    if status_code is not None and 400 <= status_code < 500 and status_code not in (408, 429):
+        return "rejected"
+    return "error"
+
+
+def to_msisdn(phone_number: str) -> str:
+    """Format a Ghana phone number as 233XXXXXXXXX for the MoMo API."""
+    clean_phone = phone_number.replace("+", "").replace(" ", "").replace("-", "")
+    if not clean_phone.startswith("233"):
+        if clean_phone.startswith("0"):
+            clean_phone = f"233{clean_phone[1:]}"
+        else:
+            clean_phone = f"233{clean_phone}"
+    return clean_phone
+
+
 class MTNMoMoIntegration:
     """
     Integration with MTN Mobile Money API.
@@ -25,6 +57,9 @@ class MTNMoMoIntegration:
     - Collections: Request payments from users
     - Disbursements: Send money to users
     - Transaction status queries
+    
+    API calls are written as @api_operation generators; this client runs
+    them on the pooled requests session, AsyncMTNMoMoIntegration on httpx.
     """
     
     def __init__(self):
@@ -32,15 +67,38 @@ class MTNMoMoIntegration:
         self.subscription_key = settings.MTN_MOMO_SUBSCRIPTION_KEY
         self.api_user = settings.MTN_MOMO_API_USER
         self.api_key = settings.MTN_MOMO_API_KEY
+        self.disbursement_subscription_key = settings.MTN_MOMO_DISBURSEMENT_SUBSCRIPTION_KEY or self.subscription_key
+        self.disbursement_api_user = settings.MTN_MOMO_DISBURSEMENT_API_USER or self.api_user
+        self.disbursement_api_key = settings.MTN_MOMO_DISBURSEMENT_API_KEY or self.api_key
         self.target_environment = settings.MTN_MOMO_TARGET_ENVIRONMENT
         self.currency = settings.MTN_MOMO_CURRENCY
         self.enabled = settings.ENABLE_MTN_MOMO and settings.USE_MTN_SERVICES
         
         logger.info(f"MTN MoMo Integration initialized - Environment: {self.target_environment}")
     
-    def _get_auth_token(self) -> str:
+    @property
+    def session(self) -> MTNSession:
+        """Pooled keep-alive session shared by all MTN integrations, looked up per call."""
+        return get_session()
+    
+    def _execute(self, operation: Operation) -> Any:
+        """Run an API operation on the blocking session."""
+        return run(operation, self.session)
+    
+    def _credentials(self, product: str) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+        """Subscription key, API user and API key of a MoMo product ("collection" or "disbursement")."""
+        if product == "disbursement":
+            return self.disbursement_subscription_key, self.disbursement_api_user, self.disbursement_api_key
+        return self.subscription_key, self.api_user, self.api_key
+    
+    @api_operation
+    def _get_auth_token(self, product: str = "collection") -> Operation:
         """
         Get Bearer token for MoMo API authentication.
+        Tokens come from the shared token manager and are refreshed before expiry.
+        
+        Args:
+            product: MoMo product the token is for ("collection" or "disbursement")
         
         Returns:
             Bearer token string
@@ -48,33 +106,59 @@ class MTNMoMoIntegration:
         Raises:
             Exception: If token request fails
         """
-        if not self.api_user or not self.api_key:
+        subscription_key, api_user, api_key = self._credentials(product)
+        if not api_user or not api_key:
             raise Exception("MTN MoMo API credentials not configured")
         
-        url = f"{self.base_url}/collection/token/"
+        return (yield TokenRequest(
+            f"momo-{product}",
+            (self.base_url, subscription_key, api_user, api_key),
+            lambda: self._request_auth_token(product)
+        ))
+    
+    def _request_auth_token(self, product: str = "collection") -> Operation:
+        """
+        Request a new Bearer token from the MoMo token endpoint.
         
-        headers = {
-            "Ocp-Apim-Subscription-Key": self.subscription_key,
-        }
+        Args:
+            product: MoMo product the token is for
+        
+        Returns:
+            Tuple of (access token, lifetime in seconds)
+        """
+        subscription_key, api_user, api_key = self._credentials(product)
         
         # Use basic auth with API user and API key
-        auth = (self.api_user, self.api_key)
+        response = yield ApiRequest(
+            "POST",
+            f"{self.base_url}/{product}/token/",
+            headers={"Ocp-Apim-Subscription-Key": subscription_key},
+            auth=(api_user, api_key)
+        )
         
-        try:
-            response = requests.post(url, headers=headers, auth=auth, timeout=10)
-            response.raise_for_status()
-            
-            token_data = response.json()
-            access_token = token_data.get("access_token")
-            
-            logger.info("Successfully obtained MTN MoMo access token")
-            return access_token
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to obtain MTN MoMo token: {e}")
-            raise Exception(f"MTN MoMo authentication failed: {e}")
+        if not response.ok:
+            logger.error(f"Failed to obtain MTN MoMo token: {response.error}")
+            raise Exception(f"MTN MoMo authentication failed: {response.error}")
+        
+        token_data = response.body or {}
+        
+        logger.info("Successfully obtained MTN MoMo access token")
+        return token_data.get("access_token"), token_data.get("expires_in", 3600)
     
-    def create_api_user(self) -> Dict:
+    def _headers(self, product: str = "collection", **extra: str) -> Operation:
+        """Authorization headers for MoMo API calls of a product."""
+        access_token = yield from operation_steps(self._get_auth_token, product)
+        
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "X-Target-Environment": self.target_environment,
+            "Ocp-Apim-Subscription-Key": self._credentials(product)[0],
+        }
+        headers.update(extra)
+        return headers
+    
+    @api_operation
+    def create_api_user(self) -> Operation:
         """
         Create API user for sandbox environment.
         This is typically done once during setup.
@@ -82,36 +166,34 @@ class MTNMoMoIntegration:
         Returns:
             API user information
         """
-        url = f"{self.base_url}/v1_0/apiuser"
-        
         api_user_id = str(uuid.uuid4())
         
-        headers = {
-            "X-Reference-Id": api_user_id,
-            "Ocp-Apim-Subscription-Key": self.subscription_key,
-            "Content-Type": "application/json"
-        }
+        response = yield ApiRequest(
+            "POST",
+            f"{self.base_url}/v1_0/apiuser",
+            headers={
+                "X-Reference-Id": api_user_id,
+                "Ocp-Apim-Subscription-Key": self.subscription_key,
+                "Content-Type": "application/json"
+            },
+            json={
+                "providerCallbackHost": settings.MTN_CALLBACK_URL.replace("https://", "").replace("http://", "")
+            }
+        )
         
-        payload = {
-            "providerCallbackHost": settings.MTN_CALLBACK_URL.replace("https://", "").replace("http://", "")
-        }
+        if not response.ok:
+            logger.error(f"Failed to create API user: {response.error}")
+            raise Exception(f"Failed to create API user: {response.error}")
         
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
-            response.raise_for_status()
-            
-            logger.info(f"Created API user: {api_user_id}")
-            
-            return {
-                "api_user": api_user_id,
-                "status": "created"
-            }
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to create API user: {e}")
-            raise Exception(f"Failed to create API user: {e}")
+        logger.info(f"Created API user: {api_user_id}")
+        
+        return {
+            "api_user": api_user_id,
+            "status": "created"
+        }
     
-    def create_api_key(self, api_user: str) -> str:
+    @api_operation
+    def create_api_key(self, api_user: str) -> Operation:
         """
         Create API key for an API user (sandbox only).
         
@@ -121,38 +203,36 @@ class MTNMoMoIntegration:
         Returns:
             API key
         """
-        url = f"{self.base_url}/v1_0/apiuser/{api_user}/apikey"
-        
-        headers = {
-            "Ocp-Apim-Subscription-Key": self.subscription_key,
-        }
-        
-        try:
-            response = requests.post(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            api_key = data.get("apiKey")
-            
-            logger.info("Created API key successfully")
-            return api_key
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to create API key: {e}")
-            raise Exception(f"Failed to create API key: {e}")
+        response = yield ApiRequest(
+            "POST",
+            f"{self.base_url}/v1_0/apiuser/{api_user}/apikey",
+            headers={"Ocp-Apim-Subscription-Key": self.subscription_key}
+        )
+        
+        if not response.ok:
+            logger.error(f"Failed to create API key: {response.error}")
+            raise Exception(f"Failed to create API key: {response.error}")
+        
+        logger.info("Created API key successfully")
+        return (response.body or {}).get("apiKey")
     
+    @api_operation
     def request_to_pay(
         self,
         phone_number: str,
         amount: float,
         reference: str,
         payer_message: str = "Payment for SusuSave",
-        payee_note: str = "Thank you!"
-    ) -> Dict:
+        payee_note: str = "Thank you!",
+        reference_id: Optional[str] = None,
+        callback_url: Optional[str] = None
+    ) -> Operation:
         """
         Request payment from a user (Collection).
         
         The user will receive a prompt on their phone to approve the payment.
+        The request completes asynchronously: poll get_transaction_status or
+        receive the result on callback_url.
         
         Args:
             phone_number: User's phone number (format: 233XXXXXXXXX, no +)
@@ -160,6 +240,8 @@ class MTNMoMoIntegration:
             reference: Your internal reference/transaction ID
             payer_message: Message shown to payer
             payee_note: Note for payee
+            reference_id: X-Reference-Id to use (generated if not given)
+            callback_url: URL MTN calls with the final status
             
         Returns:
             Dict with transaction details
@@ -174,30 +256,16 @@ class MTNMoMoIntegration:
                 "message": "MTN MoMo is not enabled"
             }
         
-        # Clean phone number (remove + and spaces)
-        clean_phone = phone_number.replace("+", "").replace(" ", "").replace("-", "")
-        
-        # Ensure it starts with country code (233 for Ghana)
-        if not clean_phone.startswith("233"):
-            if clean_phone.startswith("0"):
-                clean_phone = f"233{clean_phone[1:]}"
-            else:
-                clean_phone = f"233{clean_phone}"
+        clean_phone = to_msisdn(phone_number)
         
         # Generate unique reference ID
-        reference_id = str(uuid.uuid4())
-        
-        access_token = self._get_auth_token()
+        reference_id = reference_id or str(uuid.uuid4())
         
-        url = f"{self.base_url}/collection/v1_0/requesttopay"
-        
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "X-Reference-Id": reference_id,
-            "X-Target-Environment": self.target_environment,
-            "Ocp-Apim-Subscription-Key": self.subscription_key,
-            "Content-Type": "application/json"
-        }
+        headers = yield from self._headers(
+            "collection", **{"X-Reference-Id": reference_id, "Content-Type": "application/json"}
+        )
+        if callback_url:
+            headers["X-Callback-Url"] = callback_url
         
         payload = {
             "amount": str(amount),
@@ -211,33 +279,33 @@ class MTNMoMoIntegration:
             "payeeNote": payee_note
         }
         
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=15)
-            response.raise_for_status()
-            
-            logger.info(f"Payment request sent: {reference_id}")
-            
-            return {
-                "status": "pending",
-                "reference_id": reference_id,
-                "external_id": reference,
-                "amount": amount,
-                "currency": self.currency,
-                "phone_number": clean_phone,
-                "message": "Payment request sent. User will receive prompt to approve."
-            }
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to request payment: {e}")
-            
+        response = yield ApiRequest(
+            "POST", f"{self.base_url}/collection/v1_0/requesttopay", headers=headers, json=payload
+        )
+        
+        if not response.ok:
+            logger.error(f"Failed to request payment: {response.error}")
             return {
-                "status": "error",
-                "message": str(e),
+                "status": request_error_status(response.status_code),
+                "message": response.error,
                 "reference_id": reference_id,
                 "amount": amount
             }
+        
+        logger.info(f"Payment request sent: {reference_id}")
+        
+        return {
+            "status": "pending",
+            "reference_id": reference_id,
+            "external_id": reference,
+            "amount": amount,
+            "currency": self.currency,
+            "phone_number": clean_phone,
+            "message": "Payment request sent. User will receive prompt to approve."
+        }
     
-    def get_transaction_status(self, reference_id: str) -> Dict:
+    @api_operation
+    def get_transaction_status(self, reference_id: str) -> Operation:
         """
         Get status of a payment request.
         
@@ -250,48 +318,46 @@ class MTNMoMoIntegration:
         if not self.enabled:
             return {"status": "disabled"}
         
-        access_token = self._get_auth_token()
+        headers = yield from self._headers("collection")
         
-        url = f"{self.base_url}/collection/v1_0/requesttopay/{reference_id}"
+        response = yield ApiRequest(
+            "GET", f"{self.base_url}/collection/v1_0/requesttopay/{reference_id}", headers=headers
+        )
         
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "X-Target-Environment": self.target_environment,
-            "Ocp-Apim-Subscription-Key": self.subscription_key,
-        }
-        
-        try:
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
+        if not response.ok:
+            logger.error(f"Failed to get transaction status: {response.error}")
             
-            return {
-                "status": data.get("status", "unknown").lower(),
-                "amount": data.get("amount"),
-                "currency": data.get("currency"),
-                "financial_transaction_id": data.get("financialTransactionId"),
-                "external_id": data.get("externalId"),
-                "payer": data.get("payer"),
-                "reason": data.get("reason")
-            }
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get transaction status: {e}")
+            # MTN has no request with this reference (it never arrived)
+            if response.status_code == 404:
+                return {"status": "not_found", "message": response.error}
             
             return {
                 "status": "error",
-                "message": str(e)
+                "message": response.error
             }
+        
+        data = response.body or {}
+        
+        return {
+            "status": data.get("status", "unknown").lower(),
+            "amount": data.get("amount"),
+            "currency": data.get("currency"),
+            "financial_transaction_id": data.get("financialTransactionId"),
+            "external_id": data.get("externalId"),
+            "payer": data.get("payer"),
+            "reason": data.get("reason")
+        }
     
+    @api_operation
     def transfer(
         self,
         phone_number: str,
         amount: float,
         reference: str,
         payee_message: str = "Payout from SusuSave",
-        payer_note: str = "Congratulations!"
-    ) -> Dict:
+        payer_note: str = "Congratulations!",
+        reference_id: Optional[str] = None
+    ) -> Operation:
         """
         Send money to a user (Disbursement).
         
@@ -301,6 +367,7 @@ class MTNMoMoIntegration:
             reference: Your internal reference
             payee_message: Message for recipient
             payer_note: Note from payer
+            reference_id: X-Reference-Id to use (generated if not given)
             
         Returns:
             Dict with transfer details
@@ -312,28 +379,12 @@ class MTNMoMoIntegration:
                 "message": "MTN MoMo is not enabled"
             }
         
-        # Clean phone number
-        clean_phone = phone_number.replace("+", "").replace(" ", "").replace("-", "")
-        
-        if not clean_phone.startswith("233"):
-            if clean_phone.startswith("0"):
-                clean_phone = f"233{clean_phone[1:]}"
-            else:
-                clean_phone = f"233{clean_phone}"
-        
-        reference_id = str(uuid.uuid4())
-        
-        access_token = self._get_auth_token()
-        
-        url = f"{self.base_url}/disbursement/v1_0/transfer"
+        clean_phone = to_msisdn(phone_number)
+        reference_id = reference_id or str(uuid.uuid4())
         
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "X-Reference-Id": reference_id,
-            "X-Target-Environment": self.target_environment,
-            "Ocp-Apim-Subscription-Key": self.subscription_key,
-            "Content-Type": "application/json"
-        }
+        headers = yield from self._headers(
+            "disbursement", **{"X-Reference-Id": reference_id, "Content-Type": "application/json"}
+        )
         
         payload = {
             "amount": str(amount),
@@ -347,34 +398,78 @@ class MTNMoMoIntegration:
             "payeeNote": payee_message
         }
         
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=15)
-            response.raise_for_status()
-            
-            logger.info(f"Transfer initiated: {reference_id}")
-            
+        response = yield ApiRequest(
+            "POST", f"{self.base_url}/disbursement/v1_0/transfer", headers=headers, json=payload
+        )
+        
+        if not response.ok:
+            logger.error(f"Failed to initiate transfer: {response.error}")
             return {
-                "status": "pending",
-                "reference_id": reference_id,
-                "external_id": reference,
-                "amount": amount,
-                "currency": self.currency,
-                "phone_number": clean_phone,
-                "message": "Transfer initiated successfully."
+                "status": request_error_status(response.status_code),
+                "message": response.error,
+                "reference_id": reference_id
             }
+        
+        logger.info(f"Transfer initiated: {reference_id}")
+        
+        return {
+            "status": "pending",
+            "reference_id": reference_id,
+            "external_id": reference,
+            "amount": amount,
+            "currency": self.currency,
+            "phone_number": clean_phone,
+            "message": "Transfer initiated successfully."
+        }
+    
+    @api_operation
+    def get_transfer_status(self, reference_id: str) -> Operation:
+        """
+        Get status of a transfer.
+        
+        Args:
+            reference_id: Reference ID returned from transfer
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to initiate transfer: {e}")
+        Returns:
+            Transfer status information
+        """
+        if not self.enabled:
+            return {"status": "disabled"}
+        
+        headers = yield from self._headers("disbursement")
+        
+        response = yield ApiRequest(
+            "GET", f"{self.base_url}/disbursement/v1_0/transfer/{reference_id}", headers=headers
+        )
+        
+        if not response.ok:
+            logger.error(f"Failed to get transfer status: {response.error}")
+            
+            if response.status_code == 404:
+                return {"status": "not_found", "message": response.error}
             
             return {
                 "status": "error",
-                "message": str(e),
-                "reference_id": reference_id
+                "message": response.error
             }
+        
+        data = response.body or {}
+        
+        return {
+            "status": data.get("status", "unknown").lower(),
+            "amount": data.get("amount"),
+            "financial_transaction_id": data.get("financialTransactionId"),
+            "external_id": data.get("externalId"),
+            "reason": data.get("reason")
+        }
     
-    def get_account_balance(self) -> Optional[Dict]:
+    @api_operation
+    def get_account_balance(self, product: str = "collection") -> Operation:
         """
-        Get account balance (for collection account).
+        Get the balance of a MoMo account.
+        
+        Args:
+            product: "collection" or "disbursement" (the account payouts are sent from)
         
         Returns:
             Balance information
@@ -382,32 +477,23 @@ class MTNMoMoIntegration:
         if not self.enabled:
             return None
         
-        try:
-            access_token = self._get_auth_token()
-            
-            url = f"{self.base_url}/collection/v1_0/account/balance"
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "X-Target-Environment": self.target_environment,
-                "Ocp-Apim-Subscription-Key": self.subscription_key,
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            return {
-                "available_balance": data.get("availableBalance"),
-                "currency": data.get("currency")
-            }
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get account balance: {e}")
+        headers = yield from self._headers(product)
+        
+        response = yield ApiRequest("GET", f"{self.base_url}/{product}/v1_0/account/balance", headers=headers)
+        
+        if not response.ok:
+            logger.error(f"Failed to get account balance: {response.error}")
             return None
+        
+        data = response.body or {}
+        
+        return {
+            "available_balance": data.get("availableBalance"),
+            "currency": data.get("currency")
+        }
     
-    def validate_account(self, phone_number: str) -> Dict:
+    @api_operation
+    def validate_account(self, phone_number: str) -> Operation:
         """
         Validate if a phone number has an active MoMo account.
         
@@ -415,49 +501,46 @@ class MTNMoMoIntegration:
             phone_number: Phone number to validate
             
         Returns:
-            Account validation result
+            Account validation result, with "error" set if MTN gave no answer
         """
         if not self.enabled:
             return {"valid": False, "message": "MTN MoMo is disabled"}
         
-        # Clean phone number
-        clean_phone = phone_number.replace("+", "").replace(" ", "").replace("-", "")
+        clean_phone = to_msisdn(phone_number)
         
-        if not clean_phone.startswith("233"):
-            if clean_phone.startswith("0"):
-                clean_phone = f"233{clean_phone[1:]}"
+        headers = yield from self._headers("collection")
         
-        try:
-            access_token = self._get_auth_token()
-            
-            url = f"{self.base_url}/collection/v1_0/accountholder/msisdn/{clean_phone}/active"
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "X-Target-Environment": self.target_environment,
-                "Ocp-Apim-Subscription-Key": self.subscription_key,
+        response = yield ApiRequest(
+            "GET", f"{self.base_url}/collection/v1_0/accountholder/msisdn/{clean_phone}/active", headers=headers
+        )
+        
+        if response.status_code is None:
+            logger.error(f"Failed to validate account: {response.error}")
+            return {
+                "valid": False,
+                "error": True,
+                "message": response.error
             }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return {
-                    "valid": data.get("result", False),
-                    "phone_number": clean_phone
-                }
-            else:
-                return {
-                    "valid": False,
-                    "message": "Account not found or inactive"
-                }
-                
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to validate account: {e}")
+        
+        if response.status_code == 200:
+            return {
+                "valid": (response.body or {}).get("result", False),
+                "phone_number": clean_phone
+            }
+        
+        if response.status_code not in (400, 404):
+            # Auth, throttling or server errors say nothing about the account
+            logger.error(f"Account validation failed with status {response.status_code}")
             return {
                 "valid": False,
-                "message": str(e)
+                "error": True,
+                "message": f"Account validation failed: {response.status_code}"
             }
+        
+        return {
+            "valid": False,
+            "message": "Account not found or inactive"
+        }
 
 
 # Singleton instance
@@ -492,7 +575,7 @@ def debit_wallet(phone_number: str, amount: float, reference: str = "") -> str:
         payer_message=f"Payment for {reference}"
     )
     
-    if result.get("status") == "error":
+    if result.get("status") in ("error", "rejected"):
         raise InsufficientFundsError(result.get("message", "Payment failed"))
     
     return result.get("reference_id", "")
@@ -507,7 +590,7 @@ def credit_wallet(phone_number: str, amount: float, reference: str = "") -> str:
         payee_message=f"Payout: {reference}"
     )
     
-    if result.get("status") == "error":
+    if result.get("status") in ("error", "rejected"):
         raise Exception(result.get("message", "Transfer failed"))
     
     return result.get("reference_id", "")
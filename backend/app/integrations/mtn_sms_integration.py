@@ -5,13 +5,15 @@ This module handles integration with MTN's SMS API for Ghana.
 Supports sending SMS messages to MTN subscribers.
 """
 
-import requests
 import base64
 import logging
 import uuid
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 from ..config import settings
+from .http_session import MTNSession, get_session
+from .mtn_transport import (
+    ApiRequest, Concurrent, Operation, TokenRequest, api_operation, operation_steps, run
+)
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +23,8 @@ class MTNSMSIntegration:
     Integration with MTN SMS API.
     
     MTN SMS API allows applications to send SMS messages to mobile subscribers.
+    API calls are written as @api_operation generators; this client runs
+    them on the pooled requests session, AsyncMTNSMSIntegration on httpx.
     """
     
     def __init__(self):
@@ -30,16 +34,22 @@ class MTNSMSIntegration:
         self.environment = settings.MTN_ENVIRONMENT
         self.enabled = settings.ENABLE_MTN_SMS and settings.USE_MTN_SERVICES
         
-        # Token caching
-        self._access_token: Optional[str] = None
-        self._token_expires_at: Optional[datetime] = None
-        
         logger.info(f"MTN SMS Integration initialized - Environment: {self.environment}")
     
-    def _get_access_token(self) -> str:
+    @property
+    def session(self) -> MTNSession:
+        """Pooled keep-alive session shared by all MTN integrations, looked up per call."""
+        return get_session()
+    
+    def _execute(self, operation: Operation) -> Any:
+        """Run an API operation on the blocking session."""
+        return run(operation, self.session)
+    
+    @api_operation
+    def _get_access_token(self) -> Operation:
         """
         Get OAuth access token for MTN API authentication.
-        Tokens are cached and refreshed when expired.
+        Tokens are shared through the token manager and refreshed before expiry.
         
         Returns:
             Access token string
@@ -47,51 +57,49 @@ class MTNSMSIntegration:
         Raises:
             Exception: If token request fails
         """
-        # Return cached token if still valid
-        if self._access_token and self._token_expires_at:
-            if datetime.utcnow() < self._token_expires_at:
-                return self._access_token
-        
-        # Request new token
-        url = f"{self.base_url}/oauth/token"
+        return (yield TokenRequest(
+            "mtn-oauth",
+            (self.base_url, self.consumer_key, self.consumer_secret),
+            self._request_access_token
+        ))
+    
+    def _request_access_token(self) -> Operation:
+        """
+        Request a new access token from the MTN OAuth endpoint.
         
+        Returns:
+            Tuple of (access token, lifetime in seconds)
+        """
         # Create Basic Auth header
         credentials = f"{self.consumer_key}:{self.consumer_secret}"
         encoded_credentials = base64.b64encode(credentials.encode()).decode()
         
-        headers = {
-            "Authorization": f"Basic {encoded_credentials}",
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
+        response = yield ApiRequest(
+            "POST",
+            f"{self.base_url}/oauth/token",
+            headers={
+                "Authorization": f"Basic {encoded_credentials}",
+                "Content-Type": "application/x-www-form-urlencoded"
+            },
+            data={"grant_type": "client_credentials"}
+        )
         
-        data = {
-            "grant_type": "client_credentials"
-        }
+        if not response.ok:
+            logger.error(f"Failed to obtain MTN access token: {response.error}")
+            raise Exception(f"MTN authentication failed: {response.error}")
         
-        try:
-            response = requests.post(url, headers=headers, data=data, timeout=10)
-            response.raise_for_status()
-            
-            token_data = response.json()
-            self._access_token = token_data.get("access_token")
-            
-            # Set expiration (usually 3600 seconds, we set it to 50 minutes to be safe)
-            expires_in = token_data.get("expires_in", 3600)
-            self._token_expires_at = datetime.utcnow() + timedelta(seconds=expires_in - 600)
-            
-            logger.info("Successfully obtained MTN SMS access token")
-            return self._access_token
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to obtain MTN access token: {e}")
-            raise Exception(f"MTN authentication failed: {e}")
+        token_data = response.body or {}
+        
+        logger.info("Successfully obtained MTN SMS access token")
+        return token_data.get("access_token"), token_data.get("expires_in", 3600)
     
+    @api_operation
     def send_sms(
         self,
         phone_numbers: List[str],
         message: str,
         sender_id: str = "SusuSave"
-    ) -> Dict:
+    ) -> Operation:
         """
         Send SMS message to one or more recipients.
         
@@ -123,14 +131,7 @@ class MTNSMSIntegration:
                 number = f"+233{number.lstrip('0')}"
             validated_numbers.append(number)
         
-        access_token = self._get_access_token()
-        
-        url = f"{self.base_url}/sms/messages"
-        
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json"
-        }
+        access_token = yield from operation_steps(self._get_access_token)
         
         # Generate unique message ID
         message_id = str(uuid.uuid4())
@@ -143,31 +144,35 @@ class MTNSMSIntegration:
             "senderName": sender_id
         }
         
-        try:
-            response = requests.post(url, headers=headers, json=payload, timeout=15)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            logger.info(f"SMS sent successfully to {len(validated_numbers)} recipient(s)")
-            
-            return {
-                "status": "success",
-                "message_id": message_id,
-                "recipients": validated_numbers,
-                "sent": True,
-                "response": result
-            }
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to send SMS: {e}")
+        response = yield ApiRequest(
+            "POST",
+            f"{self.base_url}/sms/messages",
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Content-Type": "application/json"
+            },
+            json=payload
+        )
+        
+        if not response.ok:
+            logger.error(f"Failed to send SMS: {response.error}")
             
             return {
                 "status": "error",
-                "message": str(e),
+                "message": response.error,
                 "recipients": validated_numbers,
                 "sent": False
             }
+        
+        logger.info(f"SMS sent successfully to {len(validated_numbers)} recipient(s)")
+        
+        return {
+            "status": "success",
+            "message_id": message_id,
+            "recipients": validated_numbers,
+            "sent": True,
+            "response": response.body
+        }
     
     def send_single_sms(
         self,
@@ -188,42 +193,99 @@ class MTNSMSIntegration:
         """
         return self.send_sms([phone_number], message, sender_id)
     
+    @api_operation
     def send_bulk_sms(
         self,
         recipients: List[Dict[str, str]],
         sender_id: str = "SusuSave"
-    ) -> List[Dict]:
+    ) -> Operation:
         """
         Send personalized SMS to multiple recipients.
         
+        Recipients sharing a message are sent in one request per
+        MTN_SMS_BATCH_LIMIT numbers; requests for different messages run
+        concurrently (SMS_SEND_CONCURRENCY) within the MTN request rate limit.
+        
         Args:
             recipients: List of dicts with 'phone_number' and 'message' keys
             sender_id: Sender ID to display
             
         Returns:
-            List of responses for each SMS sent
+            List of responses, one per recipient in input order
         """
-        results = []
+        results: List[Optional[Dict]] = [None] * len(recipients)
+        batches = self._group_bulk_recipients(recipients, results)
+        
+        sent = yield Concurrent(
+            [
+                self._send_rate_limited([recipients[i]["phone_number"] for i in indexes], message, sender_id)
+                for message, indexes in batches
+            ],
+            limit=settings.SMS_SEND_CONCURRENCY
+        )
+        
+        for (_, indexes), result in zip(batches, sent):
+            for index in indexes:
+                results[index] = result
         
-        for recipient in recipients:
+        return results
+    
+    def _send_rate_limited(self, phone_numbers: List[str], message: str, sender_id: str) -> Operation:
+        """send_sms with its message request counted against the MTN rate limit."""
+        operation = operation_steps(self.send_sms, phone_numbers, message, sender_id)
+        result = None
+        while True:
+            try:
+                step = operation.send(result)
+            except StopIteration as done:
+                return done.value
+            if isinstance(step, ApiRequest) and step.url.endswith("/sms/messages"):
+                step.rate_limit = "MTN"
+            result = yield step
+    
+    def _group_bulk_recipients(
+        self,
+        recipients: List[Dict[str, str]],
+        results: List[Optional[Dict]]
+    ) -> List[Tuple[str, List[int]]]:
+        """
+        Group recipients of identical messages into batches.
+        
+        Invalid recipients get their error result directly.
+        
+        Args:
+            recipients: List of dicts with 'phone_number' and 'message' keys
+            results: Per-recipient results, filled in for invalid recipients
+            
+        Returns:
+            (message, recipient indexes) batches of up to MTN_SMS_BATCH_LIMIT
+        """
+        by_message: Dict[str, List[int]] = {}
+        
+        for index, recipient in enumerate(recipients):
             phone_number = recipient.get("phone_number")
             message = recipient.get("message")
             
             if not phone_number or not message:
                 logger.warning(f"Invalid recipient data: {recipient}")
-                results.append({
+                results[index] = {
                     "status": "error",
                     "message": "Missing phone_number or message",
                     "sent": False
-                })
+                }
                 continue
             
-            result = self.send_single_sms(phone_number, message, sender_id)
-            results.append(result)
+            by_message.setdefault(message, []).append(index)
         
-        return results
+        limit = max(settings.MTN_SMS_BATCH_LIMIT, 1)
+        return [
+            (message, indexes[start:start + limit])
+            for message, indexes in by_message.items()
+            for start in range(0, len(indexes), limit)
+        ]
     
-    def get_delivery_status(self, message_id: str) -> Optional[Dict]:
+    @api_operation
+    def get_delivery_status(self, message_id: str) -> Operation:
         """
         Get delivery status of a sent SMS.
         
@@ -236,23 +298,19 @@ class MTNSMSIntegration:
         if not self.enabled:
             return None
         
-        try:
-            access_token = self._get_access_token()
-            
-            url = f"{self.base_url}/sms/messages/{message_id}/deliveryStatus"
-            
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-            }
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Failed to get delivery status: {e}")
+        access_token = yield from operation_steps(self._get_access_token)
+        
+        response = yield ApiRequest(
+            "GET",
+            f"{self.base_url}/sms/messages/{message_id}/deliveryStatus",
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+        
+        if not response.ok:
+            logger.error(f"Failed to get delivery status: {response.error}")
             return None
+        
+        return response.body
     
     def validate_phone_number(self, phone_number: str) -> bool:
         """
@@ -0,0 +1,227 @@
+"""
+Transport-independent MTN API operations.
+
+The MTN clients write each API operation once, as a generator decorated with
+@api_operation. The generator yields what it needs and receives the result:
+
+- ApiRequest: an HTTP request; receives an ApiResponse
+- TokenRequest: an OAuth token from the shared token manager; receives the token
+- Concurrent: other operations to run together; receives their results
+
+and returns the operation's result dict. Request building and response
+parsing therefore live in one place, and a client only picks the transport
+that executes the steps: run() uses the pooled requests session (blocking
+clients), run_async() the shared httpx.AsyncClient (async clients).
+
+Errors raised while executing a step (e.g. a failed token fetch) are thrown
+back into the operation, so it can handle them like a direct call.
+"""
+
+import asyncio
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Generator, List, Optional, Tuple
+
+import httpx
+import requests
+
+from .rate_limiter import provider_limiter
+from .token_manager import token_manager
+
+logger = logging.getLogger(__name__)
+
+Operation = Generator[Any, Any, Any]
+
+
+@dataclass
+class ApiRequest:
+    """An HTTP request to an MTN API."""
+    method: str
+    url: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    json: Any = None
+    data: Optional[Dict[str, str]] = None
+    auth: Optional[Tuple[str, str]] = None
+    rate_limit: Optional[str] = None  # Provider whose request rate limiter to take a token from
+
+
+@dataclass
+class ApiResponse:
+    """Outcome of an ApiRequest, independent of the HTTP library."""
+    status_code: Optional[int]  # None if no response was received
+    body: Any = None  # Decoded JSON body, if any
+    error: Optional[str] = None  # Set for transport errors and non-2xx responses
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class TokenRequest:
+    """An access token from the token manager, fetched by another operation if needed."""
+    product: str
+    credentials: Tuple
+    fetch: Callable[[], Operation]  # Operation returning (access_token, expires_in)
+
+
+@dataclass
+class Concurrent:
+    """Operations to run together, at most `limit` at a time."""
+    operations: List[Operation]
+    limit: int = 2
+
+
+def api_operation(method: Callable[..., Operation]) -> Callable[..., Any]:
+    """
+    Turn a generator method into a client method executed by the client's transport.
+    
+    The decorated method returns self._execute(generator): a result for
+    the blocking clients, a coroutine for the async clients. The generator
+    itself stays reachable through operation_steps for use inside other
+    operations.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self._execute(method(self, *args, **kwargs))
+    
+    return wrapper
+
+
+def operation_steps(bound_operation: Callable[..., Any], *args, **kwargs) -> Operation:
+    """
+    Get the generator behind a bound @api_operation method.
+    
+    Lets an operation delegate to another with `yield from`, whatever
+    transport ends up running it.
+    """
+    return bound_operation.__wrapped__(bound_operation.__self__, *args, **kwargs)
+
+
+def _decode(content: bytes, parse: Callable[[], Any]) -> Any:
+    """Decode a JSON body, or None if it is empty or not JSON."""
+    if not content:
+        return None
+    try:
+        return parse()
+    except ValueError:
+        return None
+
+
+def run(operation: Operation, session: requests.Session) -> Any:
+    """
+    Run an operation to completion with blocking requests.
+    
+    Args:
+        operation: Operation generator
+        session: requests session to send through
+    
+    Returns:
+        The operation's result
+    """
+    result, error = None, None
+    while True:
+        try:
+            step = operation.throw(error) if error is not None else operation.send(result)
+        except StopIteration as done:
+            return done.value
+        
+        result, error = None, None
+        try:
+            result = _execute_step(step, session)
+        except Exception as e:
+            error = e
+
+
+def _execute_step(step: Any, session: requests.Session) -> Any:
+    """Execute one step of a blocking operation."""
+    if isinstance(step, TokenRequest):
+        return token_manager.get_token(step.product, step.credentials, lambda: run(step.fetch(), session))
+    
+    if isinstance(step, Concurrent):
+        workers = max(1, min(step.limit, len(step.operations)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda operation: run(operation, session), step.operations))
+    
+    if step.rate_limit:
+        provider_limiter(step.rate_limit).acquire()
+    
+    try:
+        response = session.request(
+            step.method, step.url, headers=step.headers, json=step.json, data=step.data, auth=step.auth
+        )
+    except requests.exceptions.RequestException as e:
+        return ApiResponse(None, error=str(e))
+    
+    error = None
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        error = str(e)
+    
+    return ApiResponse(response.status_code, _decode(response.content, response.json), error)
+
+
+async def run_async(operation: Operation, client: httpx.AsyncClient) -> Any:
+    """
+    Run an operation to completion with an httpx.AsyncClient.
+    
+    Args:
+        operation: Operation generator
+        client: Async client to send through
+    
+    Returns:
+        The operation's result
+    """
+    result, error = None, None
+    while True:
+        try:
+            step = operation.throw(error) if error is not None else operation.send(result)
+        except StopIteration as done:
+            return done.value
+        
+        result, error = None, None
+        try:
+            result = await _execute_step_async(step, client)
+        except Exception as e:
+            error = e
+
+
+async def _execute_step_async(step: Any, client: httpx.AsyncClient) -> Any:
+    """Execute one step of an async operation."""
+    if isinstance(step, TokenRequest):
+        return await token_manager.get_token_async(
+            step.product, step.credentials, lambda: run_async(step.fetch(), client)
+        )
+    
+    if isinstance(step, Concurrent):
+        semaphore = asyncio.Semaphore(max(step.limit, 1))
+        
+        async def run_limited(operation: Operation) -> Any:
+            async with semaphore:
+                return await run_async(operation, client)
+        
+        return list(await asyncio.gather(*(run_limited(operation) for operation in step.operations)))
+    
+    if step.rate_limit:
+        wait = provider_limiter(step.rate_limit).reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    try:
+        response = await client.request(
+            step.method, step.url, headers=step.headers, json=step.json, data=step.data,
+            auth=step.auth if step.auth is not None else httpx.USE_CLIENT_DEFAULT
+        )
+    except httpx.HTTPError as e:
+        return ApiResponse(None, error=str(e))
+    
+    error = None
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        error = str(e)
+    
+    return ApiResponse(response.status_code, _decode(response.content, response.json), error)
@@ -8,9 +8,10 @@ MTN USSD provides interactive menu-based services for mobile users.
 import requests
 import base64
 import logging
-from typing import Dict, Optional
-from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
 from ..config import settings
+from .http_session import MTNSession, get_session
+from .token_manager import token_manager
 
 logger = logging.getLogger(__name__)
 
@@ -32,16 +33,17 @@ class MTNUSSDIntegration:
         self.callback_url = settings.MTN_CALLBACK_URL
         self.enabled = settings.ENABLE_MTN_USSD and settings.USE_MTN_SERVICES
         
-        # Token caching
-        self._access_token: Optional[str] = None
-        self._token_expires_at: Optional[datetime] = None
-        
         logger.info(f"MTN USSD Integration initialized - Environment: {self.environment}")
     
+    @property
+    def session(self) -> MTNSession:
+        """Pooled keep-alive session shared by all MTN integrations, looked up per call."""
+        return get_session()
+    
     def _get_access_token(self) -> str:
         """
         Get OAuth access token for MTN API authentication.
-        Tokens are cached and refreshed when expired.
+        Tokens are shared through the token manager and refreshed before expiry.
         
         Returns:
             Access token string
@@ -49,12 +51,19 @@ class MTNUSSDIntegration:
         Raises:
             Exception: If token request fails
         """
-        # Return cached token if still valid
-        if self._access_token and self._token_expires_at:
-            if datetime.utcnow() < self._token_expires_at:
-                return self._access_token
+        return token_manager.get_token(
+            "mtn-oauth",
+            (self.base_url, self.consumer_key, self.consumer_secret),
+            self._request_access_token
+        )
+    
+    def _request_access_token(self) -> Tuple[str, int]:
+        """
+        Request a new access token from the MTN OAuth endpoint.
         
-        # Request new token
+        Returns:
+            Tuple of (access token, lifetime in seconds)
+        """
         url = f"{self.base_url}/oauth/token"
         
         # Create Basic Auth header
@@ -71,18 +80,13 @@ class MTNUSSDIntegration:
         }
         
         try:
-            response = requests.post(url, headers=headers, data=data, timeout=10)
+            response = self.session.post(url, headers=headers, data=data)
             response.raise_for_status()
             
             token_data = response.json()
-            self._access_token = token_data.get("access_token")
-            
-            # Set expiration (usually 3600 seconds, we set it to 50 minutes to be safe)
-            expires_in = token_data.get("expires_in", 3600)
-            self._token_expires_at = datetime.utcnow() + timedelta(seconds=expires_in - 600)
             
             logger.info("Successfully obtained MTN access token")
-            return self._access_token
+            return token_data.get("access_token"), token_data.get("expires_in", 3600)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"Failed to obtain MTN access token: {e}")
@@ -132,7 +136,7 @@ class MTNUSSDIntegration:
         }
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
+            response = self.session.post(url, headers=headers, json=payload)
             response.raise_for_status()
             
             logger.info(f"USSD message sent to {phone_number}")
@@ -224,7 +228,7 @@ class MTNUSSDIntegration:
                 "Authorization": f"Bearer {access_token}",
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers)
             response.raise_for_status()
             
             return response.json()
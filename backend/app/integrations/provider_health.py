@@ -0,0 +1,224 @@
+"""
+Circuit breakers and health scoring for the SMS providers.
+
+Each provider keeps a rolling window of its most recent calls. Routing
+tries providers due a recovery probe first, then healthy providers in their
+configured priority order, then degraded ones from the best score, and skips
+providers whose breaker is open.
+
+Breaker states:
+- closed: calls go through; the breaker opens after
+  SMS_BREAKER_FAILURE_THRESHOLD consecutive failures, or when the window's
+  error rate reaches SMS_BREAKER_ERROR_RATE
+- open: the provider is skipped until its cooldown has passed
+- half-open: one call is let through as a probe. Success closes the breaker;
+  failure re-opens it with the cooldown doubled (up to
+  SMS_BREAKER_MAX_COOLDOWN_SECONDS)
+
+A degraded provider with a closed breaker is only used after the healthy
+ones, so it is also probed once per cooldown; a successful probe restores it.
+"""
+
+import threading
+import time
+import logging
+from collections import deque
+from typing import Dict, List
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ProviderHealth:
+    """
+    Rolling health and circuit breaker for one provider.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.calls = deque(maxlen=settings.SMS_BREAKER_WINDOW_SIZE)
+        self.consecutive_failures = 0
+        self.cooldown = settings.SMS_BREAKER_COOLDOWN_SECONDS
+        self.opened_at = 0.0
+        self.last_call_at = 0.0
+        self.probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    @property
+    def error_rate(self) -> float:
+        """Share of failed calls in the window."""
+        if not self.calls:
+            return 0.0
+        return sum(1 for ok, _ in self.calls if not ok) / len(self.calls)
+    
+    @property
+    def latency(self) -> float:
+        """Mean call latency in the window, in seconds."""
+        if not self.calls:
+            return 0.0
+        return sum(latency for _, latency in self.calls) / len(self.calls)
+    
+    @property
+    def score(self) -> float:
+        """Health score; lower is better."""
+        return self.error_rate + self.latency / settings.SMS_LATENCY_TARGET_SECONDS
+    
+    @property
+    def healthy(self) -> bool:
+        """Whether the provider is fast and reliable enough to keep its priority."""
+        return (
+            self.state == CLOSED
+            and self.error_rate < settings.SMS_BREAKER_ERROR_RATE / 2
+            and self.latency <= settings.SMS_LATENCY_TARGET_SECONDS
+        )
+    
+    def probe_due(self) -> bool:
+        """
+        Whether the provider should get the next call to test its recovery.
+        
+        True for an open breaker whose cooldown has passed, and for a degraded
+        provider that has not been tried for a cooldown period.
+        """
+        if self.probe_in_flight:
+            return False
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.cooldown
+        if self.state == CLOSED and not self.healthy:
+            return time.monotonic() - self.last_call_at >= self.cooldown
+        return self.state == HALF_OPEN
+    
+    def allow(self) -> bool:
+        """
+        Check whether a call may be sent to this provider now.
+        
+        An open breaker whose cooldown has passed admits exactly one probe.
+        
+        Returns:
+            True if the caller may use the provider
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                if self.probe_due():
+                    self.probe_in_flight = True
+                self.last_call_at = time.monotonic()
+                return True
+            
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+            
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                logger.info(f"Probing {self.name} after {self.cooldown}s cooldown")
+                return True
+            
+            return False
+    
+    def record(self, ok: bool, latency: float) -> None:
+        """
+        Record the outcome of a call.
+        
+        Args:
+            ok: Whether the call succeeded
+            latency: Call duration in seconds
+        """
+        with self._lock:
+            probe, self.probe_in_flight = self.probe_in_flight, False
+            
+            if probe and ok:
+                # A successful probe re-admits the provider with a clean window
+                logger.info(f"{self.name} recovered, closing circuit")
+                self.state = CLOSED
+                self.calls.clear()
+                self.consecutive_failures = 0
+                self.cooldown = settings.SMS_BREAKER_COOLDOWN_SECONDS
+                return
+            
+            if self.state == HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, settings.SMS_BREAKER_MAX_COOLDOWN_SECONDS)
+                self._open()
+                return
+            
+            self.calls.append((ok, latency))
+            self.consecutive_failures = 0 if ok else self.consecutive_failures + 1
+            
+            if self.state == CLOSED and not ok and (
+                self.consecutive_failures >= settings.SMS_BREAKER_FAILURE_THRESHOLD
+                or (
+                    len(self.calls) >= settings.SMS_BREAKER_MIN_CALLS
+                    and self.error_rate >= settings.SMS_BREAKER_ERROR_RATE
+                )
+            ):
+                self._open()
+    
+    def _open(self) -> None:
+        """Open the breaker; the caller holds the lock."""
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(
+            f"{self.name} circuit open for {self.cooldown}s "
+            f"(error rate {self.error_rate:.0%}, latency {self.latency:.2f}s)"
+        )
+
+
+class ProviderRouter:
+    """
+    Orders providers by health and tracks their breakers.
+    """
+    
+    def __init__(self):
+        self._providers: Dict[str, ProviderHealth] = {}
+        self._lock = threading.Lock()
+    
+    def get(self, name: str) -> ProviderHealth:
+        """Get the health tracker for a provider."""
+        with self._lock:
+            if name not in self._providers:
+                self._providers[name] = ProviderHealth(name)
+            return self._providers[name]
+    
+    def route(self, names: List[str]) -> List[str]:
+        """
+        Order providers for a call.
+        
+        Providers due a recovery probe come first, so a recovered provider is
+        re-admitted even while another one is serving traffic. Healthy
+        providers follow in the given priority order, then degraded ones,
+        best score first. Callers must still check allow() before each call,
+        which skips open breakers.
+        
+        Args:
+            names: Provider names in priority order
+        
+        Returns:
+            Provider names to try, in order
+        """
+        def rank(item):
+            index, name = item
+            health = self.get(name)
+            if health.probe_due():
+                return (0, 0.0, index)
+            if health.healthy:
+                return (1, 0.0, index)
+            return (2, health.score, index)
+        
+        return [name for _, name in sorted(enumerate(names), key=rank)]
+    
+    def allow(self, name: str) -> bool:
+        """Check whether a call may be sent to a provider now."""
+        return self.get(name).allow()
+    
+    def record(self, name: str, ok: bool, latency: float) -> None:
+        """Record the outcome of a call to a provider."""
+        self.get(name).record(ok, latency)
+    
+    def reset(self) -> None:
+        """Forget all provider health."""
+        with self._lock:
+            self._providers.clear()
@@ -0,0 +1,95 @@
+"""
+Token bucket rate limiter for provider requests.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from ..config import settings
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+    
+    Tokens refill continuously at `rate` per second up to `capacity`; each
+    request takes one. A rate of 0 or less disables limiting.
+    """
+    
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update; the caller holds the lock."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def reserve(self) -> float:
+        """
+        Take a token without waiting.
+        
+        Returns:
+            Seconds until the token may be used (0 if it is available now)
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            self.tokens -= 1
+            return max(0.0, -self.tokens / self.rate)
+    
+    def acquire(self, headroom: float = 0.0) -> None:
+        """
+        Take a token, waiting for one to refill if needed.
+        
+        Args:
+            headroom: Tokens to leave in the bucket for other callers.
+                Low-priority senders wait until more than this many tokens
+                are available, so higher-priority requests (which take
+                tokens without headroom) are not queued behind them.
+        """
+        if headroom <= 0:
+            wait = self.reserve()
+            if wait > 0:
+                time.sleep(wait)
+            return
+        
+        if self.rate <= 0:
+            return
+        
+        # At least one token must be takeable at full capacity
+        needed = min(headroom, self.capacity - 1) + 1
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= needed:
+                    self.tokens -= 1
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_provider_limiters: Dict[str, TokenBucket] = {}
+_provider_limiters_lock = threading.Lock()
+
+
+def provider_limiter(provider: str) -> TokenBucket:
+    """
+    Get the shared request rate limiter for an SMS provider.
+    
+    Args:
+        provider: Provider name ("MTN", "AfricaTalking")
+        
+    Returns:
+        TokenBucket allowing SMS_PROVIDER_REQUESTS_PER_SECOND
+    """
+    with _provider_limiters_lock:
+        if provider not in _provider_limiters:
+            _provider_limiters[provider] = TokenBucket(settings.SMS_PROVIDER_REQUESTS_PER_SECOND)
+        return _provider_limiters[provider]
@@ -41,22 +41,37 @@ class SMSGateway:
         
         return True
     
+    @staticmethod
+    def payment_confirmation_message(amount: float, group_name: str, transaction_id: str) -> str:
+        """Render the payment confirmation SMS text."""
+        return f"Payment confirmed! You paid GHS {amount:.2f} to {group_name}. TxnID: {transaction_id}. Thank you!"
+    
     @staticmethod
     def payment_confirmation(phone_number: str, amount: float, group_name: str, transaction_id: str):
         """Send payment confirmation SMS."""
-        message = f"Payment confirmed! You paid GHS {amount:.2f} to {group_name}. TxnID: {transaction_id}. Thank you!"
+        message = SMSGateway.payment_confirmation_message(amount, group_name, transaction_id)
         return sms_gateway.send_sms(phone_number, message)
     
+    @staticmethod
+    def payment_failure_message(amount: float, group_name: str, retry_count: int) -> str:
+        """Render the payment failure SMS text."""
+        return f"Payment of GHS {amount:.2f} to {group_name} failed. Attempt {retry_count}/3. Please ensure sufficient funds."
+    
     @staticmethod
     def payment_failure(phone_number: str, amount: float, group_name: str, retry_count: int):
         """Send payment failure notification."""
-        message = f"Payment of GHS {amount:.2f} to {group_name} failed. Attempt {retry_count}/3. Please ensure sufficient funds."
+        message = SMSGateway.payment_failure_message(amount, group_name, retry_count)
         return sms_gateway.send_sms(phone_number, message)
     
+    @staticmethod
+    def payout_notification_message(amount: float, group_name: str, transaction_id: str) -> str:
+        """Render the payout notification SMS text."""
+        return f"Congratulations! You received GHS {amount:.2f} from {group_name}. TxnID: {transaction_id}. Funds in your wallet."
+    
     @staticmethod
     def payout_notification(phone_number: str, amount: float, group_name: str, transaction_id: str):
         """Send payout notification SMS."""
-        message = f"Congratulations! You received GHS {amount:.2f} from {group_name}. TxnID: {transaction_id}. Funds in your wallet."
+        message = SMSGateway.payout_notification_message(amount, group_name, transaction_id)
         return sms_gateway.send_sms(phone_number, message)
     
     @staticmethod
@@ -2,10 +2,15 @@
 Unified SMS sender that supports MTN, AfricaTalking, and mock integration.
 """
 
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from ..config import settings
+from .provider_health import ProviderRouter
+from .rate_limiter import provider_limiter
 
 # Try to import AfricaTalking service
 try:
@@ -21,62 +26,251 @@ try:
 except ImportError:
     MTN_AVAILABLE = False
 
+# Circuit breakers and health scores for the real SMS providers
+sms_router = ProviderRouter()
+
 
 def send_sms(
     phone_number: str,
     message: str,
-    use_africastalking: Optional[bool] = None
+    use_africastalking: Optional[bool] = None,
+    mock_fallback: bool = True
 ) -> bool:
     """
     Send SMS message.
     
-    Priority order:
+    Providers:
     1. MTN (if USE_MTN_SERVICES is True and configured)
     2. AfricaTalking (if configured and use_africastalking=True)
     3. Mock (logs to file/console)
     
+    MTN and AfricaTalking are tried healthiest first; a provider whose
+    circuit breaker is open is skipped until a probe shows it has recovered.
+    
     Args:
         phone_number: Recipient's phone number (with country code)
         message: SMS message content
         use_africastalking: Whether to use AfricaTalking. If None, auto-detects based on config
+        mock_fallback: Fall back to mock when every real provider failed. If
+            False, mock is only used when no real provider is configured
         
     Returns:
         True if successful
     """
-    # Try MTN first if enabled
+    return not _deliver([phone_number], message, use_africastalking, mock_fallback)
+
+
+def send_bulk_sms(
+    phone_numbers: List[str],
+    message: str,
+    use_africastalking: Optional[bool] = None,
+    mock_fallback: bool = True
+) -> bool:
+    """
+    Send the same SMS to many recipients in multi-recipient requests.
+    
+    Uses the same provider routing as send_sms. Recipients are split into
+    requests of up to the provider's batch limit (MTN_SMS_BATCH_LIMIT,
+    AT_SMS_BATCH_LIMIT); recipients no provider accepts fall back to mock.
+    
+    Args:
+        phone_numbers: Recipients' phone numbers (with country code)
+        message: SMS message content
+        use_africastalking: Whether to use AfricaTalking. If None, auto-detects based on config
+        mock_fallback: Fall back to mock when every real provider failed. If
+            False, mock is only used when no real provider is configured
+        
+    Returns:
+        True if every recipient was sent
+    """
+    return not _deliver(phone_numbers, message, use_africastalking, mock_fallback)
+
+
+def send_sms_messages(
+    messages: List[Tuple[str, str]],
+    mock_fallback: bool = True,
+    headroom: float = 0.0
+) -> List[bool]:
+    """
+    Send many SMS messages with as few provider requests as possible.
+    
+    Recipients of identical texts are sent together in multi-recipient
+    requests; personalized texts are sent concurrently
+    (SMS_SEND_CONCURRENCY). Every provider request is rate limited per
+    provider (SMS_PROVIDER_REQUESTS_PER_SECOND).
+    
+    Args:
+        messages: (phone_number, message) pairs
+        mock_fallback: Fall back to mock when every real provider failed. If
+            False, mock is only used when no real provider is configured
+        headroom: Provider rate-limit tokens to leave for other senders;
+            low-priority sends use SMS_INTERACTIVE_HEADROOM so OTPs and
+            confirmations are not throttled behind them
+        
+    Returns:
+        Whether each message was sent, in input order
+    """
+    by_text: Dict[str, List[int]] = defaultdict(list)
+    for index, (_, text) in enumerate(messages):
+        by_text[text].append(index)
+    
+    results = [False] * len(messages)
+    if not by_text:
+        return results
+    
+    def deliver(text: str, indexes: List[int]) -> List[str]:
+        return _deliver([messages[i][0] for i in indexes], text, None, mock_fallback, headroom)
+    
+    workers = max(1, min(settings.SMS_SEND_CONCURRENCY, len(by_text)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            (indexes, executor.submit(deliver, text, indexes))
+            for text, indexes in by_text.items()
+        ]
+        for indexes, future in futures:
+            try:
+                undelivered = set(future.result())
+            except Exception as e:
+                print(f"⚠️  SMS error: {e}")
+                undelivered = {messages[i][0] for i in indexes}
+            for index in indexes:
+                results[index] = messages[index][0] not in undelivered
+    
+    return results
+
+
+def _deliver(
+    phone_numbers: List[str],
+    message: str,
+    use_africastalking: Optional[bool],
+    mock_fallback: bool,
+    headroom: float = 0.0
+) -> List[str]:
+    """
+    Send through the real providers, then mock for what they did not accept.
+    
+    Args:
+        phone_numbers: Recipients' phone numbers (with country code)
+        message: SMS message content
+        use_africastalking: Whether AfricaTalking may be used
+        mock_fallback: Whether mock may stand in for failed real providers
+        headroom: Provider rate-limit tokens to leave for other senders
+        
+    Returns:
+        Phone numbers that were not sent
+    """
+    if not phone_numbers:
+        return []
+    
+    remaining = _send_via_providers(phone_numbers, message, use_africastalking, headroom)
+    if not remaining:
+        return []
+    
+    if not mock_fallback and _configured_providers(use_africastalking):
+        return remaining
+    
+    # Fallback to mock
+    if len(remaining) == 1:
+        _mock_send_sms(remaining[0], message)
+        return []
+    
+    for phone_number in remaining:
+        _log_to_file(phone_number, message, "Mock")
+    print(f"\n📱 Bulk SMS Sent (Mock) to {len(remaining)} recipients:\n{message}\n")
+    
+    return []
+
+
+def _configured_providers(use_africastalking: Optional[bool]) -> List[str]:
+    """Real SMS providers that are enabled and configured, in priority order."""
+    providers = []
+    
     if settings.USE_MTN_SERVICES and MTN_AVAILABLE and mtn_sms_service.enabled:
-        try:
-            result = mtn_sms_service.send_single_sms(phone_number, message)
-            if result.get("sent"):
-                print(f"✅ SMS sent via MTN to {phone_number}")
-                # Log to file for audit trail
-                _log_to_file(phone_number, message, "MTN")
-                return True
-            else:
-                print(f"⚠️  MTN SMS failed: {result.get('message')}, falling back...")
-        except Exception as e:
-            print(f"⚠️  MTN error: {e}, falling back...")
+        providers.append("MTN")
     
     # Auto-detect if not specified
     if use_africastalking is None:
         use_africastalking = settings.ENABLE_REAL_SMS
     
-    # Try AfricaTalking if available and enabled
     if use_africastalking and AT_AVAILABLE and africastalking_service.enabled:
-        try:
-            result = africastalking_service.send_sms([phone_number], message)
-            if result.get("SMSMessageData"):
-                print(f"✅ SMS sent via AfricaTalking to {phone_number}")
-                # Also log to file for audit trail
-                _log_to_file(phone_number, message, "AfricaTalking")
-                return True
-            else:
-                print(f"⚠️  AfricaTalking SMS failed, falling back to mock")
-        except Exception as e:
-            print(f"⚠️  AfricaTalking error: {e}, falling back to mock")
+        providers.append("AfricaTalking")
     
-    # Fallback to mock
-    return _mock_send_sms(phone_number, message)
+    return providers
+
+
+def _provider_send(provider: str, phone_numbers: List[str], message: str) -> bool:
+    """Send one request to a provider; True if it accepted the message."""
+    if provider == "MTN":
+        result = mtn_sms_service.send_sms(phone_numbers, message)
+        if not result.get("sent"):
+            print(f"⚠️  MTN SMS failed: {result.get('message')}, falling back...")
+        return bool(result.get("sent"))
+    
+    result = africastalking_service.send_sms(phone_numbers, message)
+    if not result.get("SMSMessageData"):
+        print(f"⚠️  AfricaTalking SMS failed, falling back...")
+    return bool(result.get("SMSMessageData"))
+
+
+def _batch_limit(provider: str) -> int:
+    """Maximum recipients per request for a provider."""
+    limit = settings.MTN_SMS_BATCH_LIMIT if provider == "MTN" else settings.AT_SMS_BATCH_LIMIT
+    return max(limit, 1)
+
+
+def _send_via_providers(
+    phone_numbers: List[str],
+    message: str,
+    use_africastalking: Optional[bool],
+    headroom: float = 0.0
+) -> List[str]:
+    """
+    Send through the real providers, healthiest first.
+    
+    Each provider gets requests of up to its batch limit; recipients of a
+    rejected request move on to the next provider. Every attempt's outcome
+    and latency feed the provider's circuit breaker.
+    
+    Args:
+        phone_numbers: Recipients' phone numbers (with country code)
+        message: SMS message content
+        use_africastalking: Whether AfricaTalking may be used
+        headroom: Provider rate-limit tokens to leave for other senders
+        
+    Returns:
+        Phone numbers that no provider accepted
+    """
+    remaining = list(phone_numbers)
+    
+    for provider in sms_router.route(_configured_providers(use_africastalking)):
+        limit = _batch_limit(provider)
+        
+        while remaining and sms_router.allow(provider):
+            batch = remaining[:limit]
+            provider_limiter(provider).acquire(headroom)
+            
+            started = time.monotonic()
+            try:
+                ok = _provider_send(provider, batch, message)
+            except Exception as e:
+                print(f"⚠️  {provider} error: {e}, falling back...")
+                ok = False
+            sms_router.record(provider, ok, time.monotonic() - started)
+            
+            if not ok:
+                break
+            
+            recipients = batch[0] if len(batch) == 1 else f"{len(batch)} recipients"
+            print(f"✅ SMS sent via {provider} to {recipients}")
+            # Log to file for audit trail
+            for phone_number in batch:
+                _log_to_file(phone_number, message, provider)
+            remaining = remaining[limit:]
+        
+        if not remaining:
+            break
+    
+    return remaining
 
 
 def _mock_send_sms(phone_number: str, message: str) -> bool:
@@ -120,20 +314,30 @@ def send_payment_confirmation(
     return send_sms(phone_number, message)
 
 
-def send_group_welcome(
-    phone_number: str,
+def group_welcome_message(
     group_name: str,
     group_code: str,
     position: int,
     contribution_amount: float
-) -> bool:
-    """Send welcome SMS when user joins a group."""
-    message = (
+) -> str:
+    """Render the group welcome SMS text."""
+    return (
         f"Welcome to {group_name}! "
         f"Position: {position}. "
         f"Contribution: GHS {contribution_amount}/month. "
         f"Code: {group_code}"
     )
+
+
+def send_group_welcome(
+    phone_number: str,
+    group_name: str,
+    group_code: str,
+    position: int,
+    contribution_amount: float
+) -> bool:
+    """Send welcome SMS when user joins a group."""
+    message = group_welcome_message(group_name, group_code, position, contribution_amount)
     return send_sms(phone_number, message)
 
 
@@ -151,19 +355,44 @@ def send_payout_notification(
     return send_sms(phone_number, message)
 
 
+def payment_reminder_message(
+    group_name: str,
+    amount: float,
+    round_number: int,
+    due_date: Optional[str] = None
+) -> str:
+    """Render the payment reminder SMS text."""
+    ussd_code = settings.MTN_USSD_SERVICE_CODE if settings.USE_MTN_SERVICES else settings.AT_USSD_SERVICE_CODE
+    due = f" due on {due_date}" if due_date else ""
+    return (
+        f"Reminder: Please pay GHS {amount:.2f} for {group_name}, "
+        f"Round {round_number}{due}. Dial {ussd_code} to pay."
+    )
+
+
 def send_payment_reminder(
     phone_number: str,
     group_name: str,
     amount: float,
-    round_number: int
+    round_number: int,
+    due_date: Optional[str] = None
 ) -> bool:
     """Send payment reminder SMS."""
+    message = payment_reminder_message(group_name, amount, round_number, due_date)
+    return send_sms(phone_number, message)
+
+
+def group_invitation_existing_user_message(
+    inviter_name: str,
+    group_name: str,
+    group_code: str
+) -> str:
+    """Render the invitation SMS text for an existing user."""
     ussd_code = settings.MTN_USSD_SERVICE_CODE if settings.USE_MTN_SERVICES else settings.AT_USSD_SERVICE_CODE
-    message = (
-        f"Reminder: Please pay GHS {amount:.2f} for {group_name}, "
-        f"Round {round_number}. Dial {ussd_code} to pay."
+    return (
+        f"You've been invited by {inviter_name} to join {group_name}. "
+        f"Dial {ussd_code} or use the app with code: {group_code} to accept."
     )
-    return send_sms(phone_number, message)
 
 
 def send_group_invitation_existing_user(
@@ -173,12 +402,20 @@ def send_group_invitation_existing_user(
     group_code: str
 ) -> bool:
     """Send invitation SMS to an existing user."""
+    message = group_invitation_existing_user_message(inviter_name, group_name, group_code)
+    return send_sms(phone_number, message)
+
+
+def group_invitation_new_user_message(
+    group_name: str,
+    group_code: str
+) -> str:
+    """Render the invitation SMS text for a new user who needs to register."""
     ussd_code = settings.MTN_USSD_SERVICE_CODE if settings.USE_MTN_SERVICES else settings.AT_USSD_SERVICE_CODE
-    message = (
-        f"You've been invited by {inviter_name} to join {group_name}. "
-        f"Dial {ussd_code} or use the app with code: {group_code} to accept."
+    return (
+        f"You've been invited to join {group_name} susu group! "
+        f"Register via USSD ({ussd_code}) or download the app, then use code: {group_code} to join."
     )
-    return send_sms(phone_number, message)
 
 
 def send_group_invitation_new_user(
@@ -187,10 +424,6 @@ def send_group_invitation_new_user(
     group_code: str
 ) -> bool:
     """Send invitation SMS to a new user who needs to register."""
-    ussd_code = settings.MTN_USSD_SERVICE_CODE if settings.USE_MTN_SERVICES else settings.AT_USSD_SERVICE_CODE
-    message = (
-        f"You've been invited to join {group_name} susu group! "
-        f"Register via USSD ({ussd_code}) or download the app, then use code: {group_code} to join."
-    )
+    message = group_invitation_new_user_message(group_name, group_code)
     return send_sms(phone_number, message)
 
@@ -0,0 +1,274 @@
+"""
+OAuth token manager for the MTN APIs.
+
+Tokens are cached per (product, credentials) and shared by every integration
+that uses the same credentials, so SMS, USSD and KYC reuse one MTN token and
+MoMo stops fetching a new token for each call.
+
+- Tokens are refreshed MTN_TOKEN_REFRESH_MARGIN_SECONDS before they expire.
+  While a token is still valid, one caller refreshes it and the others keep
+  using the current token.
+- Single-flight: concurrent callers needing a new token wait for one fetch.
+- With USE_REDIS, tokens are shared across workers and a Redis lock keeps
+  workers from refreshing the same token at once. Redis errors fall back to
+  the in-process cache.
+
+Async clients use get_token_async, which shares the same cache but
+single-flights with an asyncio lock so the event loop is never blocked.
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "mtn:token:"
+REDIS_POLL_SECONDS = 0.1
+
+
+@dataclass
+class CachedToken:
+    """An access token and the epoch times it should be refreshed and expires."""
+    token: str
+    refresh_at: float
+    expires_at: float
+
+
+class TokenManager:
+    """
+    Process-wide cache of MTN OAuth tokens.
+    """
+    
+    def __init__(self):
+        self._tokens: Dict[str, CachedToken] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._async_locks: Dict[Tuple[str, int], asyncio.Lock] = {}
+        self._redis = None
+    
+    def get_token(
+        self,
+        product: str,
+        credentials: Tuple,
+        fetch: Callable[[], Tuple[str, int]]
+    ) -> str:
+        """
+        Get a valid token, fetching a new one only when needed.
+        
+        Args:
+            product: Token product, e.g. "momo-collection" or "mtn-oauth"
+            credentials: Values identifying the credentials (base URL, key, secret)
+            fetch: Requests a new token; returns (access_token, expires_in seconds)
+        
+        Returns:
+            Access token string
+        
+        Raises:
+            Exception: If no valid token is cached and the fetch fails
+        """
+        key = self._key(product, credentials)
+        cached = self._tokens.get(key)
+        if cached and time.time() < cached.refresh_at:
+            return cached.token
+        
+        lock = self._lock_for(key)
+        if cached and time.time() < cached.expires_at:
+            # Refresh ahead of expiry; if another caller already is, use the current token
+            if not lock.acquire(blocking=False):
+                return cached.token
+        else:
+            lock.acquire()
+        
+        try:
+            cached = self._tokens.get(key)
+            if cached and time.time() < cached.refresh_at:
+                return cached.token
+            
+            shared = self._load_shared(key)
+            if shared and time.time() < shared.refresh_at:
+                self._tokens[key] = shared
+                return shared.token
+            
+            try:
+                fresh = self._refresh(key, fetch)
+            except Exception as e:
+                if cached and time.time() < cached.expires_at:
+                    logger.warning(f"MTN {product} token refresh failed, using current token: {e}")
+                    return cached.token
+                raise
+            
+            self._tokens[key] = fresh
+            return fresh.token
+        
+        finally:
+            lock.release()
+    
+    async def get_token_async(
+        self,
+        product: str,
+        credentials: Tuple,
+        fetch: Callable[[], Awaitable[Tuple[str, int]]]
+    ) -> str:
+        """
+        Async version of get_token for the httpx clients.
+        
+        Args:
+            product: Token product, e.g. "momo-collection" or "mtn-oauth"
+            credentials: Values identifying the credentials (base URL, key, secret)
+            fetch: Coroutine function returning (access_token, expires_in seconds)
+            
+        Returns:
+            Access token string
+            
+        Raises:
+            Exception: If no valid token is cached and the fetch fails
+        """
+        key = self._key(product, credentials)
+        cached = self._tokens.get(key)
+        if cached and time.time() < cached.refresh_at:
+            return cached.token
+        
+        lock = self._async_lock_for(key)
+        if cached and time.time() < cached.expires_at and lock.locked():
+            return cached.token
+        
+        async with lock:
+            cached = self._tokens.get(key)
+            if cached and time.time() < cached.refresh_at:
+                return cached.token
+            
+            shared = await asyncio.to_thread(self._load_shared, key)
+            if shared and time.time() < shared.refresh_at:
+                self._tokens[key] = shared
+                return shared.token
+            
+            try:
+                token, expires_in = await fetch()
+                fresh = self._build(token, expires_in)
+            except Exception as e:
+                if cached and time.time() < cached.expires_at:
+                    logger.warning(f"MTN {product} token refresh failed, using current token: {e}")
+                    return cached.token
+                raise
+            
+            await asyncio.to_thread(self._store_shared, key, fresh)
+            self._tokens[key] = fresh
+            return fresh.token
+    
+    def clear(self) -> None:
+        """Drop all tokens cached in this process."""
+        self._tokens.clear()
+    
+    def _refresh(self, key: str, fetch: Callable[[], Tuple[str, int]]) -> CachedToken:
+        """
+        Fetch a new token, holding the shared Redis lock when Redis is enabled.
+        
+        Args:
+            key: Cache key
+            fetch: Token fetch callable
+        
+        Returns:
+            Newly fetched token
+        """
+        client = self._get_redis()
+        lock_key = f"{REDIS_KEY_PREFIX}{key}:lock"
+        locked = False
+        
+        if client is not None:
+            deadline = time.time() + settings.MTN_TOKEN_LOCK_TIMEOUT_SECONDS
+            try:
+                locked = bool(client.set(lock_key, "1", nx=True, ex=settings.MTN_TOKEN_LOCK_TIMEOUT_SECONDS))
+                while not locked and time.time() < deadline:
+                    # Another worker is refreshing; wait for its token
+                    time.sleep(REDIS_POLL_SECONDS)
+                    shared = self._load_shared(key)
+                    if shared and time.time() < shared.refresh_at:
+                        return shared
+                    locked = bool(client.set(lock_key, "1", nx=True, ex=settings.MTN_TOKEN_LOCK_TIMEOUT_SECONDS))
+            except Exception as e:
+                logger.warning(f"Redis token lock unavailable, refreshing locally: {e}")
+        
+        try:
+            token, expires_in = fetch()
+            fresh = self._build(token, expires_in)
+            self._store_shared(key, fresh)
+            return fresh
+        
+        finally:
+            if locked:
+                try:
+                    client.delete(lock_key)
+                except Exception as e:
+                    logger.warning(f"Failed to release Redis token lock: {e}")
+    
+    @staticmethod
+    def _build(token: str, expires_in: int) -> CachedToken:
+        """Build a cached token, leaving a refresh margin before expiry."""
+        if not token:
+            raise Exception("MTN token response did not include an access token")
+        
+        now = time.time()
+        expires_in = int(expires_in or 3600)
+        margin = min(settings.MTN_TOKEN_REFRESH_MARGIN_SECONDS, expires_in // 2)
+        return CachedToken(token=token, refresh_at=now + expires_in - margin, expires_at=now + expires_in)
+    
+    @staticmethod
+    def _key(product: str, credentials: Tuple) -> str:
+        """Cache key for a product and credentials; secrets are only kept as a digest."""
+        digest = hashlib.sha256("\x1f".join(str(c) for c in credentials).encode()).hexdigest()
+        return f"{product}:{digest[:32]}"
+    
+    def _lock_for(self, key: str) -> threading.Lock:
+        """Get the in-process refresh lock for a key."""
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+    
+    def _async_lock_for(self, key: str) -> asyncio.Lock:
+        """Get the refresh lock for a key in the running event loop."""
+        loop_key = (key, id(asyncio.get_running_loop()))
+        with self._locks_guard:
+            return self._async_locks.setdefault(loop_key, asyncio.Lock())
+    
+    def _get_redis(self):
+        """Get the Redis client when USE_REDIS is enabled."""
+        if not settings.USE_REDIS:
+            return None
+        if self._redis is None:
+            import redis
+            self._redis = redis.from_url(settings.REDIS_URL)
+        return self._redis
+    
+    def _load_shared(self, key: str) -> Optional[CachedToken]:
+        """Read a token cached by any worker."""
+        try:
+            client = self._get_redis()
+            if client is None:
+                return None
+            raw = client.get(f"{REDIS_KEY_PREFIX}{key}")
+            return CachedToken(**json.loads(raw)) if raw else None
+        except Exception as e:
+            logger.warning(f"Failed to read MTN token from Redis: {e}")
+            return None
+    
+    def _store_shared(self, key: str, cached: CachedToken) -> None:
+        """Share a token with other workers until it expires."""
+        try:
+            client = self._get_redis()
+            if client is None:
+                return
+            ttl = max(1, int(cached.expires_at - time.time()))
+            client.set(f"{REDIS_KEY_PREFIX}{key}", json.dumps(cached.__dict__), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Failed to share MTN token through Redis: {e}")
+
+
+# Singleton instance
+token_manager = TokenManager()
@@ -1,11 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
 from contextlib import asynccontextmanager
 
 from .config import settings
 from .database import engine, Base
 from .routers import auth, groups, payments, payouts, ussd, kyc, admin, notifications
 from .cron.scheduler import scheduler
+from .integrations.http_session import close_session, close_async_client
 
 
 def validate_required_secrets():
@@ -60,6 +63,8 @@ async def lifespan(app: FastAPI):
     # Shutdown
     print("🛑 Shutting down SusuSave Backend...")
     scheduler.stop()
+    close_session()
+    await close_async_client()
 
 
 # Create FastAPI app
@@ -90,6 +95,15 @@ app.include_router(admin.router)
 app.include_router(notifications.router)
 
 
+@app.exception_handler(StaleDataError)
+def stale_data_handler(request: Request, exc: StaleDataError):
+    """Report version conflicts not retried by a service as 409 instead of 500."""
+    return JSONResponse(
+        status_code=status.HTTP_409_CONFLICT,
+        content={"detail": "This record was changed by another request. Please try again."}
+    )
+
+
 @app.get("/")
 def root():
     """Root endpoint."""
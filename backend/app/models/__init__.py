@@ -1,4 +1,4 @@
-from .user import User, UserType, AdminRole
+from .user import User, UserType, KYCStatus, AdminRole
 from .group import Group, GroupStatus
 from .membership import Membership
 from .payment import Payment, PaymentStatus, PaymentType
@@ -9,10 +9,16 @@ from .invitation import GroupInvitation, InvitationStatus
 from .payment_preference import PaymentPreference, PaymentMethod
 from .system_settings import SystemSetting
 from .notification import Notification
+from .job_run import JobRun, JobRunStatus
+from .idempotency_key import IdempotencyKey
+from .group_round_stats import GroupRoundStats
+from .ledger import LedgerAccount, LedgerAccountType, LedgerEntry
+from .outbox_message import OutboxMessage, OutboxStatus, OutboxPriority
 
 __all__ = [
     "User",
     "UserType",
+    "KYCStatus",
     "AdminRole",
     "Group",
     "GroupStatus",
@@ -30,5 +36,15 @@ __all__ = [
     "PaymentMethod",
     "SystemSetting",
     "Notification",
+    "JobRun",
+    "JobRunStatus",
+    "IdempotencyKey",
+    "GroupRoundStats",
+    "LedgerAccount",
+    "LedgerAccountType",
+    "LedgerEntry",
+    "OutboxMessage",
+    "OutboxStatus",
+    "OutboxPriority",
 ]
 
@@ -24,15 +24,19 @@ class Group(Base):
     num_cycles = Column(Integer, nullable=False)
     current_round = Column(Integer, default=1)
     creator_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    status = Column(Enum(GroupStatus), default=GroupStatus.ACTIVE)
+    status = Column(Enum(GroupStatus), default=GroupStatus.ACTIVE, index=True)
     cash_only = Column(Boolean, default=False, nullable=False)  # For freemium/cash-only groups
     created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)  # Set when the final round is paid out
+    version_id = Column(Integer, nullable=False, default=1)  # Optimistic concurrency check
     
     # Privacy settings for member information visibility
     show_alias_to_members = Column(Boolean, default=True, nullable=False)  # Whether to show aliases to non-admins
     show_real_name_to_members = Column(Boolean, default=False, nullable=False)  # Whether to show real names to non-admins
     show_phone_to_members = Column(Boolean, default=False, nullable=False)  # Whether to show phone numbers to non-admins
     
+    __mapper_args__ = {"version_id_col": version_id}
+    
     # Relationships
     creator = relationship("User", back_populates="created_groups", foreign_keys=[creator_id])
     memberships = relationship("Membership", back_populates="group")
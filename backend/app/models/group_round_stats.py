@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, UniqueConstraint
+from datetime import datetime
+from ..database import Base
+
+
+class GroupRoundStats(Base):
+    """Running contribution counters for one round of a group."""
+    
+    __tablename__ = "group_round_stats"
+    __table_args__ = (
+        UniqueConstraint("group_id", "round_number", name="uq_group_round_stats_group_round"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    round_number = Column(Integer, nullable=False)
+    paid_count = Column(Integer, nullable=False, default=0)  # Successful payments this round
+    collected_amount = Column(Float, nullable=False, default=0.0)  # Sum of successful payments
+    active_member_count = Column(Integer, nullable=False, default=0)  # Active memberships during the round
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
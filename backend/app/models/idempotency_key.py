@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, UniqueConstraint
+from datetime import datetime
+from ..database import Base
+
+
+class IdempotencyKey(Base):
+    """Stored result of a mutation request sent with an Idempotency-Key header."""
+    
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(255), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    endpoint = Column(String, nullable=False)  # e.g., "POST /payments/manual-trigger"
+    request_hash = Column(String(64), nullable=False)  # SHA-256 of endpoint and payload
+    response_status = Column(Integer, nullable=True)  # None while the request is in progress
+    response_body = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Text
+from datetime import datetime
+import enum
+from ..database import Base
+
+
+class JobRunStatus(str, enum.Enum):
+    """Scheduler job run status enumeration."""
+    RUNNING = "running"
+    SUCCESS = "success"
+    FAILED = "failed"
+
+
+class JobRun(Base):
+    """History of scheduler job runs with timing and outcome counters."""
+    
+    __tablename__ = "job_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, nullable=False, index=True)  # e.g., "daily_payment_check"
+    worker_id = Column(String, nullable=False)  # hostname:pid of the worker that ran the job
+    status = Column(Enum(JobRunStatus), nullable=False, default=JobRunStatus.RUNNING)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    finished_at = Column(DateTime, nullable=True)
+    duration_seconds = Column(Float, nullable=True)
+    rows_scanned = Column(Integer, nullable=False, default=0)
+    payments_attempted = Column(Integer, nullable=False, default=0)
+    successes = Column(Integer, nullable=False, default=0)
+    failures = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
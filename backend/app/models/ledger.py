@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, Enum, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from decimal import Decimal
+import enum
+from ..database import Base
+
+
+class LedgerAccountType(str, enum.Enum):
+    """Ledger account type enumeration."""
+    MEMBER = "member"  # Member wallet; owner_id is the user ID
+    GROUP = "group"  # Group pot; owner_id is the group ID
+    PLATFORM = "platform"  # Platform fees and adjustments; owner_id is 0
+
+
+class LedgerAccount(Base):
+    """Ledger account with materialized running totals."""
+    
+    __tablename__ = "ledger_accounts"
+    __table_args__ = (
+        UniqueConstraint("account_type", "owner_id", name="uq_ledger_accounts_type_owner"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    account_type = Column(Enum(LedgerAccountType), nullable=False)
+    owner_id = Column(Integer, nullable=False, default=0)
+    balance = Column(Numeric(14, 2), nullable=False, default=Decimal("0.00"))  # total_debits - total_credits
+    total_debits = Column(Numeric(14, 2), nullable=False, default=Decimal("0.00"))
+    total_credits = Column(Numeric(14, 2), nullable=False, default=Decimal("0.00"))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    entries = relationship("LedgerEntry", back_populates="account")
+
+
+class LedgerEntry(Base):
+    """Append-only ledger posting; the postings of one transaction balance."""
+    
+    __tablename__ = "ledger_entries"
+    __table_args__ = (
+        Index("ix_ledger_entries_type_created", "entry_type", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    transaction_ref = Column(String(36), nullable=False, index=True)  # Shared by the postings of one transaction
+    account_id = Column(Integer, ForeignKey("ledger_accounts.id"), nullable=False, index=True)
+    entry_type = Column(String, nullable=False)  # contribution, payout, reversal
+    channel = Column(String, nullable=True)  # momo or cash
+    payment_id = Column(Integer, ForeignKey("payments.id"), nullable=True, index=True)
+    payout_id = Column(Integer, ForeignKey("payouts.id"), nullable=True, index=True)
+    debit = Column(Numeric(14, 2), nullable=False, default=Decimal("0.00"))
+    credit = Column(Numeric(14, 2), nullable=False, default=Decimal("0.00"))
+    balance_after = Column(Numeric(14, 2), nullable=False)  # Account balance after this posting
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Relationships
+    account = relationship("LedgerAccount", back_populates="entries")
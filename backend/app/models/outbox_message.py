@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, DateTime, Enum, Text, JSON, Index
+from datetime import datetime
+import enum
+from ..database import Base
+
+
+class OutboxStatus(str, enum.Enum):
+    """Outbox message status enumeration."""
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    EXPIRED = "expired"  # Deadline passed before delivery; never sent
+
+
+class OutboxPriority(enum.IntEnum):
+    """Outbox message priority; lower values are dispatched first."""
+    OTP = 0
+    TRANSACTIONAL = 1  # Payment confirmations, payout alerts
+    NOTIFICATION = 2  # Invitations, welcomes, in-app notifications
+    BULK = 3  # Reminders and other mass sends
+
+
+class OutboxMessage(Base):
+    """Side effect recorded in the same transaction as the state change that caused it."""
+    
+    __tablename__ = "outbox_messages"
+    __table_args__ = (
+        Index("ix_outbox_messages_status_priority_next_attempt", "status", "priority", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # e.g., "sms", "payment_notification"
+    payload = Column(JSON, nullable=False)
+    dedupe_key = Column(String, unique=True, nullable=True)  # Same key is only enqueued once
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    priority = Column(Integer, nullable=False, default=OutboxPriority.NOTIFICATION)  # OutboxPriority value
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=True)  # Dropped instead of sent after this
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True, index=True)
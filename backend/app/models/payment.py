@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -22,6 +22,12 @@ class Payment(Base):
     """Payment model tracking member contributions."""
     
     __tablename__ = "payments"
+    __table_args__ = (
+        # Per-round paid counts are aggregated by (group, round, status)
+        Index("ix_payments_group_round_status", "group_id", "round_number", "status"),
+        # The status poller scans pending requests by last check time
+        Index("ix_payments_status_checked", "status", "status_checked_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     transaction_id = Column(String, unique=True, nullable=True, index=True)
@@ -34,7 +40,13 @@ class Payment(Base):
     payment_type = Column(Enum(PaymentType), default=PaymentType.MOMO)
     marked_paid_by = Column(Integer, ForeignKey("users.id"), nullable=True)  # For cash payments
     retry_count = Column(Integer, default=0)
+    provider_reference = Column(String, unique=True, nullable=True, index=True)  # MTN request-to-pay X-Reference-Id
+    requested_at = Column(DateTime, nullable=True)  # When the current debit request was sent
+    status_checked_at = Column(DateTime, nullable=True)  # Last provider status poll
     created_at = Column(DateTime, default=datetime.utcnow)
+    version_id = Column(Integer, nullable=False, default=1)  # Optimistic concurrency check
+    
+    __mapper_args__ = {"version_id_col": version_id}
     
     # Relationships
     user = relationship("User", back_populates="payments", foreign_keys=[user_id])
@@ -40,6 +40,7 @@ class PaymentPreference(Base):
     # Auto-payment settings
     auto_pay_enabled = Column(Boolean, default=False)
     auto_pay_day = Column(Integer, nullable=True)  # Day of month (1-31)
+    assigned_pay_day = Column(Integer, nullable=True)  # Load-balanced day set by the collection planner when auto_pay_day is unset
     
     # OAuth/Manual payment settings
     send_payment_reminders = Column(Boolean, default=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -9,14 +9,20 @@ class PayoutStatus(str, enum.Enum):
     """Payout status enumeration."""
     PENDING = "pending"
     APPROVED = "approved"
+    PROCESSING = "processing"  # Claimed by a worker; transfer in flight
     PAID = "paid"
-    FAILED = "failed"
+    FAILED = "failed"  # Re-queued automatically after a backoff
+    BLOCKED = "blocked"  # Needs manual action; never re-queued automatically
 
 
 class Payout(Base):
     """Payout model tracking distributions to members."""
     
     __tablename__ = "payouts"
+    __table_args__ = (
+        # Disbursement queue scan
+        Index("ix_payouts_status_created", "status", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
@@ -26,7 +32,16 @@ class Payout(Base):
     amount = Column(Float, nullable=False)
     status = Column(Enum(PayoutStatus), default=PayoutStatus.PENDING)
     transaction_id = Column(String, unique=True, nullable=True, index=True)
+    provider_reference = Column(String, unique=True, nullable=True, index=True)  # MTN transfer X-Reference-Id
+    claimed_at = Column(DateTime, nullable=True)
+    claimed_by = Column(String, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)  # Failed transfer attempts
+    next_attempt_at = Column(DateTime, nullable=True)  # FAILED payouts are not re-queued before this
+    last_error = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    version_id = Column(Integer, nullable=False, default=1)  # Optimistic concurrency check
+    
+    __mapper_args__ = {"version_id_col": version_id}
     
     # Relationships
     group = relationship("Group", back_populates="payouts")
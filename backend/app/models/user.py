@@ -11,6 +11,14 @@ class UserType(str, enum.Enum):
     USSD = "ussd"
 
 
+class KYCStatus(str, enum.Enum):
+    """Outcome of a user's automatic KYC check."""
+    PENDING = "pending"  # Queued after signup, not checked yet
+    VERIFIED = "verified"
+    UNVERIFIED = "unverified"  # MTN could not verify the number
+    ERROR = "error"  # MTN could not be asked; retry via /kyc/verify
+
+
 class AdminRole(str, enum.Enum):
     """Admin role enumeration for system-level administrators."""
     SUPER_ADMIN = "super_admin"
@@ -36,6 +44,7 @@ class User(Base):
     kyc_verified = Column(Boolean, default=False, nullable=False)
     kyc_verified_at = Column(DateTime, nullable=True)
     kyc_provider = Column(String, nullable=True)  # "MTN", "manual", etc.
+    kyc_status = Column(Enum(KYCStatus), nullable=True)  # Last automatic check; None if never run
     
     # System Admin fields
     is_system_admin = Column(Boolean, default=False, nullable=False)
@@ -9,13 +9,18 @@ import io
 
 from ..database import get_db
 from ..models import (
-    User, Group, Payment, Payout, GroupInvitation, Membership, SystemSetting,
-    AdminRole, GroupStatus, PaymentStatus, PayoutStatus, InvitationStatus, AuditLog
+    User, Group, Payment, Payout, GroupInvitation, Membership, SystemSetting, GroupRoundStats,
+    AdminRole, GroupStatus, PaymentStatus, PayoutStatus, InvitationStatus, AuditLog,
+    JobRunStatus, LedgerAccountType
 )
 from ..utils.admin_auth import get_current_admin, require_admin_role
 from ..utils.encryption import decrypt_field, encrypt_field
 from ..utils.auth import get_password_hash
 from ..services.admin_service import admin_service
+from ..services.job_run_service import job_run_service
+from ..services.collection_service import collection_service
+from ..services.round_stats_service import round_stats_service
+from ..services.ledger_service import ledger_service
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -191,6 +196,21 @@ class AuditLogItem(BaseModel):
     details: Optional[str]
 
 
+class JobRunItem(BaseModel):
+    id: int
+    job_id: str
+    worker_id: str
+    status: str
+    started_at: datetime
+    finished_at: Optional[datetime]
+    duration_seconds: Optional[float]
+    rows_scanned: int
+    payments_attempted: int
+    successes: int
+    failures: int
+    error: Optional[str]
+
+
 # ==================== Dashboard & Analytics ====================
 
 @router.get("/dashboard/stats", response_model=DashboardStatsResponse)
@@ -477,11 +497,7 @@ def get_user_detail(
         Membership.is_active == True
     ).count()
     
-    from sqlalchemy import func
-    total_payments = db.query(func.sum(Payment.amount)).filter(
-        Payment.user_id == user_id,
-        Payment.status == PaymentStatus.SUCCESS
-    ).scalar() or 0.0
+    total_payments = float(ledger_service.member_contributed(db, user_id))
     
     return UserDetailResponse(
         id=user.id,
@@ -690,8 +706,6 @@ def list_groups(
     db: Session = Depends(get_db)
 ):
     """List all groups with filters."""
-    from sqlalchemy import func
-    
     query = db.query(Group)
     
     # Apply filters
@@ -706,6 +720,9 @@ def list_groups(
     
     groups = query.offset(skip).limit(limit).all()
     
+    # Group pot accounts for the whole page in one query
+    pots = ledger_service.get_accounts(db, LedgerAccountType.GROUP, [group.id for group in groups])
+    
     result = []
     for group in groups:
         member_count = db.query(Membership).filter(
@@ -713,10 +730,8 @@ def list_groups(
             Membership.is_active == True
         ).count()
         
-        total_contributions = db.query(func.sum(Payment.amount)).filter(
-            Payment.group_id == group.id,
-            Payment.status == PaymentStatus.SUCCESS
-        ).scalar() or 0.0
+        pot = pots.get(group.id)
+        total_contributions = float(pot.total_debits) if pot else 0.0
         
         result.append(GroupListItem(
             id=group.id,
@@ -742,8 +757,6 @@ def get_group_detail(
     db: Session = Depends(get_db)
 ):
     """Get detailed group information."""
-    from sqlalchemy import func
-    
     group = db.query(Group).filter(Group.id == group_id).first()
     if not group:
         raise HTTPException(status_code=404, detail="Group not found")
@@ -770,10 +783,7 @@ def get_group_detail(
         })
     
     # Payment summary
-    total_paid = db.query(func.sum(Payment.amount)).filter(
-        Payment.group_id == group_id,
-        Payment.status == PaymentStatus.SUCCESS
-    ).scalar() or 0.0
+    total_paid = float(ledger_service.group_collected(db, group_id))
     
     pending_payments = db.query(Payment).filter(
         Payment.group_id == group_id,
@@ -918,6 +928,7 @@ def delete_group(
     db.commit()
     
     # Delete group (will cascade to memberships, payments, etc. if configured)
+    db.query(GroupRoundStats).filter(GroupRoundStats.group_id == group_id).delete(synchronize_session=False)
     db.delete(group)
     db.commit()
     
@@ -940,6 +951,9 @@ def remove_member_from_group(
     if not membership:
         raise HTTPException(status_code=404, detail="Membership not found")
     
+    if membership.is_active:
+        round_stats_service.adjust_members(db, group_id, -1)
+    
     membership.is_active = False
     db.add(membership)
     db.commit()
@@ -1067,6 +1081,14 @@ def update_payment(
         payment.status = PaymentStatus(data.status)
         if data.status == "success" and not payment.payment_date:
             payment.payment_date = datetime.utcnow()
+        
+        # Keep the ledger in step with manual status changes
+        if payment.status == PaymentStatus.SUCCESS and old_status != PaymentStatus.SUCCESS:
+            round_stats_service.record_payment(db, payment)
+            ledger_service.record_contribution(db, payment)
+        elif old_status == PaymentStatus.SUCCESS and payment.status != PaymentStatus.SUCCESS:
+            round_stats_service.reverse_payment(db, payment)
+            ledger_service.reverse_contribution(db, payment)
     
     db.add(payment)
     db.commit()
@@ -1240,12 +1262,13 @@ def reject_payout(
     admin: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
-    """Reject a payout."""
+    """Reject a payout. Rejected payouts are blocked from automatic re-queueing."""
     payout = db.query(Payout).filter(Payout.id == payout_id).first()
     if not payout:
         raise HTTPException(status_code=404, detail="Payout not found")
     
-    payout.status = PayoutStatus.FAILED
+    payout.status = PayoutStatus.BLOCKED
+    payout.last_error = reason
     db.add(payout)
     db.commit()
     
@@ -1832,6 +1855,75 @@ def get_services_status(
     }
 
 
+# ==================== Scheduler Monitoring ====================
+
+@router.get("/scheduler/runs", response_model=List[JobRunItem])
+def list_job_runs(
+    job_id: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Get scheduler job run history, newest first."""
+    run_status = None
+    if status:
+        try:
+            run_status = JobRunStatus(status)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid status: {status}")
+    
+    runs = job_run_service.get_runs(db, job_id=job_id, status=run_status, limit=limit)
+    
+    return [JobRunItem(
+        id=run.id,
+        job_id=run.job_id,
+        worker_id=run.worker_id,
+        status=run.status.value,
+        started_at=run.started_at,
+        finished_at=run.finished_at,
+        duration_seconds=run.duration_seconds,
+        rows_scanned=run.rows_scanned,
+        payments_attempted=run.payments_attempted,
+        successes=run.successes,
+        failures=run.failures,
+        error=run.error
+    ) for run in runs]
+
+
+@router.get("/scheduler/metrics")
+def get_job_metrics(
+    days: int = Query(7, ge=1, le=90),
+    format: str = Query("json", pattern="^(json|prometheus)$"),
+    admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Get per-job timing and outcome metrics (JSON or Prometheus text)."""
+    metrics = job_run_service.get_job_metrics(db, days=days)
+    
+    if format == "prometheus":
+        return Response(
+            content=job_run_service.render_prometheus(metrics),
+            media_type="text/plain; version=0.0.4"
+        )
+    
+    return {"days": days, "jobs": metrics}
+
+
+@router.get("/scheduler/collection-schedule")
+def get_collection_schedule(
+    admin: User = Depends(get_current_admin),
+    db: Session = Depends(get_db)
+):
+    """Get the number of automatic debits scheduled for each day of the month."""
+    schedule = collection_service.get_daily_schedule(db)
+    
+    return {
+        "days": [{"day": day, "collections": schedule.get(day, 0)} for day in range(1, 32)],
+        "total": sum(schedule.values())
+    }
+
+
 # ==================== Export Functions ====================
 
 @router.get("/export/users")
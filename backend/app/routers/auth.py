@@ -1,10 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 import logging
 
 from ..database import get_db
-from ..models import User, UserType
+from ..models import User, UserType, KYCStatus, OutboxPriority
 from ..schemas import UserCreate, UserLogin, UserResponse, Token
 from ..utils import (
     verify_password,
@@ -13,9 +13,9 @@ from ..utils import (
     encrypt_field,
     get_current_user
 )
-from ..integrations.sms_sender import send_sms
 from ..services.otp_service import OTPService
-from ..config import settings
+from ..services.outbox_service import OutboxService
+from ..services.onboarding_service import onboarding_service
 
 logger = logging.getLogger(__name__)
 
@@ -23,9 +23,11 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
+def register(user_data: UserCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Register a new user (for mobile app users).
+    KYC verification and the payment preference are set up by a background
+    task after the response; progress shows on /kyc/status.
     """
     # Check if user already exists (decrypt all to compare since Fernet is non-deterministic)
     from ..utils import decrypt_field
@@ -53,43 +55,17 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
         name=user_data.name,
         user_type=user_data.user_type,
         momo_account_id=encrypted_phone,  # Same as phone for now
-        password_hash=get_password_hash(user_data.password) if user_data.password else None
+        password_hash=get_password_hash(user_data.password) if user_data.password else None,
+        kyc_status=KYCStatus.PENDING
     )
     
     db.add(user)
     db.commit()
     db.refresh(user)
     
-    # Perform KYC verification
-    from ..services.kyc_service import kyc_service
-    try:
-        kyc_result = kyc_service.verify_user(db, user.id, user_data.phone_number)
-        logger.info(f"KYC verification for user {user.id}: {kyc_result.get('message')}")
-    except Exception as e:
-        logger.error(f"KYC verification failed for user {user.id}: {e}")
-        # Continue with registration even if KYC fails
-    
-    # Set payment preference if provided
-    if user_data.payment_method:
-        from ..services.dual_payment_service import dual_payment_service
-        from ..models import PaymentMethod
-        
-        # Map string to enum
-        method_map = {
-            'auto': PaymentMethod.AUTO,
-            'manual': PaymentMethod.MANUAL,
-            'ussd': PaymentMethod.USSD
-        }
-        
-        payment_method = method_map.get(user_data.payment_method, PaymentMethod.MANUAL)
-        
-        dual_payment_service.set_payment_preference(
-            db=db,
-            user_id=user.id,
-            payment_method=payment_method,
-            auto_pay_day=1 if payment_method == PaymentMethod.AUTO else None,
-            send_reminders=True
-        )
+    background_tasks.add_task(
+        onboarding_service.complete_signup, user.id, user_data.phone_number, user_data.payment_method
+    )
     
     return user
 
@@ -156,15 +132,17 @@ class OTPVerify(BaseModel):
 
 
 @router.post("/request-otp")
-def request_otp(data: OTPRequest, db: Session = Depends(get_db)):
+def request_otp(data: OTPRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Request an OTP for phone login. Creates the user if not found.
-    Sends OTP via AfricaTalking SMS when enabled, else logs to file.
+    The OTP SMS is queued at the highest outbox priority and dispatched
+    right after the response; it is dropped unsent once the code expires.
     """
     # Find or create user by phone (decrypt all due to encryption scheme)
     from ..utils import decrypt_field
     all_users = db.query(User).all()
     user = None
+    new_user = False
     for u in all_users:
         try:
             if decrypt_field(u.phone_number) == data.phone_number:
@@ -179,19 +157,13 @@ def request_otp(data: OTPRequest, db: Session = Depends(get_db)):
             phone_number=encrypted_phone,
             name=f"User {data.phone_number[-4:]}",
             user_type=UserType.USSD,
-            momo_account_id=encrypted_phone
+            momo_account_id=encrypted_phone,
+            kyc_status=KYCStatus.PENDING
         )
         db.add(user)
         db.commit()
         db.refresh(user)
-        
-        # Perform KYC verification for new USSD user
-        from ..services.kyc_service import kyc_service
-        try:
-            kyc_result = kyc_service.verify_user(db, user.id, data.phone_number)
-            logger.info(f"KYC verification for USSD user {user.id}: {kyc_result.get('message')}")
-        except Exception as e:
-            logger.error(f"KYC verification failed for USSD user {user.id}: {e}")
+        new_user = True
 
     # Create OTP
     try:
@@ -201,7 +173,18 @@ def request_otp(data: OTPRequest, db: Session = Depends(get_db)):
 
     # Send via SMS (mask code in logs if needed)
     message = f"Your SusuSave login code is {otp['code']}. Expires in 5 minutes."
-    send_sms(data.phone_number, message, use_africastalking=settings.ENABLE_REAL_SMS)
+    OutboxService.enqueue_sms(
+        db,
+        encrypt_field(data.phone_number),
+        message,
+        priority=OutboxPriority.OTP,
+        expires_at=otp["expires_at"]
+    )
+    db.commit()
+    background_tasks.add_task(OutboxService.dispatch_interactive)
+    if new_user:
+        # After the OTP send, so KYC does not delay the code
+        background_tasks.add_task(onboarding_service.complete_signup, user.id, data.phone_number)
 
     # Masked response
     masked = data.phone_number[:-4] + "****"
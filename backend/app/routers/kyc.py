@@ -22,6 +22,7 @@ router = APIRouter(prefix="/kyc", tags=["KYC Verification"])
 class KYCStatusResponse(BaseModel):
     """Response schema for KYC status."""
     verified: bool
+    status: str  # pending, verified, unverified or error
     verified_at: Optional[str]
     provider: Optional[str]
     required_for_payments: bool
@@ -53,17 +54,26 @@ def get_kyc_status(
     """
     Get current user's KYC verification status.
     
+    Right after signup the status is "pending" until the background KYC
+    check finishes.
+    
     Returns:
         KYC status information
     """
     status_info = kyc_service.check_verification_status(current_user)
     
-    message = "Verified" if status_info["verified"] else "Not verified"
+    messages = {
+        "pending": "Verification in progress",
+        "verified": "Verified",
+        "error": "Verification could not be completed, please retry"
+    }
+    message = messages.get(status_info["status"], "Not verified")
     if not settings.REQUIRE_KYC_FOR_PAYMENTS:
         message += " (KYC not required)"
     
     return KYCStatusResponse(
         verified=status_info["verified"],
+        status=status_info["status"],
         verified_at=status_info["verified_at"],
         provider=status_info["provider"],
         required_for_payments=status_info["required_for_payments"],
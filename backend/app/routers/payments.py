@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -15,6 +15,8 @@ from ..schemas import (
 )
 from ..utils import get_current_user
 from ..services import PaymentService
+from ..services.idempotency_service import IdempotencyService
+from ..services.momo_collection_service import MoMoCollectionService
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
@@ -23,11 +25,13 @@ router = APIRouter(prefix="/payments", tags=["Payments"])
 def trigger_payment(
     payment_data: PaymentTrigger,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     Manually trigger a payment for a group (used by USSD and app).
     Requires KYC verification.
+    Retries sent with the same Idempotency-Key replay the first response.
     """
     # Import settings and check KYC requirement
     from ..config import settings
@@ -39,12 +43,19 @@ def trigger_payment(
             detail="KYC verification required for payments. Please verify your account to make payments."
         )
     
-    payment = PaymentService.process_payment(
+    return IdempotencyService.execute(
         db=db,
+        key=idempotency_key,
         user_id=current_user.id,
-        group_id=payment_data.group_id
+        endpoint="POST /payments/manual-trigger",
+        payload=payment_data.model_dump(),
+        response_model=PaymentResponse,
+        handler=lambda: PaymentService.process_payment(
+            db=db,
+            user_id=current_user.id,
+            group_id=payment_data.group_id
+        )
     )
-    return payment
 
 
 @router.get("/history", response_model=List[PaymentResponse])
@@ -95,12 +106,14 @@ def mark_payment_as_paid(
 def pay_now(
     payment_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     Member manually triggers payment for their unpaid payment.
     For cash-only groups, this will return an error directing to admin.
     For MOMO groups, this processes the payment immediately.
+    Retries sent with the same Idempotency-Key replay the first response.
     """
     from ..models import Payment, Group
     
@@ -123,26 +136,34 @@ def pay_now(
     group = db.query(Group).filter(Group.id == payment.group_id).first()
     
     # Process payment (will check cash_only inside)
-    updated_payment = PaymentService.process_payment(
+    return IdempotencyService.execute(
         db=db,
+        key=idempotency_key,
         user_id=current_user.id,
-        group_id=payment.group_id,
-        round_number=payment.round_number
+        endpoint="POST /payments/{payment_id}/pay-now",
+        payload={"payment_id": payment_id},
+        response_model=PaymentResponse,
+        handler=lambda: PaymentService.process_payment(
+            db=db,
+            user_id=current_user.id,
+            group_id=payment.group_id,
+            round_number=payment.round_number
+        )
     )
-    
-    return updated_payment
 
 
 @router.post("/admin/request-payment", response_model=PaymentResponse)
 def admin_request_payment(
     payment_data: AdminPaymentRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     Admin requests payment from a group member.
     Only group admin can trigger this.
     This sends a MoMo payment request to the member's phone.
+    Retries sent with the same Idempotency-Key replay the first response.
     """
     from ..models import Group, Membership
     
@@ -160,14 +181,20 @@ def admin_request_payment(
         )
     
     # Process payment for the specified user
-    payment = PaymentService.process_payment(
+    return IdempotencyService.execute(
         db=db,
-        user_id=payment_data.user_id,
-        group_id=payment_data.group_id,
-        round_number=payment_data.round_number
+        key=idempotency_key,
+        user_id=current_user.id,
+        endpoint="POST /payments/admin/request-payment",
+        payload=payment_data.model_dump(),
+        response_model=PaymentResponse,
+        handler=lambda: PaymentService.process_payment(
+            db=db,
+            user_id=payment_data.user_id,
+            group_id=payment_data.group_id,
+            round_number=payment_data.round_number
+        )
     )
-    
-    return payment
 
 
 @router.get("/{payment_id}/status", response_model=PaymentStatusResponse)
@@ -200,9 +227,10 @@ def check_payment_status(
     )
     
     # Get MTN transaction status if it exists
-    if payment.transaction_id:
+    reference_id = payment.provider_reference or payment.transaction_id
+    if reference_id:
         try:
-            mtn_status = mtn_momo_service.get_transaction_status(payment.transaction_id)
+            mtn_status = mtn_momo_service.get_transaction_status(reference_id)
             response.mtn_status = mtn_status.get("status")
             response.financial_transaction_id = mtn_status.get("financial_transaction_id")
         except Exception as e:
@@ -211,3 +239,18 @@ def check_payment_status(
     
     return response
 
+
+@router.api_route("/momo/callback/{reference_id}", methods=["POST", "PUT"])
+def momo_collection_callback(
+    reference_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Receive MTN MoMo request-to-pay callbacks.
+    
+    MTN calls the X-Callback-Url sent with each payment request once the
+    member approves or rejects the debit. The status is re-checked with
+    the MoMo API before the payment is settled, so the body is ignored.
+    """
+    payment = MoMoCollectionService.handle_callback(db, reference_id)
+    return {"payment_id": payment.id, "status": payment.status.value}
@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, status
 from sqlalchemy.orm import Session
+from typing import Optional
 
 from ..database import get_db
 from ..models import User
 from ..schemas import PayoutResponse, PayoutApprove
 from ..utils import get_current_user
 from ..services import PayoutService
+from ..services.idempotency_service import IdempotencyService
 
 router = APIRouter(prefix="/payouts", tags=["Payouts"])
 
@@ -14,13 +16,22 @@ router = APIRouter(prefix="/payouts", tags=["Payouts"])
 def approve_payout(
     payout_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
 ):
     """
     Approve a payout (admin only).
+    Retries sent with the same Idempotency-Key replay the first response.
     """
-    payout = PayoutService.approve_payout(db, payout_id, current_user.id)
-    return payout
+    return IdempotencyService.execute(
+        db=db,
+        key=idempotency_key,
+        user_id=current_user.id,
+        endpoint="POST /payouts/{payout_id}/approve",
+        payload={"payout_id": payout_id},
+        response_model=PayoutResponse,
+        handler=lambda: PayoutService.approve_payout(db, payout_id, current_user.id)
+    )
 
 
 @router.get("/{group_id}/current", response_model=PayoutResponse)
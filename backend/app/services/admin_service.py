@@ -11,6 +11,7 @@ from ..models import (
     PaymentStatus, PayoutStatus, GroupStatus, InvitationStatus, UserType
 )
 from ..utils.encryption import decrypt_field
+from .ledger_service import LedgerService
 
 
 class AdminService:
@@ -30,10 +31,8 @@ class AdminService:
         total_groups = db.query(Group).count()
         active_groups = db.query(Group).filter(Group.status == GroupStatus.ACTIVE).count()
         
-        # Calculate total revenue from successful payments
-        total_revenue = db.query(func.sum(Payment.amount)).filter(
-            Payment.status == PaymentStatus.SUCCESS
-        ).scalar() or 0.0
+        # Total revenue collected by all group pots
+        total_revenue = float(LedgerService.total_collected(db))
         
         # Pending payments needing attention
         pending_payments = db.query(Payment).filter(Payment.status == PaymentStatus.PENDING).count()
@@ -142,47 +141,19 @@ class AdminService:
         if not end_date:
             end_date = datetime.utcnow()
         
-        # Total revenue in period
-        total = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        ).scalar() or 0.0
+        # Contributions in period by payment type (MOMO vs CASH), from the ledger
+        by_channel = LedgerService.contributions_by_channel(db, start_date, end_date)
+        momo = by_channel.get("momo", {"count": 0, "amount": 0})
+        cash = by_channel.get("cash", {"count": 0, "amount": 0})
         
-        # Count of successful payments
-        payment_count = db.query(Payment).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        ).count()
+        total = float(sum(row["amount"] for row in by_channel.values()))
+        payment_count = sum(row["count"] for row in by_channel.values())
+        momo_revenue = float(momo["amount"])
+        cash_revenue = float(cash["amount"])
         
         # Average payment amount
         avg_payment = total / payment_count if payment_count > 0 else 0.0
         
-        # Revenue by payment type (MOMO vs CASH)
-        from ..models import PaymentType
-        momo_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_type == PaymentType.MOMO,
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        ).scalar() or 0.0
-        
-        cash_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_type == PaymentType.CASH,
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        ).scalar() or 0.0
-        
         return {
             "period": {
                 "start": start_date.isoformat(),
@@ -449,41 +420,19 @@ class AdminService:
         two_years_ago = now - timedelta(days=730)
         
         # Current period revenue
-        current_month_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_date >= last_month
-            )
-        ).scalar() or 0.0
+        current_month_revenue = float(LedgerService.collected_between(db, last_month))
         
         # Previous period revenue
-        previous_month_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_date >= two_months_ago,
-                Payment.payment_date < last_month
-            )
-        ).scalar() or 0.0
+        previous_month_revenue = float(LedgerService.collected_between(db, two_months_ago, last_month))
         
         # Calculate growth
         mom_growth = ((current_month_revenue - previous_month_revenue) / previous_month_revenue * 100) if previous_month_revenue > 0 else 0
         
         # Current year revenue
-        current_year_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_date >= last_year
-            )
-        ).scalar() or 0.0
+        current_year_revenue = float(LedgerService.collected_between(db, last_year))
         
         # Previous year revenue
-        previous_year_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_date >= two_years_ago,
-                Payment.payment_date < last_year
-            )
-        ).scalar() or 0.0
+        previous_year_revenue = float(LedgerService.collected_between(db, two_years_ago, last_year))
         
         yoy_growth = ((current_year_revenue - previous_year_revenue) / previous_year_revenue * 100) if previous_year_revenue > 0 else 0
         
@@ -553,31 +502,13 @@ class AdminService:
         now = datetime.utcnow()
         start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         
-        # Total revenue
-        total_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_date >= start_of_month
-            )
-        ).scalar() or 0.0
-        
-        # Revenue by payment type
-        from ..models import PaymentType
-        momo_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_type == PaymentType.MOMO,
-                Payment.payment_date >= start_of_month
-            )
-        ).scalar() or 0.0
+        # Revenue by payment type, from the ledger
+        by_channel = LedgerService.contributions_by_channel(db, start_of_month)
+        momo_revenue = float(by_channel.get("momo", {}).get("amount", 0))
+        cash_revenue = float(by_channel.get("cash", {}).get("amount", 0))
         
-        cash_revenue = db.query(func.sum(Payment.amount)).filter(
-            and_(
-                Payment.status == PaymentStatus.SUCCESS,
-                Payment.payment_type == PaymentType.CASH,
-                Payment.payment_date >= start_of_month
-            )
-        ).scalar() or 0.0
+        # Total revenue
+        total_revenue = float(sum(row["amount"] for row in by_channel.values()))
         
         # Outstanding payments (pending)
         pending_amount = db.query(func.sum(Payment.amount)).filter(
@@ -660,7 +591,7 @@ class AdminService:
                 elif entity_type == "group":
                     if operation_type == "suspend":
                         db.query(Group).filter(Group.id == entity_id).update(
-                            {"status": GroupStatus.SUSPENDED}
+                            {"status": GroupStatus.SUSPENDED, "version_id": Group.version_id + 1}
                         )
                         results["successful"] += 1
                 
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from ..models import AuditLog
 
 
@@ -49,6 +49,68 @@ class AuditService:
         
         return audit_log
     
+    @staticmethod
+    def add(
+        db: Session,
+        entity_type: str,
+        entity_id: int,
+        action: str,
+        old_value: Optional[Dict[str, Any]] = None,
+        new_value: Optional[Dict[str, Any]] = None,
+        performed_by: Optional[int] = None,
+        details: Optional[str] = None
+    ) -> AuditLog:
+        """
+        Add an audit log entry to the current transaction without committing.
+        
+        Use this to commit the entry together with the change it records.
+        
+        Args:
+            db: Database session
+            entity_type: Type of entity (e.g., "payment", "payout")
+            entity_id: ID of the entity
+            action: Action performed (e.g., "create", "update", "approve")
+            old_value: Previous state (for updates)
+            new_value: New state
+            performed_by: User ID who performed the action
+            details: Additional context
+            
+        Returns:
+            Pending audit log entry
+        """
+        audit_log = AuditLog(
+            entity_type=entity_type,
+            entity_id=entity_id,
+            action=action,
+            old_value=old_value,
+            new_value=new_value,
+            performed_by=performed_by,
+            details=details
+        )
+        
+        db.add(audit_log)
+        
+        return audit_log
+    
+    @staticmethod
+    def log_many(db: Session, entries: List[Dict[str, Any]]) -> List[AuditLog]:
+        """
+        Create several audit log entries in a single commit.
+        
+        Args:
+            db: Database session
+            entries: List of dicts with the same keys as ``log`` accepts
+            
+        Returns:
+            Created audit log entries
+        """
+        audit_logs = [AuditLog(**entry) for entry in entries]
+        
+        db.add_all(audit_logs)
+        db.commit()
+        
+        return audit_logs
+    
     @staticmethod
     def get_logs(
         db: Session,
@@ -0,0 +1,206 @@
+"""
+Collection Planner Service
+
+Decides which members are debited on a given day. Each member is collected
+on their chosen PaymentPreference.auto_pay_day, or on a load-balanced day
+assigned by the planner, so automatic MoMo debits are spread across the
+month instead of all running on the same morning.
+"""
+
+import heapq
+import logging
+from calendar import monthrange
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, exists
+from sqlalchemy.orm import Session
+
+from ..models import Group, Membership, Payment, PaymentPreference, GroupStatus
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionService:
+    """Service for planning automatic contribution collections."""
+    
+    @staticmethod
+    def collection_day_expr():
+        """SQL expression for a preference's collection day (chosen, else assigned)."""
+        return func.coalesce(PaymentPreference.auto_pay_day, PaymentPreference.assigned_pay_day)
+    
+    @staticmethod
+    def next_collection_date(day: int, today: date) -> date:
+        """
+        Get the next date (today or later) a member with this day is collected.
+        
+        Days past the end of a month fall on its last day.
+        
+        Args:
+            day: Collection day of month (1-31)
+            today: Reference date
+            
+        Returns:
+            Next collection date
+        """
+        this_month = date(today.year, today.month, min(day, monthrange(today.year, today.month)[1]))
+        if this_month >= today:
+            return this_month
+        
+        year, month = (today.year + 1, 1) if today.month == 12 else (today.year, today.month + 1)
+        return date(year, month, min(day, monthrange(year, month)[1]))
+    
+    @staticmethod
+    def collectable_memberships(db: Session, include_cash_only: bool = False):
+        """
+        Base query of active memberships in active groups.
+        
+        Args:
+            db: Database session
+            include_cash_only: Also include cash-only groups, which are not
+                collected through MoMo
+        
+        Returns:
+            Membership query joined to Group
+        """
+        query = db.query(Membership).join(
+            Group, Group.id == Membership.group_id
+        ).filter(
+            Group.status == GroupStatus.ACTIVE,
+            Membership.is_active == True
+        )
+        
+        if not include_cash_only:
+            query = query.filter(Group.cash_only == False)
+        
+        return query
+    
+    @staticmethod
+    def assign_collection_days(db: Session) -> int:
+        """
+        Assign a collection day to every collectable member without one.
+        
+        Days are chosen greedily from 1..COLLECTION_SPREAD_DAYS, always
+        picking the day with the fewest scheduled debits (weighted by active
+        memberships), so members without a preference fill in the quiet days.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Number of members assigned a day
+        """
+        day_expr = CollectionService.collection_day_expr()
+        
+        # Members (and their membership counts) with no chosen or assigned day
+        unassigned = CollectionService.collectable_memberships(db).outerjoin(
+            PaymentPreference, PaymentPreference.user_id == Membership.user_id
+        ).filter(
+            day_expr.is_(None)
+        ).with_entities(
+            Membership.user_id, func.count(Membership.id)
+        ).group_by(Membership.user_id).all()
+        
+        if not unassigned:
+            return 0
+        
+        # Current debits per day
+        schedule = CollectionService.get_daily_schedule(db)
+        load = {
+            day: schedule.get(day, 0)
+            for day in range(1, settings.COLLECTION_SPREAD_DAYS + 1)
+        }
+        
+        heap = [(count, day) for day, count in load.items()]
+        heapq.heapify(heap)
+        
+        user_ids = [user_id for user_id, _ in unassigned]
+        preferences = {
+            pref.user_id: pref
+            for pref in db.query(PaymentPreference).filter(
+                PaymentPreference.user_id.in_(user_ids)
+            ).all()
+        }
+        
+        # Largest members first gives a tighter balance
+        for user_id, weight in sorted(unassigned, key=lambda row: -row[1]):
+            count, day = heapq.heappop(heap)
+            
+            pref = preferences.get(user_id)
+            if not pref:
+                pref = PaymentPreference(user_id=user_id)
+                db.add(pref)
+            pref.assigned_pay_day = day
+            
+            heapq.heappush(heap, (count + weight, day))
+        
+        db.commit()
+        
+        logger.info(f"Assigned collection days to {len(unassigned)} members")
+        return len(unassigned)
+    
+    @staticmethod
+    def get_due_collections(db: Session, today: Optional[date] = None) -> List[Tuple[Membership, Group]]:
+        """
+        Get memberships whose contribution should be debited today.
+        
+        A member is due once their collection day has been reached this month
+        and they have no payment yet for the group's current round. Failed
+        payments are left to the retry job. On the last day of the month every
+        remaining member is due, which covers days 29-31 in short months.
+        
+        Args:
+            db: Database session
+            today: Collection date (defaults to today, UTC)
+        
+        Returns:
+            List of (membership, group) tuples
+        """
+        today = today or datetime.utcnow().date()
+        day_expr = CollectionService.collection_day_expr()
+        
+        has_payment = exists().where(
+            Payment.user_id == Membership.user_id,
+            Payment.group_id == Membership.group_id,
+            Payment.round_number == Group.current_round
+        )
+        
+        query = CollectionService.collectable_memberships(db).join(
+            PaymentPreference, PaymentPreference.user_id == Membership.user_id
+        ).filter(
+            ~has_payment
+        )
+        
+        if today.day < monthrange(today.year, today.month)[1]:
+            query = query.filter(day_expr <= today.day)
+        
+        return query.with_entities(Membership, Group).order_by(
+            Group.id, Membership.rotation_position
+        ).all()
+    
+    @staticmethod
+    def get_daily_schedule(db: Session) -> Dict[int, int]:
+        """
+        Get the number of scheduled debits per day of month.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Dict mapping day of month to active memberships collected that day
+        """
+        day_expr = CollectionService.collection_day_expr()
+        
+        rows = CollectionService.collectable_memberships(db).join(
+            PaymentPreference, PaymentPreference.user_id == Membership.user_id
+        ).filter(
+            day_expr.isnot(None)
+        ).with_entities(
+            day_expr, func.count(Membership.id)
+        ).group_by(day_expr).all()
+        
+        return {day: count for day, count in rows}
+
+
+# Singleton instance
+collection_service = CollectionService()
@@ -0,0 +1,628 @@
+"""
+Disbursement Service
+
+Bulk payout engine used by the payout job. Approved payouts form a work
+queue: a worker claims a batch with SELECT ... FOR UPDATE SKIP LOCKED and
+moves it to PROCESSING, so any number of workers can disburse in parallel
+without ever transferring the same payout twice. Recipients and groups are
+loaded in bulk, KYC and float balance are checked up front, MoMo transfers
+are submitted concurrently within PAYOUT_DISBURSEMENT_CONCURRENCY, and
+results are written back in one commit per batch.
+
+With real MoMo, transfers go through MTN's disbursement API and the float is
+the disbursement account balance. A transfer MTN has not settled, or whose
+outcome is unknown, leaves its payout PROCESSING with its reference. It is
+never sent again; settle_transfers polls MTN for it until it is paid or
+failed.
+
+Failed transfers count against PAYOUT_MAX_ATTEMPTS and are re-queued after
+an exponential backoff. Payouts that cannot succeed without someone acting
+(recipient without KYC, invalid account, exhausted attempts) are BLOCKED
+and never re-queued automatically.
+"""
+
+import logging
+import os
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Iterable, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..models import Payout, User, Group, PayoutStatus, OutboxPriority
+from ..utils import decrypt_field
+from ..integrations.momo_mock import momo_api, InvalidAccountError
+from ..integrations.mtn_momo_integration import mtn_momo_service
+from ..integrations.sms_mock import SMSGateway
+from ..config import settings
+from .audit_service import AuditService
+from .group_service import GroupService
+from .ledger_service import LedgerService
+from .outbox_service import OutboxService
+from .payment_service import SUCCESS_STATUSES, FAILURE_STATUSES
+from .idempotency_service import IdempotencyService
+
+logger = logging.getLogger(__name__)
+
+# MTN transfer failure reasons that retrying will not fix
+TERMINAL_TRANSFER_REASONS = {
+    "PAYEE_NOT_FOUND", "PAYER_NOT_FOUND", "NOT_ALLOWED", "NOT_ALLOWED_TARGET_ENVIRONMENT",
+    "INVALID_CALLBACK_URL_HOST", "INVALID_CURRENCY", "PAYEE_NOT_ALLOWED_TO_RECEIVE",
+}
+
+# Recorded on claimed payouts to identify the worker process
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class DisbursementService:
+    """Service for disbursing many payouts at once."""
+    
+    @staticmethod
+    def get_disbursable_payouts(db: Session) -> List[Payout]:
+        """
+        Get approved payouts that have not been paid yet.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Approved payouts, oldest first
+        """
+        return db.query(Payout).filter(
+            Payout.status == PayoutStatus.APPROVED
+        ).order_by(Payout.created_at).all()
+    
+    @staticmethod
+    def claim_payouts(
+        db: Session,
+        limit: Optional[int] = None,
+        payout_ids: Optional[Iterable[int]] = None,
+        statuses: Iterable[PayoutStatus] = (PayoutStatus.APPROVED,),
+        now: Optional[datetime] = None
+    ) -> List[Payout]:
+        """
+        Claim payouts for this worker, oldest first.
+        
+        Rows are selected with FOR UPDATE SKIP LOCKED, so payouts being
+        claimed by another worker are skipped rather than waited on, and are
+        moved to PROCESSING in the same transaction. The claim is committed
+        before any transfer is sent; only the claiming worker transfers a
+        payout.
+        
+        Args:
+            db: Database session
+            limit: Maximum number of payouts to claim
+            payout_ids: Only claim these payouts
+            statuses: Statuses that may be claimed (APPROVED by default)
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Claimed payouts
+        """
+        now = now or datetime.utcnow()
+        
+        query = db.query(Payout).filter(Payout.status.in_(list(statuses)))
+        
+        if payout_ids is not None:
+            payout_ids = list(payout_ids)
+            if not payout_ids:
+                return []
+            query = query.filter(Payout.id.in_(payout_ids))
+        
+        query = query.order_by(Payout.created_at, Payout.id)
+        if limit is not None:
+            query = query.limit(limit)
+        
+        payouts = query.with_for_update(skip_locked=True).all()
+        
+        for payout in payouts:
+            payout.status = PayoutStatus.PROCESSING
+            payout.claimed_at = now
+            payout.claimed_by = WORKER_ID
+        
+        db.commit()
+        
+        return payouts
+    
+    @staticmethod
+    def get_stale_claims(db: Session, now: Optional[datetime] = None) -> List[Payout]:
+        """
+        Get payouts left PROCESSING longer than PAYOUT_CLAIM_TIMEOUT_MINUTES.
+        
+        These belong to a worker that stopped after claiming them. Their
+        transfer may or may not have been sent, so they are not re-queued
+        automatically and need to be checked against MoMo.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Stale claimed payouts, oldest claim first
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(minutes=settings.PAYOUT_CLAIM_TIMEOUT_MINUTES)
+        
+        return db.query(Payout).filter(
+            Payout.status == PayoutStatus.PROCESSING,
+            Payout.claimed_at < cutoff
+        ).order_by(Payout.claimed_at).all()
+    
+    @staticmethod
+    def record_failure(
+        payout: Payout,
+        reason: str,
+        terminal: bool = False,
+        now: Optional[datetime] = None
+    ) -> None:
+        """
+        Mark a payout failed and schedule its automatic re-queue.
+        
+        Terminal failures, and failures past PAYOUT_MAX_ATTEMPTS, block the
+        payout instead; it then waits for an admin. Changes are not
+        committed.
+        
+        Args:
+            payout: Payout whose transfer failed or could not be sent
+            reason: Failure reason
+            terminal: Whether retrying cannot help (KYC, invalid account)
+            now: Current time (defaults to utcnow)
+        """
+        now = now or datetime.utcnow()
+        payout.attempts = (payout.attempts or 0) + 1
+        payout.last_error = reason
+        payout.claimed_at = None
+        payout.claimed_by = None
+        
+        if terminal or payout.attempts >= settings.PAYOUT_MAX_ATTEMPTS:
+            payout.status = PayoutStatus.BLOCKED
+            payout.next_attempt_at = None
+        else:
+            payout.status = PayoutStatus.FAILED
+            delay = settings.PAYOUT_RETRY_BASE_MINUTES * 2 ** (payout.attempts - 1)
+            payout.next_attempt_at = now + timedelta(minutes=delay)
+    
+    @staticmethod
+    def uses_real_momo() -> bool:
+        """Whether payouts are sent through MTN's disbursement API."""
+        return settings.ENABLE_REAL_MOMO and mtn_momo_service.enabled
+    
+    @staticmethod
+    def available_float() -> float:
+        """
+        Get the MoMo balance available for payouts.
+        
+        Returns:
+            Available balance of the disbursement account, or infinity when
+            it is unknown (mock MoMo or the balance request failed)
+        """
+        if not DisbursementService.uses_real_momo():
+            return float("inf")
+        
+        balance = mtn_momo_service.get_account_balance("disbursement")
+        if not balance or balance.get("available_balance") is None:
+            return float("inf")
+        
+        return float(balance["available_balance"])
+    
+    @staticmethod
+    def _transfer(item: Dict[str, Any]) -> Dict[str, Any]:
+        """Submit one transfer; runs on a worker thread without DB access."""
+        try:
+            if DisbursementService.uses_real_momo():
+                DisbursementService._transfer_mtn(item)
+            else:
+                item["transaction_id"] = momo_api.credit_wallet(
+                    phone_number=item["phone"],
+                    amount=item["amount"],
+                    reference=item["reference"]
+                )
+        except InvalidAccountError as e:
+            item["error"] = str(e)
+            item["terminal"] = True
+        except Exception as e:
+            item["error"] = str(e)
+        return item
+    
+    @staticmethod
+    def _transfer_mtn(item: Dict[str, Any]) -> None:
+        """
+        Send one transfer through MTN and read back its status.
+        
+        Sets transaction_id on success and error on a definitive failure
+        (plus terminal when the request or payee is invalid); anything else
+        sets unsettled, since MTN may still complete it.
+        """
+        result = mtn_momo_service.transfer(
+            phone_number=item["phone"],
+            amount=item["amount"],
+            reference=item["reference"],
+            reference_id=item["reference_id"]
+        )
+        if result.get("status") == "pending":
+            result = mtn_momo_service.get_transfer_status(item["reference_id"])
+        
+        DisbursementService._read_transfer_status(item, result)
+    
+    @staticmethod
+    def _read_transfer_status(item: Dict[str, Any], result: Dict[str, Any]) -> None:
+        """Set transaction_id, error (and terminal) or unsettled on an item from an MTN transfer status."""
+        provider_status = (result.get("status") or "").lower()
+        if provider_status in SUCCESS_STATUSES:
+            item["transaction_id"] = result.get("financial_transaction_id") or item["reference_id"]
+        elif provider_status in FAILURE_STATUSES:
+            reason = result.get("reason")
+            code = reason.get("code") if isinstance(reason, dict) else reason
+            item["error"] = str(code or result.get("message") or provider_status)
+            item["terminal"] = provider_status == "rejected" or code in TERMINAL_TRANSFER_REASONS
+        else:
+            item["unsettled"] = result.get("message") or provider_status
+    
+    @staticmethod
+    def get_unsettled_transfers(db: Session, now: Optional[datetime] = None) -> List[Payout]:
+        """
+        Get PROCESSING payouts whose MTN transfer was sent but not confirmed.
+        
+        Only claims older than PAYOUT_SETTLE_INTERVAL_MINUTES are returned,
+        so transfers a worker is still sending are left to it.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Up to PAYOUT_SETTLE_BATCH_SIZE payouts, oldest claim first
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(minutes=settings.PAYOUT_SETTLE_INTERVAL_MINUTES)
+        
+        return db.query(Payout).filter(
+            Payout.status == PayoutStatus.PROCESSING,
+            Payout.provider_reference.isnot(None),
+            Payout.claimed_at < cutoff
+        ).order_by(Payout.claimed_at).limit(settings.PAYOUT_SETTLE_BATCH_SIZE).all()
+    
+    @staticmethod
+    def settle_transfers(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Poll MTN for unsettled transfers and mark their payouts paid or failed.
+        
+        Status requests run concurrently (up to PAYOUT_DISBURSEMENT_CONCURRENCY)
+        and the results are recorded like a disbursement batch: ledger
+        entries, round advance, SMS and audit logs in one commit. A transfer
+        MTN does not know is failed (and re-queued with a new reference) only
+        once its claim is older than PAYOUT_CLAIM_TIMEOUT_MINUTES; until then
+        it may still be on its way. Transfers MTN reports as pending, or
+        whose status check failed, are checked again on the next run.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Dict with checked, paid, failed and unsettled counts
+        """
+        now = now or datetime.utcnow()
+        payouts = DisbursementService.get_unsettled_transfers(db, now)
+        
+        stats = {"checked": len(payouts), "paid": 0, "failed": 0, "unsettled": 0}
+        if not payouts:
+            return stats
+        
+        def fetch_status(reference_id: str) -> Dict[str, Any]:
+            try:
+                return mtn_momo_service.get_transfer_status(reference_id)
+            except Exception as e:
+                logger.error(f"Transfer status check failed for {reference_id}: {e}")
+                return {"status": "error", "message": str(e)}
+        
+        workers = max(1, min(settings.PAYOUT_DISBURSEMENT_CONCURRENCY, len(payouts)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fetch_status, [payout.provider_reference for payout in payouts]))
+        
+        users = {
+            user.id: user
+            for user in db.query(User).filter(
+                User.id.in_({payout.recipient_id for payout in payouts})
+            ).all()
+        }
+        groups = {
+            group.id: group
+            for group in db.query(Group).filter(
+                Group.id.in_({payout.group_id for payout in payouts})
+            ).all()
+        }
+        
+        lost_cutoff = now - timedelta(minutes=settings.PAYOUT_CLAIM_TIMEOUT_MINUTES)
+        items = []
+        for payout, result in zip(payouts, results):
+            item = {
+                "payout": payout,
+                "encrypted_phone": users[payout.recipient_id].phone_number,
+                "reference_id": payout.provider_reference,
+            }
+            if (result.get("status") or "").lower() == "not_found" and payout.claimed_at < lost_cutoff:
+                # The transfer never reached MTN; safe to send again
+                item["error"] = "Transfer not found at MTN"
+            else:
+                DisbursementService._read_transfer_status(item, result)
+            items.append(item)
+        
+        try:
+            DisbursementService._record_batch(db, items, groups, stats)
+        except StaleDataError:
+            # A worker recorded some of these meanwhile; the rest are checked next run
+            db.rollback()
+            logger.info("Payouts changed while settling transfers; batch skipped")
+            stats.update({"paid": 0, "failed": 0, "unsettled": len(payouts)})
+            return stats
+        
+        logger.info(
+            f"Settled {stats['checked']} MoMo transfers: {stats['paid']} paid, "
+            f"{stats['failed']} failed, {stats['unsettled']} still unsettled"
+        )
+        return stats
+    
+    @staticmethod
+    def disburse_queue(db: Session) -> Dict[str, int]:
+        """
+        Claim and pay out approved payouts until the queue is empty.
+        
+        Payouts are claimed PAYOUT_DISBURSEMENT_BATCH_SIZE at a time. The
+        run stops early once the float is exhausted; deferred payouts are
+        picked up by the next run.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Dict with attempted, paid, failed, unsettled, kyc_blocked and
+            deferred counts
+        """
+        stats = {"attempted": 0, "paid": 0, "failed": 0, "unsettled": 0, "kyc_blocked": 0, "deferred": 0}
+        batch_size = max(settings.PAYOUT_DISBURSEMENT_BATCH_SIZE, 1)
+        
+        while True:
+            payouts = DisbursementService.claim_payouts(db, limit=batch_size)
+            if not payouts:
+                break
+            
+            for key, value in DisbursementService._disburse_claimed(db, payouts).items():
+                stats[key] += value
+            
+            if stats["deferred"]:
+                break
+        
+        return stats
+    
+    @staticmethod
+    def disburse(db: Session, payouts: List[Payout]) -> Dict[str, int]:
+        """
+        Pay out a list of approved payouts in bulk.
+        
+        Only payouts this worker manages to claim are paid; payouts that are
+        not APPROVED (already paid or claimed elsewhere) are skipped.
+        
+        Args:
+            db: Database session
+            payouts: Payouts to disburse
+        
+        Returns:
+            Dict with attempted, paid, failed, unsettled, kyc_blocked and
+            deferred counts
+        """
+        claimed = DisbursementService.claim_payouts(db, payout_ids=[payout.id for payout in payouts])
+        
+        return DisbursementService._disburse_claimed(db, claimed)
+    
+    @staticmethod
+    def _disburse_claimed(db: Session, payouts: List[Payout]) -> Dict[str, int]:
+        """
+        Pay out payouts claimed by this worker.
+        
+        Recipients without KYC (when REQUIRE_KYC_FOR_PAYMENTS is set) are
+        blocked before any transfer. Payouts that do not fit in the available
+        float are released back to APPROVED for the next run. Each batch of
+        PAYOUT_DISBURSEMENT_BATCH_SIZE transfers is submitted concurrently,
+        then recorded (statuses, group rounds and audit logs) with a single
+        commit.
+        
+        Args:
+            db: Database session
+            payouts: PROCESSING payouts claimed by this worker
+        
+        Returns:
+            Dict with attempted, paid, failed, unsettled, kyc_blocked and
+            deferred counts
+        """
+        stats = {"attempted": 0, "paid": 0, "failed": 0, "unsettled": 0, "kyc_blocked": 0, "deferred": 0}
+        
+        if not payouts:
+            return stats
+        
+        # Bulk load recipients and groups
+        users = {
+            user.id: user
+            for user in db.query(User).filter(
+                User.id.in_({payout.recipient_id for payout in payouts})
+            ).all()
+        }
+        groups = {
+            group.id: group
+            for group in db.query(Group).filter(
+                Group.id.in_({payout.group_id for payout in payouts})
+            ).all()
+        }
+        
+        # KYC pre-check
+        audit_entries = []
+        ready = []
+        for payout in payouts:
+            recipient = users[payout.recipient_id]
+            if settings.REQUIRE_KYC_FOR_PAYMENTS and not recipient.kyc_verified:
+                DisbursementService.record_failure(
+                    payout, "Recipient has not completed KYC verification", terminal=True
+                )
+                stats["kyc_blocked"] += 1
+                audit_entries.append({
+                    "entity_type": "payout",
+                    "entity_id": payout.id,
+                    "action": "execute_failed",
+                    "new_value": {"reason": "Recipient has not completed KYC verification"}
+                })
+            else:
+                ready.append(payout)
+        
+        # Float pre-check
+        remaining_float = DisbursementService.available_float()
+        affordable = []
+        for payout in ready:
+            if payout.amount <= remaining_float:
+                remaining_float -= payout.amount
+                affordable.append(payout)
+            else:
+                # Release the claim
+                payout.status = PayoutStatus.APPROVED
+                payout.claimed_at = None
+                payout.claimed_by = None
+                stats["deferred"] += 1
+        
+        if stats["deferred"]:
+            logger.warning(f"Insufficient float: {stats['deferred']} payouts deferred to the next run")
+        
+        if audit_entries or stats["deferred"]:
+            # Commits the failed and released payouts with their audit logs
+            AuditService.log_many(db, audit_entries)
+        
+        batch_size = max(settings.PAYOUT_DISBURSEMENT_BATCH_SIZE, 1)
+        workers = max(settings.PAYOUT_DISBURSEMENT_CONCURRENCY, 1)
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(affordable), batch_size):
+                batch = affordable[start:start + batch_size]
+                stats["attempted"] += len(batch)
+                
+                if DisbursementService.uses_real_momo():
+                    # Store the X-Reference-Ids before sending, so an
+                    # interrupted run can be reconciled against MTN
+                    for payout in batch:
+                        payout.provider_reference = str(uuid.uuid4())
+                    db.commit()
+                
+                items = [
+                    {
+                        "payout": payout,
+                        "phone": decrypt_field(users[payout.recipient_id].phone_number),
+                        "encrypted_phone": users[payout.recipient_id].phone_number,
+                        "amount": payout.amount,
+                        "reference_id": payout.provider_reference,
+                        "reference": (
+                            f"Payout:Group:{groups[payout.group_id].name}"
+                            f"|Round:{payout.round_number}|Payout:{payout.id}"
+                        ),
+                    }
+                    for payout in batch
+                ]
+                
+                for item in items:
+                    IdempotencyService.record_provider_call(f"MoMo transfer for payout {item['payout'].id}")
+                results = list(executor.map(DisbursementService._transfer, items))
+                
+                DisbursementService._record_batch(db, results, groups, stats)
+        
+        logger.info(
+            f"Disbursed {stats['paid']} payouts ({stats['failed']} failed, "
+            f"{stats['kyc_blocked']} blocked by KYC, {stats['deferred']} deferred)"
+        )
+        return stats
+    
+    @staticmethod
+    def _record_batch(
+        db: Session,
+        results: List[Dict[str, Any]],
+        groups: Dict[int, Group],
+        stats: Dict[str, int]
+    ) -> None:
+        """Write a batch of transfer results and recipient SMS with one commit."""
+        now = datetime.utcnow()
+        audit_entries = []
+        paid = []
+        
+        # Lock the batch's groups so concurrent workers advance rounds in turn
+        db.query(Group).filter(
+            Group.id.in_({item["payout"].group_id for item in results})
+        ).with_for_update().populate_existing().all()
+        
+        for item in results:
+            payout = item["payout"]
+            group = groups[payout.group_id]
+            
+            if item.get("unsettled"):
+                # Left PROCESSING; settle_transfers checks it again
+                stats["unsettled"] += 1
+                logger.warning(
+                    f"Payout {payout.id} transfer {payout.provider_reference} not settled: {item['unsettled']}"
+                )
+                continue
+            
+            if item.get("error"):
+                DisbursementService.record_failure(payout, item["error"], item.get("terminal", False), now)
+                stats["failed"] += 1
+                audit_entries.append({
+                    "entity_type": "payout",
+                    "entity_id": payout.id,
+                    "action": "execute_failed",
+                    "new_value": {"reason": item["error"]}
+                })
+                continue
+            
+            old_status = payout.status.value
+            payout.transaction_id = item["transaction_id"]
+            payout.status = PayoutStatus.PAID
+            payout.payout_date = now
+            LedgerService.record_payout(db, payout, created_at=now)
+            stats["paid"] += 1
+            paid.append(item)
+            
+            audit_entries.append({
+                "entity_type": "payout",
+                "entity_id": payout.id,
+                "action": "execute",
+                "old_value": {"status": old_status},
+                "new_value": {
+                    "status": "paid",
+                    "transaction_id": item["transaction_id"],
+                    "amount": payout.amount
+                }
+            })
+            
+            # Move group to next round, or complete it after the final round
+            if GroupService.advance_round(db, group, payout.round_number):
+                audit_entries.append({
+                    "entity_type": "group",
+                    "entity_id": group.id,
+                    "action": "complete",
+                    "old_value": {"status": "active"},
+                    "new_value": {"status": "completed", "rounds": group.num_cycles}
+                })
+        
+        for item in paid:
+            payout = item["payout"]
+            OutboxService.enqueue_sms(
+                db,
+                item["encrypted_phone"],
+                SMSGateway.payout_notification_message(
+                    payout.amount, groups[payout.group_id].name, item["transaction_id"]
+                ),
+                dedupe_key=f"payout:{payout.id}:paid:sms",
+                priority=OutboxPriority.TRANSACTIONAL
+            )
+        
+        # One commit for the batch's payouts, group rounds, SMS and audit logs
+        AuditService.log_many(db, audit_entries)
+
+
+# Singleton instance
+disbursement_service = DisbursementService()
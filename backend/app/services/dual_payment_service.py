@@ -252,8 +252,6 @@ class DualPaymentService:
         Returns:
             Dict with auth_req_id, interval, expires_in
         """
-        import requests
-        
         try:
             # Get bearer token first
             token = mtn_momo_service._get_auth_token()
@@ -274,7 +272,7 @@ class DualPaymentService:
                 "access_type": "offline"
             }
             
-            response = requests.post(url, headers=headers, json=payload, timeout=10)
+            response = mtn_momo_service.session.post(url, headers=headers, json=payload)
             response.raise_for_status()
             
             result = response.json()
@@ -313,8 +311,6 @@ class DualPaymentService:
     @staticmethod
     def _check_bc_authorize_status(auth_req_id: str) -> Dict:
         """Check bc-authorize status via OAuth token endpoint."""
-        import requests
-        
         try:
             url = f"{settings.MTN_MOMO_BASE_URL}/collection/oauth2/token/"
             
@@ -328,7 +324,7 @@ class DualPaymentService:
                 "auth_req_id": auth_req_id
             }
             
-            response = requests.post(url, headers=headers, data=data, timeout=10)
+            response = mtn_momo_service.session.post(url, headers=headers, data=data)
             
             if response.status_code == 200:
                 # User approved!
@@ -375,7 +371,8 @@ class DualPaymentService:
         
         if payment_method == PaymentMethod.AUTO:
             pref.auto_pay_enabled = True
-            pref.auto_pay_day = auto_pay_day or 1
+            # Leave the day unset if not chosen; the collection planner assigns one
+            pref.auto_pay_day = auto_pay_day
             pref.momo_consent_given = True
             pref.momo_consent_date = datetime.utcnow()
         else:
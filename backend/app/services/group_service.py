@@ -3,12 +3,16 @@ from typing import List, Optional
 from fastapi import HTTPException, status
 from datetime import datetime
 
-from ..models import Group, User, Membership, Payment, Payout, GroupStatus, PaymentStatus
+from ..models import Group, User, Membership, Payment, Payout, GroupStatus, PaymentStatus, PaymentPreference
 from ..models.invitation import GroupInvitation, InvitationStatus
 from ..schemas import GroupCreate, MemberInfo, InvitationResponse
 from ..utils import generate_group_code, decrypt_field, encrypt_field
 from .audit_service import AuditService
-from ..integrations.sms_sender import send_group_invitation_existing_user, send_group_invitation_new_user
+from .round_stats_service import RoundStatsService
+from .outbox_service import OutboxService
+from ..integrations.sms_sender import (
+    group_invitation_existing_user_message, group_invitation_new_user_message, group_welcome_message
+)
 
 
 class GroupService:
@@ -55,6 +59,7 @@ class GroupService:
         )
         
         db.add(membership)
+        RoundStatsService.start_round(db, group)
         db.commit()
         db.refresh(group)
         
@@ -151,6 +156,7 @@ class GroupService:
         )
         
         db.add(membership)
+        RoundStatsService.adjust_members(db, group.id, 1)
         
         # If there was a pending invitation, mark it as accepted
         if pending_invitation:
@@ -303,12 +309,8 @@ class GroupService:
         # Get members with payment status
         members = GroupService.get_group_members(db, group_id, group.current_round, current_user_id)
         
-        # Calculate total collected for current round
-        total_collected = db.query(Payment).filter(
-            Payment.group_id == group_id,
-            Payment.round_number == group.current_round,
-            Payment.status == PaymentStatus.SUCCESS
-        ).count() * group.contribution_amount
+        # Total collected for current round
+        total_collected = RoundStatsService.get_stats(db, group_id, group.current_round).collected_amount
         
         # Get next recipient
         next_recipient = None
@@ -476,32 +478,24 @@ class GroupService:
         db.add(invitation)
         db.flush()
         
-        # Send SMS invitation
-        try:
-            if existing_user:
-                # User exists - send invitation with inviter's name
-                send_group_invitation_existing_user(
-                    phone_number=phone_number,
-                    inviter_name=inviter.name,
-                    group_name=group.name,
-                    group_code=group.group_code
-                )
-            else:
-                # New user - send registration invitation
-                send_group_invitation_new_user(
-                    phone_number=phone_number,
-                    group_name=group.name,
-                    group_code=group.group_code
-                )
-        except Exception as e:
-            # Log the error but don't fail the invitation
-            print(f"Failed to send invitation SMS: {e}")
-        
-        db.commit()
-        db.refresh(invitation)
+        # SMS invitation, sent by the outbox after commit
+        if existing_user:
+            # User exists - invitation with inviter's name
+            message = group_invitation_existing_user_message(
+                inviter_name=inviter.name,
+                group_name=group.name,
+                group_code=group.group_code
+            )
+        else:
+            # New user - registration invitation
+            message = group_invitation_new_user_message(
+                group_name=group.name,
+                group_code=group.group_code
+            )
+        OutboxService.enqueue_sms(db, encrypted_phone, message, dedupe_key=f"invitation:{invitation.id}:sms")
         
         # Audit log
-        AuditService.log(
+        AuditService.add(
             db=db,
             entity_type="invitation",
             entity_id=invitation.id,
@@ -514,6 +508,9 @@ class GroupService:
             performed_by=inviter.id
         )
         
+        db.commit()
+        db.refresh(invitation)
+        
         # Build response
         return InvitationResponse(
             id=invitation.id,
@@ -602,31 +599,29 @@ class GroupService:
         )
         
         db.add(membership)
+        RoundStatsService.adjust_members(db, invitation.group_id, 1)
         
         # Update invitation status
         invitation.status = InvitationStatus.ACCEPTED
         invitation.accepted_at = datetime.utcnow()
+        db.flush()
         
-        db.commit()
-        db.refresh(membership)
-        
-        # Send welcome SMS
+        # Welcome SMS, sent by the outbox after commit
         group = invitation.group
-        phone_number = decrypt_field(user.phone_number)
-        from ..integrations.sms_sender import send_group_welcome
-        try:
-            send_group_welcome(
-                phone_number=phone_number,
+        OutboxService.enqueue_sms(
+            db,
+            user.phone_number,
+            group_welcome_message(
                 group_name=group.name,
                 group_code=group.group_code,
                 position=next_position,
                 contribution_amount=group.contribution_amount
-            )
-        except Exception as e:
-            print(f"Failed to send welcome SMS: {e}")
+            ),
+            dedupe_key=f"membership:{membership.id}:welcome:sms"
+        )
         
         # Audit log
-        AuditService.log(
+        AuditService.add(
             db=db,
             entity_type="membership",
             entity_id=membership.id,
@@ -640,6 +635,9 @@ class GroupService:
             performed_by=user.id
         )
         
+        db.commit()
+        db.refresh(membership)
+        
         return membership
     
     @staticmethod
@@ -739,28 +737,19 @@ class GroupService:
         
         # Update admin status
         membership.is_admin = is_admin
-        db.commit()
-        db.refresh(membership)
         
-        # Send SMS notification
+        # SMS notification, sent by the outbox after commit
         user = db.query(User).filter(User.id == target_user_id).first()
-        phone = decrypt_field(user.phone_number)
-        from ..integrations.sms_mock import SMSGateway
-        
         message = (
             f"You have been made an admin of '{group.name}'. "
             f"You can now manage payments and members."
         ) if is_admin else (
             f"Your admin role in '{group.name}' has been removed."
         )
-        
-        try:
-            SMSGateway.send_sms(phone, message)
-        except Exception as e:
-            print(f"Failed to send admin role SMS: {e}")
+        OutboxService.enqueue_sms(db, user.phone_number, message)
         
         # Audit log
-        AuditService.log(
+        AuditService.add(
             db=db,
             entity_type="membership",
             entity_id=membership.id,
@@ -770,6 +759,9 @@ class GroupService:
             performed_by=requester_id
         )
         
+        db.commit()
+        db.refresh(membership)
+        
         return membership
     
     @staticmethod
@@ -847,3 +839,117 @@ class GroupService:
         )
         
         return group
+    
+    @staticmethod
+    def advance_round(db: Session, group: Group, round_number: Optional[int] = None) -> bool:
+        """
+        Move a group on after its current round has been paid out.
+        
+        The group moves to the next round, or is completed if the round just
+        paid was its last. Changes are not committed.
+        
+        Args:
+            db: Database session
+            group: Group whose current round was paid out (locked by the
+                caller when payouts run concurrently)
+            round_number: Round that was paid out; the group is left alone
+                if it is no longer on this round
+            
+        Returns:
+            True if the group was completed
+        """
+        if round_number is not None and group.current_round != round_number:
+            return False
+        
+        if group.current_round >= group.num_cycles:
+            GroupService.archive_groups(db, [group])
+            return True
+        
+        group.current_round += 1
+        RoundStatsService.start_round(db, group)
+        return False
+    
+    @staticmethod
+    def archive_groups(db: Session, groups: List[Group]) -> None:
+        """
+        Mark groups as completed and release their scheduling state.
+        
+        Completed groups drop out of every active-group scan. Members left
+        without another active group also give up their planner-assigned
+        collection day, so the collection schedule only reflects live groups.
+        Changes are not committed.
+        
+        Args:
+            db: Database session
+            groups: Groups to complete
+        """
+        if not groups:
+            return
+        
+        now = datetime.utcnow()
+        group_ids = [group.id for group in groups]
+        
+        for group in groups:
+            group.status = GroupStatus.COMPLETED
+            group.completed_at = now
+            if group.current_round > group.num_cycles:
+                group.current_round = group.num_cycles
+        
+        member_ids = {
+            user_id for user_id, in db.query(Membership.user_id).filter(
+                Membership.group_id.in_(group_ids)
+            ).all()
+        }
+        
+        # Members still collected for another active group keep their day
+        live_ids = {
+            user_id for user_id, in db.query(Membership.user_id).join(
+                Group, Group.id == Membership.group_id
+            ).filter(
+                Membership.user_id.in_(member_ids),
+                Membership.is_active == True,
+                Group.status == GroupStatus.ACTIVE,
+                Group.id.notin_(group_ids)
+            ).distinct().all()
+        }
+        
+        released = member_ids - live_ids
+        if released:
+            db.query(PaymentPreference).filter(
+                PaymentPreference.user_id.in_(released)
+            ).update({PaymentPreference.assigned_pay_day: None}, synchronize_session=False)
+    
+    @staticmethod
+    def complete_finished_groups(db: Session) -> int:
+        """
+        Complete active groups that have already run past their final round.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of groups completed
+        """
+        groups = db.query(Group).filter(
+            Group.status == GroupStatus.ACTIVE,
+            Group.current_round > Group.num_cycles
+        ).all()
+        
+        if not groups:
+            return 0
+        
+        GroupService.archive_groups(db, groups)
+        db.commit()
+        
+        AuditService.log_many(db, [
+            {
+                "entity_type": "group",
+                "entity_id": group.id,
+                "action": "complete",
+                "old_value": {"status": "active"},
+                "new_value": {"status": "completed", "rounds": group.num_cycles},
+            }
+            for group in groups
+        ])
+        
+        return len(groups)
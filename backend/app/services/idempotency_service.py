@@ -0,0 +1,314 @@
+"""
+Idempotency Service
+
+Lets clients safely retry payment and payout mutations. A request sent with
+an Idempotency-Key header is fingerprinted and its response stored; retries
+with the same key replay the stored response without running the handler
+(and its MoMo call) again.
+
+A failed request releases its key for a retry only if it failed before
+sending money through MoMo. Services report those requests with
+record_provider_call. Once one was sent, the failure is stored instead,
+so a retry cannot debit or pay out twice.
+"""
+
+import hashlib
+import json
+import logging
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Type
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import IdempotencyKey
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Response header marking a replayed response
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Stored for requests that failed after money was sent to MoMo
+PROVIDER_FAILURE_DETAIL = (
+    "The request failed after the payment was sent to MoMo. "
+    "Check its status before retrying with a new Idempotency-Key."
+)
+
+# Money-moving MoMo requests sent by the idempotent handler running in this context
+_provider_calls: ContextVar[Optional[List[str]]] = ContextVar("idempotency_provider_calls", default=None)
+
+
+class IdempotencyService:
+    """Service for Idempotency-Key request deduplication."""
+    
+    @staticmethod
+    def fingerprint(endpoint: str, payload: Dict[str, Any]) -> str:
+        """
+        Hash an endpoint and request payload.
+        
+        Args:
+            endpoint: Method and path template, e.g. "POST /payments/manual-trigger"
+            payload: Request parameters and body
+        
+        Returns:
+            Hex SHA-256 digest
+        """
+        canonical = json.dumps({"endpoint": endpoint, "payload": payload}, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+    
+    @staticmethod
+    def begin(
+        db: Session,
+        key: str,
+        user_id: int,
+        endpoint: str,
+        payload: Dict[str, Any]
+    ) -> IdempotencyKey:
+        """
+        Claim an idempotency key, or return its stored response.
+        
+        Args:
+            db: Database session
+            key: Idempotency-Key header value
+            user_id: ID of the requesting user
+            endpoint: Method and path template
+            payload: Request parameters and body
+        
+        Returns:
+            New in-progress record, or a completed record to replay
+            (response_status set)
+        
+        Raises:
+            HTTPException: If the key is invalid, reused for a different
+                request, or still in progress
+        """
+        if not key or len(key) > 255:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Idempotency-Key must be between 1 and 255 characters"
+            )
+        
+        request_hash = IdempotencyService.fingerprint(endpoint, payload)
+        now = datetime.utcnow()
+        
+        record = db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key
+        ).first()
+        
+        if record and record.expires_at <= now:
+            db.delete(record)
+            db.flush()
+            record = None
+        
+        if not record:
+            record = IdempotencyKey(
+                key=key,
+                user_id=user_id,
+                endpoint=endpoint,
+                request_hash=request_hash,
+                expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+            )
+            db.add(record)
+            try:
+                db.commit()
+                return record
+            except IntegrityError:
+                # A concurrent request claimed the key first
+                db.rollback()
+                record = db.query(IdempotencyKey).filter(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key
+                ).first()
+        
+        if record.request_hash != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        
+        if record.response_status is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        
+        return record
+    
+    @staticmethod
+    def complete(db: Session, record: IdempotencyKey, status_code: int, body: Any) -> IdempotencyKey:
+        """
+        Store the response of a claimed key.
+        
+        Args:
+            db: Database session
+            record: Record returned by begin
+            status_code: HTTP status code of the response
+            body: JSON-serializable response body
+        
+        Returns:
+            Updated record
+        """
+        record.response_status = status_code
+        record.response_body = body
+        
+        db.commit()
+        
+        return record
+    
+    @staticmethod
+    def release(db: Session, record: IdempotencyKey) -> None:
+        """
+        Drop a claimed key so the request can be retried.
+        
+        Args:
+            db: Database session
+            record: Record returned by begin
+        """
+        db.delete(record)
+        db.commit()
+    
+    @staticmethod
+    def record_provider_call(description: str) -> None:
+        """
+        Note that the running handler is sending money through MoMo.
+        
+        Call this just before the request is sent. It has no effect outside
+        an idempotent handler.
+        
+        Args:
+            description: What was sent, for logs (e.g. "debit payment 12")
+        """
+        calls = _provider_calls.get()
+        if calls is not None:
+            calls.append(description)
+    
+    @staticmethod
+    def replay(record: IdempotencyKey) -> JSONResponse:
+        """
+        Build the stored response of a completed key.
+        
+        Args:
+            record: Completed record
+        
+        Returns:
+            Stored response
+        
+        Raises:
+            HTTPException: If the stored response was an error
+        """
+        headers = {REPLAYED_HEADER: "true"}
+        
+        if record.response_status >= 400:
+            raise HTTPException(
+                status_code=record.response_status,
+                detail=(record.response_body or {}).get("detail"),
+                headers=headers
+            )
+        
+        return JSONResponse(
+            status_code=record.response_status,
+            content=record.response_body,
+            headers=headers
+        )
+    
+    @staticmethod
+    def execute(
+        db: Session,
+        key: Optional[str],
+        user_id: int,
+        endpoint: str,
+        payload: Dict[str, Any],
+        response_model: Type[BaseModel],
+        handler: Callable[[], Any]
+    ) -> Any:
+        """
+        Run a mutation handler at most once per Idempotency-Key.
+        
+        Without a key the handler simply runs. Successful responses and
+        client errors (4xx) are stored and replayed. Server errors release
+        the key so the client can retry, unless the handler had already sent
+        money through MoMo (see record_provider_call). In that case the
+        failure is stored with PROVIDER_FAILURE_DETAIL.
+        
+        Args:
+            db: Database session
+            key: Idempotency-Key header value (optional)
+            user_id: ID of the requesting user
+            endpoint: Method and path template
+            payload: Request parameters and body
+            response_model: Schema used to serialize the handler's result
+            handler: Callable performing the mutation
+        
+        Returns:
+            Serialized handler result, or the replayed response
+        """
+        if key is None:
+            return handler()
+        
+        record = IdempotencyService.begin(db, key, user_id, endpoint, payload)
+        if record.response_status is not None:
+            return IdempotencyService.replay(record)
+        
+        provider_calls: List[str] = []
+        token = _provider_calls.set(provider_calls)
+        try:
+            result = handler()
+        except HTTPException as e:
+            db.rollback()
+            if e.status_code < 500:
+                IdempotencyService.complete(db, record, e.status_code, {"detail": e.detail})
+            else:
+                IdempotencyService._fail(db, record, e.status_code, provider_calls)
+            raise
+        except Exception:
+            db.rollback()
+            IdempotencyService._fail(db, record, status.HTTP_500_INTERNAL_SERVER_ERROR, provider_calls)
+            raise
+        finally:
+            _provider_calls.reset(token)
+        
+        body = response_model.model_validate(result).model_dump(mode="json")
+        IdempotencyService.complete(db, record, status.HTTP_200_OK, body)
+        
+        return body
+    
+    @staticmethod
+    def _fail(db: Session, record: IdempotencyKey, status_code: int, provider_calls: List[str]) -> None:
+        """Release a key after a server error, or store the error if money was already sent."""
+        if not provider_calls:
+            IdempotencyService.release(db, record)
+            return
+        
+        logger.error(
+            f"Idempotent request {record.endpoint} failed after {', '.join(provider_calls)}; "
+            f"key kept so retries are not sent again"
+        )
+        IdempotencyService.complete(db, record, status_code, {"detail": PROVIDER_FAILURE_DETAIL})
+    
+    @staticmethod
+    def purge_expired(db: Session) -> int:
+        """
+        Delete expired idempotency keys.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Number of keys deleted
+        """
+        deleted = db.query(IdempotencyKey).filter(
+            IdempotencyKey.expires_at <= datetime.utcnow()
+        ).delete(synchronize_session=False)
+        
+        db.commit()
+        
+        return deleted
+
+
+# Singleton instance
+idempotency_service = IdempotencyService()
@@ -0,0 +1,343 @@
+"""
+Job Run Service Module
+
+Records scheduler job runs (timing, rows scanned, outcomes) and
+aggregates them into per-job metrics for the admin dashboard. Recording is
+best-effort: a job still runs when its run row cannot be stored.
+"""
+
+import os
+import logging
+import socket
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models import JobRun, JobRunStatus
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Identifies the process that ran a job when several workers are deployed
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobRunService:
+    """Service for scheduler job run history and metrics."""
+    
+    @staticmethod
+    def job_windows() -> Dict[str, int]:
+        """
+        Get the scheduling window (seconds between runs) of each job.
+        
+        Returns:
+            Dict mapping job ID to window length in seconds
+        """
+        return {
+            "daily_payment_check": 24 * 3600,
+            "retry_failed_payments": settings.RETRY_INTERVAL_HOURS * 3600,
+            "process_pending_payouts": settings.PAYOUT_CHECK_INTERVAL_HOURS * 3600,
+            "send_payment_reminders": 24 * 3600,
+            "purge_idempotency_keys": 3600,
+            "poll_pending_collections": settings.MOMO_STATUS_POLL_INTERVAL_MINUTES * 60,
+            "settle_payout_transfers": settings.PAYOUT_SETTLE_INTERVAL_MINUTES * 60,
+            "reconcile_round_stats": 24 * 3600,
+            "dispatch_outbox": settings.OUTBOX_DISPATCH_INTERVAL_SECONDS,
+            "dispatch_interactive_outbox": settings.OUTBOX_INTERACTIVE_DISPATCH_INTERVAL_SECONDS,
+        }
+    
+    @staticmethod
+    def start_run(db: Session, job_id: str) -> JobRun:
+        """
+        Record the start of a job run.
+        
+        Args:
+            db: Database session
+            job_id: Scheduler job ID
+        
+        Returns:
+            Created job run in RUNNING status
+        """
+        run = JobRun(
+            job_id=job_id,
+            worker_id=WORKER_ID,
+            status=JobRunStatus.RUNNING,
+            started_at=datetime.utcnow()
+        )
+        
+        db.add(run)
+        db.commit()
+        
+        return run
+    
+    @staticmethod
+    def finish_run(db: Session, run: JobRun, error: Optional[str] = None) -> JobRun:
+        """
+        Record the end of a job run.
+        
+        The run is marked FAILED if an error is passed or was set on the run
+        by the job itself, otherwise SUCCESS.
+        
+        Args:
+            db: Database session
+            run: Job run returned by start_run
+            error: Error message if the job raised
+        
+        Returns:
+            Updated job run
+        """
+        if error:
+            run.error = error
+        
+        run.finished_at = datetime.utcnow()
+        run.duration_seconds = (run.finished_at - run.started_at).total_seconds()
+        run.status = JobRunStatus.FAILED if run.error else JobRunStatus.SUCCESS
+        
+        db.commit()
+        
+        return run
+    
+    @staticmethod
+    @contextmanager
+    def track(job_id: str):
+        """
+        Context manager recording one run of a scheduler job.
+        
+        Uses its own session so the run is stored even if the job's session
+        is rolled back. The yielded run's counters (rows_scanned,
+        payments_attempted, successes, failures, error) may be updated by the
+        job and are saved when the block exits.
+        
+        Tracking never stops the job: if the run cannot be recorded the
+        error is logged and the job runs with an unsaved run object.
+        
+        Args:
+            job_id: Scheduler job ID
+        """
+        db = SessionLocal()
+        try:
+            try:
+                run = JobRunService.start_run(db, job_id)
+                recorded = True
+            except Exception as e:
+                logger.error(f"Could not record start of job {job_id}: {e}")
+                db.rollback()
+                run = JobRun(
+                    job_id=job_id,
+                    worker_id=WORKER_ID,
+                    status=JobRunStatus.RUNNING,
+                    started_at=datetime.utcnow(),
+                    rows_scanned=0,
+                    payments_attempted=0,
+                    successes=0,
+                    failures=0
+                )
+                recorded = False
+            
+            error = None
+            try:
+                yield run
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                if recorded:
+                    try:
+                        JobRunService.finish_run(db, run, error=error)
+                    except Exception as e:
+                        logger.error(f"Could not record end of job {job_id}: {e}")
+                        db.rollback()
+        finally:
+            db.close()
+    
+    @staticmethod
+    def purge_old_runs(db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Delete finished job runs older than JOB_RUN_RETENTION_DAYS.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Number of runs deleted
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=settings.JOB_RUN_RETENTION_DAYS)
+        
+        deleted = db.query(JobRun).filter(
+            JobRun.started_at < cutoff,
+            JobRun.status != JobRunStatus.RUNNING
+        ).delete(synchronize_session=False)
+        
+        db.commit()
+        
+        return deleted
+    
+    @staticmethod
+    def last_success_started_at(db: Session, job_id: str) -> Optional[datetime]:
+        """
+        Get the start time of a job's latest successful run.
+        
+        Stored runs survive restarts and are shared by every worker, so jobs
+        can use this as their incremental watermark.
+        
+        Args:
+            db: Database session
+            job_id: Scheduler job ID
+        
+        Returns:
+            Start time, or None if the job never succeeded
+        """
+        return db.query(func.max(JobRun.started_at)).filter(
+            JobRun.job_id == job_id,
+            JobRun.status == JobRunStatus.SUCCESS
+        ).scalar()
+    
+    @staticmethod
+    def get_runs(
+        db: Session,
+        job_id: Optional[str] = None,
+        status: Optional[JobRunStatus] = None,
+        limit: int = 100
+    ) -> List[JobRun]:
+        """
+        Get recent job runs, newest first.
+        
+        Args:
+            db: Database session
+            job_id: Filter by job ID
+            status: Filter by run status
+            limit: Maximum number of runs to return
+        
+        Returns:
+            List of job runs
+        """
+        query = db.query(JobRun)
+        
+        if job_id:
+            query = query.filter(JobRun.job_id == job_id)
+        
+        if status:
+            query = query.filter(JobRun.status == status)
+        
+        return query.order_by(JobRun.started_at.desc()).limit(limit).all()
+    
+    @staticmethod
+    def get_job_metrics(db: Session, days: int = 7) -> List[Dict[str, Any]]:
+        """
+        Aggregate job runs into per-job metrics.
+        
+        Args:
+            db: Database session
+            days: Number of days of history to aggregate
+        
+        Returns:
+            List of per-job metric dicts, including how much of its scheduling
+            window the last run used
+        """
+        since = datetime.utcnow() - timedelta(days=days)
+        
+        rows = db.query(
+            JobRun.job_id,
+            func.count(JobRun.id).label("runs"),
+            func.sum(case((JobRun.status == JobRunStatus.FAILED, 1), else_=0)).label("failed_runs"),
+            func.avg(JobRun.duration_seconds).label("avg_duration"),
+            func.max(JobRun.duration_seconds).label("max_duration"),
+            func.sum(JobRun.rows_scanned).label("rows_scanned"),
+            func.sum(JobRun.payments_attempted).label("payments_attempted"),
+            func.sum(JobRun.successes).label("successes"),
+            func.sum(JobRun.failures).label("failures"),
+        ).filter(
+            JobRun.started_at >= since
+        ).group_by(JobRun.job_id).all()
+        
+        # Latest finished run per job
+        latest = db.query(
+            JobRun.job_id,
+            func.max(JobRun.started_at).label("started_at")
+        ).filter(
+            JobRun.finished_at.isnot(None)
+        ).group_by(JobRun.job_id).subquery()
+        
+        last_runs = {
+            run.job_id: run
+            for run in db.query(JobRun).join(
+                latest,
+                (latest.c.job_id == JobRun.job_id) & (latest.c.started_at == JobRun.started_at)
+            ).all()
+        }
+        
+        windows = JobRunService.job_windows()
+        
+        metrics = []
+        for row in rows:
+            last_run = last_runs.get(row.job_id)
+            window = windows.get(row.job_id)
+            last_duration = last_run.duration_seconds if last_run else None
+            
+            metrics.append({
+                "job_id": row.job_id,
+                "runs": row.runs,
+                "failed_runs": int(row.failed_runs or 0),
+                "avg_duration_seconds": round(row.avg_duration or 0.0, 3),
+                "max_duration_seconds": round(row.max_duration or 0.0, 3),
+                "rows_scanned": int(row.rows_scanned or 0),
+                "payments_attempted": int(row.payments_attempted or 0),
+                "successes": int(row.successes or 0),
+                "failures": int(row.failures or 0),
+                "last_run_at": last_run.started_at if last_run else None,
+                "last_status": last_run.status.value if last_run else None,
+                "last_duration_seconds": last_duration,
+                "last_worker_id": last_run.worker_id if last_run else None,
+                "window_seconds": window,
+                "window_utilization": round(last_duration / window, 4) if window and last_duration is not None else None,
+            })
+        
+        return metrics
+    
+    @staticmethod
+    def render_prometheus(metrics: List[Dict[str, Any]]) -> str:
+        """
+        Render job metrics in the Prometheus text exposition format.
+        
+        Every series is a gauge: the totals are recomputed from the stored
+        runs in the metrics window, so they can go down as runs age out.
+        
+        Args:
+            metrics: Output of get_job_metrics
+        
+        Returns:
+            Metrics text
+        """
+        series = [
+            ("sususave_job_runs", "Job runs in the metrics window", "runs"),
+            ("sususave_job_failed_runs", "Failed job runs in the metrics window", "failed_runs"),
+            ("sususave_job_duration_seconds_avg", "Average job run duration", "avg_duration_seconds"),
+            ("sususave_job_duration_seconds_max", "Longest job run duration", "max_duration_seconds"),
+            ("sususave_job_last_duration_seconds", "Duration of the last finished run", "last_duration_seconds"),
+            ("sususave_job_window_utilization", "Last run duration as a fraction of the job's schedule window", "window_utilization"),
+            ("sususave_job_rows_scanned", "Rows scanned by job runs in the metrics window", "rows_scanned"),
+            ("sususave_job_payments_attempted", "Payments or payouts attempted by job runs in the metrics window", "payments_attempted"),
+            ("sususave_job_successes", "Successful items processed by job runs in the metrics window", "successes"),
+            ("sususave_job_failures", "Failed items processed by job runs in the metrics window", "failures"),
+        ]
+        
+        lines = []
+        for name, help_text, key in series:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for job in metrics:
+                value = job.get(key)
+                if value is None:
+                    continue
+                lines.append(f'{name}{{job="{job["job_id"]}"}} {value}')
+        
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+job_run_service = JobRunService()
@@ -3,20 +3,90 @@ KYC Service Module
 
 This service layer handles KYC verification orchestration,
 combining MTN KYC API calls with database operations.
+
+MTN outcomes are cached per phone number (keyed by a digest, so numbers
+are not kept in clear) for KYC_CACHE_TTL_SECONDS, or
+KYC_CACHE_FAILED_TTL_SECONDS for failed verifications, so re-verifying a
+number checked moments ago does not call MTN again. Checks that got no
+definitive answer (network or server errors) are never cached and leave
+the user's verification as it was. Bulk verification
+calls MTN for KYC_BULK_CONCURRENCY users at a time and commits once per
+KYC_BULK_BATCH_SIZE users.
 """
 
+import hashlib
 import logging
-from typing import Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 
-from ..models import User
+from ..models import User, KYCStatus
 from ..integrations.mtn_kyc_integration import mtn_kyc_service
 from ..config import settings
 
 logger = logging.getLogger(__name__)
 
 
+class KYCProviderError(Exception):
+    """MTN could not be asked, or did not give a definitive answer."""
+    pass
+
+
+def phone_digest(phone_number: str) -> str:
+    """SHA-256 digest of a phone number in MTN (233XXXXXXXXX) format."""
+    return hashlib.sha256(mtn_kyc_service._clean_phone_number(phone_number).encode()).hexdigest()
+
+
+class KYCResultCache:
+    """
+    Thread-safe TTL cache of MTN KYC outcomes by phone digest.
+    
+    Holds at most KYC_CACHE_MAX_ENTRIES results; the least recently stored
+    are evicted first.
+    """
+    
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, phone_number: str) -> Optional[Dict]:
+        """Cached result for a phone number, or None if missing or expired."""
+        key = phone_digest(phone_number)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[1]
+    
+    def put(self, phone_number: str, result: Dict) -> None:
+        """Cache a verification result for its TTL (0 disables caching)."""
+        ttl = settings.KYC_CACHE_TTL_SECONDS if result.get("verified") else settings.KYC_CACHE_FAILED_TTL_SECONDS
+        if ttl <= 0:
+            return
+        
+        key = phone_digest(phone_number)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.monotonic() + ttl, result)
+            while len(self._entries) > settings.KYC_CACHE_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+
+
+kyc_cache = KYCResultCache()
+
+
 class KYCService:
     """
     Service for managing user KYC verification.
@@ -52,58 +122,104 @@ class KYCService:
                 "message": "User not found"
             }
         
-        # If KYC is disabled, mark as verified
-        if not settings.ENABLE_MTN_KYC:
-            logger.warning("KYC is disabled, auto-verifying user")
-            user.kyc_verified = True
-            user.kyc_verified_at = datetime.utcnow()
-            user.kyc_provider = "disabled"
-            db.commit()
-            
-            return {
-                "success": True,
-                "verified": True,
-                "message": "KYC verification disabled, user auto-verified",
-                "provider": "disabled"
-            }
-        
-        # Perform MTN KYC verification
         try:
-            verification_result = mtn_kyc_service.perform_kyc_verification(phone_number)
-            
-            # Update user record
-            user.kyc_verified = verification_result.get("verified", False)
-            
-            if verification_result.get("verified"):
-                user.kyc_verified_at = datetime.utcnow()
-                user.kyc_provider = verification_result.get("provider", "MTN")
-                logger.info(f"User {user_id} verified successfully")
-            else:
-                user.kyc_verified_at = None
-                user.kyc_provider = None
-                logger.warning(f"User {user_id} verification failed: {verification_result.get('message')}")
+            verification_result = KYCService.check_phone(phone_number)
+            KYCService._apply_result(user, verification_result)
             
             db.commit()
             db.refresh(user)
             
-            return {
-                "success": True,
-                "verified": user.kyc_verified,
-                "verified_at": user.kyc_verified_at.isoformat() if user.kyc_verified_at else None,
-                "provider": user.kyc_provider,
-                "message": verification_result.get("message"),
-                "details": verification_result.get("details")
-            }
-            
         except Exception as e:
             logger.error(f"KYC verification error for user {user_id}: {e}")
             db.rollback()
+            KYCService._mark_error(db, user)
             
             return {
                 "success": False,
                 "verified": False,
                 "message": f"Verification error: {str(e)}"
             }
+        
+        if verification_result.get("provider") == "disabled":
+            return {
+                "success": True,
+                "verified": True,
+                "message": "KYC verification disabled, user auto-verified",
+                "provider": "disabled"
+            }
+        
+        return {
+            "success": True,
+            "verified": user.kyc_verified,
+            "verified_at": user.kyc_verified_at.isoformat() if user.kyc_verified_at else None,
+            "provider": user.kyc_provider,
+            "message": verification_result.get("message"),
+            "details": verification_result.get("details")
+        }
+    
+    @staticmethod
+    def check_phone(phone_number: str) -> Dict:
+        """
+        Get the MTN KYC outcome for a phone number, from the cache if fresh.
+        
+        With KYC disabled every number passes without calling MTN.
+        
+        Args:
+            phone_number: Phone number (unencrypted)
+            
+        Returns:
+            Verification result (verified, provider, message, details)
+            
+        Raises:
+            KYCProviderError: If MTN gave no definitive answer (not cached)
+            Exception: If MTN could not be asked
+        """
+        if not settings.ENABLE_MTN_KYC:
+            return {"verified": True, "provider": "disabled", "message": "KYC verification is disabled"}
+        
+        cached = kyc_cache.get(phone_number)
+        if cached is not None:
+            return cached
+        
+        result = mtn_kyc_service.perform_kyc_verification(phone_number)
+        if result.get("error"):
+            # A network or server error says nothing about the number
+            raise KYCProviderError(result.get("message") or "MTN KYC check failed")
+        
+        kyc_cache.put(phone_number, result)
+        return result
+    
+    @staticmethod
+    def _apply_result(user: User, verification_result: Dict) -> None:
+        """Record a verification result on a user without committing."""
+        user.kyc_verified = verification_result.get("verified", False)
+        user.kyc_status = KYCStatus.VERIFIED if user.kyc_verified else KYCStatus.UNVERIFIED
+        
+        if user.kyc_verified:
+            user.kyc_verified_at = datetime.utcnow()
+            user.kyc_provider = verification_result.get("provider", "MTN")
+            logger.info(f"User {user.id} verified successfully")
+        else:
+            user.kyc_verified_at = None
+            user.kyc_provider = None
+            logger.warning(f"User {user.id} verification failed: {verification_result.get('message')}")
+    
+    @staticmethod
+    def _mark_error(db: Session, user: User) -> None:
+        """
+        Record that a pending check could not reach MTN, so the user can see a retry is needed.
+        
+        A previous verified or unverified outcome is kept.
+        """
+        if user.kyc_verified or user.kyc_status not in (None, KYCStatus.PENDING):
+            return
+        
+        try:
+            user.kyc_status = KYCStatus.ERROR
+            db.commit()
+        except Exception as e:
+            logger.error(f"Could not record KYC error for user {user.id}: {e}")
+            db.rollback()
     
     @staticmethod
     def check_verification_status(user: User) -> Dict:
@@ -116,8 +232,16 @@ class KYCService:
         Returns:
             Dict with verification status
         """
+        if user and user.kyc_verified:
+            kyc_status = KYCStatus.VERIFIED.value
+        elif user and user.kyc_status:
+            kyc_status = user.kyc_status.value
+        else:
+            kyc_status = KYCStatus.UNVERIFIED.value
+        
         return {
             "verified": user.kyc_verified if user else False,
+            "status": kyc_status,
             "verified_at": user.kyc_verified_at.isoformat() if user and user.kyc_verified_at else None,
             "provider": user.kyc_provider if user else None,
             "required_for_payments": settings.REQUIRE_KYC_FOR_PAYMENTS
@@ -192,14 +316,27 @@ class KYCService:
         return mtn_kyc_service.get_kyc_requirements()
     
     @staticmethod
-    def bulk_verify_users(db: Session, user_ids: list = None) -> Dict:
+    def bulk_verify_users(
+        db: Session,
+        user_ids: list = None,
+        unverified_only: bool = True,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict:
         """
         Verify multiple users in bulk.
         Useful for migrating existing users.
         
+        Users are read in pages of KYC_BULK_BATCH_SIZE. Each page's phone
+        numbers are decrypted and checked with MTN KYC_BULK_CONCURRENCY at a
+        time (through the result cache), then the page's results are
+        committed together.
+        
         Args:
             db: Database session
-            user_ids: List of user IDs to verify (None = all unverified users)
+            user_ids: List of user IDs to verify (None = all users, or all
+                unverified users with unverified_only)
+            unverified_only: Skip verified users when user_ids is None
+            progress: Called with (processed, total) after each page
             
         Returns:
             Dict with bulk verification results
@@ -211,56 +348,99 @@ class KYCService:
         
         if user_ids:
             query = query.filter(User.id.in_(user_ids))
-        else:
+        elif unverified_only:
             # Only verify unverified users
             query = query.filter(User.kyc_verified == False)
         
-        users = query.all()
-        
         results = {
-            "total": len(users),
+            "total": query.count(),
             "verified": 0,
             "failed": 0,
             "errors": [],
             "details": []
         }
         
-        from ..utils import decrypt_field
+        batch_size = max(settings.KYC_BULK_BATCH_SIZE, 1)
+        workers = max(settings.KYC_BULK_CONCURRENCY, 1)
+        processed = 0
+        last_id = 0
         
-        for user in users:
-            try:
-                # Decrypt phone number
-                phone_number = decrypt_field(user.phone_number)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                # Keyset pagination: users verified by earlier pages drop out of
+                # the unverified filter without shifting later pages
+                users = query.filter(User.id > last_id).order_by(User.id).limit(batch_size).all()
+                if not users:
+                    break
+                last_id = users[-1].id
                 
-                # Verify user
-                result = KYCService.verify_user(db, user.id, phone_number)
+                outcomes = executor.map(KYCService._check_encrypted_phone, [user.phone_number for user in users])
                 
-                if result.get("verified"):
-                    results["verified"] += 1
-                else:
-                    results["failed"] += 1
-                    results["errors"].append({
-                        "user_id": user.id,
-                        "phone": phone_number[-4:],  # Last 4 digits only
-                        "message": result.get("message")
-                    })
+                for user, (phone_number, result, error) in zip(users, outcomes):
+                    if error is None:
+                        KYCService._apply_result(user, result)
+                    KYCService._record_bulk_outcome(results, user, phone_number, result, error)
                 
-                results["details"].append({
-                    "user_id": user.id,
-                    "verified": result.get("verified"),
-                    "message": result.get("message")
-                })
+                db.commit()
                 
-            except Exception as e:
-                logger.error(f"Error verifying user {user.id}: {e}")
-                results["failed"] += 1
-                results["errors"].append({
-                    "user_id": user.id,
-                    "message": str(e)
-                })
+                processed += len(users)
+                logger.info(f"Bulk KYC verification: {processed}/{results['total']} users processed")
+                if progress:
+                    progress(processed, results["total"])
         
         logger.info(f"Bulk verification complete: {results['verified']} verified, {results['failed']} failed")
         return results
+    
+    @staticmethod
+    def _check_encrypted_phone(encrypted_phone: str) -> Tuple[Optional[str], Optional[Dict], Optional[str]]:
+        """
+        Decrypt a stored phone number and check it with MTN; runs in a worker thread.
+        
+        Returns:
+            (phone number, verification result, error message)
+        """
+        from ..utils import decrypt_field
+        
+        phone_number = None
+        try:
+            phone_number = decrypt_field(encrypted_phone)
+            return phone_number, KYCService.check_phone(phone_number), None
+        except Exception as e:
+            return phone_number, None, str(e)
+    
+    @staticmethod
+    def _record_bulk_outcome(
+        results: Dict,
+        user: User,
+        phone_number: Optional[str],
+        result: Optional[Dict],
+        error: Optional[str]
+    ) -> None:
+        """Count one user's bulk verification outcome."""
+        if error is not None:
+            logger.error(f"Error verifying user {user.id}: {error}")
+            results["failed"] += 1
+            results["errors"].append({
+                "user_id": user.id,
+                "message": error
+            })
+            return
+        
+        if result.get("verified"):
+            results["verified"] += 1
+        else:
+            results["failed"] += 1
+            results["errors"].append({
+                "user_id": user.id,
+                "phone": phone_number[-4:],  # Last 4 digits only
+                "message": result.get("message")
+            })
+        
+        results["details"].append({
+            "user_id": user.id,
+            "verified": result.get("verified"),
+            "message": result.get("message")
+        })
 
 
 # Singleton instance
@@ -0,0 +1,429 @@
+"""
+Ledger Service
+
+Double-entry ledger of contributions and payouts. Every money movement is
+posted as a balanced transaction (total debits equal total credits) of
+append-only ledger entries, and each account keeps materialized running
+totals, so balances and totals are single-row reads. Amounts are exact
+Decimals rounded to 2 places.
+
+Postings:
+    contribution: debit the group pot, credit the member wallet
+    payout: debit the member wallet, credit the group pot
+    reversal: the original postings with negated amounts
+
+A member's total_credits is what they contributed and total_debits what
+they received; a group's total_debits is what it collected and
+total_credits what it paid out.
+"""
+
+import uuid
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple, Iterable
+from sqlalchemy import func, case
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import (
+    Payment, Payout, LedgerAccount, LedgerAccountType, LedgerEntry, PaymentStatus, PayoutStatus
+)
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0.00")
+
+# (account, debit, credit)
+Posting = Tuple[LedgerAccount, Decimal, Decimal]
+
+
+def to_amount(value) -> Decimal:
+    """Convert a float or string amount to a 2-place Decimal."""
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class LedgerService:
+    """Service for the double-entry ledger."""
+    
+    @staticmethod
+    def get_account(db: Session, account_type: LedgerAccountType, owner_id: int = 0) -> LedgerAccount:
+        """
+        Get a ledger account, creating it if missing.
+        
+        Args:
+            db: Database session
+            account_type: Account type
+            owner_id: User ID (member wallets), group ID (group pots) or 0
+        
+        Returns:
+            Ledger account
+        """
+        account = db.query(LedgerAccount).filter(
+            LedgerAccount.account_type == account_type,
+            LedgerAccount.owner_id == owner_id
+        ).first()
+        
+        if account:
+            return account
+        
+        try:
+            with db.begin_nested():
+                account = LedgerAccount(
+                    account_type=account_type,
+                    owner_id=owner_id,
+                    balance=ZERO,
+                    total_debits=ZERO,
+                    total_credits=ZERO
+                )
+                db.add(account)
+        except IntegrityError:
+            # Created concurrently
+            account = db.query(LedgerAccount).filter(
+                LedgerAccount.account_type == account_type,
+                LedgerAccount.owner_id == owner_id
+            ).one()
+        
+        return account
+    
+    @staticmethod
+    def post(
+        db: Session,
+        entry_type: str,
+        postings: List[Posting],
+        channel: Optional[str] = None,
+        payment_id: Optional[int] = None,
+        payout_id: Optional[int] = None,
+        created_at: Optional[datetime] = None
+    ) -> str:
+        """
+        Post a balanced transaction.
+        
+        Account totals are moved with in-database increments, so concurrent
+        postings to the same account cannot lose updates. Changes are not
+        committed.
+        
+        Args:
+            db: Database session
+            entry_type: contribution, payout or reversal
+            postings: (account, debit, credit) legs
+            channel: Payment channel (momo or cash)
+            payment_id: Related payment
+            payout_id: Related payout
+            created_at: Posting time (defaults to utcnow)
+        
+        Returns:
+            Transaction reference shared by the entries
+        
+        Raises:
+            ValueError: If debits and credits do not balance
+        """
+        total_debits = sum((debit for _, debit, _ in postings), ZERO)
+        total_credits = sum((credit for _, _, credit in postings), ZERO)
+        if total_debits != total_credits:
+            raise ValueError(f"Unbalanced ledger transaction: debits {total_debits} != credits {total_credits}")
+        
+        transaction_ref = str(uuid.uuid4())
+        created_at = created_at or datetime.utcnow()
+        
+        for account, debit, credit in postings:
+            db.query(LedgerAccount).filter(LedgerAccount.id == account.id).update({
+                LedgerAccount.balance: LedgerAccount.balance + debit - credit,
+                LedgerAccount.total_debits: LedgerAccount.total_debits + debit,
+                LedgerAccount.total_credits: LedgerAccount.total_credits + credit
+            }, synchronize_session=False)
+            
+            balance_after = db.query(LedgerAccount.balance).filter(LedgerAccount.id == account.id).scalar()
+            
+            db.add(LedgerEntry(
+                transaction_ref=transaction_ref,
+                account_id=account.id,
+                entry_type=entry_type,
+                channel=channel,
+                payment_id=payment_id,
+                payout_id=payout_id,
+                debit=debit,
+                credit=credit,
+                balance_after=balance_after,
+                created_at=created_at
+            ))
+            db.expire(account)
+        
+        return transaction_ref
+    
+    @staticmethod
+    def _latest_entry_type(db: Session, **reference) -> Optional[str]:
+        """Get the entry type of the latest posting for a payment or payout."""
+        entry = db.query(LedgerEntry.entry_type).filter_by(**reference).order_by(LedgerEntry.id.desc()).first()
+        return entry[0] if entry else None
+    
+    @staticmethod
+    def record_contribution(db: Session, payment: Payment, created_at: Optional[datetime] = None) -> Optional[str]:
+        """
+        Post a successful payment to the ledger.
+        
+        Payments already posted (and not reversed) are skipped. Changes are
+        not committed.
+        
+        Args:
+            db: Database session
+            payment: Payment marked SUCCESS in the current transaction
+            created_at: Posting time (defaults to utcnow)
+        
+        Returns:
+            Transaction reference, or None if already posted
+        """
+        if LedgerService._latest_entry_type(db, payment_id=payment.id) == "contribution":
+            return None
+        
+        amount = to_amount(payment.amount)
+        pot = LedgerService.get_account(db, LedgerAccountType.GROUP, payment.group_id)
+        wallet = LedgerService.get_account(db, LedgerAccountType.MEMBER, payment.user_id)
+        
+        return LedgerService.post(
+            db,
+            "contribution",
+            [(pot, amount, ZERO), (wallet, ZERO, amount)],
+            channel=payment.payment_type.value if payment.payment_type else None,
+            payment_id=payment.id,
+            created_at=created_at
+        )
+    
+    @staticmethod
+    def reverse_contribution(db: Session, payment: Payment) -> Optional[str]:
+        """
+        Reverse a posted contribution whose payment is no longer successful.
+        
+        The reversal repeats the original postings with negated amounts, so
+        collected and contributed totals go back down. Changes are not
+        committed.
+        
+        Args:
+            db: Database session
+            payment: Payment moved out of SUCCESS
+        
+        Returns:
+            Transaction reference, or None if nothing was posted
+        """
+        if LedgerService._latest_entry_type(db, payment_id=payment.id) != "contribution":
+            return None
+        
+        original = db.query(LedgerEntry).filter(
+            LedgerEntry.payment_id == payment.id,
+            LedgerEntry.entry_type == "contribution"
+        ).order_by(LedgerEntry.id.desc()).first()
+        
+        entries = db.query(LedgerEntry).filter(
+            LedgerEntry.transaction_ref == original.transaction_ref
+        ).all()
+        
+        return LedgerService.post(
+            db,
+            "reversal",
+            [(entry.account, -entry.debit, -entry.credit) for entry in entries],
+            channel=original.channel,
+            payment_id=payment.id
+        )
+    
+    @staticmethod
+    def record_payout(db: Session, payout: Payout, created_at: Optional[datetime] = None) -> Optional[str]:
+        """
+        Post a paid payout to the ledger.
+        
+        Payouts already posted are skipped. Changes are not committed.
+        
+        Args:
+            db: Database session
+            payout: Payout marked PAID in the current transaction
+            created_at: Posting time (defaults to utcnow)
+        
+        Returns:
+            Transaction reference, or None if already posted
+        """
+        if LedgerService._latest_entry_type(db, payout_id=payout.id) == "payout":
+            return None
+        
+        amount = to_amount(payout.amount)
+        wallet = LedgerService.get_account(db, LedgerAccountType.MEMBER, payout.recipient_id)
+        pot = LedgerService.get_account(db, LedgerAccountType.GROUP, payout.group_id)
+        
+        return LedgerService.post(
+            db,
+            "payout",
+            [(wallet, amount, ZERO), (pot, ZERO, amount)],
+            channel="momo",
+            payout_id=payout.id,
+            created_at=created_at
+        )
+    
+    @staticmethod
+    def get_accounts(
+        db: Session,
+        account_type: LedgerAccountType,
+        owner_ids: Iterable[int]
+    ) -> Dict[int, LedgerAccount]:
+        """
+        Get the accounts of many owners in one query.
+        
+        Args:
+            db: Database session
+            account_type: Account type
+            owner_ids: User or group IDs
+        
+        Returns:
+            Dict mapping owner ID to account (owners without postings are missing)
+        """
+        owner_ids = list(owner_ids)
+        if not owner_ids:
+            return {}
+        
+        return {
+            account.owner_id: account
+            for account in db.query(LedgerAccount).filter(
+                LedgerAccount.account_type == account_type,
+                LedgerAccount.owner_id.in_(owner_ids)
+            ).all()
+        }
+    
+    @staticmethod
+    def member_contributed(db: Session, user_id: int) -> Decimal:
+        """
+        Get the total a member has contributed across all groups.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+        
+        Returns:
+            Net contributed amount
+        """
+        account = LedgerService.get_accounts(db, LedgerAccountType.MEMBER, [user_id]).get(user_id)
+        return account.total_credits if account else ZERO
+    
+    @staticmethod
+    def group_collected(db: Session, group_id: int) -> Decimal:
+        """
+        Get the total a group has collected over its lifetime.
+        
+        Args:
+            db: Database session
+            group_id: Group ID
+        
+        Returns:
+            Net collected amount
+        """
+        account = LedgerService.get_accounts(db, LedgerAccountType.GROUP, [group_id]).get(group_id)
+        return account.total_debits if account else ZERO
+    
+    @staticmethod
+    def total_collected(db: Session) -> Decimal:
+        """
+        Get the total collected by all groups.
+        
+        Sums one row per group pot instead of every payment.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Net collected amount
+        """
+        total = db.query(func.sum(LedgerAccount.total_debits)).filter(
+            LedgerAccount.account_type == LedgerAccountType.GROUP
+        ).scalar()
+        return to_amount(total or 0)
+    
+    @staticmethod
+    def contributions_by_channel(
+        db: Session,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Dict[str, Dict]:
+        """
+        Summarize contributions posted in a period by payment channel.
+        
+        Scans the group-pot side of contribution and reversal entries, with
+        reversals cancelling the payments they reverse.
+        
+        Args:
+            db: Database session
+            start: Period start (inclusive)
+            end: Period end (exclusive)
+        
+        Returns:
+            Dict mapping channel to {"count", "amount"}
+        """
+        query = db.query(
+            LedgerEntry.channel,
+            func.sum(case((LedgerEntry.entry_type == "reversal", -1), else_=1)),
+            func.sum(LedgerEntry.debit)
+        ).join(
+            LedgerAccount, LedgerAccount.id == LedgerEntry.account_id
+        ).filter(
+            LedgerAccount.account_type == LedgerAccountType.GROUP,
+            LedgerEntry.entry_type.in_(["contribution", "reversal"])
+        )
+        
+        if start is not None:
+            query = query.filter(LedgerEntry.created_at >= start)
+        if end is not None:
+            query = query.filter(LedgerEntry.created_at < end)
+        
+        return {
+            channel: {"count": int(count or 0), "amount": to_amount(amount or 0)}
+            for channel, count, amount in query.group_by(LedgerEntry.channel).all()
+        }
+    
+    @staticmethod
+    def collected_between(
+        db: Session,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Decimal:
+        """
+        Get the net amount collected in a period.
+        
+        Args:
+            db: Database session
+            start: Period start (inclusive)
+            end: Period end (exclusive)
+        
+        Returns:
+            Net collected amount
+        """
+        summary = LedgerService.contributions_by_channel(db, start, end)
+        return sum((row["amount"] for row in summary.values()), ZERO)
+    
+    @staticmethod
+    def backfill(db: Session) -> Dict[str, int]:
+        """
+        Post successful payments and paid payouts that predate the ledger.
+        
+        Postings are dated with the original payment and payout dates.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Dict with contributions and payouts counts
+        """
+        payments = db.query(Payment).filter(
+            Payment.status == PaymentStatus.SUCCESS,
+            ~Payment.id.in_(db.query(LedgerEntry.payment_id).filter(LedgerEntry.payment_id.isnot(None)))
+        ).order_by(Payment.payment_date, Payment.id).all()
+        
+        payouts = db.query(Payout).filter(
+            Payout.status == PayoutStatus.PAID,
+            ~Payout.id.in_(db.query(LedgerEntry.payout_id).filter(LedgerEntry.payout_id.isnot(None)))
+        ).order_by(Payout.payout_date, Payout.id).all()
+        
+        for payment in payments:
+            LedgerService.record_contribution(db, payment, created_at=payment.payment_date or payment.created_at)
+        for payout in payouts:
+            LedgerService.record_payout(db, payout, created_at=payout.payout_date or payout.created_at)
+        
+        db.commit()
+        
+        return {"contributions": len(payments), "payouts": len(payouts)}
+
+
+# Singleton instance
+ledger_service = LedgerService()
@@ -0,0 +1,195 @@
+"""
+MoMo Collection Service
+
+Settles asynchronous MTN request-to-pay collections. Payments wait in
+PENDING with their provider reference until MTN calls back or the status
+poller finds a final status; API requests never wait for the member to
+approve the debit on their handset.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+from fastapi import HTTPException, status
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..models import Payment, PaymentStatus
+from ..integrations.mtn_momo_integration import mtn_momo_service
+from ..utils import retry_on_conflict
+from ..config import settings
+from .payment_service import PaymentService, SUCCESS_STATUSES, FAILURE_STATUSES, PENDING_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class MoMoCollectionService:
+    """Service for settling pending MoMo collections."""
+    
+    @staticmethod
+    def apply_status(
+        db: Session,
+        payment: Payment,
+        result: Dict[str, Any],
+        now: Optional[datetime] = None
+    ) -> str:
+        """
+        Apply a provider status to a pending payment.
+        
+        Payments that are no longer PENDING are left alone, so duplicate
+        callbacks and polls are harmless. Requests MTN still reports as
+        pending (or does not know) after MOMO_COLLECTION_TIMEOUT_MINUTES are
+        failed; a failed status check never fails a payment. Nothing is
+        committed; the caller commits once for the callback or poll batch.
+        
+        Args:
+            db: Database session
+            payment: Pending payment
+            result: Output of mtn_momo_service.get_transaction_status
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Resulting payment status value ("pending", "success" or "failed")
+        """
+        if payment.status != PaymentStatus.PENDING:
+            return payment.status.value
+        
+        now = now or datetime.utcnow()
+        provider_status = (result.get("status") or "").lower()
+        
+        if provider_status in SUCCESS_STATUSES:
+            transaction_id = result.get("financial_transaction_id") or payment.provider_reference
+            PaymentService.settle_success(db, payment, transaction_id, commit=False)
+            return PaymentStatus.SUCCESS.value
+        
+        if provider_status in FAILURE_STATUSES:
+            PaymentService.settle_failure(db, payment, result.get("reason") or provider_status, commit=False)
+            return PaymentStatus.FAILED.value
+        
+        timeout = timedelta(minutes=settings.MOMO_COLLECTION_TIMEOUT_MINUTES)
+        if provider_status in PENDING_STATUSES and payment.requested_at and now - payment.requested_at > timeout:
+            PaymentService.settle_failure(db, payment, "Payment approval timed out", commit=False)
+            return PaymentStatus.FAILED.value
+        
+        # Still waiting for approval, or the status check failed and the
+        # next poll tries again
+        payment.status_checked_at = now
+        return PaymentStatus.PENDING.value
+    
+    @staticmethod
+    def handle_callback(db: Session, reference_id: str) -> Payment:
+        """
+        Handle an MTN request-to-pay callback.
+        
+        MTN callbacks are not signed, so the callback body is not trusted:
+        the status is re-read from the MoMo API before the payment is settled.
+        
+        Args:
+            db: Database session
+            reference_id: X-Reference-Id of the request
+        
+        Returns:
+            Updated payment
+        
+        Raises:
+            HTTPException: If no payment has this reference
+        """
+        payment = db.query(Payment).filter(Payment.provider_reference == reference_id).first()
+        
+        if not payment:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Payment not found"
+            )
+        
+        def settle() -> Payment:
+            if payment.status == PaymentStatus.PENDING:
+                result = mtn_momo_service.get_transaction_status(reference_id)
+                MoMoCollectionService.apply_status(db, payment, result)
+                db.commit()
+            return payment
+        
+        return retry_on_conflict(db, settle)
+    
+    @staticmethod
+    def get_stale_pending(db: Session, now: Optional[datetime] = None) -> List[Payment]:
+        """
+        Get pending collections due for a status check, oldest first.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Up to MOMO_STATUS_POLL_BATCH_SIZE pending payments not checked in
+            the last MOMO_STATUS_POLL_INTERVAL_MINUTES
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(minutes=settings.MOMO_STATUS_POLL_INTERVAL_MINUTES)
+        
+        return db.query(Payment).filter(
+            Payment.status == PaymentStatus.PENDING,
+            Payment.provider_reference.isnot(None),
+            Payment.requested_at <= cutoff,
+            or_(Payment.status_checked_at.is_(None), Payment.status_checked_at <= cutoff)
+        ).order_by(Payment.requested_at).limit(settings.MOMO_STATUS_POLL_BATCH_SIZE).all()
+    
+    @staticmethod
+    def poll_pending(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Check the status of stale pending collections in one batch.
+        
+        Status requests for the batch run concurrently (up to
+        MOMO_STATUS_POLL_CONCURRENCY at a time); results are then applied
+        in the caller's session, each in its own savepoint. A payment that
+        changed meanwhile (e.g. settled by its callback) is rolled back to
+        its savepoint and skipped, and the rest of the batch is committed.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Dict with checked, success, failed and pending counts
+        """
+        now = now or datetime.utcnow()
+        payments = MoMoCollectionService.get_stale_pending(db, now)
+        
+        stats = {"checked": len(payments), "success": 0, "failed": 0, "pending": 0}
+        if not payments:
+            return stats
+        
+        def fetch_status(reference_id: str) -> Dict[str, Any]:
+            try:
+                return mtn_momo_service.get_transaction_status(reference_id)
+            except Exception as e:
+                logger.error(f"Status check failed for {reference_id}: {e}")
+                return {"status": "error", "message": str(e)}
+        
+        workers = max(1, min(settings.MOMO_STATUS_POLL_CONCURRENCY, len(payments)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(fetch_status, [p.provider_reference for p in payments]))
+        
+        for payment, result in zip(payments, results):
+            try:
+                with db.begin_nested():
+                    outcome = MoMoCollectionService.apply_status(db, payment, result, now)
+            except StaleDataError:
+                # Picked up again by the next poll if still pending
+                logger.info(f"Payment {payment.id} changed while polling; skipped")
+                continue
+            stats[outcome] += 1
+        
+        db.commit()
+        
+        logger.info(
+            f"Polled {stats['checked']} pending collections: {stats['success']} succeeded, "
+            f"{stats['failed']} failed, {stats['pending']} still pending"
+        )
+        return stats
+
+
+# Singleton instance
+momo_collection_service = MoMoCollectionService()
@@ -1,8 +1,9 @@
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
-from ..models import Notification, Membership, Payment, PaymentStatus
+from ..models import Notification, Membership
+from .round_stats_service import RoundStatsService
 
 
 class NotificationService:
@@ -13,16 +14,22 @@ class NotificationService:
         db: Session, 
         group_id: int, 
         payer_user_id: int, 
-        round_number: int
+        round_number: int,
+        paid_members: Optional[int] = None,
+        total_members: Optional[int] = None
     ) -> int:
         """
         Create payment notifications for all group members except the payer.
         
+        Called by the outbox dispatcher, which commits the batch.
+        
         Args:
             db: Database session
             group_id: Group ID
             payer_user_id: User ID of the person who made the payment
             round_number: Round number for the payment
+            paid_members: Paid count when the payment was made (defaults to the current count)
+            total_members: Member count when the payment was made (defaults to the current count)
             
         Returns:
             Number of notifications created
@@ -34,17 +41,11 @@ class NotificationService:
             Membership.user_id != payer_user_id
         ).all()
         
-        # Count total members and paid members for the message
-        total_members = db.query(Membership).filter(
-            Membership.group_id == group_id,
-            Membership.is_active == True
-        ).count()
-        
-        paid_members = db.query(Payment).filter(
-            Payment.group_id == group_id,
-            Payment.round_number == round_number,
-            Payment.status == PaymentStatus.SUCCESS
-        ).count()
+        # Total members and paid members for the message
+        if paid_members is None or total_members is None:
+            stats = RoundStatsService.get_stats(db, group_id, round_number)
+            total_members = stats.active_member_count
+            paid_members = stats.paid_count
         
         # Create notification for each member
         notifications_created = 0
@@ -61,7 +62,6 @@ class NotificationService:
             db.add(notification)
             notifications_created += 1
         
-        db.commit()
         return notifications_created
     
     @staticmethod
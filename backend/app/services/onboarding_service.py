@@ -0,0 +1,73 @@
+"""
+Onboarding Service Module
+
+Post-signup enrichment that needs MTN or extra writes: the KYC check and
+the payment preference chosen at registration. Signup only commits the
+user (with kyc_status PENDING) and queues complete_signup as a request
+background task, so registration does not wait on MTN. Progress is
+visible through kyc_status on /kyc/status.
+"""
+
+import logging
+from typing import Optional
+
+from ..database import SessionLocal
+from ..models import PaymentMethod
+from .kyc_service import kyc_service
+from .dual_payment_service import dual_payment_service
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_METHODS = {
+    'auto': PaymentMethod.AUTO,
+    'manual': PaymentMethod.MANUAL,
+    'ussd': PaymentMethod.USSD
+}
+
+
+class OnboardingService:
+    """
+    Service for finishing a new user's setup after signup.
+    """
+    
+    @staticmethod
+    def complete_signup(user_id: int, phone_number: str, payment_method: Optional[str] = None) -> None:
+        """
+        Verify a new user with MTN KYC and set their payment preference.
+        
+        Runs after the signup request in a session of its own. Failures are
+        logged and never raised: the user exists either way and KYC can be
+        retried via /kyc/verify.
+        
+        Args:
+            user_id: New user's ID
+            phone_number: User's phone number (unencrypted)
+            payment_method: Payment method chosen at registration ("auto", "manual", "ussd"), if any
+        """
+        db = SessionLocal()
+        try:
+            try:
+                kyc_result = kyc_service.verify_user(db, user_id, phone_number)
+                logger.info(f"KYC verification for user {user_id}: {kyc_result.get('message')}")
+            except Exception as e:
+                logger.error(f"KYC verification failed for user {user_id}: {e}")
+                db.rollback()
+            
+            if payment_method:
+                try:
+                    dual_payment_service.set_payment_preference(
+                        db=db,
+                        user_id=user_id,
+                        payment_method=PAYMENT_METHODS.get(payment_method, PaymentMethod.MANUAL),
+                        auto_pay_day=None,  # Collection planner assigns a load-balanced day
+                        send_reminders=True
+                    )
+                except Exception as e:
+                    logger.error(f"Could not set payment preference for user {user_id}: {e}")
+                    db.rollback()
+        finally:
+            db.close()
+
+
+# Singleton instance
+onboarding_service = OnboardingService()
@@ -0,0 +1,449 @@
+"""
+Outbox Service
+
+Transactional outbox for side effects of state changes. Services enqueue
+SMS and in-app notification messages in the same transaction as the change
+that causes them, so a committed change always has its messages recorded
+and a rolled back one never does. A background dispatcher claims due
+messages in batches, leases them and commits before sending, sends
+identical SMS texts together, retries failures with exponential backoff
+and marks messages failed after OUTBOX_MAX_ATTEMPTS.
+
+Messages carry a priority (OTP first, bulk reminders last) and an optional
+deadline. Dispatchers claim the most urgent due messages first, an
+interactive lane dispatches only OTP and transactional messages so they are
+not stuck behind a bulk run, bulk SMS leave provider rate-limit headroom for
+them, and messages past their deadline (stale OTPs) are dropped unsent.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models import OutboxMessage, OutboxStatus, OutboxPriority
+from ..utils import decrypt_field
+from ..integrations.sms_sender import send_sms_messages
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Dedupe keys looked up per query by enqueue_many
+DEDUPE_LOOKUP_CHUNK_SIZE = 1000
+
+
+def _create_payment_notifications(db: Session, payload: Dict[str, Any]) -> None:
+    """Fan a payment out to in-app notifications for the other group members."""
+    from .notification_service import NotificationService
+    NotificationService.create_payment_notification(db=db, **payload)
+
+
+# Handlers for non-SMS message kinds; they must not commit
+HANDLERS: Dict[str, Callable[[Session, Dict[str, Any]], None]] = {
+    "payment_notification": _create_payment_notifications,
+}
+
+
+class OutboxService:
+    """Service for the transactional outbox."""
+    
+    @staticmethod
+    def enqueue(
+        db: Session,
+        kind: str,
+        payload: Dict[str, Any],
+        dedupe_key: Optional[str] = None,
+        priority: OutboxPriority = OutboxPriority.NOTIFICATION,
+        expires_at: Optional[datetime] = None
+    ) -> Optional[OutboxMessage]:
+        """
+        Record a message in the current transaction without committing.
+        
+        Args:
+            db: Database session
+            kind: Message kind ("sms" or a key of HANDLERS)
+            payload: JSON-serializable message payload
+            dedupe_key: Messages with a key already in the outbox are skipped
+            priority: Dispatch priority
+            expires_at: Drop the message instead of sending it after this
+        
+        Returns:
+            Pending message, or None if it was a duplicate
+        """
+        message = OutboxMessage(
+            kind=kind,
+            payload=payload,
+            dedupe_key=dedupe_key,
+            status=OutboxStatus.PENDING,
+            priority=int(priority),
+            attempts=0,
+            next_attempt_at=datetime.utcnow(),
+            expires_at=expires_at
+        )
+        
+        if dedupe_key is None:
+            db.add(message)
+            return message
+        
+        if db.query(OutboxMessage.id).filter(OutboxMessage.dedupe_key == dedupe_key).first():
+            return None
+        
+        # Flush pending changes first so only the outbox insert can fail below
+        db.flush()
+        try:
+            with db.begin_nested():
+                db.add(message)
+        except IntegrityError:
+            # Enqueued concurrently
+            return None
+        
+        return message
+    
+    @staticmethod
+    def enqueue_many(db: Session, messages: List[Dict[str, Any]]) -> int:
+        """
+        Record many messages in the current transaction without committing.
+        
+        Dedupe keys already in the outbox are looked up together and the
+        new messages are inserted in one statement, instead of a query and
+        savepoint per message. If the insert hits a key enqueued
+        concurrently, the batch falls back to enqueue one message at a time.
+        
+        Args:
+            db: Database session
+            messages: enqueue keyword arguments (kind, payload, and optionally
+                dedupe_key, priority and expires_at) for each message
+        
+        Returns:
+            Number of messages queued; the others were duplicates
+        """
+        keys = [message["dedupe_key"] for message in messages if message.get("dedupe_key") is not None]
+        existing = set()
+        for start in range(0, len(keys), DEDUPE_LOOKUP_CHUNK_SIZE):
+            chunk = keys[start:start + DEDUPE_LOOKUP_CHUNK_SIZE]
+            existing.update(
+                key for key, in db.query(OutboxMessage.dedupe_key).filter(OutboxMessage.dedupe_key.in_(chunk))
+            )
+        
+        now = datetime.utcnow()
+        rows = []
+        for message in messages:
+            dedupe_key = message.get("dedupe_key")
+            if dedupe_key is not None:
+                if dedupe_key in existing:
+                    continue
+                existing.add(dedupe_key)
+            
+            rows.append({
+                "kind": message["kind"],
+                "payload": message["payload"],
+                "dedupe_key": dedupe_key,
+                "status": OutboxStatus.PENDING,
+                "priority": int(message.get("priority", OutboxPriority.NOTIFICATION)),
+                "attempts": 0,
+                "next_attempt_at": now,
+                "expires_at": message.get("expires_at")
+            })
+        
+        if not rows:
+            return 0
+        
+        # Flush pending changes first so only the outbox insert can fail below
+        db.flush()
+        try:
+            with db.begin_nested():
+                db.execute(insert(OutboxMessage), rows)
+        except IntegrityError:
+            # Some were enqueued concurrently
+            return sum(1 for message in messages if OutboxService.enqueue(db, **message) is not None)
+        
+        return len(rows)
+    
+    @staticmethod
+    def enqueue_sms(
+        db: Session,
+        phone_number: str,
+        message: str,
+        dedupe_key: Optional[str] = None,
+        priority: OutboxPriority = OutboxPriority.NOTIFICATION,
+        expires_at: Optional[datetime] = None
+    ) -> Optional[OutboxMessage]:
+        """
+        Record an SMS in the current transaction without committing.
+        
+        Args:
+            db: Database session
+            phone_number: Encrypted recipient phone number (as stored on User)
+            message: SMS text
+            dedupe_key: Messages with a key already in the outbox are skipped
+            priority: Dispatch priority
+            expires_at: Drop the SMS instead of sending it after this
+        
+        Returns:
+            Pending message, or None if it was a duplicate
+        """
+        return OutboxService.enqueue(
+            db,
+            "sms",
+            {"phone_number": phone_number, "message": message},
+            dedupe_key=dedupe_key,
+            priority=priority,
+            expires_at=expires_at
+        )
+    
+    @staticmethod
+    def claim_due(
+        db: Session,
+        now: Optional[datetime] = None,
+        max_priority: Optional[OutboxPriority] = None
+    ) -> List[OutboxMessage]:
+        """
+        Lease up to OUTBOX_BATCH_SIZE pending messages that are due, most urgent first.
+        
+        Rows locked by another dispatcher are skipped. Claimed messages are
+        pushed OUTBOX_LEASE_SECONDS into the future, so once the claim is
+        committed other dispatchers leave them alone while they are sent;
+        a dispatcher that dies mid-send lets the lease run out and the
+        messages are retried. Changes are not committed.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+            max_priority: Only claim messages of this priority or more urgent
+        
+        Returns:
+            Claimed messages, by priority and then oldest first
+        """
+        now = now or datetime.utcnow()
+        
+        query = db.query(OutboxMessage).filter(
+            OutboxMessage.status == OutboxStatus.PENDING,
+            OutboxMessage.next_attempt_at <= now
+        )
+        if max_priority is not None:
+            query = query.filter(OutboxMessage.priority <= int(max_priority))
+        
+        messages = query.order_by(OutboxMessage.priority, OutboxMessage.id).limit(
+            settings.OUTBOX_BATCH_SIZE
+        ).with_for_update(skip_locked=True).all()
+        
+        lease_until = now + timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        for message in messages:
+            message.next_attempt_at = lease_until
+        
+        return messages
+    
+    @staticmethod
+    def _mark(message: OutboxMessage, error: Optional[str], now: datetime, stats: Dict[str, int]) -> None:
+        """Record the outcome of one delivery attempt."""
+        message.attempts = (message.attempts or 0) + 1
+        
+        if error is None:
+            message.status = OutboxStatus.SENT
+            message.sent_at = now
+            message.last_error = None
+            stats["sent"] += 1
+        elif message.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxStatus.FAILED
+            message.last_error = error
+            stats["failed"] += 1
+        else:
+            delay = settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (message.attempts - 1)
+            message.next_attempt_at = now + timedelta(seconds=delay)
+            message.last_error = error
+            stats["retried"] += 1
+    
+    @staticmethod
+    def _send_sms_batch(
+        messages: List[Tuple[int, Dict[str, Any]]],
+        stats: Dict[str, int],
+        headroom: float = 0.0
+    ) -> Dict[int, Optional[str]]:
+        """
+        Send SMS messages through the bulk sender; duplicates are sent once.
+        
+        Only real providers count as delivery: when providers are configured
+        and none accepts a message, it is reported as failed instead of
+        being logged by the mock sender.
+        
+        Args:
+            messages: (message ID, payload) pairs
+            stats: Dispatch counters; duplicates are counted here
+            headroom: Provider rate-limit tokens to leave for other senders
+        
+        Returns:
+            Error per message ID (None if sent)
+        """
+        # (text, encrypted phone) -> message IDs
+        recipients: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for message_id, payload in messages:
+            recipients[(payload["message"], payload["phone_number"])].append(message_id)
+        
+        outcomes: Dict[Tuple[str, str], Optional[str]] = {}
+        deliverable = []
+        for key in recipients:
+            text, phone = key
+            try:
+                deliverable.append((key, decrypt_field(phone), text))
+            except Exception as e:
+                outcomes[key] = str(e)
+        
+        try:
+            sent = send_sms_messages(
+                [(number, text) for _, number, text in deliverable],
+                mock_fallback=False,
+                headroom=headroom
+            )
+            for (key, _, _), ok in zip(deliverable, sent):
+                outcomes[key] = None if ok else "SMS was not accepted by any provider"
+        except Exception as e:
+            for key, _, _ in deliverable:
+                outcomes[key] = str(e)
+        
+        errors: Dict[int, Optional[str]] = {}
+        for key, duplicates in recipients.items():
+            stats["deduplicated"] += len(duplicates) - 1
+            for message_id in duplicates:
+                errors[message_id] = outcomes[key]
+        
+        return errors
+    
+    @staticmethod
+    def dispatch(
+        db: Session,
+        now: Optional[datetime] = None,
+        max_priority: Optional[OutboxPriority] = None
+    ) -> Dict[str, int]:
+        """
+        Deliver one batch of due messages.
+        
+        The claim is committed before any SMS is sent, so no row locks or
+        open transaction are held across provider requests. Messages past
+        their deadline are expired without being sent. Interactive SMS are
+        sent first; bulk SMS then leave SMS_INTERACTIVE_HEADROOM provider
+        tokens for interactive senders. Outcomes are recorded and committed
+        once for the batch. Handler messages run in their own savepoint so
+        one failure does not undo the others.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+            max_priority: Only dispatch messages of this priority or more
+                urgent (the interactive lane)
+        
+        Returns:
+            Dict with claimed, sent, retried, failed, expired and deduplicated counts
+        """
+        now = now or datetime.utcnow()
+        claimed = [
+            (m.id, m.kind, m.payload, m.priority, m.expires_at)
+            for m in OutboxService.claim_due(db, now, max_priority)
+        ]
+        db.commit()
+        
+        stats = {"claimed": len(claimed), "sent": 0, "retried": 0, "failed": 0, "expired": 0, "deduplicated": 0}
+        if not claimed:
+            return stats
+        
+        expired = {message_id for message_id, _, _, _, expires_at in claimed if expires_at and expires_at <= now}
+        sms = [
+            (message_id, payload, priority)
+            for message_id, kind, payload, priority, _ in claimed
+            if kind == "sms" and message_id not in expired
+        ]
+        
+        sms_errors = OutboxService._send_sms_batch(
+            [(message_id, payload) for message_id, payload, priority in sms if priority < OutboxPriority.BULK],
+            stats
+        )
+        sms_errors.update(OutboxService._send_sms_batch(
+            [(message_id, payload) for message_id, payload, priority in sms if priority >= OutboxPriority.BULK],
+            stats,
+            headroom=settings.SMS_INTERACTIVE_HEADROOM
+        ))
+        
+        # Messages another dispatcher settled after our lease ran out are left alone
+        messages = db.query(OutboxMessage).filter(
+            OutboxMessage.id.in_([message_id for message_id, _, _, _, _ in claimed]),
+            OutboxMessage.status == OutboxStatus.PENDING
+        ).order_by(OutboxMessage.id).all()
+        
+        for message in messages:
+            if message.id in expired:
+                message.status = OutboxStatus.EXPIRED
+                message.last_error = "Deadline passed before delivery"
+                stats["expired"] += 1
+            elif message.kind == "sms":
+                OutboxService._mark(message, sms_errors[message.id], now, stats)
+            elif message.kind not in HANDLERS:
+                OutboxService._mark(message, f"Unknown outbox message kind: {message.kind}", now, stats)
+            else:
+                try:
+                    with db.begin_nested():
+                        HANDLERS[message.kind](db, message.payload)
+                    error = None
+                except Exception as e:
+                    error = str(e)
+                OutboxService._mark(message, error, now, stats)
+            
+            if message.priority == OutboxPriority.OTP and message.status != OutboxStatus.PENDING:
+                # OTP codes are only stored hashed; drop the text once it is settled
+                message.payload = {**message.payload, "message": None}
+        
+        db.commit()
+        
+        if stats["retried"] or stats["failed"] or stats["expired"]:
+            logger.warning(
+                f"Outbox: {stats['sent']} sent, {stats['retried']} to retry, "
+                f"{stats['failed']} failed, {stats['expired']} expired"
+            )
+        return stats
+    
+    @staticmethod
+    def dispatch_interactive() -> Dict[str, int]:
+        """
+        Dispatch due OTP and transactional messages in a session of its own.
+        
+        Used by the interactive lane job and as a request background task,
+        so an OTP is sent right after the request that queued it commits.
+        
+        Returns:
+            Dispatch counts
+        """
+        db = SessionLocal()
+        try:
+            return OutboxService.dispatch(db, max_priority=OutboxPriority.TRANSACTIONAL)
+        finally:
+            db.close()
+    
+    @staticmethod
+    def purge_sent(db: Session, now: Optional[datetime] = None) -> int:
+        """
+        Delete sent messages older than OUTBOX_RETENTION_DAYS.
+        
+        Args:
+            db: Database session
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Number of messages deleted
+        """
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+        
+        deleted = db.query(OutboxMessage).filter(
+            OutboxMessage.status == OutboxStatus.SENT,
+            OutboxMessage.sent_at < cutoff
+        ).delete(synchronize_session=False)
+        
+        db.commit()
+        
+        return deleted
+
+
+# Singleton instance
+outbox_service = OutboxService()
@@ -1,18 +1,37 @@
+import uuid
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from fastapi import HTTPException, status
 from datetime import datetime
 
-from ..models import Payment, User, Group, Membership, PaymentStatus, PaymentType
-from ..utils import decrypt_field
+from ..models import Payment, User, Group, Membership, PaymentStatus, PaymentType, GroupStatus, OutboxPriority
+from ..utils import decrypt_field, retry_on_conflict
 from ..integrations.momo_mock import momo_api, InsufficientFundsError
+from ..integrations.mtn_momo_integration import mtn_momo_service
 from ..integrations.sms_mock import SMSGateway
+from ..config import settings
 from .audit_service import AuditService
+from .round_stats_service import RoundStatsService
+from .ledger_service import LedgerService
+from .outbox_service import OutboxService
+from .idempotency_service import IdempotencyService
+
+# MTN request-to-pay statuses that end a collection
+SUCCESS_STATUSES = {"successful"}
+FAILURE_STATUSES = {"failed", "rejected", "timeout", "expired"}
+# Definitive answers for a request that has not ended ("not_found": it never
+# reached MTN); other results, like "error", say nothing about the request
+PENDING_STATUSES = {"pending", "not_found"}
 
 
 class PaymentService:
     """Service for managing payments."""
     
+    @staticmethod
+    def uses_async_collections() -> bool:
+        """Whether debits go through MTN's asynchronous request-to-pay flow."""
+        return settings.ENABLE_REAL_MOMO and mtn_momo_service.enabled
+    
     @staticmethod
     def process_payment(
         db: Session,
@@ -23,6 +42,10 @@ class PaymentService:
         """
         Process a payment from a user to a group.
         
+        With real MoMo the payment is returned PENDING as soon as the payment
+        request is sent; it is settled later by the MTN callback or the
+        status poller. The mock settles immediately.
+        
         Args:
             db: Database session
             user_id: User making the payment
@@ -62,6 +85,12 @@ class PaymentService:
         if round_number is None:
             round_number = group.current_round
         
+        if group.status != GroupStatus.ACTIVE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Group is {group.status.value} and not collecting payments"
+            )
+        
         # Check if group is cash-only
         if group.cash_only:
             raise HTTPException(
@@ -69,20 +98,25 @@ class PaymentService:
                 detail="This is a cash-only group. Please pay cash to your group admin, who will mark your payment as received."
             )
         
-        # Check if already paid for this round
-        existing_payment = db.query(Payment).filter(
+        # Check if already paid for this round; a payment request awaiting
+        # the member's approval is not sent twice
+        existing_payments = db.query(Payment).filter(
             Payment.user_id == user_id,
             Payment.group_id == group_id,
             Payment.round_number == round_number,
-            Payment.status == PaymentStatus.SUCCESS
-        ).first()
+            Payment.status.in_([PaymentStatus.SUCCESS, PaymentStatus.PENDING])
+        ).all()
         
-        if existing_payment:
+        if any(p.status == PaymentStatus.SUCCESS for p in existing_payments):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Payment already made for this round"
             )
         
+        for existing_payment in existing_payments:
+            if existing_payment.provider_reference is not None:
+                return existing_payment
+        
         # Create pending payment record
         payment = Payment(
             user_id=user_id,
@@ -96,107 +130,261 @@ class PaymentService:
         db.add(payment)
         db.flush()
         
-        # Attempt MoMo debit
-        phone = decrypt_field(user.phone_number)
         reference = f"Group:{group.name}|Round:{round_number}|Payment:{payment.id}"
         
+        return PaymentService.request_collection(db, payment, user, group, reference)
+    
+    @staticmethod
+    def request_collection(
+        db: Session,
+        payment: Payment,
+        user: User,
+        group: Group,
+        reference: str
+    ) -> Payment:
+        """
+        Request the MoMo debit for a payment.
+        
+        With real MoMo, the provider reference is stored and committed before
+        the request is sent, so a crash cannot lose track of a debit the
+        member may still approve. The payment stays PENDING until the
+        callback or poller settles it, including when the request timed out
+        or failed in transit, since MTN may still have accepted it. Only a
+        definitive rejection fails the payment. With the mock, the debit
+        settles immediately and the payment is committed once, together with
+        its ledger entries, messages and audit log.
+        
+        Args:
+            db: Database session
+            payment: Payment to collect
+            user: Paying member
+            group: Group receiving the payment
+            reference: External reference shown to the provider
+            
+        Returns:
+            Updated payment
+            
+        Raises:
+            HTTPException: If the debit is rejected outright
+        """
+        phone = decrypt_field(user.phone_number)
+        
+        if PaymentService.uses_async_collections():
+            payment.status = PaymentStatus.PENDING
+            payment.provider_reference = str(uuid.uuid4())
+            payment.requested_at = datetime.utcnow()
+            payment.status_checked_at = None
+            db.commit()
+            
+            callback_url = None
+            if settings.MTN_MOMO_CALLBACK_URL:
+                callback_url = f"{settings.MTN_MOMO_CALLBACK_URL.rstrip('/')}/{payment.provider_reference}"
+            
+            IdempotencyService.record_provider_call(f"MoMo request to pay for payment {payment.id}")
+            try:
+                result = mtn_momo_service.request_to_pay(
+                    phone_number=phone,
+                    amount=payment.amount,
+                    reference=reference,
+                    payer_message=f"Payment for {group.name}",
+                    reference_id=payment.provider_reference,
+                    callback_url=callback_url
+                )
+            except Exception as e:
+                # Raised before the request was sent (e.g. authentication)
+                result = {"status": "rejected", "message": str(e)}
+            
+            # "error": the outcome is unknown; the poller finds out from MTN
+            if result.get("status") in ("pending", "error"):
+                return payment
+            
+            reason = result.get("message", "Payment request failed")
+            PaymentService.settle_failure(db, payment, reason)
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail=f"Payment failed: {reason}"
+            )
+        
+        IdempotencyService.record_provider_call(f"MoMo debit for payment {payment.id}")
         try:
             transaction_id = momo_api.debit_wallet(
                 phone_number=phone,
-                amount=group.contribution_amount,
+                amount=payment.amount,
                 reference=reference
             )
+        except InsufficientFundsError as e:
+            PaymentService.settle_failure(db, payment, str(e))
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail=f"Payment failed: {str(e)}"
+            )
+        
+        return PaymentService.settle_success(db, payment, transaction_id)
+    
+    @staticmethod
+    def settle_success(db: Session, payment: Payment, transaction_id: str, commit: bool = True) -> Payment:
+        """
+        Mark a payment as successful and notify the member and group.
+        
+        The confirmation SMS and group notifications go through the outbox
+        and are committed with the payment and its audit log.
+        
+        A concurrent change to the payment is retried (see
+        retry_on_conflict); a payment settled meanwhile is left as it is.
+        
+        Args:
+            db: Database session
+            payment: Payment that was debited
+            transaction_id: Provider transaction ID
+            commit: If False, the caller commits (e.g. once for a batch)
+            
+        Returns:
+            Updated payment
+        """
+        def settle() -> Payment:
+            if payment.status == PaymentStatus.SUCCESS:
+                return payment  # Settled concurrently
+            
+            old_status = payment.status.value
+            retried = payment.retry_count > 0
             
-            # Update payment as successful
             payment.transaction_id = transaction_id
             payment.status = PaymentStatus.SUCCESS
             payment.payment_date = datetime.utcnow()
+            RoundStatsService.record_payment(db, payment)
+            LedgerService.record_contribution(db, payment)
             
-            db.commit()
-            db.refresh(payment)
+            user = db.get(User, payment.user_id)
+            group = db.get(Group, payment.group_id)
+            stats = RoundStatsService.get_stats(db, payment.group_id, payment.round_number)
             
-            # Send confirmation SMS
-            SMSGateway.payment_confirmation(
-                phone_number=phone,
-                amount=group.contribution_amount,
-                group_name=group.name,
-                transaction_id=transaction_id
+            # Confirmation SMS
+            OutboxService.enqueue_sms(
+                db,
+                user.phone_number,
+                SMSGateway.payment_confirmation_message(payment.amount, group.name, transaction_id),
+                dedupe_key=f"payment:{payment.id}:success:sms",
+                priority=OutboxPriority.TRANSACTIONAL
             )
             
-            # Create payment notifications for other group members
-            from .notification_service import NotificationService
-            NotificationService.create_payment_notification(
-                db=db,
-                group_id=group_id,
-                payer_user_id=user_id,
-                round_number=round_number
+            # Payment notifications for other group members
+            OutboxService.enqueue(
+                db,
+                "payment_notification",
+                {
+                    "group_id": payment.group_id,
+                    "payer_user_id": payment.user_id,
+                    "round_number": payment.round_number,
+                    "paid_members": stats.paid_count,
+                    "total_members": stats.active_member_count
+                },
+                dedupe_key=f"payment:{payment.id}:success:notification"
             )
             
             # Audit log
-            AuditService.log(
+            AuditService.add(
                 db=db,
                 entity_type="payment",
                 entity_id=payment.id,
-                action="success",
+                action="retry_success" if retried else "success",
+                old_value={"status": old_status, "retry_count": payment.retry_count},
                 new_value={
-                    "user_id": user_id,
-                    "group_id": group_id,
-                    "round": round_number,
-                    "amount": group.contribution_amount,
+                    "status": "success",
+                    "user_id": payment.user_id,
+                    "group_id": payment.group_id,
+                    "round": payment.round_number,
+                    "amount": payment.amount,
                     "transaction_id": transaction_id
                 },
-                performed_by=user_id
+                performed_by=payment.user_id
             )
             
+            if commit:
+                db.commit()
+            
             return payment
+        
+        if not commit:
+            return settle()
+        return retry_on_conflict(db, settle)
+    
+    @staticmethod
+    def settle_failure(db: Session, payment: Payment, reason: str, commit: bool = True) -> Payment:
+        """
+        Mark a payment attempt as failed and notify the member.
+        
+        A concurrent change to the payment is retried (see
+        retry_on_conflict); a payment settled meanwhile is left as it is.
+        
+        Args:
+            db: Database session
+            payment: Payment whose debit failed
+            reason: Failure reason
+            commit: If False, the caller commits (e.g. once for a batch)
+            
+        Returns:
+            Updated payment
+        """
+        def settle() -> Payment:
+            if payment.status == PaymentStatus.SUCCESS:
+                return payment  # Settled concurrently
+            
+            retried = payment.retry_count > 0
             
-        except InsufficientFundsError as e:
-            # Update payment as failed
             payment.status = PaymentStatus.FAILED
-            payment.retry_count = 1
+            payment.retry_count = (payment.retry_count or 0) + 1
             
-            db.commit()
-            db.refresh(payment)
+            user = db.get(User, payment.user_id)
+            group = db.get(Group, payment.group_id)
             
-            # Send failure SMS
-            SMSGateway.payment_failure(
-                phone_number=phone,
-                amount=group.contribution_amount,
-                group_name=group.name,
-                retry_count=1
+            # Failure SMS
+            OutboxService.enqueue_sms(
+                db,
+                user.phone_number,
+                SMSGateway.payment_failure_message(payment.amount, group.name, payment.retry_count),
+                dedupe_key=f"payment:{payment.id}:failed:{payment.retry_count}:sms",
+                priority=OutboxPriority.TRANSACTIONAL
             )
             
             # Audit log
-            AuditService.log(
+            AuditService.add(
                 db=db,
                 entity_type="payment",
                 entity_id=payment.id,
-                action="failed",
+                action="retry_failed" if retried else "failed",
                 new_value={
-                    "user_id": user_id,
-                    "group_id": group_id,
-                    "reason": str(e),
-                    "retry_count": 1
+                    "user_id": payment.user_id,
+                    "group_id": payment.group_id,
+                    "reason": reason,
+                    "retry_count": payment.retry_count
                 },
-                performed_by=user_id
+                performed_by=payment.user_id
             )
             
-            raise HTTPException(
-                status_code=status.HTTP_402_PAYMENT_REQUIRED,
-                detail=f"Payment failed: {str(e)}"
-            )
+            if commit:
+                db.commit()
+            
+            return payment
+        
+        if not commit:
+            return settle()
+        return retry_on_conflict(db, settle)
     
     @staticmethod
     def retry_failed_payment(db: Session, payment_id: int) -> Payment:
         """
         Retry a failed payment.
         
+        With real MoMo, the previous request is checked first: a late success
+        settles the payment, and a request MTN may still complete blocks the
+        retry, so the member is never asked to pay twice.
+        
         Args:
             db: Database session
             payment_id: Payment ID to retry
             
         Returns:
-            Updated payment record
+            Updated payment record (PENDING while awaiting MTN approval)
         """
         payment = db.query(Payment).filter(Payment.id == payment_id).first()
         
@@ -218,78 +406,28 @@ class PaymentService:
                 detail="Maximum retry attempts reached"
             )
         
+        # A new request gets a new reference, so the previous one must be dead
+        if payment.provider_reference and PaymentService.uses_async_collections():
+            previous = mtn_momo_service.get_transaction_status(payment.provider_reference)
+            previous_status = (previous.get("status") or "").lower()
+            
+            if previous_status in SUCCESS_STATUSES:
+                transaction_id = previous.get("financial_transaction_id") or payment.provider_reference
+                return PaymentService.settle_success(db, payment, transaction_id)
+            
+            if previous_status not in FAILURE_STATUSES and previous_status != "not_found":
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="The previous payment request may still be approved"
+                )
+        
         # Get user and group
-        user = db.query(User).filter(User.id == payment.user_id).first()
-        group = db.query(Group).filter(Group.id == payment.group_id).first()
+        user = db.get(User, payment.user_id)
+        group = db.get(Group, payment.group_id)
         
-        phone = decrypt_field(user.phone_number)
         reference = f"Group:{group.name}|Round:{payment.round_number}|Payment:{payment.id}|Retry:{payment.retry_count + 1}"
         
-        try:
-            transaction_id = momo_api.debit_wallet(
-                phone_number=phone,
-                amount=payment.amount,
-                reference=reference
-            )
-            
-            # Update payment as successful
-            payment.transaction_id = transaction_id
-            payment.status = PaymentStatus.SUCCESS
-            payment.payment_date = datetime.utcnow()
-            
-            db.commit()
-            db.refresh(payment)
-            
-            # Send confirmation SMS
-            SMSGateway.payment_confirmation(
-                phone_number=phone,
-                amount=payment.amount,
-                group_name=group.name,
-                transaction_id=transaction_id
-            )
-            
-            # Audit log
-            AuditService.log(
-                db=db,
-                entity_type="payment",
-                entity_id=payment.id,
-                action="retry_success",
-                old_value={"status": "failed", "retry_count": payment.retry_count},
-                new_value={"status": "success", "transaction_id": transaction_id},
-                performed_by=user.id
-            )
-            
-            return payment
-            
-        except InsufficientFundsError as e:
-            # Increment retry count
-            payment.retry_count += 1
-            
-            db.commit()
-            db.refresh(payment)
-            
-            # Send failure SMS
-            SMSGateway.payment_failure(
-                phone_number=phone,
-                amount=payment.amount,
-                group_name=group.name,
-                retry_count=payment.retry_count
-            )
-            
-            # Audit log
-            AuditService.log(
-                db=db,
-                entity_type="payment",
-                entity_id=payment.id,
-                action="retry_failed",
-                new_value={"retry_count": payment.retry_count, "reason": str(e)},
-                performed_by=user.id
-            )
-            
-            raise HTTPException(
-                status_code=status.HTTP_402_PAYMENT_REQUIRED,
-                detail=f"Payment retry failed: {str(e)}"
-            )
+        return PaymentService.request_collection(db, payment, user, group, reference)
     
     @staticmethod
     def get_user_payment_history(db: Session, user_id: int) -> List[Payment]:
@@ -300,8 +438,11 @@ class PaymentService:
     
     @staticmethod
     def get_failed_payments_for_retry(db: Session) -> List[Payment]:
-        """Get all failed payments that can be retried."""
-        return db.query(Payment).filter(
+        """Get all failed payments that can be retried (active groups only)."""
+        return db.query(Payment).join(
+            Group, Group.id == Payment.group_id
+        ).filter(
+            Group.status == GroupStatus.ACTIVE,
             Payment.status == PaymentStatus.FAILED,
             Payment.retry_count < 3
         ).all()
@@ -356,7 +497,6 @@ class PaymentService:
             )
             db.add(payment)
             db.commit()
-            db.refresh(payment)
         
         return payment
     
@@ -369,6 +509,11 @@ class PaymentService:
         """
         Mark a payment as cash paid by admin.
         
+        Retried if the payment changes concurrently, e.g. a MoMo debit
+        settling it first, which is then reported as already paid. Refused
+        while a MoMo request for the payment is still awaiting approval, so
+        its callback or poll cannot settle the contribution a second time.
+        
         Args:
             db: Database session
             payment_id: Payment ID to mark as paid
@@ -377,70 +522,80 @@ class PaymentService:
         Returns:
             Updated payment record
         """
-        # Get payment
-        payment = db.query(Payment).filter(Payment.id == payment_id).first()
-        if not payment:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Payment not found"
-            )
-        
-        # Check if already paid
-        if payment.status == PaymentStatus.SUCCESS:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Payment already marked as paid"
+        def mark() -> Payment:
+            # Get payment
+            payment = db.get(Payment, payment_id)
+            if not payment:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Payment not found"
+                )
+            
+            # Check if already paid
+            if payment.status == PaymentStatus.SUCCESS:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Payment already marked as paid"
+                )
+            
+            if payment.status == PaymentStatus.PENDING and payment.provider_reference:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A MoMo payment request is in progress for this payment; try again once it settles"
+                )
+            
+            # Get group and check admin status
+            group = db.get(Group, payment.group_id)
+            membership = db.query(Membership).filter(
+                Membership.user_id == admin_user_id,
+                Membership.group_id == payment.group_id,
+                Membership.is_active == True
+            ).first()
+            
+            # Check if user is group creator or admin
+            if not membership or (group.creator_id != admin_user_id and not membership.is_admin):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Only group admins can mark payments as paid"
+                )
+            
+            # Update payment
+            payment.status = PaymentStatus.SUCCESS
+            payment.payment_type = PaymentType.CASH
+            payment.payment_date = datetime.utcnow()
+            payment.transaction_id = f"CASH-{int(datetime.utcnow().timestamp())}-{payment_id}"
+            payment.marked_paid_by = admin_user_id
+            RoundStatsService.record_payment(db, payment)
+            LedgerService.record_contribution(db, payment)
+            
+            # SMS confirmation to member
+            user = db.get(User, payment.user_id)
+            OutboxService.enqueue_sms(
+                db,
+                user.phone_number,
+                SMSGateway.payment_confirmation_message(payment.amount, group.name, payment.transaction_id),
+                dedupe_key=f"payment:{payment.id}:success:sms",
+                priority=OutboxPriority.TRANSACTIONAL
             )
-        
-        # Get group and check admin status
-        group = db.query(Group).filter(Group.id == payment.group_id).first()
-        membership = db.query(Membership).filter(
-            Membership.user_id == admin_user_id,
-            Membership.group_id == payment.group_id,
-            Membership.is_active == True
-        ).first()
-        
-        # Check if user is group creator or admin
-        if not membership or (group.creator_id != admin_user_id and not membership.is_admin):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Only group admins can mark payments as paid"
+            
+            # Audit log
+            AuditService.add(
+                db=db,
+                entity_type="payment",
+                entity_id=payment.id,
+                action="marked_cash_paid",
+                new_value={
+                    "payment_id": payment_id,
+                    "marked_by": admin_user_id,
+                    "amount": payment.amount,
+                    "transaction_id": payment.transaction_id
+                },
+                performed_by=admin_user_id
             )
+            
+            db.commit()
+            
+            return payment
         
-        # Update payment
-        payment.status = PaymentStatus.SUCCESS
-        payment.payment_type = PaymentType.CASH
-        payment.payment_date = datetime.utcnow()
-        payment.transaction_id = f"CASH-{int(datetime.utcnow().timestamp())}-{payment_id}"
-        payment.marked_paid_by = admin_user_id
-        
-        db.commit()
-        db.refresh(payment)
-        
-        # Send SMS confirmation to member
-        user = db.query(User).filter(User.id == payment.user_id).first()
-        phone = decrypt_field(user.phone_number)
-        SMSGateway.payment_confirmation(
-            phone_number=phone,
-            amount=payment.amount,
-            group_name=group.name,
-            transaction_id=payment.transaction_id
-        )
-        
-        # Audit log
-        AuditService.log(
-            db=db,
-            entity_type="payment",
-            entity_id=payment.id,
-            action="marked_cash_paid",
-            new_value={
-                "payment_id": payment_id,
-                "marked_by": admin_user_id,
-                "amount": payment.amount,
-                "transaction_id": payment.transaction_id
-            },
-            performed_by=admin_user_id
-        )
-        
-        return payment
+        return retry_on_conflict(db, mark)
 
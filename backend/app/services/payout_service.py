@@ -1,13 +1,13 @@
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import and_, or_, exists
+from typing import List, Optional, Tuple
 from fastapi import HTTPException, status
 from datetime import datetime
 
-from ..models import Payout, Payment, User, Group, Membership, PaymentStatus, PayoutStatus
-from ..utils import decrypt_field
-from ..integrations.momo_mock import momo_api
-from ..integrations.sms_mock import SMSGateway
+from ..models import Payout, Group, Membership, GroupRoundStats, PayoutStatus, GroupStatus
 from .audit_service import AuditService
+from .disbursement_service import DisbursementService
+from .round_stats_service import RoundStatsService
 
 
 class PayoutService:
@@ -22,24 +22,136 @@ class PayoutService:
             db: Database session
             group_id: Group ID
             round_number: Round number to check
-            
+        
         Returns:
             True if all members have paid, False otherwise
         """
-        # Get total active members
-        total_members = db.query(Membership).filter(
-            Membership.group_id == group_id,
-            Membership.is_active == True
-        ).count()
+        stats = RoundStatsService.get_stats(db, group_id, round_number)
+        
+        return stats.paid_count >= stats.active_member_count
+    
+    @staticmethod
+    def find_complete_rounds(db: Session, since: Optional[datetime] = None) -> List[Tuple[Group, GroupRoundStats]]:
+        """
+        Find all active groups whose current round is fully paid.
+        
+        Reads the current round's group_round_stats row of each group
+        instead of counting payments and members.
         
-        # Get successful payments for this round
-        successful_payments = db.query(Payment).filter(
-            Payment.group_id == group_id,
-            Payment.round_number == round_number,
-            Payment.status == PaymentStatus.SUCCESS
-        ).count()
+        Args:
+            db: Database session
+            since: If given, only consider groups whose round counters
+                changed at or after this time, or that still have an unpaid,
+                unblocked payout for the current round
         
-        return successful_payments >= total_members
+        Returns:
+            List of (group, current round stats) tuples
+        """
+        query = db.query(Group, GroupRoundStats).join(
+            GroupRoundStats,
+            and_(
+                GroupRoundStats.group_id == Group.id,
+                GroupRoundStats.round_number == Group.current_round
+            )
+        ).filter(
+            Group.status == GroupStatus.ACTIVE,
+            GroupRoundStats.paid_count > 0,
+            GroupRoundStats.paid_count >= GroupRoundStats.active_member_count
+        )
+        
+        if since is not None:
+            recently_updated = GroupRoundStats.updated_at >= since
+            open_payout = exists().where(
+                Payout.group_id == Group.id,
+                Payout.round_number == Group.current_round,
+                Payout.status.notin_([PayoutStatus.PAID, PayoutStatus.BLOCKED])
+            )
+            query = query.filter(or_(recently_updated, open_payout))
+        
+        return query.order_by(Group.id).all()
+    
+    @staticmethod
+    def create_payouts_for_rounds(db: Session, complete_rounds: List[Tuple[Group, GroupRoundStats]]) -> List[Payout]:
+        """
+        Create payouts for many completed rounds in one transaction.
+        
+        Existing payouts are returned as-is; groups with no active member at
+        the current rotation position are skipped. Each payout is the round's
+        collected amount, as in create_payout_for_round.
+        
+        Args:
+            db: Database session
+            complete_rounds: (group, round stats) tuples from find_complete_rounds
+        
+        Returns:
+            Payouts for the current round of each group
+        """
+        if not complete_rounds:
+            return []
+        
+        group_ids = [group.id for group, _ in complete_rounds]
+        
+        existing = {
+            payout.group_id: payout
+            for payout in db.query(Payout).join(
+                Group,
+                and_(Group.id == Payout.group_id, Group.current_round == Payout.round_number)
+            ).filter(Payout.group_id.in_(group_ids)).all()
+        }
+        
+        recipients = {
+            membership.group_id: membership.user_id
+            for membership in db.query(Membership).join(
+                Group,
+                and_(Group.id == Membership.group_id, Group.current_round == Membership.rotation_position)
+            ).filter(
+                Membership.group_id.in_(group_ids),
+                Membership.is_active == True
+            ).all()
+        }
+        
+        payouts = []
+        created = []
+        for group, stats in complete_rounds:
+            if group.id in existing:
+                payouts.append(existing[group.id])
+                continue
+            
+            recipient_id = recipients.get(group.id)
+            if recipient_id is None:
+                # If no one has this position, skip
+                continue
+            
+            payout = Payout(
+                group_id=group.id,
+                round_number=group.current_round,
+                recipient_id=recipient_id,
+                amount=stats.collected_amount,
+                status=PayoutStatus.PENDING
+            )
+            db.add(payout)
+            payouts.append(payout)
+            created.append(payout)
+        
+        if created:
+            db.flush()
+            
+            AuditService.log_many(db, [
+                {
+                    "entity_type": "payout",
+                    "entity_id": payout.id,
+                    "action": "create",
+                    "new_value": {
+                        "group_id": payout.group_id,
+                        "round_number": payout.round_number,
+                        "recipient_id": payout.recipient_id,
+                        "amount": payout.amount
+                    }
+                }
+                for payout in created
+            ])
+        
+        return payouts
     
     @staticmethod
     def create_payout_for_round(db: Session, group_id: int, round_number: int) -> Optional[Payout]:
@@ -50,7 +162,7 @@ class PayoutService:
             db: Database session
             group_id: Group ID
             round_number: Round number
-            
+        
         Returns:
             Created payout or None if round not complete
         """
@@ -68,7 +180,7 @@ class PayoutService:
             return None
         
         # Get group
-        group = db.query(Group).filter(Group.id == group_id).first()
+        group = db.get(Group, group_id)
         if not group:
             return None
         
@@ -83,12 +195,8 @@ class PayoutService:
             # If no one has this position, skip
             return None
         
-        # Calculate total payout amount
-        total_amount = db.query(Payment).filter(
-            Payment.group_id == group_id,
-            Payment.round_number == round_number,
-            Payment.status == PaymentStatus.SUCCESS
-        ).count() * group.contribution_amount
+        # Total payout amount
+        total_amount = RoundStatsService.get_stats(db, group_id, round_number).collected_amount
         
         # Create payout record
         payout = Payout(
@@ -100,11 +208,10 @@ class PayoutService:
         )
         
         db.add(payout)
-        db.commit()
-        db.refresh(payout)
+        db.flush()
         
-        # Audit log
-        AuditService.log(
+        # Audit log, committed with the payout
+        AuditService.add(
             db=db,
             entity_type="payout",
             entity_id=payout.id,
@@ -117,25 +224,29 @@ class PayoutService:
             }
         )
         
+        db.commit()
+        
         return payout
     
     @staticmethod
     def approve_payout(db: Session, payout_id: int, admin_user_id: int) -> Payout:
         """
-        Approve a payout (admin action).
+        Approve a payout (admin action) and execute it.
+        
+        The approval is committed together with the payout's execution.
         
         Args:
             db: Database session
             payout_id: Payout ID
             admin_user_id: Admin user approving the payout
-            
+        
         Returns:
             Updated payout
-            
+        
         Raises:
             HTTPException: If validation fails
         """
-        payout = db.query(Payout).filter(Payout.id == payout_id).first()
+        payout = db.get(Payout, payout_id)
         
         if not payout:
             raise HTTPException(
@@ -162,15 +273,18 @@ class PayoutService:
                 detail="Payout already processed"
             )
         
+        if payout.status == PayoutStatus.PROCESSING:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Payout is already being processed"
+            )
+        
         # Approve payout
         old_status = payout.status
         payout.status = PayoutStatus.APPROVED
         
-        db.commit()
-        db.refresh(payout)
-        
         # Audit log
-        AuditService.log(
+        AuditService.add(
             db=db,
             entity_type="payout",
             entity_id=payout.id,
@@ -188,17 +302,25 @@ class PayoutService:
         """
         Execute a payout by crediting the recipient's MoMo wallet.
         
+        The payout is first claimed (moved to PROCESSING and committed), so
+        a payout being executed by an admin, the payout job or another
+        worker is never transferred twice. It is then sent like one item of
+        a disbursement batch (see DisbursementService): through MTN when
+        real MoMo is enabled, with the result, its ledger entries, the round
+        advance, the payout SMS and the audit logs committed together.
+        
         Args:
             db: Database session
             payout_id: Payout ID
-            
+        
         Returns:
-            Updated payout
-            
+            Updated payout: PAID, PROCESSING while MTN has not settled the
+            transfer, or APPROVED if the float could not cover it yet
+        
         Raises:
-            HTTPException: If payout fails
+            HTTPException: If payout fails or is being executed elsewhere
         """
-        payout = db.query(Payout).filter(Payout.id == payout_id).first()
+        payout = db.get(Payout, payout_id)
         
         if not payout:
             raise HTTPException(
@@ -209,113 +331,104 @@ class PayoutService:
         if payout.status == PayoutStatus.PAID:
             return payout  # Already paid
         
-        # Get recipient and group
-        recipient = db.query(User).filter(User.id == payout.recipient_id).first()
-        group = db.query(Group).filter(Group.id == payout.group_id).first()
+        # Claim the payout for this worker
+        claimed = DisbursementService.claim_payouts(
+            db,
+            payout_ids=[payout.id],
+            statuses=(PayoutStatus.PENDING, PayoutStatus.APPROVED, PayoutStatus.FAILED, PayoutStatus.BLOCKED)
+        )
         
-        # Check if recipient is KYC verified
-        from ..config import settings
-        if settings.REQUIRE_KYC_FOR_PAYMENTS and not recipient.kyc_verified:
-            payout.status = PayoutStatus.FAILED
-            db.commit()
+        if not claimed:
+            db.refresh(payout)
+            if payout.status == PayoutStatus.PAID:
+                return payout
             raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"Recipient must complete KYC verification before receiving payouts. User ID: {recipient.id}"
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Payout is already being processed"
             )
         
-        phone = decrypt_field(recipient.phone_number)
-        reference = f"Payout:Group:{group.name}|Round:{payout.round_number}|Payout:{payout.id}"
+        stats = DisbursementService._disburse_claimed(db, claimed)
+        db.refresh(payout)
         
-        try:
-            transaction_id = momo_api.credit_wallet(
-                phone_number=phone,
-                amount=payout.amount,
-                reference=reference
-            )
-            
-            # Update payout as paid
-            payout.transaction_id = transaction_id
-            payout.status = PayoutStatus.PAID
-            payout.payout_date = datetime.utcnow()
-            
-            # Move group to next round
-            group.current_round += 1
-            
-            db.commit()
-            db.refresh(payout)
-            
-            # Send payout notification SMS
-            SMSGateway.payout_notification(
-                phone_number=phone,
-                amount=payout.amount,
-                group_name=group.name,
-                transaction_id=transaction_id
-            )
-            
-            # Audit log
-            AuditService.log(
-                db=db,
-                entity_type="payout",
-                entity_id=payout.id,
-                action="execute",
-                old_value={"status": "approved"},
-                new_value={
-                    "status": "paid",
-                    "transaction_id": transaction_id,
-                    "amount": payout.amount
-                }
-            )
-            
-            return payout
-            
-        except Exception as e:
-            payout.status = PayoutStatus.FAILED
-            
-            db.commit()
-            db.refresh(payout)
-            
-            # Audit log
-            AuditService.log(
-                db=db,
-                entity_type="payout",
-                entity_id=payout.id,
-                action="execute_failed",
-                new_value={"reason": str(e)}
+        if stats["kyc_blocked"]:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail=f"Recipient must complete KYC verification before receiving payouts. User ID: {payout.recipient_id}"
             )
-            
+        
+        if stats["failed"]:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Payout execution failed: {str(e)}"
+                detail=f"Payout execution failed: {payout.last_error}"
+            )
+        
+        # Paid, awaiting MTN (settled by the settle job) or deferred for float
+        return payout
+    
+    @staticmethod
+    def queue_for_disbursement(db: Session, payouts: List[Payout], now: Optional[datetime] = None) -> int:
+        """
+        Approve unpaid payouts so the disbursement queue picks them up.
+        
+        Pending payouts, and failed payouts whose retry backoff has passed,
+        are moved to APPROVED. Blocked payouts wait for an admin; payouts
+        that are already queued, being processed or paid are left alone.
+        
+        Args:
+            db: Database session
+            payouts: Payouts to queue
+            now: Current time (defaults to utcnow)
+        
+        Returns:
+            Number of payouts queued
+        """
+        payout_ids = [payout.id for payout in payouts]
+        if not payout_ids:
+            return 0
+        
+        now = now or datetime.utcnow()
+        
+        queued = db.query(Payout).filter(
+            Payout.id.in_(payout_ids),
+            or_(
+                Payout.status == PayoutStatus.PENDING,
+                and_(
+                    Payout.status == PayoutStatus.FAILED,
+                    or_(Payout.next_attempt_at == None, Payout.next_attempt_at <= now)
+                )
             )
+        ).update(
+            {Payout.status: PayoutStatus.APPROVED, Payout.version_id: Payout.version_id + 1},
+            synchronize_session="fetch"
+        )
+        db.commit()
+        
+        return queued
     
     @staticmethod
     def auto_process_payouts(db: Session):
         """
         Auto-process pending payouts that are approved or in groups with auto-payout enabled.
         This is called by the scheduler.
+        
+        Returns:
+            Disbursement stats from DisbursementService.disburse_queue
         """
-        # Get all pending or approved payouts
-        payouts = db.query(Payout).filter(
-            Payout.status.in_([PayoutStatus.PENDING, PayoutStatus.APPROVED])
-        ).all()
-        
-        for payout in payouts:
-            try:
-                # For auto-payout, approve and execute
-                if payout.status == PayoutStatus.PENDING:
-                    payout.status = PayoutStatus.APPROVED
-                    db.commit()
-                
-                PayoutService.execute_payout(db, payout.id)
-                
-            except Exception as e:
-                print(f"Error processing payout {payout.id}: {str(e)}")
-                continue
+        # For auto-payout, approve all pending payouts
+        db.query(Payout).filter(
+            Payout.status == PayoutStatus.PENDING
+        ).update(
+            {Payout.status: PayoutStatus.APPROVED, Payout.version_id: Payout.version_id + 1},
+            synchronize_session=False
+        )
+        db.commit()
+        
+        return DisbursementService.disburse_queue(db)
     
     @staticmethod
     def get_current_payout(db: Session, group_id: int) -> Optional[Payout]:
         """Get current round payout for a group."""
-        group = db.query(Group).filter(Group.id == group_id).first()
+        group = db.get(Group, group_id)
         if not group:
             return None
         
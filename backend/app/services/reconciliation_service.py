@@ -0,0 +1,426 @@
+"""
+Reconciliation Service
+
+Checks payments and payouts against what MoMo actually moved. Provider
+records (the mock's transaction log or an MTN statement export) are
+streamed once and hash-joined on transaction ID against successful MoMo
+payments and paid payouts, which are also streamed. The provider side is
+indexed in memory up to RECONCILIATION_MEMORY_ROWS records; larger inputs
+are spilled to RECONCILIATION_PARTITIONS temporary partition files by hash
+of the transaction ID and joined one partition at a time, so memory stays
+bounded however many rows there are.
+
+Mismatch kinds:
+    missing_in_db: provider moved money that no payment or payout records
+    missing_at_provider: a payment or payout the provider has no record of
+    duplicate: a transaction ID seen more than once on either side
+    amount_mismatch: amounts differ
+    type_mismatch: a debit matched to a payout or a credit to a payment
+"""
+
+import csv
+import json
+import os
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from ..models import Payment, Payout, PaymentStatus, PaymentType, PayoutStatus
+from ..config import settings
+from .ledger_service import to_amount
+
+# Provider record types, from the member's wallet point of view
+DEBIT = "debit"    # Collected from a member (payment)
+CREDIT = "credit"  # Paid to a member (payout)
+
+# Provider statuses that mean money moved
+SUCCESS_STATUSES = {"success", "successful"}
+
+# MTN statement column with the financial transaction ID, which is what
+# payments and payouts store; "External Transaction Id" is our own externalId
+STATEMENT_ID_COLUMN = "Id"
+
+# Bytes read at a time when streaming a JSON array
+JSON_CHUNK_SIZE = 1 << 16
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse an ISO timestamp, returning None if missing or invalid."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def iter_mock_transactions(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the mock MoMo API's transaction log.
+    
+    Reads the JSON Lines log (momo_transactions.jsonl) one line at a time,
+    or a log in the old JSON array format one record at a time.
+    
+    Args:
+        path: Path to the transaction log
+    
+    Yields:
+        Provider records (transaction_id, type, amount, status, timestamp)
+    """
+    with open(path, "r") as f:
+        first = ""
+        while True:
+            first = f.read(1)
+            if not first or not first.isspace():
+                break
+    
+    items = _iter_json_array(path) if first == "[" else _iter_json_lines(path)
+    for item in items:
+        yield {
+            "transaction_id": item.get("transaction_id"),
+            "type": item.get("type"),
+            "amount": item.get("amount"),
+            "status": item.get("status"),
+            "timestamp": _parse_timestamp(item.get("timestamp")),
+        }
+
+
+def _iter_json_lines(path: str) -> Iterator[Dict[str, Any]]:
+    """Decode a JSON Lines file one line at a time."""
+    with open(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_json_array(path: str) -> Iterator[Dict[str, Any]]:
+    """Decode a JSON array file one element at a time instead of loading it whole."""
+    decoder = json.JSONDecoder()
+    whitespace = " \t\r\n"
+    buffer = ""
+    pos = 0
+    started = False
+    
+    with open(path, "r") as f:
+        while True:
+            chunk = f.read(JSON_CHUNK_SIZE)
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            
+            while True:
+                separators = whitespace + "," if started else whitespace
+                while pos < len(buffer) and buffer[pos] in separators:
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{path} is not a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                
+                if buffer[pos] == "]":
+                    return
+                
+                try:
+                    item, pos_after = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    if not chunk:
+                        raise
+                    break  # Record continues in the next chunk
+                
+                pos = pos_after
+                yield item
+            
+            if not chunk:
+                break
+
+
+def iter_statement_csv(
+    path: str,
+    id_column: str = STATEMENT_ID_COLUMN,
+    amount_column: str = "Amount",
+    status_column: str = "Status",
+    type_column: Optional[str] = None,
+    timestamp_column: Optional[str] = "Date"
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream an MTN MoMo statement exported as CSV.
+    
+    Records are joined on MTN's financial transaction ID ("Id"), which
+    settled payments and payouts store as their transaction_id. Without a
+    type column, positive amounts are collections (debits of a member's
+    wallet) and negative amounts are disbursements. Thousands separators
+    in amounts are ignored.
+    
+    Args:
+        path: Path to the CSV file
+        id_column: Column holding the transaction ID stored on payments and payouts
+        amount_column: Column holding the amount
+        status_column: Column holding the transaction status
+        type_column: Optional column holding "debit" or "credit"
+        timestamp_column: Optional column holding the transaction time
+    
+    Yields:
+        Provider records (transaction_id, type, amount, status, timestamp)
+    """
+    with open(path, "r", newline="") as f:
+        for row in csv.DictReader(f):
+            amount = float((row[amount_column] or "0").replace(",", ""))
+            
+            if type_column:
+                record_type = (row.get(type_column) or "").strip().lower()
+            else:
+                record_type = DEBIT if amount >= 0 else CREDIT
+            
+            yield {
+                "transaction_id": (row.get(id_column) or "").strip() or None,
+                "type": record_type,
+                "amount": abs(amount),
+                "status": row.get(status_column),
+                "timestamp": _parse_timestamp(row.get(timestamp_column)) if timestamp_column else None,
+            }
+
+
+class _Partitions:
+    """Temporary partition files for joins that do not fit in memory."""
+    
+    def __init__(self, count: int):
+        self.count = max(count, 1)
+        self.directory = tempfile.TemporaryDirectory(prefix="susu-reconcile-")
+        self.files = {}
+        self.writers = {}
+        for side in ("provider", "books"):
+            for index in range(self.count):
+                path = os.path.join(self.directory.name, f"{side}-{index}.csv")
+                self.files[(side, index)] = open(path, "w+", newline="")
+                self.writers[(side, index)] = csv.writer(self.files[(side, index)])
+    
+    def _partition(self, transaction_id: str) -> int:
+        return zlib.crc32(transaction_id.encode()) % self.count
+    
+    def add(self, side: str, row: Tuple) -> None:
+        """Append a row whose first field is the transaction ID."""
+        self.writers[(side, self._partition(row[0]))].writerow(row)
+    
+    def read(self, side: str, index: int) -> Iterator[List[str]]:
+        """Read a partition back from the start."""
+        f = self.files[(side, index)]
+        f.flush()
+        f.seek(0)
+        return csv.reader(f)
+    
+    def close(self) -> None:
+        for f in self.files.values():
+            f.close()
+        self.directory.cleanup()
+
+
+class ReconciliationService:
+    """Service for reconciling payments and payouts with provider records."""
+    
+    @staticmethod
+    def iter_book_entries(
+        db: Session,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> Iterator[Tuple[str, str, int, float]]:
+        """
+        Stream successful MoMo payments and paid payouts.
+        
+        Args:
+            db: Database session
+            start: Only include entries dated at or after this time
+            end: Only include entries dated before this time
+        
+        Yields:
+            (transaction_id, "payment" or "payout", id, amount) tuples
+        """
+        batch_size = settings.RECONCILIATION_FETCH_SIZE
+        
+        payments = db.query(Payment.transaction_id, Payment.id, Payment.amount).filter(
+            Payment.status == PaymentStatus.SUCCESS,
+            or_(Payment.payment_type.is_(None), Payment.payment_type != PaymentType.CASH),
+            Payment.transaction_id.isnot(None)
+        )
+        if start is not None:
+            payments = payments.filter(Payment.payment_date >= start)
+        if end is not None:
+            payments = payments.filter(Payment.payment_date < end)
+        
+        for transaction_id, payment_id, amount in payments.yield_per(batch_size):
+            yield transaction_id, "payment", payment_id, amount
+        
+        payouts = db.query(Payout.transaction_id, Payout.id, Payout.amount).filter(
+            Payout.status == PayoutStatus.PAID,
+            Payout.transaction_id.isnot(None)
+        )
+        if start is not None:
+            payouts = payouts.filter(Payout.payout_date >= start)
+        if end is not None:
+            payouts = payouts.filter(Payout.payout_date < end)
+        
+        for transaction_id, payout_id, amount in payouts.yield_per(batch_size):
+            yield transaction_id, "payout", payout_id, amount
+    
+    @staticmethod
+    def _join(
+        index: Dict[str, list],
+        book_entries: Iterable[Tuple],
+        report: Callable[..., None],
+        stats: Dict[str, Any]
+    ) -> None:
+        """Probe indexed provider records with book entries and report mismatches."""
+        # index: transaction_id -> [type, amount, count, matched entry]
+        for transaction_id, kind, entry_id, amount in book_entries:
+            entry_id = int(entry_id)
+            amount = to_amount(amount)
+            record = index.get(transaction_id)
+            
+            if record is None:
+                report("missing_at_provider", transaction_id=transaction_id, entity=kind,
+                       entity_id=entry_id, book_amount=amount)
+                continue
+            
+            if record[3] is not None:
+                report("duplicate", transaction_id=transaction_id, entity=kind, entity_id=entry_id,
+                       detail=f"also recorded on {record[3]}")
+                continue
+            
+            record[3] = f"{kind} {entry_id}"
+            expected_type = DEBIT if kind == "payment" else CREDIT
+            
+            if record[0] != expected_type:
+                report("type_mismatch", transaction_id=transaction_id, entity=kind, entity_id=entry_id,
+                       detail=f"provider recorded a {record[0]}")
+            elif record[1] != amount:
+                report("amount_mismatch", transaction_id=transaction_id, entity=kind, entity_id=entry_id,
+                       book_amount=amount, provider_amount=record[1])
+            else:
+                stats["matched"] += 1
+        
+        for transaction_id, (record_type, amount, count, matched) in index.items():
+            if count > 1:
+                report("duplicate", transaction_id=transaction_id, provider_amount=amount,
+                       detail=f"{count} provider records")
+            if matched is None:
+                report("missing_in_db", transaction_id=transaction_id, provider_amount=amount,
+                       detail=f"provider {record_type}")
+    
+    @staticmethod
+    def reconcile(
+        db: Session,
+        records: Iterable[Dict[str, Any]],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        on_mismatch: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Reconcile provider records with payments and payouts in one pass.
+        
+        Args:
+            db: Database session
+            records: Provider records, e.g. from iter_mock_transactions or
+                iter_statement_csv
+            start: Only reconcile transactions at or after this time
+            end: Only reconcile transactions before this time
+            on_mismatch: Called with every mismatch (e.g. to write a report)
+        
+        Returns:
+            Dict with provider_records, skipped, matched and per-kind
+            mismatch counts, spilled (whether partition files were used) and
+            a sample of up to RECONCILIATION_SAMPLE_SIZE mismatches
+        """
+        stats: Dict[str, Any] = {
+            "provider_records": 0,
+            "skipped": 0,
+            "matched": 0,
+            "missing_in_db": 0,
+            "missing_at_provider": 0,
+            "duplicate": 0,
+            "amount_mismatch": 0,
+            "type_mismatch": 0,
+            "spilled": False,
+            "mismatches": [],
+        }
+        
+        def report(kind: str, **fields) -> None:
+            stats[kind] += 1
+            mismatch = {"kind": kind, **fields}
+            if on_mismatch:
+                on_mismatch(mismatch)
+            if len(stats["mismatches"]) < settings.RECONCILIATION_SAMPLE_SIZE:
+                stats["mismatches"].append(mismatch)
+        
+        def add(index: Dict[str, list], transaction_id: str, record_type: str, amount) -> None:
+            record = index.get(transaction_id)
+            if record is None:
+                index[transaction_id] = [record_type, to_amount(amount), 1, None]
+            else:
+                record[2] += 1
+        
+        index: Dict[str, list] = {}
+        partitions: Optional[_Partitions] = None
+        
+        try:
+            # Build side: provider records
+            for record in records:
+                stats["provider_records"] += 1
+                transaction_id = record.get("transaction_id")
+                timestamp = record.get("timestamp")
+                
+                if (
+                    not transaction_id
+                    or (record.get("status") or "").lower() not in SUCCESS_STATUSES
+                    or (start is not None and timestamp is not None and timestamp < start)
+                    or (end is not None and timestamp is not None and timestamp >= end)
+                ):
+                    stats["skipped"] += 1
+                    continue
+                
+                record_type = (record.get("type") or "").lower()
+                amount = record.get("amount") or 0
+                
+                if partitions is not None:
+                    partitions.add("provider", (transaction_id, record_type, amount))
+                    continue
+                
+                add(index, transaction_id, record_type, amount)
+                
+                if len(index) > settings.RECONCILIATION_MEMORY_ROWS:
+                    # Too big for memory: spill to hash partitions
+                    partitions = _Partitions(settings.RECONCILIATION_PARTITIONS)
+                    for spilled_id, (spilled_type, spilled_amount, count, _) in index.items():
+                        for _ in range(count):
+                            partitions.add("provider", (spilled_id, spilled_type, spilled_amount))
+                    index = {}
+                    stats["spilled"] = True
+            
+            # Probe side: payments and payouts
+            book_entries = ReconciliationService.iter_book_entries(db, start, end)
+            
+            if partitions is None:
+                ReconciliationService._join(index, book_entries, report, stats)
+            else:
+                for entry in book_entries:
+                    partitions.add("books", entry)
+                
+                for partition in range(partitions.count):
+                    index = {}
+                    for transaction_id, record_type, amount in partitions.read("provider", partition):
+                        add(index, transaction_id, record_type, amount)
+                    ReconciliationService._join(index, partitions.read("books", partition), report, stats)
+        finally:
+            if partitions is not None:
+                partitions.close()
+        
+        return stats
+
+
+# Singleton instance
+reconciliation_service = ReconciliationService()
@@ -0,0 +1,150 @@
+"""
+Payment Reminder Service
+
+Sends SMS reminders ahead of each member's collection day. Due members are
+found with a single query and their reminders are queued in the outbox, whose
+dispatcher sends identical messages together in rate-limited bulk requests.
+"""
+
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional, Any
+from sqlalchemy import exists
+from sqlalchemy.orm import Session
+
+from ..models import Group, Membership, Payment, PaymentPreference, PaymentStatus, User, OutboxPriority
+from ..integrations.sms_sender import payment_reminder_message
+from .collection_service import CollectionService
+from .outbox_service import OutboxService
+
+logger = logging.getLogger(__name__)
+
+# Used when a preference row has no reminder_days_before
+DEFAULT_REMINDER_DAYS_BEFORE = 3
+
+
+class ReminderService:
+    """Service for batched payment reminders."""
+    
+    @staticmethod
+    def get_due_reminders(db: Session, today: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Get members who should be reminded today.
+        
+        A member is reminded when reminders are enabled in their payment
+        preference, they have not paid the group's current round, and their
+        next collection date is exactly reminder_days_before days away.
+        Members of cash-only groups are reminded too when they have a
+        collection day.
+        
+        Args:
+            db: Database session
+            today: Reminder date (defaults to today, UTC)
+        
+        Returns:
+            List of dicts with user_id, group_id, phone_number, group_name,
+            amount, round_number and due_date
+        """
+        today = today or datetime.utcnow().date()
+        day_expr = CollectionService.collection_day_expr()
+        
+        has_paid = exists().where(
+            Payment.user_id == Membership.user_id,
+            Payment.group_id == Membership.group_id,
+            Payment.round_number == Group.current_round,
+            Payment.status == PaymentStatus.SUCCESS
+        )
+        
+        rows = CollectionService.collectable_memberships(db, include_cash_only=True).join(
+            User, User.id == Membership.user_id
+        ).join(
+            PaymentPreference, PaymentPreference.user_id == Membership.user_id
+        ).filter(
+            PaymentPreference.send_payment_reminders == True,
+            day_expr.isnot(None),
+            ~has_paid
+        ).with_entities(
+            Membership.user_id,
+            Group.id,
+            User.phone_number,
+            Group.name,
+            Group.contribution_amount,
+            Group.current_round,
+            day_expr,
+            PaymentPreference.reminder_days_before
+        ).order_by(Group.id, Membership.rotation_position).all()
+        
+        due = []
+        for user_id, group_id, phone_number, group_name, amount, round_number, day, days_before in rows:
+            if days_before is None:
+                days_before = DEFAULT_REMINDER_DAYS_BEFORE
+            
+            due_date = CollectionService.next_collection_date(day, today)
+            if (due_date - today).days != days_before:
+                continue
+            
+            due.append({
+                "user_id": user_id,
+                "group_id": group_id,
+                "phone_number": phone_number,
+                "group_name": group_name,
+                "amount": amount,
+                "round_number": round_number,
+                "due_date": due_date,
+            })
+        
+        return due
+    
+    @staticmethod
+    def send_due_reminders(db: Session, today: Optional[date] = None) -> Dict[str, int]:
+        """
+        Queue reminders for every member due today.
+        
+        Reminders go through the outbox, which groups identical messages
+        (same group, round and due date) into bulk requests and paces them
+        per provider. Each member is queued at most once per group, round and
+        due date, so a rerun on the same day does not send twice. All
+        reminders are queued with one dedupe lookup and one bulk insert.
+        
+        Args:
+            db: Database session
+            today: Reminder date (defaults to today, UTC)
+        
+        Returns:
+            Dict with due, queued and duplicate counts
+        """
+        # Members need a collection day before they can be reminded
+        CollectionService.assign_collection_days(db)
+        
+        due = ReminderService.get_due_reminders(db, today)
+        
+        messages = []
+        for reminder in due:
+            text = payment_reminder_message(
+                reminder["group_name"],
+                reminder["amount"],
+                reminder["round_number"],
+                reminder["due_date"].strftime("%d %b")
+            )
+            messages.append({
+                "kind": "sms",
+                "payload": {"phone_number": reminder["phone_number"], "message": text},
+                "dedupe_key": (
+                    f"reminder:{reminder['user_id']}:{reminder['group_id']}:"
+                    f"{reminder['round_number']}:{reminder['due_date'].isoformat()}"
+                ),
+                "priority": OutboxPriority.BULK
+            })
+        
+        # One dedupe lookup and one insert for the whole run
+        queued = OutboxService.enqueue_many(db, messages)
+        stats = {"due": len(due), "queued": queued, "duplicates": len(due) - queued}
+        
+        db.commit()
+        
+        logger.info(f"Payment reminders: {stats['queued']} queued, {stats['duplicates']} already queued")
+        return stats
+
+
+# Singleton instance
+reminder_service = ReminderService()
@@ -0,0 +1,346 @@
+"""
+Round Stats Service
+
+Maintains the group_round_stats counters (paid_count, collected_amount,
+active_member_count) in the same transaction as the payment or membership
+change that moves them, so round-completion checks, payout amounts and
+dashboards read one row instead of re-counting payments and members.
+A reconciliation job recomputes the counters and corrects any drift.
+"""
+
+import logging
+from typing import Dict, List
+from sqlalchemy import func, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import GroupRoundStats, Group, Membership, Payment, PaymentStatus, GroupStatus
+from .audit_service import AuditService
+
+logger = logging.getLogger(__name__)
+
+
+class RoundStatsService:
+    """Service for per-group-round contribution counters."""
+    
+    @staticmethod
+    def compute(db: Session, group_id: int, round_number: int) -> GroupRoundStats:
+        """
+        Count a round's payments and the group's active members from scratch.
+        
+        Args:
+            db: Database session
+            group_id: Group ID
+            round_number: Round number
+        
+        Returns:
+            Unsaved stats row
+        """
+        paid_count, collected = db.query(
+            func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0.0)
+        ).filter(
+            Payment.group_id == group_id,
+            Payment.round_number == round_number,
+            Payment.status == PaymentStatus.SUCCESS
+        ).one()
+        
+        active_members = db.query(func.count(Membership.id)).filter(
+            Membership.group_id == group_id,
+            Membership.is_active == True
+        ).scalar()
+        
+        return GroupRoundStats(
+            group_id=group_id,
+            round_number=round_number,
+            paid_count=paid_count,
+            collected_amount=float(collected),
+            active_member_count=active_members
+        )
+    
+    @staticmethod
+    def get_or_create(db: Session, group_id: int, round_number: int) -> GroupRoundStats:
+        """
+        Get a round's stats row, creating it from a full count if missing.
+        
+        Pending changes are flushed first so the count includes them. The
+        new row is not committed.
+        
+        Args:
+            db: Database session
+            group_id: Group ID
+            round_number: Round number
+        
+        Returns:
+            Stats row
+        """
+        stats = db.query(GroupRoundStats).filter(
+            GroupRoundStats.group_id == group_id,
+            GroupRoundStats.round_number == round_number
+        ).first()
+        
+        if not stats:
+            db.flush()
+            stats = RoundStatsService._insert(db, RoundStatsService.compute(db, group_id, round_number))
+        
+        return stats
+    
+    @staticmethod
+    def _insert(db: Session, stats: GroupRoundStats) -> GroupRoundStats:
+        """
+        Insert a new stats row, or return the row another writer created first.
+        
+        The insert runs in a savepoint, so losing the race on the unique
+        (group_id, round_number) constraint leaves the outer transaction usable.
+        
+        Args:
+            db: Database session
+            stats: Unsaved stats row
+        
+        Returns:
+            Stats row
+        """
+        try:
+            with db.begin_nested():
+                db.add(stats)
+        except IntegrityError:
+            # Created concurrently
+            stats = db.query(GroupRoundStats).filter(
+                GroupRoundStats.group_id == stats.group_id,
+                GroupRoundStats.round_number == stats.round_number
+            ).one()
+        
+        return stats
+    
+    @staticmethod
+    def get_stats(db: Session, group_id: int, round_number: int) -> GroupRoundStats:
+        """
+        Read a round's counters.
+        
+        Falls back to an unsaved full count for rounds without a row.
+        
+        Args:
+            db: Database session
+            group_id: Group ID
+            round_number: Round number
+        
+        Returns:
+            Stats row
+        """
+        stats = db.query(GroupRoundStats).filter(
+            GroupRoundStats.group_id == group_id,
+            GroupRoundStats.round_number == round_number
+        ).first()
+        
+        return stats or RoundStatsService.compute(db, group_id, round_number)
+    
+    @staticmethod
+    def start_round(db: Session, group: Group) -> GroupRoundStats:
+        """
+        Create the stats row for a group's current round.
+        
+        The member count is carried over from the previous round when it
+        has a row. The row is inserted in a savepoint; the outer transaction
+        is not committed.
+        
+        Args:
+            db: Database session
+            group: Group that just started its current round
+        
+        Returns:
+            Stats row
+        """
+        existing = db.query(GroupRoundStats).filter(
+            GroupRoundStats.group_id == group.id,
+            GroupRoundStats.round_number == group.current_round
+        ).first()
+        if existing:
+            return existing
+        
+        previous = db.query(GroupRoundStats).filter(
+            GroupRoundStats.group_id == group.id,
+            GroupRoundStats.round_number == group.current_round - 1
+        ).first()
+        
+        if not previous:
+            return RoundStatsService.get_or_create(db, group.id, group.current_round)
+        
+        stats = GroupRoundStats(
+            group_id=group.id,
+            round_number=group.current_round,
+            paid_count=0,
+            collected_amount=0.0,
+            active_member_count=previous.active_member_count
+        )
+        
+        return RoundStatsService._insert(db, stats)
+    
+    @staticmethod
+    def record_payment(db: Session, payment: Payment) -> None:
+        """
+        Count a payment that just became successful.
+        
+        Uses an in-database increment, so concurrent payments for the same
+        round cannot lose updates. Changes are not committed.
+        
+        Args:
+            db: Database session
+            payment: Payment marked SUCCESS in the current transaction
+        """
+        updated = db.query(GroupRoundStats).filter(
+            GroupRoundStats.group_id == payment.group_id,
+            GroupRoundStats.round_number == payment.round_number
+        ).update({
+            GroupRoundStats.paid_count: GroupRoundStats.paid_count + 1,
+            GroupRoundStats.collected_amount: GroupRoundStats.collected_amount + payment.amount
+        }, synchronize_session=False)
+        
+        if not updated:
+            # The full count includes this payment
+            RoundStatsService.get_or_create(db, payment.group_id, payment.round_number)
+    
+    @staticmethod
+    def reverse_payment(db: Session, payment: Payment) -> None:
+        """
+        Uncount a payment moved out of SUCCESS.
+        
+        The counterpart of record_payment, using the same in-database
+        decrement. Changes are not committed.
+        
+        Args:
+            db: Database session
+            payment: Payment moved out of SUCCESS in the current transaction
+        """
+        updated = db.query(GroupRoundStats).filter(
+            GroupRoundStats.group_id == payment.group_id,
+            GroupRoundStats.round_number == payment.round_number
+        ).update({
+            GroupRoundStats.paid_count: GroupRoundStats.paid_count - 1,
+            GroupRoundStats.collected_amount: GroupRoundStats.collected_amount - payment.amount
+        }, synchronize_session=False)
+        
+        if not updated:
+            # The full count already leaves this payment out
+            RoundStatsService.get_or_create(db, payment.group_id, payment.round_number)
+    
+    @staticmethod
+    def adjust_members(db: Session, group_id: int, delta: int) -> None:
+        """
+        Apply a membership change to the group's current round.
+        
+        Changes are not committed.
+        
+        Args:
+            db: Database session
+            group_id: Group ID
+            delta: +1 when a member joins, -1 when one leaves
+        """
+        group = db.query(Group).filter(Group.id == group_id).first()
+        if not group:
+            return
+        
+        updated = db.query(GroupRoundStats).filter(
+            GroupRoundStats.group_id == group_id,
+            GroupRoundStats.round_number == group.current_round
+        ).update({
+            GroupRoundStats.active_member_count: GroupRoundStats.active_member_count + delta
+        }, synchronize_session=False)
+        
+        if not updated:
+            # The full count includes this change
+            RoundStatsService.get_or_create(db, group_id, group.current_round)
+    
+    @staticmethod
+    def reconcile(db: Session) -> Dict[str, int]:
+        """
+        Verify the current-round counters of active groups.
+        
+        Counters are recomputed with one grouped aggregate each. Rows that
+        drifted are corrected (and audit logged); missing rows are created.
+        
+        Args:
+            db: Database session
+        
+        Returns:
+            Dict with checked, corrected and created counts
+        """
+        paid = {
+            group_id: (count, float(amount))
+            for group_id, count, amount in db.query(
+                Payment.group_id,
+                func.count(Payment.id),
+                func.coalesce(func.sum(Payment.amount), 0.0)
+            ).join(
+                Group,
+                and_(Group.id == Payment.group_id, Group.current_round == Payment.round_number)
+            ).filter(
+                Group.status == GroupStatus.ACTIVE,
+                Payment.status == PaymentStatus.SUCCESS
+            ).group_by(Payment.group_id).all()
+        }
+        
+        members = dict(
+            db.query(Membership.group_id, func.count(Membership.id)).join(
+                Group, Group.id == Membership.group_id
+            ).filter(
+                Group.status == GroupStatus.ACTIVE,
+                Membership.is_active == True
+            ).group_by(Membership.group_id).all()
+        )
+        
+        rows = db.query(Group, GroupRoundStats).outerjoin(
+            GroupRoundStats,
+            and_(
+                GroupRoundStats.group_id == Group.id,
+                GroupRoundStats.round_number == Group.current_round
+            )
+        ).filter(Group.status == GroupStatus.ACTIVE).all()
+        
+        result = {"checked": len(rows), "corrected": 0, "created": 0}
+        audit_entries: List[Dict] = []
+        
+        for group, stats in rows:
+            paid_count, collected = paid.get(group.id, (0, 0.0))
+            expected = {
+                "paid_count": paid_count,
+                "collected_amount": collected,
+                "active_member_count": members.get(group.id, 0),
+            }
+            
+            if stats is None:
+                db.add(GroupRoundStats(group_id=group.id, round_number=group.current_round, **expected))
+                result["created"] += 1
+                continue
+            
+            actual = {
+                "paid_count": stats.paid_count,
+                "collected_amount": stats.collected_amount,
+                "active_member_count": stats.active_member_count,
+            }
+            
+            if actual["paid_count"] == expected["paid_count"] \
+                    and abs(actual["collected_amount"] - expected["collected_amount"]) < 0.005 \
+                    and actual["active_member_count"] == expected["active_member_count"]:
+                continue
+            
+            logger.warning(f"Round stats drift for group {group.id} round {group.current_round}: {actual} != {expected}")
+            for field, value in expected.items():
+                setattr(stats, field, value)
+            result["corrected"] += 1
+            audit_entries.append({
+                "entity_type": "group_round_stats",
+                "entity_id": stats.id,
+                "action": "reconcile",
+                "old_value": actual,
+                "new_value": expected
+            })
+        
+        if audit_entries:
+            AuditService.log_many(db, audit_entries)
+        else:
+            db.commit()
+        
+        return result
+
+
+# Singleton instance
+round_stats_service = RoundStatsService()
@@ -7,6 +7,7 @@ from .auth import (
 )
 from .encryption import encrypt_field, decrypt_field
 from .group_code import generate_group_code
+from .concurrency import retry_on_conflict
 
 __all__ = [
     "verify_password",
@@ -17,5 +18,6 @@ __all__ = [
     "encrypt_field",
     "decrypt_field",
     "generate_group_code",
+    "retry_on_conflict",
 ]
 
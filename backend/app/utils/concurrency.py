@@ -0,0 +1,47 @@
+import random
+import time
+from typing import Callable, Optional, TypeVar
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+from ..config import settings
+
+T = TypeVar("T")
+
+
+def retry_on_conflict(db: Session, operation: Callable[[], T], attempts: Optional[int] = None) -> T:
+    """
+    Run a read-modify-write unit of work, retrying it on version conflicts.
+    
+    Payments, payouts and groups carry a version_id column; flushing a
+    change to a row that another transaction changed after it was read
+    raises StaleDataError instead of overwriting that change. The session
+    is then rolled back, which expires loaded objects so the next attempt
+    re-reads them, and the operation runs again after a short jittered
+    pause. The operation must be a complete unit of work that commits.
+    
+    Args:
+        db: Database session
+        operation: Callable that reads, modifies and commits
+        attempts: Maximum attempts (defaults to OPTIMISTIC_RETRY_ATTEMPTS)
+    
+    Returns:
+        Result of the operation
+    
+    Raises:
+        HTTPException: 409 if the rows kept changing on every attempt
+    """
+    attempts = max(attempts or settings.OPTIMISTIC_RETRY_ATTEMPTS, 1)
+    
+    for attempt in range(1, attempts + 1):
+        try:
+            return operation()
+        except StaleDataError:
+            db.rollback()
+            if attempt == attempts:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="This record was changed by another request. Please try again."
+                )
+            time.sleep(random.uniform(0, settings.OPTIMISTIC_RETRY_BACKOFF_SECONDS * attempt))
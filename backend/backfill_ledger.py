@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Backfill Ledger Script
+
+Posts successful payments and paid payouts that predate the double-entry
+ledger, dated with their original payment and payout dates. Safe to run
+more than once: anything already posted is skipped.
+
+Usage:
+    python backfill_ledger.py
+"""
+
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.ledger_service import ledger_service
+
+
+def main():
+    """Main entry point."""
+    db = SessionLocal()
+    
+    try:
+        print("=" * 80)
+        print("Ledger Backfill")
+        print("=" * 80)
+        
+        result = ledger_service.backfill(db)
+        
+        print(f"✅ Posted {result['contributions']} contributions and {result['payouts']} payouts")
+    
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Local MTN API Stand-in Server
+
+A stand-in for the MTN APIs used by app/integrations/mtn_* and the
+bc-authorize flow, for load testing the real integration code (connection
+pooling, retries, token refresh, callbacks) on a laptop without network
+access. Only the standard library is used.
+
+Endpoints (matched on the path suffix, so any base URL prefix works):
+    POST /{collection,disbursement}/token/           MoMo OAuth token (Basic auth)
+    POST /v1_0/apiuser, /v1_0/apiuser/{id}/apikey    Sandbox API user setup
+    POST /collection/v1_0/requesttopay               Collection request
+    GET  /collection/v1_0/requesttopay/{id}          Collection status
+    POST /disbursement/v1_0/transfer                 Disbursement transfer
+    GET  /disbursement/v1_0/transfer/{id}            Transfer status
+    GET  /{product}/v1_0/account/balance             Account balance
+    GET  /collection/v1_0/accountholder/msisdn/{msisdn}/active
+    POST /collection/v1_0/bc-authorize               Consent request
+    POST /collection/oauth2/token/                   Consent polling (CIBA grant)
+    POST /oauth/token                                SMS/KYC OAuth token (Basic auth)
+    POST /sms/messages, GET /sms/messages/{id}/deliveryStatus
+    GET  /customer/v1/msisdn/{msisdn}/verify         KYC phone verification
+    GET  /_stats                                     Request counters of this run
+
+Collections, transfers and consent requests stay PENDING for the callback
+delay, then settle (SUCCESSFUL, or FAILED at --reject-rate). A request-to-pay
+sent with X-Callback-Url gets a PUT to that URL when it settles. MTN numbers
+(233 followed by 24, 25, 53, 54, 55 or 59) pass KYC and account checks.
+
+Usage:
+    python mtn_stand_in.py --port 8090 --latency normal:80:20 --error-rate 0.01 \\
+        --rate-limit 50 --token-ttl 300 --callback-delay uniform:2000:10000
+
+    # Point the backend at it
+    MTN_MOMO_BASE_URL=http://127.0.0.1:8090 MTN_BASE_URL=http://127.0.0.1:8090/v1 \\
+        MTN_KYC_BASE_URL=http://127.0.0.1:8090/v1 ENABLE_REAL_MOMO=true ...
+
+Latency and callback delays are distributions in milliseconds:
+    fixed:MS, uniform:LOW:HIGH, normal:MEAN:STDDEV, exp:MEAN, lognormal:MEDIAN:SIGMA
+"""
+
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+MTN_PREFIXES = ("23324", "23325", "23353", "23354", "23355", "23359")
+
+
+def parse_delay(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a delay distribution in milliseconds.
+    
+    Args:
+        spec: fixed:MS, uniform:LOW:HIGH, normal:MEAN:STDDEV, exp:MEAN or
+            lognormal:MEDIAN:SIGMA (a bare number means fixed)
+    
+    Returns:
+        Function drawing a delay in seconds from a random generator
+    """
+    kind, _, params = spec.partition(":")
+    if not params:
+        kind, params = "fixed", kind
+    try:
+        values = [float(value) for value in params.split(":")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid delay: {spec}")
+    
+    samplers = {
+        ("fixed", 1): lambda rng: values[0],
+        ("uniform", 2): lambda rng: rng.uniform(values[0], values[1]),
+        ("normal", 2): lambda rng: rng.gauss(values[0], values[1]),
+        ("exp", 1): lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0,
+        ("lognormal", 2): lambda rng: rng.lognormvariate(math.log(values[0]), values[1]),
+    }
+    sampler = samplers.get((kind, len(values)))
+    if sampler is None:
+        raise argparse.ArgumentTypeError(f"Invalid delay: {spec}")
+    
+    return lambda rng: max(sampler(rng), 0.0) / 1000
+
+
+@dataclass
+class StandInConfig:
+    """Behaviour of the stand-in server."""
+    latency: Callable[[random.Random], float] = field(default_factory=lambda: parse_delay("fixed:0"))
+    error_rate: float = 0.0  # Share of requests answered 500
+    throttle_rate: float = 0.0  # Share of requests answered 429
+    rate_limit: float = 0.0  # Requests per second before 429s (0 disables)
+    token_ttl: int = 3600  # OAuth token lifetime in seconds
+    callback_delay: Callable[[random.Random], float] = field(default_factory=lambda: parse_delay("fixed:0"))
+    reject_rate: float = 0.0  # Share of collections, transfers and consents that fail
+    seed: Optional[int] = None
+
+
+class StandInState:
+    """Tokens, transactions and counters shared by the request threads."""
+    
+    def __init__(self, config: StandInConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.tokens: Dict[str, float] = {}  # Token -> expiry (monotonic)
+        self.requests: Dict[str, Dict] = {}  # "kind:id" -> stored request
+        self.stats: Counter = Counter()
+        self.bucket_tokens = max(config.rate_limit, 1.0)
+        self.bucket_updated = time.monotonic()
+    
+    def count(self, name: str):
+        """Increment a request counter."""
+        with self.lock:
+            self.stats[name] += 1
+    
+    def draw(self, sampler: Callable[[random.Random], float]) -> float:
+        """Draw from a distribution with the shared generator."""
+        with self.lock:
+            return sampler(self.random)
+    
+    def chance(self, rate: float) -> bool:
+        """True with probability `rate`."""
+        with self.lock:
+            return self.random.random() < rate
+    
+    def take_rate_limit_token(self) -> bool:
+        """Take a request token from the rate limit bucket; False if empty."""
+        rate = self.config.rate_limit
+        if rate <= 0:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.bucket_tokens = min(max(rate, 1.0), self.bucket_tokens + (now - self.bucket_updated) * rate)
+            self.bucket_updated = now
+            if self.bucket_tokens < 1:
+                return False
+            self.bucket_tokens -= 1
+            return True
+    
+    def issue_token(self) -> str:
+        """Issue an access token valid for token_ttl seconds."""
+        token = uuid.uuid4().hex
+        with self.lock:
+            self.tokens[token] = time.monotonic() + self.config.token_ttl
+        return token
+    
+    def token_valid(self, token: str) -> bool:
+        """Whether a bearer token was issued here and has not expired."""
+        with self.lock:
+            expires = self.tokens.get(token)
+        return expires is not None and expires > time.monotonic()
+    
+    def store(self, key: str, record: Dict) -> bool:
+        """
+        Store a pending request that settles after the callback delay.
+        
+        Returns:
+            False if the key already exists (duplicate reference ID)
+        """
+        record["settles_at"] = time.monotonic() + self.draw(self.config.callback_delay)
+        record["outcome"] = "FAILED" if self.chance(self.config.reject_rate) else "SUCCESSFUL"
+        with self.lock:
+            if key in self.requests:
+                return False
+            self.requests[key] = record
+        return True
+    
+    def lookup(self, key: str) -> Optional[Dict]:
+        """A stored request with its current status, or None."""
+        with self.lock:
+            record = self.requests.get(key)
+        if record is None:
+            return None
+        settled = time.monotonic() >= record["settles_at"]
+        return dict(record, status=record["outcome"] if settled else "PENDING")
+
+
+def is_mtn_number(msisdn: str) -> bool:
+    """Whether a 233XXXXXXXXX number belongs to an MTN range."""
+    return msisdn.startswith(MTN_PREFIXES) and len(msisdn) == 12
+
+
+class MTNStandInHandler(BaseHTTPRequestHandler):
+    """Routes requests to the stand-in endpoints."""
+    
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+    
+    # (method, path suffix pattern, handler, authentication: "basic", "bearer" or None)
+    ROUTES = [
+        ("POST", r"/(collection|disbursement)/token/?$", "momo_token", "basic"),
+        ("POST", r"/v1_0/apiuser$", "create_api_user", None),
+        ("POST", r"/v1_0/apiuser/(?P<id>[^/]+)/apikey$", "create_api_key", None),
+        ("POST", r"/collection/v1_0/requesttopay$", "request_to_pay", "bearer"),
+        ("GET", r"/collection/v1_0/requesttopay/(?P<id>[^/]+)$", "request_to_pay_status", "bearer"),
+        ("POST", r"/disbursement/v1_0/transfer$", "transfer", "bearer"),
+        ("GET", r"/disbursement/v1_0/transfer/(?P<id>[^/]+)$", "transfer_status", "bearer"),
+        ("GET", r"/(collection|disbursement)/v1_0/account/balance$", "balance", "bearer"),
+        ("GET", r"/v1_0/accountholder/msisdn/(?P<id>\d+)/active$", "account_active", "bearer"),
+        ("POST", r"/collection/v1_0/bc-authorize$", "bc_authorize", "bearer"),
+        ("POST", r"/collection/oauth2/token/?$", "ciba_token", None),
+        ("POST", r"/oauth/token$", "oauth_token", "basic"),
+        ("POST", r"/sms/messages$", "send_sms", "bearer"),
+        ("GET", r"/sms/messages/(?P<id>[^/]+)/deliveryStatus$", "sms_delivery", "bearer"),
+        ("GET", r"/customer/v1/msisdn/(?P<id>\d+)/verify$", "kyc_verify", "bearer"),
+        ("GET", r"/_stats$", "stats", None),
+    ]
+    
+    @property
+    def state(self) -> StandInState:
+        return self.server.state
+    
+    def log_message(self, format, *args):
+        """Keep load tests quiet; counters are on /_stats."""
+    
+    def do_GET(self):
+        self._dispatch("GET")
+    
+    def do_POST(self):
+        self._dispatch("POST")
+    
+    def _dispatch(self, method: str):
+        """Apply latency and injected failures, then route the request."""
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        path = self.path.split("?", 1)[0]
+        
+        for route_method, pattern, handler, auth in self.ROUTES:
+            match = re.search(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self._reply(404, {"code": "RESOURCE_NOT_FOUND", "message": f"No route for {method} {path}"})
+        
+        self.state.count(handler)
+        if handler == "stats":
+            return self.stats(None)
+        
+        time.sleep(self.state.draw(self.state.config.latency))
+        
+        if not self.state.take_rate_limit_token() or self.state.chance(self.state.config.throttle_rate):
+            self.state.count("throttled")
+            return self._reply(429, {"code": "TOO_MANY_REQUESTS"}, {"Retry-After": "1"})
+        if self.state.chance(self.state.config.error_rate):
+            self.state.count("errors")
+            return self._reply(500, {"code": "INTERNAL_PROCESSING_ERROR"})
+        
+        if auth == "basic" and not self._basic_auth():
+            return self._reply(401, {"error": "invalid_client"})
+        if auth == "bearer" and not self._bearer_auth():
+            self.state.count("unauthorized")
+            return self._reply(401, {"code": "UNAUTHORIZED", "message": "Access token invalid or expired"})
+        
+        getattr(self, handler)(match.groupdict().get("id"))
+    
+    def _basic_auth(self) -> bool:
+        header = self.headers.get("Authorization", "")
+        if not header.startswith("Basic "):
+            return False
+        try:
+            return ":" in base64.b64decode(header[6:]).decode()
+        except ValueError:
+            return False
+    
+    def _bearer_auth(self) -> bool:
+        header = self.headers.get("Authorization", "")
+        return header.startswith("Bearer ") and self.state.token_valid(header[7:])
+    
+    def _json(self) -> Dict:
+        try:
+            return json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+    
+    def _reply(self, status: int, body: Optional[Dict] = None, headers: Optional[Dict[str, str]] = None):
+        content = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(content)))
+        if content:
+            self.send_header("Content-Type", "application/json")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+    
+    # OAuth
+    
+    def momo_token(self, _):
+        token = self.state.issue_token()
+        self._reply(200, {"access_token": token, "token_type": "access_token", "expires_in": self.state.config.token_ttl})
+    
+    def oauth_token(self, _):
+        token = self.state.issue_token()
+        self._reply(200, {"access_token": token, "token_type": "Bearer", "expires_in": self.state.config.token_ttl})
+    
+    def create_api_user(self, _):
+        self._reply(201)
+    
+    def create_api_key(self, _):
+        self._reply(201, {"apiKey": uuid.uuid4().hex})
+    
+    # Collections and disbursements
+    
+    def _store_payment(self, kind: str, party: str):
+        reference_id = self.headers.get("X-Reference-Id")
+        payload = self._json()
+        if not reference_id or "amount" not in payload:
+            return self._reply(400, {"code": "INVALID_PARAMETER"})
+        
+        record = {
+            "amount": payload.get("amount"),
+            "currency": payload.get("currency"),
+            "externalId": payload.get("externalId"),
+            party: payload.get(party),
+            "financialTransactionId": str(uuid.uuid4().int % 10 ** 10),
+        }
+        if not self.state.store(f"{kind}:{reference_id}", record):
+            return self._reply(409, {"code": "RESOURCE_ALREADY_EXIST"})
+        
+        callback_url = self.headers.get("X-Callback-Url")
+        if callback_url:
+            delay = max(record["settles_at"] - time.monotonic(), 0.0)
+            timer = threading.Timer(delay, self._send_callback, (callback_url, f"{kind}:{reference_id}"))
+            timer.daemon = True
+            timer.start()
+        
+        self._reply(202)
+    
+    def _send_callback(self, url: str, key: str):
+        """PUT the settled request to its callback URL, as MTN does."""
+        record = self.state.lookup(key)
+        body = {k: v for k, v in record.items() if k not in ("settles_at", "outcome")}
+        request = urllib.request.Request(
+            url, data=json.dumps(body).encode(), method="PUT", headers={"Content-Type": "application/json"}
+        )
+        try:
+            urllib.request.urlopen(request, timeout=10).close()
+            self.state.count("callbacks")
+        except Exception:
+            self.state.count("callback_errors")
+    
+    def _payment_status(self, key: str):
+        record = self.state.lookup(key)
+        if record is None:
+            return self._reply(404, {"code": "RESOURCE_NOT_FOUND"})
+        
+        body = {k: v for k, v in record.items() if k not in ("settles_at", "outcome")}
+        if record["status"] != "SUCCESSFUL":
+            body.pop("financialTransactionId")
+        if record["status"] == "FAILED":
+            body["reason"] = "APPROVAL_REJECTED" if key.startswith("collection") else "PAYEE_NOT_ALLOWED_TO_RECEIVE"
+        self._reply(200, body)
+    
+    def request_to_pay(self, _):
+        self._store_payment("collection", "payer")
+    
+    def request_to_pay_status(self, reference_id):
+        self._payment_status(f"collection:{reference_id}")
+    
+    def transfer(self, _):
+        self._store_payment("disbursement", "payee")
+    
+    def transfer_status(self, reference_id):
+        self._payment_status(f"disbursement:{reference_id}")
+    
+    def balance(self, _):
+        self._reply(200, {"availableBalance": "1000000.00", "currency": "GHS"})
+    
+    def account_active(self, msisdn):
+        self._reply(200, {"result": is_mtn_number(msisdn)})
+    
+    # bc-authorize (CIBA consent)
+    
+    def bc_authorize(self, _):
+        payload = self._json()
+        auth_req_id = uuid.uuid4().hex
+        self.state.store(f"consent:{auth_req_id}", {"login_hint": payload.get("login_hint")})
+        self._reply(200, {"auth_req_id": auth_req_id, "interval": 5, "expires_in": 300})
+    
+    def ciba_token(self, _):
+        form = parse_qs(self.body.decode())
+        auth_req_id = (form.get("auth_req_id") or [""])[0]
+        record = self.state.lookup(f"consent:{auth_req_id}")
+        if record is None:
+            return self._reply(400, {"error": "invalid_grant"})
+        if record["status"] == "PENDING":
+            return self._reply(400, {"error": "authorization_pending"})
+        if record["status"] == "FAILED":
+            return self._reply(400, {"error": "access_denied"})
+        self.oauth_token(None)
+    
+    # SMS and KYC
+    
+    def send_sms(self, _):
+        payload = self._json()
+        if not payload.get("receiverAddress") or not payload.get("message"):
+            return self._reply(400, {"code": "INVALID_PARAMETER"})
+        message_id = payload.get("clientCorrelator") or uuid.uuid4().hex
+        self._reply(201, {"resourceReference": {"resourceURL": f"/sms/messages/{message_id}"}, "status": "ACCEPTED"})
+    
+    def sms_delivery(self, message_id):
+        self._reply(200, {"messageId": message_id, "deliveryStatus": "DeliveredToTerminal"})
+    
+    def kyc_verify(self, msisdn):
+        if not is_mtn_number(msisdn):
+            return self._reply(404, {"code": "RESOURCE_NOT_FOUND"})
+        self._reply(200, {"msisdn": msisdn, "status": "ACTIVE", "network": "MTN"})
+    
+    def stats(self, _):
+        with self.state.lock:
+            counters = dict(self.state.stats)
+        self._reply(200, counters)
+
+
+def make_server(host: str, port: int, config: StandInConfig) -> ThreadingHTTPServer:
+    """
+    Create a stand-in server; call serve_forever() to run it.
+    
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+        config: Server behaviour
+    
+    Returns:
+        Server, with its StandInState on `state`
+    """
+    server = ThreadingHTTPServer((host, port), MTNStandInHandler)
+    server.daemon_threads = True
+    server.state = StandInState(config)
+    return server
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Local stand-in for the MTN MoMo, SMS and KYC APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=parse_delay, default=parse_delay("fixed:0"), help="Response latency (ms distribution)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Share of requests answered 429")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second before answering 429 (0 disables)")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="OAuth token lifetime in seconds")
+    parser.add_argument("--callback-delay", type=parse_delay, default=parse_delay("fixed:0"), help="Time until payments settle (ms distribution)")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="Share of payments and consents that fail")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible runs")
+    
+    args = parser.parse_args()
+    
+    config = StandInConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit,
+        token_ttl=args.token_ttl,
+        callback_delay=args.callback_delay,
+        reject_rate=args.reject_rate,
+        seed=args.seed
+    )
+    server = make_server(args.host, args.port, config)
+    
+    print(f"MTN stand-in listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Requests served: {dict(server.state.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+MoMo Reconciliation Script
+
+Reconciles payments and payouts against provider records: the mock MoMo
+API's transaction log, or a statement exported from the MTN MoMo partner
+portal as CSV. Every mismatch is written to a CSV report.
+
+Usage:
+    python reconcile_momo.py --mock momo_transactions.jsonl
+    python reconcile_momo.py --statement statement.csv --start 2026-01-01 --end 2026-02-01
+"""
+
+import sys
+import os
+import csv
+import argparse
+from datetime import datetime
+
+# Add parent directory to path for imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.reconciliation_service import (
+    reconciliation_service,
+    iter_mock_transactions,
+    iter_statement_csv,
+    STATEMENT_ID_COLUMN,
+)
+
+REPORT_FIELDS = [
+    "kind", "transaction_id", "entity", "entity_id", "book_amount", "provider_amount", "detail"
+]
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(
+        description="Reconcile payments and payouts with MoMo provider records"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--mock", help="Mock MoMo transaction log (momo_transactions.jsonl)")
+    source.add_argument("--statement", help="MTN MoMo statement exported as CSV")
+    parser.add_argument("--id-column", default=STATEMENT_ID_COLUMN, help="Statement financial transaction ID column")
+    parser.add_argument("--type-column", default=None, help="Statement debit/credit column (default: amount sign)")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Only reconcile from this date")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Only reconcile before this date")
+    parser.add_argument("--output", default="reconciliation_mismatches.csv", help="Mismatch report path")
+    
+    args = parser.parse_args()
+    
+    if args.mock:
+        records = iter_mock_transactions(args.mock)
+    else:
+        records = iter_statement_csv(args.statement, id_column=args.id_column, type_column=args.type_column)
+    
+    db = SessionLocal()
+    
+    try:
+        print("=" * 80)
+        print("MoMo Reconciliation")
+        print("=" * 80)
+        
+        with open(args.output, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            
+            result = reconciliation_service.reconcile(
+                db,
+                records,
+                start=args.start,
+                end=args.end,
+                on_mismatch=writer.writerow
+            )
+        
+        print(f"Provider records: {result['provider_records']} ({result['skipped']} skipped)")
+        print(f"✅ Matched: {result['matched']}")
+        for kind in ("missing_in_db", "missing_at_provider", "duplicate", "amount_mismatch", "type_mismatch"):
+            print(f"{'⚠️ ' if result[kind] else '  '} {kind}: {result[kind]}")
+        print(f"Report written to {args.output}")
+    
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.main import app
 from app.database import Base, get_db
-from app.models import User, UserType
+from app.models import User, UserType, Group, Membership, GroupStatus
 from app.utils import get_password_hash, encrypt_field
 
 # Test database URL (use in-memory SQLite for tests)
@@ -30,6 +30,22 @@ def db_session():
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture
+def commits(db_session):
+    """Count the transactions committed by the test session (not savepoints)."""
+    from sqlalchemy import event
+    
+    counter = {"count": 0}
+    
+    def after_commit(session):
+        if not session.in_nested_transaction():
+            counter["count"] += 1
+    
+    event.listen(db_session, "after_commit", after_commit)
+    yield counter
+    event.remove(db_session, "after_commit", after_commit)
+
+
 @pytest.fixture(scope="function")
 def client(db_session):
     """Create a test client with the test database."""
@@ -81,3 +97,51 @@ def auth_headers(test_token):
     """Get authorization headers with test token."""
     return {"Authorization": f"Bearer {test_token}"}
 
+
+
+@pytest.fixture
+def make_group(db_session):
+    """Factory creating a group with a number of active, KYC-verified members."""
+    counter = {"groups": 0}
+    
+    def _make_group(num_members, contribution_amount=100.0, cash_only=False):
+        counter["groups"] += 1
+        index = counter["groups"]
+        
+        users = []
+        for i in range(num_members):
+            user = User(
+                phone_number=encrypt_field(f"+23324{index:03d}{i:04d}"),
+                name=f"Member {index}-{i + 1}",
+                user_type=UserType.APP,
+                kyc_verified=True
+            )
+            db_session.add(user)
+            users.append(user)
+        db_session.flush()
+        
+        group = Group(
+            group_code=f"TEST{index:04d}",
+            name=f"Group {index}",
+            contribution_amount=contribution_amount,
+            num_cycles=num_members,
+            current_round=1,
+            creator_id=users[0].id,
+            status=GroupStatus.ACTIVE,
+            cash_only=cash_only
+        )
+        db_session.add(group)
+        db_session.flush()
+        
+        for position, user in enumerate(users, start=1):
+            db_session.add(Membership(
+                user_id=user.id,
+                group_id=group.id,
+                rotation_position=position,
+                is_admin=position == 1,
+                is_active=True
+            ))
+        db_session.commit()
+        return group, users
+    
+    return _make_group
@@ -1,12 +1,13 @@
 """Tests for admin CRM endpoints and authorization."""
 import pytest
+from datetime import datetime, timedelta
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.main import app
 from app.database import Base, get_db
-from app.models import User, Group, Payment, Payout, SystemSetting, AdminRole, UserType, PaymentStatus, GroupStatus
+from app.models import User, Group, Payment, Payout, SystemSetting, AdminRole, UserType, PaymentStatus, GroupStatus, JobRun, JobRunStatus
 from app.utils.auth import get_password_hash
 from app.utils.encryption import encrypt_field
 
@@ -349,6 +350,47 @@ def test_update_payment_status(admin_token, db_session, regular_user):
     assert response.status_code == 200
 
 
+
+def test_payment_status_round_trip_keeps_round_stats(admin_token, db_session, regular_user):
+    """Reversing a successful payment uncounts it, and re-approving counts it once."""
+    from app.models import GroupRoundStats
+    from app.utils.group_code import generate_group_code
+    group = Group(
+        group_code=generate_group_code(db_session),
+        name="Round Trip Group",
+        contribution_amount=100.0,
+        num_cycles=5,
+        creator_id=regular_user.id,
+        status=GroupStatus.ACTIVE
+    )
+    db_session.add(group)
+    db_session.commit()
+    
+    payment = Payment(
+        user_id=regular_user.id,
+        group_id=group.id,
+        round_number=1,
+        amount=100.0,
+        status=PaymentStatus.PENDING
+    )
+    db_session.add(payment)
+    db_session.commit()
+    
+    def set_status(status):
+        response = client.put(
+            f"/admin/payments/{payment.id}",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            json={"status": status}
+        )
+        assert response.status_code == 200
+        stats = db_session.query(GroupRoundStats).filter(GroupRoundStats.group_id == group.id).one()
+        db_session.refresh(stats)
+        return stats.paid_count, stats.collected_amount
+    
+    assert set_status("success") == (1, 100.0)
+    assert set_status("failed") == (0, 0.0)
+    assert set_status("success") == (1, 100.0)
+
 # ==================== System Settings Tests ====================
 
 def test_list_settings(admin_token):
@@ -533,6 +575,60 @@ def test_finance_admin_cannot_create_admins(finance_admin_token):
     assert response.status_code == 403
 
 
+# ==================== Scheduler Monitoring Tests ====================
+
+def test_list_job_runs(admin_token, db_session):
+    """Test scheduler job run history endpoint."""
+    now = datetime.utcnow()
+    db_session.add_all([
+        JobRun(job_id="daily_payment_check", worker_id="w1:1", status=JobRunStatus.SUCCESS,
+               started_at=now - timedelta(minutes=5), finished_at=now, duration_seconds=300.0,
+               rows_scanned=10, payments_attempted=4, successes=3, failures=1),
+        JobRun(job_id="process_pending_payouts", worker_id="w1:1", status=JobRunStatus.FAILED,
+               started_at=now, finished_at=now, duration_seconds=1.0, error="boom"),
+    ])
+    db_session.commit()
+    
+    response = client.get(
+        "/admin/scheduler/runs?job_id=daily_payment_check",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    runs = response.json()
+    assert len(runs) == 1
+    assert runs[0]["payments_attempted"] == 4
+    assert runs[0]["worker_id"] == "w1:1"
+
+
+def test_job_metrics(admin_token, db_session):
+    """Test scheduler metrics in JSON and Prometheus formats."""
+    now = datetime.utcnow()
+    db_session.add(JobRun(
+        job_id="daily_payment_check", worker_id="w1:1", status=JobRunStatus.SUCCESS,
+        started_at=now - timedelta(hours=6), finished_at=now, duration_seconds=21600.0,
+        rows_scanned=10, payments_attempted=4, successes=3, failures=1
+    ))
+    db_session.commit()
+    
+    response = client.get(
+        "/admin/scheduler/metrics",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    job = response.json()["jobs"][0]
+    assert job["job_id"] == "daily_payment_check"
+    assert job["failures"] == 1
+    assert job["window_utilization"] == 0.25
+    
+    response = client.get(
+        "/admin/scheduler/metrics?format=prometheus",
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    assert 'sususave_job_runs{job="daily_payment_check"} 1' in response.text
+    assert "# TYPE sususave_job_runs gauge" in response.text
+
+
 # ==================== Cleanup ====================
 
 @pytest.fixture(scope="module", autouse=True)
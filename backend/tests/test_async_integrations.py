@@ -0,0 +1,71 @@
+"""Tests for the async MTN clients."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.integrations import mtn_async_integration as async_module
+from app.integrations.token_manager import token_manager
+
+
+@pytest.fixture
+def mtn(monkeypatch):
+    """Route the async clients to a fake MTN API and record the requests it receives."""
+    received = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        received.append(request)
+        path = request.url.path
+        if path.endswith("/token/") or path.endswith("/oauth/token"):
+            return httpx.Response(200, json={"access_token": "token-1", "expires_in": 3600})
+        if "/requesttopay/" in path:
+            return httpx.Response(200, json={"status": "SUCCESSFUL", "financialTransactionId": "FT-1"})
+        if path.endswith("/requesttopay"):
+            return httpx.Response(202)
+        if path.endswith("/active"):
+            return httpx.Response(200, json={"result": True})
+        if path.endswith("/verify"):
+            return httpx.Response(404)
+        return httpx.Response(500)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(async_module, "get_async_client", lambda: client)
+    for service in (async_module.async_mtn_momo_service, async_module.async_mtn_kyc_service):
+        monkeypatch.setattr(service, "enabled", True)
+    monkeypatch.setattr(async_module.async_mtn_momo_service, "api_user", "async-user")
+    monkeypatch.setattr(async_module.async_mtn_momo_service, "api_key", "async-key")
+    monkeypatch.setattr(async_module.async_mtn_momo_service, "subscription_key", "async-subscription")
+    monkeypatch.setattr(async_module.async_mtn_kyc_service, "consumer_key", "async-consumer")
+    monkeypatch.setattr(async_module.async_mtn_kyc_service, "consumer_secret", "async-secret")
+    token_manager.clear()
+    yield received
+    token_manager.clear()
+
+
+def test_concurrent_momo_calls_share_one_token(mtn):
+    """Many concurrent collections and status checks need a single token request."""
+    momo = async_module.async_mtn_momo_service
+
+    async def run():
+        return await asyncio.gather(
+            *(momo.request_to_pay("0241234567", 50.0, f"REF-{i}") for i in range(20)),
+            *(momo.get_transaction_status(f"ref-{i}") for i in range(20))
+        )
+
+    results = asyncio.run(run())
+
+    assert [r["status"] for r in results] == ["pending"] * 20 + ["successful"] * 20
+    assert results[0]["phone_number"] == "233241234567"
+    assert results[20]["financial_transaction_id"] == "FT-1"
+    assert sum(r.url.path.endswith("/token/") for r in mtn) == 1
+    assert len(mtn) == 41
+
+
+def test_async_kyc_combines_concurrent_checks(mtn):
+    """The phone and MoMo checks run together and combine like the blocking client's."""
+    result = asyncio.run(async_module.async_mtn_kyc_service.perform_kyc_verification("+233241234567"))
+
+    assert result["verified"] is False
+    assert result["phone_verified"] is False
+    assert result["momo_verified"] is True
+    assert result["message"] == "Phone number verification failed"
@@ -0,0 +1,72 @@
+"""Tests for the collection planner that spreads automatic debits over the month."""
+from datetime import date
+
+from app.models import Payment, PaymentPreference, PaymentStatus
+from app.services.collection_service import CollectionService
+
+
+def test_assign_collection_days_balances_load(db_session, make_group):
+    """Members without a chosen day are spread over the least loaded days."""
+    group, users = make_group(4)
+    # Two members chose the 1st
+    for user in users[:2]:
+        db_session.add(PaymentPreference(user_id=user.id, auto_pay_day=1))
+    db_session.commit()
+
+    assigned = CollectionService.assign_collection_days(db_session)
+
+    assert assigned == 2
+    prefs = {p.user_id: p for p in db_session.query(PaymentPreference).all()}
+    assert prefs[users[0].id].assigned_pay_day is None
+    new_days = {prefs[user.id].assigned_pay_day for user in users[2:]}
+    assert len(new_days) == 2
+    assert 1 not in new_days
+
+    # Nothing left to assign on the next run
+    assert CollectionService.assign_collection_days(db_session) == 0
+
+
+def test_due_collections_follow_pay_day(db_session, make_group):
+    """Members are due only once their collection day is reached."""
+    group, users = make_group(3)
+    db_session.add_all([
+        PaymentPreference(user_id=users[0].id, auto_pay_day=5),
+        PaymentPreference(user_id=users[1].id, auto_pay_day=20),
+        PaymentPreference(user_id=users[2].id, assigned_pay_day=10),
+    ])
+    db_session.commit()
+
+    due = CollectionService.get_due_collections(db_session, today=date(2026, 3, 12))
+
+    assert sorted(m.user_id for m, _ in due) == [users[0].id, users[2].id]
+
+
+def test_due_collections_skip_paid_and_cash_groups(db_session, make_group):
+    """Members with a payment this round and cash-only groups are not debited."""
+    group, users = make_group(2)
+    cash_group, cash_users = make_group(1, cash_only=True)
+    for user in users + cash_users:
+        db_session.add(PaymentPreference(user_id=user.id, auto_pay_day=1))
+    db_session.add(Payment(
+        user_id=users[0].id,
+        group_id=group.id,
+        round_number=1,
+        amount=group.contribution_amount,
+        status=PaymentStatus.FAILED
+    ))
+    db_session.commit()
+
+    due = CollectionService.get_due_collections(db_session, today=date(2026, 3, 12))
+
+    assert [m.user_id for m, _ in due] == [users[1].id]
+
+
+def test_due_collections_month_end(db_session, make_group):
+    """Days past the end of a short month fall on its last day."""
+    group, users = make_group(1)
+    db_session.add(PaymentPreference(user_id=users[0].id, auto_pay_day=31))
+    db_session.commit()
+
+    assert CollectionService.get_due_collections(db_session, today=date(2026, 2, 27)) == []
+    due = CollectionService.get_due_collections(db_session, today=date(2026, 2, 28))
+    assert [m.user_id for m, _ in due] == [users[0].id]
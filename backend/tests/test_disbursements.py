@@ -0,0 +1,271 @@
+"""Tests for the bulk payout disbursement engine."""
+import pytest
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+
+from app.models import AuditLog, Payout, PayoutStatus, GroupStatus
+from app.services import disbursement_service as disbursement_module
+from app.services import PayoutService
+from app.services.disbursement_service import DisbursementService
+
+
+@pytest.fixture
+def transfers(monkeypatch):
+    """Record MoMo transfers; phone numbers in `fail` are rejected."""
+    state = {"sent": [], "fail": set()}
+
+    def credit_wallet(phone_number, amount, reference=""):
+        if phone_number in state["fail"]:
+            raise Exception("Transfer rejected")
+        state["sent"].append(phone_number)
+        return f"TX-{len(state['sent'])}"
+
+    monkeypatch.setattr(disbursement_module.momo_api, "credit_wallet", credit_wallet)
+    return state
+
+
+def make_payout(db_session, group, recipient, amount=300.0):
+    """Create an approved payout for the group's current round."""
+    payout = Payout(
+        group_id=group.id,
+        round_number=group.current_round,
+        recipient_id=recipient.id,
+        amount=amount,
+        status=PayoutStatus.APPROVED
+    )
+    db_session.add(payout)
+    db_session.commit()
+    return payout
+
+
+def test_disburse_in_batches(db_session, make_group, transfers, monkeypatch):
+    """Payouts are paid in batches and groups advance or complete."""
+    monkeypatch.setattr(disbursement_module.settings, "PAYOUT_DISBURSEMENT_BATCH_SIZE", 2)
+    groups = [make_group(2) for _ in range(3)]
+    groups[2][0].current_round = 2
+    db_session.commit()
+    payouts = [make_payout(db_session, group, users[group.current_round - 1]) for group, users in groups]
+
+    stats = DisbursementService.disburse(db_session, DisbursementService.get_disbursable_payouts(db_session))
+
+    assert stats == {"attempted": 3, "paid": 3, "failed": 0, "unsettled": 0, "kyc_blocked": 0, "deferred": 0}
+    assert all(p.status == PayoutStatus.PAID and p.transaction_id for p in payouts)
+    assert [group.current_round for group, _ in groups] == [2, 2, 2]
+    assert groups[2][0].status == GroupStatus.COMPLETED
+    assert DisbursementService.get_disbursable_payouts(db_session) == []
+
+
+def test_disburse_prechecks_and_failures(db_session, make_group, transfers, monkeypatch):
+    """Unverified recipients are blocked, payouts beyond the float wait, rejected transfers fail."""
+    monkeypatch.setattr(disbursement_module.settings, "REQUIRE_KYC_FOR_PAYMENTS", True)
+    monkeypatch.setattr(DisbursementService, "available_float", staticmethod(lambda: 500.0))
+    unverified, unverified_users = make_group(1)
+    rejected, rejected_users = make_group(1)
+    paid, paid_users = make_group(1)
+    deferred, deferred_users = make_group(1)
+    unverified_users[0].kyc_verified = False
+    transfers["fail"].add(disbursement_module.decrypt_field(rejected_users[0].phone_number))
+
+    payouts = [
+        make_payout(db_session, unverified, unverified_users[0]),
+        make_payout(db_session, rejected, rejected_users[0], amount=200.0),
+        make_payout(db_session, paid, paid_users[0], amount=250.0),
+        make_payout(db_session, deferred, deferred_users[0], amount=100.0),
+    ]
+
+    stats = DisbursementService.disburse(db_session, payouts)
+
+    assert stats == {"attempted": 2, "paid": 1, "failed": 1, "unsettled": 0, "kyc_blocked": 1, "deferred": 1}
+    assert [p.status for p in payouts] == [
+        PayoutStatus.BLOCKED, PayoutStatus.FAILED, PayoutStatus.PAID, PayoutStatus.APPROVED
+    ]
+    assert paid.status == GroupStatus.COMPLETED
+    assert db_session.query(AuditLog).filter(AuditLog.action == "execute_failed").count() == 2
+
+
+def test_failed_payouts_back_off_then_block(db_session, make_group, transfers, monkeypatch):
+    """Failed transfers are re-queued after a growing delay and blocked after the last attempt."""
+    monkeypatch.setattr(disbursement_module.settings, "PAYOUT_MAX_ATTEMPTS", 2)
+    group, users = make_group(1)
+    transfers["fail"].add(disbursement_module.decrypt_field(users[0].phone_number))
+    payout = make_payout(db_session, group, users[0])
+
+    DisbursementService.disburse(db_session, [payout])
+    assert (payout.status, payout.attempts, payout.last_error) == (PayoutStatus.FAILED, 1, "Transfer rejected")
+
+    # Not re-queued before the backoff runs out
+    assert PayoutService.queue_for_disbursement(db_session, [payout]) == 0
+    assert PayoutService.queue_for_disbursement(db_session, [payout], now=payout.next_attempt_at) == 1
+
+    DisbursementService.disburse_queue(db_session)
+    assert (payout.status, payout.attempts) == (PayoutStatus.BLOCKED, 2)
+    assert PayoutService.queue_for_disbursement(db_session, [payout], now=datetime.utcnow() + timedelta(days=30)) == 0
+
+
+def test_invalid_account_blocks_payout(db_session, make_group, monkeypatch):
+    """Transfers to invalid accounts are not retried."""
+    def credit_wallet(phone_number, amount, reference=""):
+        raise disbursement_module.InvalidAccountError(f"Invalid MoMo account: {phone_number}")
+
+    monkeypatch.setattr(disbursement_module.momo_api, "credit_wallet", credit_wallet)
+    group, users = make_group(1)
+    payout = make_payout(db_session, group, users[0])
+
+    DisbursementService.disburse(db_session, [payout])
+
+    assert (payout.status, payout.attempts, payout.next_attempt_at) == (PayoutStatus.BLOCKED, 1, None)
+
+
+def test_claimed_payouts_are_not_paid_twice(db_session, make_group, transfers):
+    """Payouts claimed by one worker are skipped by the queue and by direct execution."""
+    first, first_users = make_group(2)
+    second, second_users = make_group(2)
+    claimed = make_payout(db_session, first, first_users[0])
+    queued = make_payout(db_session, second, second_users[0])
+
+    assert DisbursementService.claim_payouts(db_session, limit=1) == [claimed]
+    assert claimed.status == PayoutStatus.PROCESSING and claimed.claimed_by
+
+    with pytest.raises(HTTPException) as exc:
+        PayoutService.execute_payout(db_session, claimed.id)
+    assert exc.value.status_code == 409
+
+    stats = DisbursementService.disburse_queue(db_session)
+
+    assert stats["paid"] == 1
+    assert queued.status == PayoutStatus.PAID
+    assert claimed.status == PayoutStatus.PROCESSING
+    assert len(transfers["sent"]) == 1
+
+    later = datetime.utcnow() + timedelta(minutes=disbursement_module.settings.PAYOUT_CLAIM_TIMEOUT_MINUTES + 1)
+    assert DisbursementService.get_stale_claims(db_session, now=later) == [claimed]
+
+
+def test_stale_round_payout_does_not_advance_group(db_session, make_group, transfers):
+    """A payout for a round the group already left does not move the group again."""
+    group, users = make_group(3)
+    old = make_payout(db_session, group, users[0])
+    group.current_round = 2
+    db_session.commit()
+
+    DisbursementService.disburse(db_session, [old])
+
+    assert old.status == PayoutStatus.PAID
+    assert group.current_round == 2
+
+
+def test_real_momo_uses_disbursement_api(db_session, make_group, monkeypatch):
+    """With real MoMo, payouts use MTN transfers and the disbursement balance."""
+    mtn = disbursement_module.mtn_momo_service
+    state = {"balances": [], "transfers": {}}
+    outcomes = {}
+
+    def transfer(phone_number, amount, reference, reference_id=None, **kwargs):
+        state["transfers"][reference_id] = phone_number
+        return outcomes.get(phone_number, {"status": "pending", "reference_id": reference_id})
+
+    def get_transfer_status(reference_id):
+        return {"status": "successful", "financial_transaction_id": f"FT-{state['transfers'][reference_id][-4:]}"}
+
+    def get_account_balance(product="collection"):
+        state["balances"].append(product)
+        return {"available_balance": "10000"}
+
+    monkeypatch.setattr(disbursement_module.settings, "ENABLE_REAL_MOMO", True)
+    monkeypatch.setattr(mtn, "enabled", True)
+    monkeypatch.setattr(mtn, "transfer", transfer)
+    monkeypatch.setattr(mtn, "get_transfer_status", get_transfer_status)
+    monkeypatch.setattr(mtn, "get_account_balance", get_account_balance)
+    monkeypatch.setattr(disbursement_module.momo_api, "credit_wallet", lambda **kwargs: pytest.fail("mock used"))
+
+    groups = [make_group(1) for _ in range(3)]
+    payouts = [make_payout(db_session, group, users[0]) for group, users in groups]
+    phones = [disbursement_module.decrypt_field(users[0].phone_number) for _, users in groups]
+    outcomes[phones[1]] = {"status": "rejected", "message": "400 Bad Request"}
+    outcomes[phones[2]] = {"status": "error", "message": "Read timed out"}
+
+    stats = DisbursementService.disburse(db_session, payouts)
+
+    assert state["balances"] == ["disbursement"]
+    assert stats["paid"] == 1 and stats["failed"] == 1 and stats["unsettled"] == 1
+    assert payouts[0].status == PayoutStatus.PAID
+    assert payouts[0].transaction_id == f"FT-{phones[0][-4:]}"
+    # Validation failures are not retried
+    assert payouts[1].status == PayoutStatus.BLOCKED
+    # Outcome unknown: kept for reconciliation with the reference MTN knows
+    assert payouts[2].status == PayoutStatus.PROCESSING
+    assert state["transfers"][payouts[2].provider_reference] == phones[2]
+
+
+@pytest.fixture
+def mtn_transfers(monkeypatch):
+    """Real MoMo mode with stubbed MTN transfers; `statuses` maps reference IDs to their reported status."""
+    mtn = disbursement_module.mtn_momo_service
+    state = {"sent": {}, "statuses": {}, "default": {"status": "pending"}}
+
+    def transfer(phone_number, amount, reference, reference_id=None, **kwargs):
+        state["sent"][reference_id] = phone_number
+        return {"status": "pending", "reference_id": reference_id}
+
+    def get_transfer_status(reference_id):
+        return state["statuses"].get(reference_id, state["default"])
+
+    monkeypatch.setattr(disbursement_module.settings, "ENABLE_REAL_MOMO", True)
+    monkeypatch.setattr(mtn, "enabled", True)
+    monkeypatch.setattr(mtn, "transfer", transfer)
+    monkeypatch.setattr(mtn, "get_transfer_status", get_transfer_status)
+    monkeypatch.setattr(mtn, "get_account_balance", lambda product="collection": None)
+    monkeypatch.setattr(disbursement_module.momo_api, "credit_wallet", lambda **kwargs: pytest.fail("mock used"))
+    return state
+
+
+def test_execute_payout_uses_mtn_with_real_momo(db_session, make_group, mtn_transfers):
+    """Manual execution sends the transfer through MTN, like the payout job."""
+    group, users = make_group(2)
+    payout = make_payout(db_session, group, users[0])
+
+    # MTN has not completed the transfer yet
+    assert PayoutService.execute_payout(db_session, payout.id).status == PayoutStatus.PROCESSING
+    assert mtn_transfers["sent"] == {payout.provider_reference: disbursement_module.decrypt_field(users[0].phone_number)}
+    assert group.current_round == 1
+
+    mtn_transfers["default"] = {"status": "SUCCESSFUL", "financial_transaction_id": "FT-2"}
+    other_group, other_users = make_group(2)
+    paid = PayoutService.execute_payout(db_session, make_payout(db_session, other_group, other_users[0]).id)
+
+    assert (paid.status, paid.transaction_id) == (PayoutStatus.PAID, "FT-2")
+    assert other_group.current_round == 2
+
+
+def test_settle_transfers_marks_pending_transfers(db_session, make_group, mtn_transfers):
+    """Pending transfers are polled until MTN settles them; unknown ones fail only after the claim timeout."""
+    groups = [make_group(2) for _ in range(4)]
+    payouts = [make_payout(db_session, group, users[0]) for group, users in groups]
+    DisbursementService.disburse(db_session, payouts)
+    assert all(payout.status == PayoutStatus.PROCESSING for payout in payouts)
+    references = [payout.provider_reference for payout in payouts]
+
+    # Claims younger than the settle interval are left to the worker sending them
+    assert DisbursementService.settle_transfers(db_session)["checked"] == 0
+
+    mtn_transfers["statuses"].update({
+        references[0]: {"status": "SUCCESSFUL", "financial_transaction_id": "FT-1"},
+        references[1]: {"status": "FAILED", "reason": "PAYEE_NOT_FOUND"},
+        references[3]: {"status": "not_found", "message": "Resource not found"},
+    })
+    later = datetime.utcnow() + timedelta(minutes=disbursement_module.settings.PAYOUT_SETTLE_INTERVAL_MINUTES + 1)
+    stats = DisbursementService.settle_transfers(db_session, now=later)
+
+    assert stats == {"checked": 4, "paid": 1, "failed": 1, "unsettled": 2}
+    assert (payouts[0].status, payouts[0].transaction_id) == (PayoutStatus.PAID, "FT-1")
+    assert groups[0][0].current_round == 2
+    assert payouts[1].status == PayoutStatus.BLOCKED
+    assert payouts[2].status == payouts[3].status == PayoutStatus.PROCESSING
+
+    # A transfer MTN still does not know after the claim timeout never reached it
+    lost = datetime.utcnow() + timedelta(minutes=disbursement_module.settings.PAYOUT_CLAIM_TIMEOUT_MINUTES + 1)
+    stats = DisbursementService.settle_transfers(db_session, now=lost)
+
+    assert stats == {"checked": 2, "paid": 0, "failed": 1, "unsettled": 1}
+    assert (payouts[3].status, payouts[3].last_error) == (PayoutStatus.FAILED, "Transfer not found at MTN")
+    assert payouts[2].status == PayoutStatus.PROCESSING
@@ -0,0 +1,45 @@
+"""Tests for the pooled MTN HTTP session."""
+from app.config import settings
+from app.integrations import http_session
+from app.integrations.mtn_momo_integration import mtn_momo_service
+from app.integrations.mtn_sms_integration import mtn_sms_service
+
+
+def test_integrations_share_one_pooled_session():
+    """All MTN integrations reuse the same keep-alive session and per-host pool."""
+    session = http_session.get_session()
+
+    assert mtn_momo_service.session is session
+    assert mtn_sms_service.session is session
+
+    adapter = session.get_adapter("https://sandbox.momodeveloper.mtn.com")
+    assert adapter._pool_maxsize == settings.MTN_HTTP_POOL_MAXSIZE
+    assert adapter.max_retries.total == settings.MTN_HTTP_MAX_RETRIES
+    assert "GET" in adapter.max_retries.allowed_methods
+    assert "POST" not in adapter.max_retries.allowed_methods
+
+
+def test_integrations_use_new_session_after_close():
+    """Closing the shared session (app shutdown) does not leave the singletons holding it."""
+    closed = http_session.get_session()
+
+    http_session.close_session()
+
+    assert mtn_momo_service.session is not closed
+    assert mtn_sms_service.session is http_session.get_session()
+
+
+def test_default_timeouts_apply_unless_overridden(monkeypatch):
+    """Requests get (connect, read) timeouts by default; callers can still pass their own."""
+    session = http_session.build_session()
+    sent = []
+    monkeypatch.setattr("requests.Session.request",
+                        lambda self, method, url, **kwargs: sent.append(kwargs["timeout"]))
+
+    session.get("https://api.mtn.com/v1/status")
+    session.post("https://api.mtn.com/v1/token", timeout=2)
+
+    assert sent == [
+        (settings.MTN_HTTP_CONNECT_TIMEOUT_SECONDS, settings.MTN_HTTP_READ_TIMEOUT_SECONDS),
+        2,
+    ]
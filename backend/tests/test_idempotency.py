@@ -0,0 +1,141 @@
+"""Tests for Idempotency-Key request deduplication."""
+import pytest
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from app.models import IdempotencyKey, Payment, PaymentStatus
+from app.schemas import PaymentResponse
+from app.services.idempotency_service import IdempotencyService
+
+ENDPOINT = "POST /payments/manual-trigger"
+
+
+@pytest.fixture
+def payment(db_session, make_group):
+    """A successful payment returned by the handlers under test."""
+    group, users = make_group(1)
+    payment = Payment(
+        user_id=users[0].id,
+        group_id=group.id,
+        round_number=1,
+        amount=group.contribution_amount,
+        status=PaymentStatus.SUCCESS,
+        transaction_id="TX-1"
+    )
+    db_session.add(payment)
+    db_session.commit()
+    return payment
+
+
+def run(db_session, user_id, handler, key="key-1", payload=None):
+    """Execute a handler under an idempotency key."""
+    return IdempotencyService.execute(
+        db=db_session,
+        key=key,
+        user_id=user_id,
+        endpoint=ENDPOINT,
+        payload=payload or {"group_id": 1},
+        response_model=PaymentResponse,
+        handler=handler
+    )
+
+
+def test_retry_replays_stored_response(db_session, payment):
+    """A retry with the same key returns the first response without running the handler."""
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return payment
+
+    first = run(db_session, payment.user_id, handler)
+    second = run(db_session, payment.user_id, handler)
+
+    assert len(calls) == 1
+    assert first["transaction_id"] == "TX-1"
+    assert isinstance(second, JSONResponse)
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert second.body == JSONResponse(content=first).body
+
+
+def test_key_reused_for_different_request(db_session, payment):
+    """Reusing a key with another payload is rejected."""
+    run(db_session, payment.user_id, lambda: payment)
+
+    with pytest.raises(HTTPException) as exc:
+        run(db_session, payment.user_id, lambda: payment, payload={"group_id": 2})
+
+    assert exc.value.status_code == 422
+
+
+def test_client_errors_are_replayed(db_session, payment):
+    """4xx responses are stored; server errors release the key."""
+    def insufficient_funds():
+        raise HTTPException(status_code=402, detail="Insufficient funds")
+
+    def crash():
+        raise RuntimeError("MoMo timeout")
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            run(db_session, payment.user_id, insufficient_funds)
+        assert exc.value.status_code == 402
+        assert exc.value.detail == "Insufficient funds"
+
+    with pytest.raises(RuntimeError):
+        run(db_session, payment.user_id, crash, key="key-2")
+    assert db_session.query(IdempotencyKey).filter(IdempotencyKey.key == "key-2").count() == 0
+
+    assert run(db_session, payment.user_id, lambda: payment, key="key-2")["id"] == payment.id
+
+
+def test_failures_after_money_was_sent_are_stored(db_session, make_group, monkeypatch):
+    """A crash after the MoMo debit keeps the key, so a retry cannot debit the member again."""
+    from app.services import PaymentService
+    from app.services import payment_service as payment_module
+    group, users = make_group(1)
+    debits = []
+
+    def debit_wallet(**kwargs):
+        debits.append(kwargs)
+        return "TX-DEBITED"
+
+    def broken_ledger(db, payment):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(payment_module.momo_api, "debit_wallet", debit_wallet)
+    monkeypatch.setattr(payment_module.LedgerService, "record_contribution", broken_ledger)
+
+    def trigger():
+        return PaymentService.process_payment(db_session, users[0].id, group.id)
+
+    with pytest.raises(RuntimeError):
+        run(db_session, users[0].id, trigger)
+
+    with pytest.raises(HTTPException) as exc:
+        run(db_session, users[0].id, trigger)
+
+    assert exc.value.status_code == 500
+    assert "Check its status" in exc.value.detail
+    assert len(debits) == 1
+
+
+def test_expired_keys(db_session, payment):
+    """Expired keys run the handler again and are purged."""
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return payment
+
+    run(db_session, payment.user_id, handler)
+    db_session.query(IdempotencyKey).update({IdempotencyKey.expires_at: datetime.utcnow() - timedelta(minutes=1)})
+    db_session.commit()
+
+    run(db_session, payment.user_id, handler)
+    assert len(calls) == 2
+
+    db_session.query(IdempotencyKey).update({IdempotencyKey.expires_at: datetime.utcnow() - timedelta(minutes=1)})
+    db_session.commit()
+    assert IdempotencyService.purge_expired(db_session) == 1
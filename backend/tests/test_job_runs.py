@@ -0,0 +1,53 @@
+"""Tests for scheduler job run tracking and retention."""
+from datetime import datetime, timedelta
+
+from app.models import JobRun, JobRunStatus
+from app.services.job_run_service import JobRunService
+
+
+def test_job_runs_when_its_run_cannot_be_recorded(db_session, monkeypatch):
+    """A failing job_runs insert is logged and the job still runs."""
+    def broken_start(db, job_id):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(JobRunService, "start_run", broken_start)
+    ran = []
+
+    with JobRunService.track("dispatch_outbox") as run:
+        run.successes += 1
+        ran.append(run.job_id)
+
+    assert ran == ["dispatch_outbox"]
+    assert db_session.query(JobRun).count() == 0
+
+
+def test_purge_old_runs_keeps_recent_and_running(db_session):
+    """Finished runs past the retention window are deleted."""
+    now = datetime.utcnow()
+    db_session.add_all([
+        JobRun(job_id="dispatch_outbox", worker_id="w1:1", status=JobRunStatus.SUCCESS,
+               started_at=now - timedelta(days=60)),
+        JobRun(job_id="dispatch_outbox", worker_id="w1:1", status=JobRunStatus.RUNNING,
+               started_at=now - timedelta(days=60)),
+        JobRun(job_id="dispatch_outbox", worker_id="w1:1", status=JobRunStatus.SUCCESS,
+               started_at=now - timedelta(days=1)),
+    ])
+    db_session.commit()
+
+    assert JobRunService.purge_old_runs(db_session, now) == 1
+    assert db_session.query(JobRun).count() == 2
+
+
+def test_every_scheduled_job_has_a_window(monkeypatch):
+    """Jobs without a window cannot be reported as overdue."""
+    import importlib
+    scheduler_module = importlib.import_module("app.cron.scheduler")
+    monkeypatch.setattr(scheduler_module.settings, "ENABLE_SCHEDULER", True)
+    susu_scheduler = scheduler_module.SusuScheduler()
+    monkeypatch.setattr(susu_scheduler.scheduler, "start", lambda: None)
+
+    susu_scheduler.start()
+
+    job_ids = {job.id for job in susu_scheduler.scheduler.get_jobs()}
+    assert "dispatch_interactive_outbox" in job_ids
+    assert job_ids <= set(JobRunService.job_windows())
@@ -0,0 +1,150 @@
+"""Tests for KYC result caching and bulk verification."""
+import threading
+
+import pytest
+
+from app.models import User, UserType
+from app.services import kyc_service as kyc_module
+from app.services.kyc_service import KYCService, kyc_cache
+from app.utils import encrypt_field
+
+
+@pytest.fixture
+def mtn_kyc(monkeypatch):
+    """Fake MTN KYC checks; numbers ending in 9 fail verification."""
+    calls = []
+    lock = threading.Lock()
+
+    def perform_kyc_verification(phone_number):
+        with lock:
+            calls.append(phone_number)
+        verified = not phone_number.endswith("9")
+        return {"verified": verified, "provider": "MTN", "message": "ok" if verified else "Not an MTN number"}
+
+    monkeypatch.setattr(kyc_module.settings, "ENABLE_MTN_KYC", True)
+    monkeypatch.setattr(kyc_module.mtn_kyc_service, "perform_kyc_verification", perform_kyc_verification)
+    kyc_cache.clear()
+    yield calls
+    kyc_cache.clear()
+
+
+def add_users(db_session, phones):
+    users = [
+        User(phone_number=encrypt_field(phone), name=f"User {phone[-4:]}", user_type=UserType.APP)
+        for phone in phones
+    ]
+    db_session.add_all(users)
+    db_session.commit()
+    return users
+
+
+def test_verify_user_reuses_cached_outcome(db_session, mtn_kyc, monkeypatch):
+    """A number checked moments ago is not sent to MTN again, in any format."""
+    user, = add_users(db_session, ["+233241110001"])
+
+    first = KYCService.verify_user(db_session, user.id, "+233241110001")
+    second = KYCService.verify_user(db_session, user.id, "0241110001")
+
+    assert first["verified"] and second["verified"]
+    assert mtn_kyc == ["+233241110001"]
+
+    # Failed outcomes are only kept for KYC_CACHE_FAILED_TTL_SECONDS
+    monkeypatch.setattr(kyc_module.settings, "KYC_CACHE_FAILED_TTL_SECONDS", 0)
+    failing, = add_users(db_session, ["+233241110009"])
+    KYCService.verify_user(db_session, failing.id, "+233241110009")
+    KYCService.verify_user(db_session, failing.id, "+233241110009")
+    assert mtn_kyc.count("+233241110009") == 2
+
+
+def test_bulk_verify_commits_per_batch_and_reports_progress(db_session, mtn_kyc, commits, monkeypatch):
+    """Users are checked concurrently, committed per batch and reported as they go."""
+    monkeypatch.setattr(kyc_module.settings, "KYC_BULK_BATCH_SIZE", 2)
+    monkeypatch.setattr(kyc_module.settings, "KYC_BULK_CONCURRENCY", 4)
+    users = add_users(db_session, [f"+23324222000{i}" for i in range(4)] + ["+233242220009"])
+    users[1].phone_number = "not-encrypted"
+    db_session.commit()
+    commits["count"] = 0
+    progress = []
+
+    results = KYCService.bulk_verify_users(db_session, progress=lambda done, total: progress.append((done, total)))
+
+    assert progress == [(2, 5), (4, 5), (5, 5)]
+    assert commits["count"] == 3
+    assert results["total"] == 5
+    assert results["verified"] == 3
+    assert results["failed"] == 2
+    assert sorted(e["user_id"] for e in results["errors"]) == [users[1].id, users[4].id]
+    db_session.expire_all()
+    assert [u.kyc_verified for u in db_session.query(User).order_by(User.id)] == [True, False, True, True, False]
+    assert len(mtn_kyc) == 4
+
+
+def test_register_defers_kyc_and_payment_preference(db_session, mtn_kyc, monkeypatch):
+    """Signup commits the user without calling MTN; the background task finishes setup."""
+    from fastapi import BackgroundTasks
+    from app.models import KYCStatus, PaymentMethod, PaymentPreference
+    from app.routers.auth import register
+    from app.schemas import UserCreate
+    from app.services import onboarding_service as onboarding_module
+    from tests.conftest import TestingSessionLocal
+    monkeypatch.setattr(onboarding_module, "SessionLocal", TestingSessionLocal)
+    background_tasks = BackgroundTasks()
+
+    user = register(
+        UserCreate(phone_number="+233243330001", name="New User", password="secret123", payment_method="auto"),
+        background_tasks,
+        db_session
+    )
+
+    assert mtn_kyc == []
+    assert KYCService.check_verification_status(user)["status"] == "pending"
+    assert db_session.query(PaymentPreference).count() == 0
+
+    for task in background_tasks.tasks:
+        task.func(*task.args, **task.kwargs)
+
+    db_session.expire_all()
+    assert mtn_kyc == ["+233243330001"]
+    assert user.kyc_verified and user.kyc_status == KYCStatus.VERIFIED
+    assert KYCService.check_verification_status(user)["status"] == "verified"
+    assert db_session.query(PaymentPreference).one().payment_method == PaymentMethod.AUTO
+
+
+def test_kyc_status_reports_unreachable_mtn(db_session, mtn_kyc, monkeypatch):
+    """A check that could not reach MTN is reported as an error to retry, not as a rejection."""
+    def perform_kyc_verification(phone_number):
+        raise ConnectionError("MTN unavailable")
+
+    monkeypatch.setattr(kyc_module.mtn_kyc_service, "perform_kyc_verification", perform_kyc_verification)
+    user, = add_users(db_session, ["+233243330002"])
+
+    result = KYCService.verify_user(db_session, user.id, "+233243330002")
+
+    assert not result["success"]
+    db_session.expire_all()
+    assert KYCService.check_verification_status(user)["status"] == "error"
+
+
+def test_provider_errors_are_not_cached_or_applied(db_session, mtn_kyc, monkeypatch):
+    """An MTN outage neither caches a failure nor downgrades verified users."""
+    from app.integrations.mtn_kyc_integration import mtn_kyc_service
+
+    verified, = add_users(db_session, ["+233244440001"])
+    KYCService.verify_user(db_session, verified.id, "+233244440001")
+    kyc_cache.clear()
+
+    outage = mtn_kyc_service._combine_kyc_results(
+        "+233244440001",
+        {"verified": False, "error": True, "message": "Verification failed: 503", "provider": "error"},
+        {"valid": True, "has_momo": True}
+    )
+    assert outage["error"] and not outage["verified"]
+    monkeypatch.setattr(kyc_module.mtn_kyc_service, "perform_kyc_verification", lambda phone_number: outage)
+
+    results = KYCService.bulk_verify_users(db_session, user_ids=[verified.id])
+
+    assert results["failed"] == 1 and results["errors"][0]["message"] == "Verification failed: 503"
+    assert kyc_cache.get("+233244440001") is None
+    db_session.expire_all()
+    assert verified.kyc_verified
+    assert KYCService.check_verification_status(verified)["status"] == "verified"
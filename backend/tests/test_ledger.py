@@ -0,0 +1,100 @@
+"""Tests for the double-entry ledger."""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.models import Payment, Payout, LedgerEntry, LedgerAccountType, PaymentStatus, PaymentType, PayoutStatus
+from app.services import PaymentService, PayoutService
+from app.services.ledger_service import LedgerService
+from app.integrations.momo_mock import momo_api
+
+
+def pending_payment(db_session, group, user, amount=None):
+    """Create a pending payment for the group's current round."""
+    payment = Payment(
+        user_id=user.id,
+        group_id=group.id,
+        round_number=group.current_round,
+        amount=amount or group.contribution_amount,
+        status=PaymentStatus.PENDING
+    )
+    db_session.add(payment)
+    db_session.commit()
+    return payment
+
+
+def test_contributions_and_payouts_balance(db_session, make_group, monkeypatch):
+    """Settled payments and payouts post balanced entries with exact running balances."""
+    monkeypatch.setattr(momo_api, "credit_wallet", lambda **kwargs: "TX-PAYOUT")
+    group, users = make_group(2, contribution_amount=0.1)
+
+    PaymentService.settle_success(db_session, pending_payment(db_session, group, users[0]), "TX-1")
+    PaymentService.mark_as_cash_paid(db_session, pending_payment(db_session, group, users[1], 0.2).id, users[0].id)
+
+    pot = LedgerService.get_account(db_session, LedgerAccountType.GROUP, group.id)
+    assert pot.balance == Decimal("0.30")
+    assert LedgerService.member_contributed(db_session, users[1].id) == Decimal("0.20")
+
+    payout = Payout(group_id=group.id, round_number=1, recipient_id=users[0].id,
+                    amount=0.3, status=PayoutStatus.APPROVED)
+    db_session.add(payout)
+    db_session.commit()
+    PayoutService.execute_payout(db_session, payout.id)
+
+    db_session.refresh(pot)
+    assert pot.balance == Decimal("0.00")
+    assert pot.total_debits == Decimal("0.30")
+    assert LedgerService.group_collected(db_session, group.id) == Decimal("0.30")
+
+    entries = db_session.query(LedgerEntry).all()
+    assert len(entries) == 6
+    assert sum(e.debit for e in entries) == sum(e.credit for e in entries)
+    assert [e.balance_after for e in entries if e.account_id == pot.id] == [
+        Decimal("0.10"), Decimal("0.30"), Decimal("0.00")
+    ]
+
+
+def test_reversal_and_channel_summary(db_session, make_group):
+    """Reversed contributions drop out of totals and channel summaries."""
+    group, users = make_group(3)
+    momo = pending_payment(db_session, group, users[0])
+    PaymentService.settle_success(db_session, momo, "TX-2")
+    PaymentService.mark_as_cash_paid(db_session, pending_payment(db_session, group, users[1]).id, users[0].id)
+    reversed_payment = pending_payment(db_session, group, users[2])
+    PaymentService.settle_success(db_session, reversed_payment, "TX-3")
+
+    reversed_payment.status = PaymentStatus.FAILED
+    LedgerService.reverse_contribution(db_session, reversed_payment)
+    db_session.commit()
+
+    # Posting twice is a no-op
+    assert LedgerService.record_contribution(db_session, momo) is None
+    assert LedgerService.reverse_contribution(db_session, reversed_payment) is None
+
+    summary = LedgerService.contributions_by_channel(db_session, datetime.utcnow() - timedelta(hours=1))
+    assert summary == {
+        "momo": {"count": 1, "amount": Decimal("100.00")},
+        "cash": {"count": 1, "amount": Decimal("100.00")},
+    }
+    assert LedgerService.total_collected(db_session) == Decimal("200.00")
+    assert LedgerService.member_contributed(db_session, users[2].id) == Decimal("0.00")
+
+
+def test_backfill_posts_history_once(db_session, make_group):
+    """Payments that predate the ledger are posted on their original dates."""
+    group, users = make_group(2)
+    paid_at = datetime(2026, 1, 5, 12, 0)
+    db_session.add(Payment(
+        user_id=users[0].id,
+        group_id=group.id,
+        round_number=1,
+        amount=100.0,
+        status=PaymentStatus.SUCCESS,
+        payment_type=PaymentType.CASH,
+        payment_date=paid_at
+    ))
+    db_session.commit()
+
+    assert LedgerService.backfill(db_session) == {"contributions": 1, "payouts": 0}
+    assert LedgerService.backfill(db_session) == {"contributions": 0, "payouts": 0}
+
+    assert LedgerService.collected_between(db_session, datetime(2026, 1, 1), datetime(2026, 2, 1)) == Decimal("100.00")
@@ -0,0 +1,206 @@
+"""Tests for the asynchronous MoMo collection pipeline."""
+import pytest
+from datetime import datetime, timedelta
+
+from app.models import Payment, PaymentStatus
+from app.services import PaymentService
+from app.services import payment_service as payment_module
+from app.services import momo_collection_service as collection_module
+from app.services.momo_collection_service import MoMoCollectionService
+
+
+@pytest.fixture
+def fake_mtn(monkeypatch):
+    """Route collections through a fake MTN request-to-pay API."""
+    mtn = collection_module.mtn_momo_service
+    state = {"requests": [], "statuses": {}}
+
+    def request_to_pay(**kwargs):
+        state["requests"].append(kwargs)
+        return {"status": "pending", "reference_id": kwargs["reference_id"]}
+
+    def get_transaction_status(reference_id):
+        return state["statuses"].get(reference_id, {"status": "pending"})
+
+    monkeypatch.setattr(payment_module.settings, "ENABLE_REAL_MOMO", True)
+    monkeypatch.setattr(mtn, "enabled", True)
+    monkeypatch.setattr(mtn, "request_to_pay", request_to_pay)
+    monkeypatch.setattr(mtn, "get_transaction_status", get_transaction_status)
+    return state
+
+
+def test_payment_request_returns_pending(db_session, make_group, fake_mtn):
+    """Payments are left PENDING with their reference instead of waiting for approval."""
+    group, users = make_group(1)
+
+    payment = PaymentService.process_payment(db_session, users[0].id, group.id)
+
+    assert payment.status == PaymentStatus.PENDING
+    assert payment.provider_reference == fake_mtn["requests"][0]["reference_id"]
+    assert payment.requested_at is not None
+
+    # A second trigger does not send another request
+    again = PaymentService.process_payment(db_session, users[0].id, group.id)
+    assert again.id == payment.id
+    assert len(fake_mtn["requests"]) == 1
+
+
+def test_callback_settles_payment(db_session, make_group, fake_mtn):
+    """Callbacks re-check the status and settle the payment once."""
+    group, users = make_group(1)
+    payment = PaymentService.process_payment(db_session, users[0].id, group.id)
+    reference = payment.provider_reference
+
+    assert MoMoCollectionService.handle_callback(db_session, reference).status == PaymentStatus.PENDING
+
+    fake_mtn["statuses"][reference] = {"status": "successful", "financial_transaction_id": "FT-1"}
+    settled = MoMoCollectionService.handle_callback(db_session, reference)
+    assert settled.status == PaymentStatus.SUCCESS
+    assert settled.transaction_id == "FT-1"
+
+    fake_mtn["statuses"][reference] = {"status": "failed"}
+    assert MoMoCollectionService.handle_callback(db_session, reference).status == PaymentStatus.SUCCESS
+
+
+def test_cash_marking_waits_for_momo_request(db_session, make_group, fake_mtn):
+    """A payment with a live MoMo request cannot also be marked as cash paid."""
+    from fastapi import HTTPException
+    from app.models import PaymentType
+    group, users = make_group(2)
+    payment = PaymentService.process_payment(db_session, users[1].id, group.id)
+    reference = payment.provider_reference
+
+    with pytest.raises(HTTPException) as exc:
+        PaymentService.mark_as_cash_paid(db_session, payment.id, users[0].id)
+    assert exc.value.status_code == 409
+
+    fake_mtn["statuses"][reference] = {"status": "rejected"}
+    MoMoCollectionService.handle_callback(db_session, reference)
+    marked = PaymentService.mark_as_cash_paid(db_session, payment.id, users[0].id)
+    assert marked.payment_type == PaymentType.CASH
+
+    # A late answer for the ended request changes nothing
+    fake_mtn["statuses"][reference] = {"status": "successful", "financial_transaction_id": "FT-LATE"}
+    assert MoMoCollectionService.handle_callback(db_session, reference).transaction_id.startswith("CASH-")
+
+
+def test_poll_pending(db_session, make_group, fake_mtn, commits):
+    """The poller settles stale pendings in one batch and times out abandoned requests."""
+    group, users = make_group(4)
+    payments = [PaymentService.process_payment(db_session, user.id, group.id) for user in users]
+    now = datetime.utcnow()
+
+    for payment in payments:
+        payment.requested_at = now - timedelta(minutes=30)
+    payments[3].requested_at = now - timedelta(hours=2)
+    db_session.commit()
+
+    fake_mtn["statuses"][payments[0].provider_reference] = {"status": "successful", "financial_transaction_id": "FT-A"}
+    fake_mtn["statuses"][payments[1].provider_reference] = {"status": "rejected", "reason": "APPROVAL_REJECTED"}
+
+    commits["count"] = 0
+    stats = MoMoCollectionService.poll_pending(db_session, now=now)
+
+    assert stats == {"checked": 4, "success": 1, "failed": 2, "pending": 1}
+    assert commits["count"] == 1
+    assert [p.status for p in payments] == [
+        PaymentStatus.SUCCESS, PaymentStatus.FAILED, PaymentStatus.PENDING, PaymentStatus.FAILED
+    ]
+    assert payments[1].retry_count == 1
+
+    # Recently checked pendings wait for the next interval
+    assert MoMoCollectionService.poll_pending(db_session, now=now)["checked"] == 0
+
+
+def test_poll_skips_payment_changed_meanwhile(db_session, make_group, fake_mtn):
+    """A version conflict on one payment does not stop the rest of the batch."""
+    from sqlalchemy import text
+
+    group, users = make_group(2)
+    payments = [PaymentService.process_payment(db_session, user.id, group.id) for user in users]
+    now = datetime.utcnow()
+    for payment in payments:
+        payment.requested_at = now - timedelta(minutes=30)
+        fake_mtn["statuses"][payment.provider_reference] = {"status": "successful", "financial_transaction_id": f"FT-{payment.id}"}
+    db_session.commit()
+
+    # Another worker updates the first payment after it was loaded
+    assert payments[0].version_id
+    db_session.execute(text("UPDATE payments SET version_id = version_id + 1 WHERE id = :id"), {"id": payments[0].id})
+
+    stats = MoMoCollectionService.poll_pending(db_session, now=now)
+
+    assert stats == {"checked": 2, "success": 1, "failed": 0, "pending": 0}
+    db_session.refresh(payments[0])
+    assert payments[0].status == PaymentStatus.PENDING
+    assert payments[1].status == PaymentStatus.SUCCESS
+
+
+def test_request_timeout_stays_pending_until_mtn_answers(db_session, make_group, fake_mtn, monkeypatch):
+    """A timed-out request may have reached MTN, so it is settled by the poller, not failed."""
+    group, users = make_group(1)
+    monkeypatch.setattr(
+        collection_module.mtn_momo_service, "request_to_pay",
+        lambda **kwargs: {"status": "error", "message": "Read timed out", "reference_id": kwargs["reference_id"]}
+    )
+
+    payment = PaymentService.process_payment(db_session, users[0].id, group.id)
+    reference = payment.provider_reference
+    assert payment.status == PaymentStatus.PENDING
+
+    # Provider outage: status checks fail, even past the approval timeout
+    late = payment.requested_at + timedelta(hours=2)
+    fake_mtn["statuses"][reference] = {"status": "error", "message": "Connection refused"}
+    assert MoMoCollectionService.poll_pending(db_session, now=late)["pending"] == 1
+
+    fake_mtn["statuses"][reference] = {"status": "successful", "financial_transaction_id": "FT-T"}
+    settled = MoMoCollectionService.handle_callback(db_session, reference)
+    assert settled.status == PaymentStatus.SUCCESS
+    assert settled.provider_reference == reference
+
+
+def test_request_rejection_fails_payment(db_session, make_group, fake_mtn, monkeypatch):
+    """A definitive rejection fails the payment straight away."""
+    group, users = make_group(1)
+    monkeypatch.setattr(
+        collection_module.mtn_momo_service, "request_to_pay",
+        lambda **kwargs: {"status": "rejected", "message": "400 Bad Request"}
+    )
+
+    with pytest.raises(Exception) as error:
+        PaymentService.process_payment(db_session, users[0].id, group.id)
+
+    assert error.value.status_code == 402
+    assert db_session.query(Payment).one().status == PaymentStatus.FAILED
+
+
+def test_unknown_request_times_out(db_session, make_group, fake_mtn):
+    """Requests MTN never received are failed after the approval timeout."""
+    group, users = make_group(1)
+    payment = PaymentService.process_payment(db_session, users[0].id, group.id)
+    fake_mtn["statuses"][payment.provider_reference] = {"status": "not_found"}
+
+    stats = MoMoCollectionService.poll_pending(db_session, now=payment.requested_at + timedelta(hours=2))
+
+    assert stats["failed"] == 1
+    assert payment.status == PaymentStatus.FAILED
+
+
+def test_retry_checks_previous_request(db_session, make_group, fake_mtn):
+    """A retry never replaces a reference MTN may still complete."""
+    group, users = make_group(1)
+    payment = PaymentService.process_payment(db_session, users[0].id, group.id)
+    reference = payment.provider_reference
+    PaymentService.settle_failure(db_session, payment, "Payment approval timed out")
+
+    with pytest.raises(Exception) as error:
+        PaymentService.retry_failed_payment(db_session, payment.id)
+    assert error.value.status_code == 409
+    assert payment.provider_reference == reference
+
+    # The old request was approved late: settle it instead of asking again
+    fake_mtn["statuses"][reference] = {"status": "successful", "financial_transaction_id": "FT-LATE"}
+    retried = PaymentService.retry_failed_payment(db_session, payment.id)
+    assert retried.status == PaymentStatus.SUCCESS
+    assert retried.transaction_id == "FT-LATE"
+    assert len(fake_mtn["requests"]) == 1
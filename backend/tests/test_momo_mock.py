@@ -0,0 +1,67 @@
+"""Tests for the mock MoMo API's transaction log."""
+import json
+
+import pytest
+
+from app.integrations import momo_mock
+from app.integrations.momo_mock import MoMoMockAPI, InsufficientFundsError
+
+
+@pytest.fixture
+def no_random_failures(monkeypatch):
+    """Make the mock's simulated failures deterministic."""
+    monkeypatch.setattr(momo_mock.random, "random", lambda: 0.5)
+    monkeypatch.setattr(momo_mock.random, "uniform", lambda low, high: 500.0)
+
+
+def test_transactions_are_appended_and_indexed(tmp_path, no_random_failures):
+    """Each transaction adds one log line and is found by ID, also after a restart."""
+    path = tmp_path / "momo_transactions.jsonl"
+    api = MoMoMockAPI(str(path))
+
+    debit_id = api.debit_wallet("+233244000001", 100.0, "Payment:1")
+    credit_id = api.credit_wallet("+233244000002", 40.0, "Payout:1")
+    with pytest.raises(InsufficientFundsError):
+        api.debit_wallet("+233244000001", 1000.0, "Payment:2")
+
+    lines = path.read_text().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[0])["transaction_id"] == debit_id
+    assert api.get_transaction(credit_id)["amount"] == 40.0
+
+    # A partially written last line is skipped on restart
+    with open(path, "a") as f:
+        f.write('{"transaction_id": "MOMO')
+    restarted = MoMoMockAPI(str(path))
+    assert restarted.get_transaction(debit_id)["reference"] == "Payment:1"
+    assert restarted.get_transaction("MISSING") is None
+
+
+def test_failed_attempts_are_compacted_away(tmp_path, no_random_failures):
+    """Once failed attempts outnumber kept transactions the log is rewritten without them."""
+    path = tmp_path / "momo_transactions.jsonl"
+    api = MoMoMockAPI(str(path), compact_after=2)
+    kept = api.credit_wallet("+233244000001", 10.0)
+
+    for _ in range(3):
+        with pytest.raises(InsufficientFundsError):
+            api.debit_wallet("+233244000002", 1000.0)
+
+    assert [json.loads(line)["transaction_id"] for line in path.read_text().splitlines()] == [kept]
+    # Appends continue on the compacted log
+    api.credit_wallet("+233244000001", 5.0)
+    assert len(path.read_text().splitlines()) == 2
+
+
+def test_legacy_json_log_is_converted(tmp_path):
+    """A log in the old JSON array format is converted to JSON Lines once."""
+    legacy = [
+        {"transaction_id": "MOMO1", "type": "debit", "amount": 10.0, "status": "success"},
+        {"transaction_id": None, "type": "debit", "amount": 5.0, "status": "failed"},
+    ]
+    (tmp_path / "momo_transactions.json").write_text(json.dumps(legacy, indent=2))
+
+    api = MoMoMockAPI(str(tmp_path / "momo_transactions.jsonl"))
+
+    assert api.get_transaction("MOMO1")["amount"] == 10.0
+    assert len((tmp_path / "momo_transactions.jsonl").read_text().splitlines()) == 2
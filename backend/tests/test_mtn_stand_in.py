@@ -0,0 +1,97 @@
+"""Tests for the local MTN API stand-in server, driven by the real clients."""
+import threading
+
+import pytest
+import requests
+
+import mtn_stand_in
+from app.integrations.mtn_kyc_integration import MTNKYCIntegration
+from app.integrations.mtn_momo_integration import MTNMoMoIntegration
+from app.integrations.mtn_sms_integration import MTNSMSIntegration
+from app.integrations.token_manager import token_manager
+
+
+def start(config):
+    """Run a stand-in server on a free port; returns (server, base URL)."""
+    server = mtn_stand_in.make_server("127.0.0.1", 0, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def stand_in():
+    server, base_url = start(mtn_stand_in.StandInConfig(seed=1))
+    token_manager.clear()
+    yield server, base_url
+    token_manager.clear()
+    server.shutdown()
+    server.server_close()
+
+
+def configure(client, base_url, **attributes):
+    client.base_url = base_url
+    client.enabled = True
+    for name, value in attributes.items():
+        setattr(client, name, value)
+    return client
+
+
+def test_momo_collection_settles_through_stand_in(stand_in):
+    """A collection is accepted and settles; a retried reference is not stored twice."""
+    server, base_url = stand_in
+    momo = configure(
+        MTNMoMoIntegration(), base_url,
+        api_user="user", api_key="key", subscription_key="sub"
+    )
+
+    requested = momo.request_to_pay("0241234567", 25.0, "Payment:1", reference_id="ref-1")
+    status = momo.get_transaction_status("ref-1")
+    duplicate = momo.request_to_pay("0241234567", 25.0, "Payment:1", reference_id="ref-1")
+
+    assert requested["status"] == "pending"
+    assert status["status"] == "successful"
+    assert status["financial_transaction_id"]
+    # 409 for a known reference means the first request arrived
+    assert duplicate["status"] == "pending"
+    assert len(server.state.requests) == 1
+    assert momo.get_transaction_status("unknown")["status"] == "not_found"
+    assert server.state.stats["momo_token"] == 1
+
+
+def test_sms_and_kyc_through_stand_in(stand_in):
+    """SMS sends are accepted and KYC verifies MTN numbers only."""
+    server, base_url = stand_in
+    credentials = {"consumer_key": "key", "consumer_secret": "secret"}
+    sms = configure(MTNSMSIntegration(), base_url, **credentials)
+    kyc = configure(MTNKYCIntegration(), base_url, **credentials)
+    momo = configure(
+        MTNMoMoIntegration(), base_url,
+        api_user="user", api_key="key", subscription_key="sub"
+    )
+    kyc._momo = lambda: momo
+
+    assert sms.send_sms(["+233241234567"], "Hello")["sent"] is True
+    assert kyc.perform_kyc_verification("0241234567")["verified"] is True
+    assert kyc.perform_kyc_verification("0201234567")["verified"] is False
+
+
+def test_throttling_and_expired_tokens():
+    """The rate limit answers 429 and expired tokens are refused."""
+    server, base_url = start(mtn_stand_in.StandInConfig(rate_limit=1, token_ttl=0))
+    try:
+        token = requests.post(f"{base_url}/collection/token/", auth=("user", "key"))
+        throttled = requests.post(f"{base_url}/collection/token/", auth=("user", "key"))
+
+        assert token.status_code == 200
+        assert throttled.status_code == 429
+        assert throttled.headers["Retry-After"] == "1"
+
+        server.state.config.rate_limit = 0
+        expired = requests.get(
+            f"{base_url}/collection/v1_0/account/balance",
+            headers={"Authorization": f"Bearer {token.json()['access_token']}"}
+        )
+        assert expired.status_code == 401
+    finally:
+        server.shutdown()
+        server.server_close()
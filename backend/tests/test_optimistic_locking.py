@@ -0,0 +1,59 @@
+"""Tests for optimistic concurrency on payments, payouts and groups."""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Payment, Group, LedgerEntry, PaymentStatus, PaymentType
+from app.services import PaymentService
+from app.utils import concurrency as concurrency_module
+from app.utils import retry_on_conflict
+
+
+@pytest.fixture
+def other_session(db_session):
+    """A second session, standing in for a concurrent request."""
+    session = sessionmaker(autoflush=False, bind=db_session.get_bind())()
+    yield session
+    session.close()
+
+
+def test_settlement_retries_after_concurrent_cash_marking(db_session, other_session, make_group):
+    """A MoMo settlement racing an admin's cash marking re-reads the payment instead of overwriting it."""
+    group, users = make_group(2)
+    payment = Payment(user_id=users[1].id, group_id=group.id, round_number=1,
+                      amount=100.0, status=PaymentStatus.PENDING)
+    db_session.add(payment)
+    db_session.commit()
+    assert payment.status == PaymentStatus.PENDING
+
+    PaymentService.mark_as_cash_paid(other_session, payment.id, users[0].id)
+
+    settled = PaymentService.settle_success(db_session, payment, "TX-LATE")
+
+    assert settled.status == PaymentStatus.SUCCESS
+    assert settled.payment_type == PaymentType.CASH
+    assert settled.transaction_id.startswith("CASH-")
+    assert settled.version_id == 2
+    assert db_session.query(LedgerEntry).filter(LedgerEntry.payment_id == payment.id).count() == 2
+
+
+def test_persistent_conflicts_return_409(db_session, other_session, make_group, monkeypatch):
+    """Rows that change on every attempt give up after OPTIMISTIC_RETRY_ATTEMPTS."""
+    monkeypatch.setattr(concurrency_module.settings, "OPTIMISTIC_RETRY_BACKOFF_SECONDS", 0)
+    group, _ = make_group(1)
+    attempts = []
+
+    def rename():
+        attempts.append(1)
+        group.name = "Renamed"
+        concurrent = other_session.get(Group, group.id, populate_existing=True)
+        concurrent.name = f"Concurrent {len(attempts)}"
+        other_session.commit()
+        db_session.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        retry_on_conflict(db_session, rename)
+
+    assert exc.value.status_code == 409
+    assert len(attempts) == concurrency_module.settings.OPTIMISTIC_RETRY_ATTEMPTS
+    assert group.name == f"Concurrent {len(attempts)}"
@@ -0,0 +1,216 @@
+"""Tests for the transactional outbox."""
+import pytest
+from datetime import datetime, timedelta
+
+from app.integrations import sms_sender
+from app.models import Payment, Notification, OutboxMessage, OutboxPriority, OutboxStatus, PaymentStatus
+from app.services import PaymentService
+from app.services import outbox_service as outbox_module
+from app.services.outbox_service import OutboxService
+from app.utils import decrypt_field
+
+
+@pytest.fixture
+def sent_sms(monkeypatch, db_session):
+    """Capture provider requests instead of delivering them."""
+    sent = {"single": [], "bulk": [], "fail": False, "in_transaction": [], "headroom": []}
+
+    def fake_send_via_providers(phone_numbers, message, use_africastalking, headroom=0.0):
+        sent["in_transaction"].append(db_session.in_transaction())
+        sent["headroom"].append((message, headroom))
+        if len(phone_numbers) == 1:
+            sent["single"].append((phone_numbers[0], message))
+        else:
+            sent["bulk"].append((list(phone_numbers), message))
+        return list(phone_numbers) if sent["fail"] else []
+
+    monkeypatch.setattr(sms_sender, "_send_via_providers", fake_send_via_providers)
+    monkeypatch.setattr(sms_sender, "_configured_providers", lambda use_africastalking: ["MTN"])
+    return sent
+
+
+def test_payment_side_effects_commit_with_payment(db_session, make_group, sent_sms):
+    """Settling a payment records its SMS and notifications, delivered by the dispatcher."""
+    group, users = make_group(3)
+    payment = Payment(
+        user_id=users[1].id,
+        group_id=group.id,
+        round_number=1,
+        amount=group.contribution_amount,
+        status=PaymentStatus.PENDING
+    )
+    db_session.add(payment)
+    db_session.commit()
+
+    PaymentService.settle_success(db_session, payment, "TX-OUTBOX")
+
+    assert sorted(m.kind for m in db_session.query(OutboxMessage).all()) == ["payment_notification", "sms"]
+    assert sent_sms["single"] == []
+    assert db_session.query(Notification).count() == 0
+
+    stats = OutboxService.dispatch(db_session)
+
+    assert stats["sent"] == 2
+    assert sent_sms["single"][0][0] == decrypt_field(users[1].phone_number)
+    assert "TX-OUTBOX" in sent_sms["single"][0][1]
+    notifications = db_session.query(Notification).all()
+    assert sorted(n.user_id for n in notifications) == [users[0].id, users[2].id]
+    assert "1 of 3" in notifications[0].message
+    assert OutboxService.dispatch(db_session)["claimed"] == 0
+
+
+def test_dispatch_batches_dedupes_and_retries(db_session, make_group, sent_sms, monkeypatch):
+    """Identical texts go out in one bulk request; failures back off, then fail."""
+    monkeypatch.setattr(outbox_module.settings, "OUTBOX_MAX_ATTEMPTS", 2)
+    group, users = make_group(3)
+    for user in users:
+        OutboxService.enqueue_sms(db_session, user.phone_number, "Meeting moved")
+    OutboxService.enqueue_sms(db_session, users[0].phone_number, "Meeting moved")
+    OutboxService.enqueue_sms(db_session, users[0].phone_number, "Once", dedupe_key="once")
+    assert OutboxService.enqueue_sms(db_session, users[0].phone_number, "Once", dedupe_key="once") is None
+    db_session.commit()
+
+    stats = OutboxService.dispatch(db_session)
+
+    assert stats == {"claimed": 5, "sent": 5, "retried": 0, "failed": 0, "expired": 0, "deduplicated": 1}
+    assert len(sent_sms["bulk"]) == 1 and len(sent_sms["bulk"][0][0]) == 3
+
+    sent_sms["fail"] = True
+    OutboxService.enqueue_sms(db_session, users[1].phone_number, "Flaky")
+    db_session.commit()
+
+    now = datetime.utcnow()
+    assert OutboxService.dispatch(db_session, now)["retried"] == 1
+    assert OutboxService.dispatch(db_session, now)["claimed"] == 0
+
+    later = now + timedelta(seconds=outbox_module.settings.OUTBOX_RETRY_BASE_SECONDS + 1)
+    assert OutboxService.dispatch(db_session, later)["failed"] == 1
+    flaky = db_session.query(OutboxMessage).filter(OutboxMessage.status == OutboxStatus.FAILED).one()
+    assert flaky.attempts == 2
+
+
+def test_dispatch_sends_outside_the_claim_transaction(db_session, make_group, sent_sms):
+    """Claims are committed before sending, and provider rejections are retried, not sent."""
+    group, users = make_group(1)
+    message = OutboxService.enqueue_sms(db_session, users[0].phone_number, "Hello")
+    db_session.commit()
+    sent_sms["fail"] = True
+
+    now = datetime.utcnow()
+    stats = OutboxService.dispatch(db_session, now)
+
+    assert sent_sms["in_transaction"] == [False]
+    assert stats["sent"] == 0 and stats["retried"] == 1
+    assert message.status == OutboxStatus.PENDING
+    assert message.last_error == "SMS was not accepted by any provider"
+
+
+def test_claimed_messages_are_leased(db_session, make_group):
+    """A committed claim hides messages from other dispatchers until the lease runs out."""
+    group, users = make_group(1)
+    OutboxService.enqueue_sms(db_session, users[0].phone_number, "Hello")
+    db_session.commit()
+
+    now = datetime.utcnow()
+    assert len(OutboxService.claim_due(db_session, now)) == 1
+    db_session.commit()
+
+    assert OutboxService.claim_due(db_session, now) == []
+    expired = now + timedelta(seconds=outbox_module.settings.OUTBOX_LEASE_SECONDS + 1)
+    assert len(OutboxService.claim_due(db_session, expired)) == 1
+
+
+def test_claims_most_urgent_first_and_by_lane(db_session, make_group):
+    """Messages are claimed by priority; the interactive lane skips notifications and bulk."""
+    group, users = make_group(1)
+    phone = users[0].phone_number
+    OutboxService.enqueue_sms(db_session, phone, "Reminder", priority=OutboxPriority.BULK)
+    OutboxService.enqueue_sms(db_session, phone, "Welcome")
+    OutboxService.enqueue_sms(db_session, phone, "Paid", priority=OutboxPriority.TRANSACTIONAL)
+    OutboxService.enqueue_sms(db_session, phone, "Code 123456", priority=OutboxPriority.OTP)
+    db_session.commit()
+
+    now = datetime.utcnow()
+    interactive = OutboxService.claim_due(db_session, now, max_priority=OutboxPriority.TRANSACTIONAL)
+    assert [m.payload["message"] for m in interactive] == ["Code 123456", "Paid"]
+    db_session.rollback()
+
+    assert [m.payload["message"] for m in OutboxService.claim_due(db_session, now)] == [
+        "Code 123456", "Paid", "Welcome", "Reminder"
+    ]
+
+
+def test_stale_otp_is_dropped_and_bulk_leaves_headroom(db_session, make_group, sent_sms, monkeypatch):
+    """An OTP past its deadline is never sent; bulk SMS go last and leave provider headroom."""
+    monkeypatch.setattr(outbox_module.settings, "SMS_INTERACTIVE_HEADROOM", 3.0)
+    group, users = make_group(1)
+    phone = users[0].phone_number
+    now = datetime.utcnow()
+    stale = OutboxService.enqueue_sms(
+        db_session, phone, "Code 111111", priority=OutboxPriority.OTP, expires_at=now
+    )
+    fresh = OutboxService.enqueue_sms(
+        db_session, phone, "Code 222222", priority=OutboxPriority.OTP, expires_at=now + timedelta(minutes=5)
+    )
+    OutboxService.enqueue_sms(db_session, phone, "Reminder", priority=OutboxPriority.BULK)
+    db_session.commit()
+
+    stats = OutboxService.dispatch(db_session, now + timedelta(seconds=1))
+
+    assert stats["expired"] == 1 and stats["sent"] == 2
+    assert sent_sms["headroom"] == [("Code 222222", 0.0), ("Reminder", 3.0)]
+    assert stale.status == OutboxStatus.EXPIRED
+    # Settled OTP texts are not kept
+    assert stale.payload["message"] is None and fresh.payload["message"] is None
+
+
+def test_request_otp_queues_and_dispatches_otp(db_session, sent_sms, monkeypatch):
+    """The OTP SMS goes through the outbox and is sent by the request's background task."""
+    from fastapi import BackgroundTasks
+    from app.routers.auth import OTPRequest, request_otp
+    from app.services import onboarding_service as onboarding_module
+    from tests.conftest import TestingSessionLocal
+    monkeypatch.setattr(outbox_module, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(onboarding_module, "SessionLocal", TestingSessionLocal)
+    background_tasks = BackgroundTasks()
+
+    request_otp(OTPRequest(phone_number="+233241110000"), background_tasks, db_session)
+
+    message = db_session.query(OutboxMessage).one()
+    assert message.priority == OutboxPriority.OTP
+    assert message.expires_at is not None
+    assert sent_sms["single"] == []
+
+    for task in background_tasks.tasks:
+        task.func(*task.args, **task.kwargs)
+
+    assert sent_sms["single"][0][0] == "+233241110000"
+    assert "login code" in sent_sms["single"][0][1]
+    db_session.expire_all()
+    assert db_session.query(OutboxMessage).one().status == OutboxStatus.SENT
+
+
+def test_enqueue_many_falls_back_on_concurrent_duplicates(db_session, monkeypatch):
+    """A key enqueued after the dedupe lookup is skipped instead of failing the batch."""
+    from tests.conftest import TestingSessionLocal
+    real_query = db_session.query
+
+    def query_then_enqueue_elsewhere(*entities):
+        # Another worker enqueues "dup" right after this lookup
+        result = real_query(*entities)
+        if entities == (OutboxMessage.dedupe_key,):
+            other = TestingSessionLocal()
+            OutboxService.enqueue_sms(other, "+233241110000", "Reminder", dedupe_key="dup")
+            other.commit()
+            other.close()
+        return result
+
+    monkeypatch.setattr(db_session, "query", query_then_enqueue_elsewhere)
+    messages = [
+        {"kind": "sms", "payload": {"phone_number": "+233241110000", "message": "Reminder"}, "dedupe_key": key}
+        for key in ("new", "dup")
+    ]
+
+    assert OutboxService.enqueue_many(db_session, messages) == 1
+    db_session.commit()
+    assert sorted(m.dedupe_key for m in real_query(OutboxMessage)) == ["dup", "new"]
@@ -0,0 +1,214 @@
+"""Tests for payout round-completion detection and bulk payout creation."""
+from datetime import datetime, timedelta
+
+from app.models import (
+    Membership, Payment, Payout, PaymentPreference, GroupRoundStats, PaymentStatus, PayoutStatus, GroupStatus
+)
+from app.services import PaymentService, PayoutService, GroupService
+from app.services.round_stats_service import RoundStatsService
+from app.integrations.momo_mock import momo_api
+
+
+def pay(db_session, group, users, payment_date=None):
+    """Record successful payments for the current round and count them."""
+    for user in users:
+        payment = Payment(
+            user_id=user.id,
+            group_id=group.id,
+            round_number=group.current_round,
+            amount=group.contribution_amount,
+            status=PaymentStatus.SUCCESS,
+            payment_date=payment_date or datetime.utcnow()
+        )
+        db_session.add(payment)
+        db_session.flush()
+        RoundStatsService.record_payment(db_session, payment)
+    if payment_date:
+        db_session.query(GroupRoundStats).filter(
+            GroupRoundStats.group_id == group.id
+        ).update({GroupRoundStats.updated_at: payment_date}, synchronize_session=False)
+    db_session.commit()
+
+
+def test_find_complete_rounds(db_session, make_group):
+    """Only groups where every active member paid are returned."""
+    complete, complete_users = make_group(3)
+    partial, partial_users = make_group(3)
+    pay(db_session, complete, complete_users)
+    pay(db_session, partial, partial_users[:2])
+
+    result = PayoutService.find_complete_rounds(db_session)
+
+    assert [(group.id, stats.paid_count) for group, stats in result] == [(complete.id, 3)]
+
+
+def test_find_complete_rounds_since(db_session, make_group):
+    """Groups whose counters did not change since the last run are skipped."""
+    old, old_users = make_group(2)
+    recent, recent_users = make_group(2)
+    pay(db_session, old, old_users, payment_date=datetime.utcnow() - timedelta(days=1))
+    pay(db_session, recent, recent_users)
+
+    since = datetime.utcnow() - timedelta(hours=2)
+    result = PayoutService.find_complete_rounds(db_session, since=since)
+
+    assert [group.id for group, _ in result] == [recent.id]
+
+
+def test_find_complete_rounds_since_includes_open_payouts(db_session, make_group):
+    """Unpaid payouts for the current round are picked up again."""
+    group, users = make_group(2)
+    pay(db_session, group, users, payment_date=datetime.utcnow() - timedelta(days=1))
+    db_session.add(Payout(
+        group_id=group.id,
+        round_number=1,
+        recipient_id=users[0].id,
+        amount=200.0,
+        status=PayoutStatus.FAILED
+    ))
+    db_session.commit()
+
+    result = PayoutService.find_complete_rounds(db_session, since=datetime.utcnow())
+
+    assert [g.id for g, _ in result] == [group.id]
+
+
+def test_find_complete_rounds_since_skips_blocked_payouts(db_session, make_group):
+    """Payouts waiting for an admin do not keep their round in every scan."""
+    group, users = make_group(2)
+    pay(db_session, group, users, payment_date=datetime.utcnow() - timedelta(days=1))
+    db_session.add(Payout(
+        group_id=group.id,
+        round_number=1,
+        recipient_id=users[0].id,
+        amount=200.0,
+        status=PayoutStatus.BLOCKED
+    ))
+    db_session.commit()
+
+    assert PayoutService.find_complete_rounds(db_session, since=datetime.utcnow()) == []
+
+
+def test_payout_watermark_comes_from_job_runs(db_session):
+    """The payout job resumes from its latest successful run, not in-process state."""
+    from app.models import JobRun, JobRunStatus
+    from app.services.job_run_service import JobRunService
+
+    now = datetime.utcnow()
+    db_session.add_all([
+        JobRun(job_id="process_pending_payouts", worker_id="w1:1", status=JobRunStatus.SUCCESS,
+               started_at=now - timedelta(hours=4)),
+        JobRun(job_id="process_pending_payouts", worker_id="w2:1", status=JobRunStatus.SUCCESS,
+               started_at=now - timedelta(hours=2)),
+        JobRun(job_id="process_pending_payouts", worker_id="w1:1", status=JobRunStatus.FAILED,
+               started_at=now - timedelta(hours=1)),
+        JobRun(job_id="daily_payment_check", worker_id="w1:1", status=JobRunStatus.SUCCESS,
+               started_at=now),
+    ])
+    db_session.commit()
+
+    assert JobRunService.last_success_started_at(db_session, "process_pending_payouts") == now - timedelta(hours=2)
+    assert JobRunService.last_success_started_at(db_session, "dispatch_outbox") is None
+
+def test_create_payouts_for_rounds(db_session, make_group):
+    """Payouts are created once per group and reused on later runs."""
+    first, first_users = make_group(2, contribution_amount=50.0)
+    second, second_users = make_group(3)
+    pay(db_session, first, first_users)
+    pay(db_session, second, second_users)
+
+    payouts = PayoutService.create_payouts_for_rounds(
+        db_session, PayoutService.find_complete_rounds(db_session)
+    )
+
+    assert len(payouts) == 2
+    by_group = {payout.group_id: payout for payout in payouts}
+    assert by_group[first.id].amount == 100.0
+    assert by_group[first.id].recipient_id == first_users[0].id
+    assert by_group[second.id].amount == 300.0
+
+    again = PayoutService.create_payouts_for_rounds(
+        db_session, PayoutService.find_complete_rounds(db_session)
+    )
+    assert sorted(p.id for p in again) == sorted(p.id for p in payouts)
+    assert db_session.query(Payout).count() == 2
+
+
+def test_bulk_and_single_payouts_use_collected_amount(db_session, make_group):
+    """Both creation paths pay out what was collected, not the current contribution times payers."""
+    bulk, bulk_users = make_group(2, contribution_amount=50.0)
+    single, single_users = make_group(2, contribution_amount=50.0)
+    pay(db_session, bulk, bulk_users)
+    pay(db_session, single, single_users)
+    bulk.contribution_amount = single.contribution_amount = 80.0
+    db_session.commit()
+
+    bulk_payout, = PayoutService.create_payouts_for_rounds(
+        db_session, [(group, stats) for group, stats in PayoutService.find_complete_rounds(db_session)
+                     if group.id == bulk.id]
+    )
+    single_payout = PayoutService.create_payout_for_round(db_session, single.id, single.current_round)
+
+    assert bulk_payout.amount == single_payout.amount == 100.0
+
+
+def test_final_payout_completes_group(db_session, make_group, monkeypatch):
+    """Paying out the last round completes the group instead of starting a new round."""
+    monkeypatch.setattr(momo_api, "credit_wallet", lambda **kwargs: "TX-FINAL")
+    group, users = make_group(2)
+    group.current_round = 2
+    pay(db_session, group, users)
+
+    payouts = PayoutService.create_payouts_for_rounds(
+        db_session, PayoutService.find_complete_rounds(db_session)
+    )
+    PayoutService.execute_payout(db_session, payouts[0].id)
+
+    db_session.refresh(group)
+    assert group.status == GroupStatus.COMPLETED
+    assert group.current_round == 2
+    assert group.completed_at is not None
+    assert PayoutService.find_complete_rounds(db_session) == []
+
+
+def test_payment_and_payout_commit_once(db_session, make_group, monkeypatch, commits):
+    """A contribution is a single transaction; a payout adds only its claim."""
+    monkeypatch.setattr(momo_api, "debit_wallet", lambda **kwargs: "TX-DEBIT")
+    monkeypatch.setattr(momo_api, "credit_wallet", lambda **kwargs: "TX-CREDIT")
+    group, users = make_group(1)
+
+    commits["count"] = 0
+    payment = PaymentService.process_payment(db_session, users[0].id, group.id)
+    assert payment.status == PaymentStatus.SUCCESS
+    assert commits["count"] == 1
+
+    payout = Payout(group_id=group.id, round_number=1, recipient_id=users[0].id,
+                    amount=100.0, status=PayoutStatus.PENDING)
+    db_session.add(payout)
+    db_session.commit()
+
+    commits["count"] = 0
+    assert PayoutService.approve_payout(db_session, payout.id, users[0].id).status == PayoutStatus.PAID
+    # The claim is committed before the transfer, the result after it
+    assert commits["count"] == 2
+
+
+def test_complete_finished_groups(db_session, make_group):
+    """Groups past their final round are completed and release assigned collection days."""
+    finished, finished_users = make_group(2)
+    live, live_users = make_group(2)
+    finished.current_round = 3
+    # The first member is also in a live group
+    db_session.add(Membership(user_id=finished_users[0].id, group_id=live.id, rotation_position=3, is_active=True))
+    for user in finished_users:
+        db_session.add(PaymentPreference(user_id=user.id, assigned_pay_day=7))
+    db_session.commit()
+
+    assert GroupService.complete_finished_groups(db_session) == 1
+
+    db_session.refresh(finished)
+    assert finished.status == GroupStatus.COMPLETED
+    assert finished.current_round == 2
+    prefs = {p.user_id: p.assigned_pay_day for p in db_session.query(PaymentPreference).all()}
+    assert prefs == {finished_users[0].id: 7, finished_users[1].id: None}
+    assert GroupService.complete_finished_groups(db_session) == 0
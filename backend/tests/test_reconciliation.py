@@ -0,0 +1,129 @@
+"""Tests for reconciliation against provider records."""
+import json
+import pytest
+
+from app.models import Payment, Payout, PaymentStatus, PaymentType, PayoutStatus
+from app.services import reconciliation_service as reconciliation_module
+from app.services.reconciliation_service import ReconciliationService, iter_mock_transactions, iter_statement_csv
+
+
+def record(transaction_id, amount, record_type="debit", status="success"):
+    """Build a provider record."""
+    return {"transaction_id": transaction_id, "type": record_type, "amount": amount,
+            "status": status, "timestamp": None}
+
+
+@pytest.fixture
+def books(db_session, make_group):
+    """Payments and a payout as recorded in the database."""
+    group, users = make_group(3)
+    payments = [
+        Payment(user_id=users[0].id, group_id=group.id, round_number=1, amount=100.0,
+                status=PaymentStatus.SUCCESS, transaction_id="TX-OK"),
+        Payment(user_id=users[1].id, group_id=group.id, round_number=1, amount=100.0,
+                status=PaymentStatus.SUCCESS, transaction_id="TX-DRIFT"),
+        Payment(user_id=users[2].id, group_id=group.id, round_number=1, amount=100.0,
+                status=PaymentStatus.SUCCESS, transaction_id="TX-UNKNOWN"),
+        Payment(user_id=users[2].id, group_id=group.id, round_number=2, amount=100.0,
+                status=PaymentStatus.SUCCESS, transaction_id="CASH-1", payment_type=PaymentType.CASH),
+    ]
+    db_session.add_all(payments)
+    db_session.add(Payout(group_id=group.id, round_number=1, recipient_id=users[0].id, amount=300.0,
+                          status=PayoutStatus.PAID, transaction_id="TX-PAYOUT"))
+    db_session.commit()
+
+
+PROVIDER_RECORDS = [
+    record("TX-OK", 100.0),
+    record("TX-DRIFT", 99.5),
+    record("TX-PAYOUT", 300.0, "credit"),
+    record("TX-STRAY", 50.0),
+    record("TX-STRAY", 50.0),
+    record(None, 100.0, status="failed"),
+]
+
+
+def test_reconcile_reports_mismatches(db_session, books):
+    """Missing, duplicate and drifted transactions are reported; cash is ignored."""
+    reported = []
+
+    result = ReconciliationService.reconcile(db_session, PROVIDER_RECORDS, on_mismatch=reported.append)
+
+    assert result["provider_records"] == 6
+    assert result["skipped"] == 1
+    assert result["matched"] == 2
+    assert result["spilled"] is False
+    assert {(m["kind"], m["transaction_id"]) for m in reported} == {
+        ("amount_mismatch", "TX-DRIFT"),
+        ("missing_at_provider", "TX-UNKNOWN"),
+        ("duplicate", "TX-STRAY"),
+        ("missing_in_db", "TX-STRAY"),
+    }
+
+
+def test_spilled_join_matches_in_memory_join(db_session, books, monkeypatch):
+    """Joining through partition files gives the same result as the in-memory join."""
+    in_memory = ReconciliationService.reconcile(db_session, PROVIDER_RECORDS)
+
+    monkeypatch.setattr(reconciliation_module.settings, "RECONCILIATION_MEMORY_ROWS", 1)
+    monkeypatch.setattr(reconciliation_module.settings, "RECONCILIATION_PARTITIONS", 3)
+    spilled = ReconciliationService.reconcile(db_session, PROVIDER_RECORDS)
+
+    assert spilled["spilled"] is True
+    for key in ("matched", "missing_in_db", "missing_at_provider", "duplicate", "amount_mismatch", "type_mismatch"):
+        assert spilled[key] == in_memory[key]
+
+
+def test_mock_transaction_log_is_streamed(tmp_path, monkeypatch):
+    """The mock's JSON array is decoded record by record across read chunks."""
+    monkeypatch.setattr(reconciliation_module, "JSON_CHUNK_SIZE", 7)
+    transactions = [
+        {"transaction_id": f"MOMO{i}", "type": "debit", "amount": 10.5 * i, "status": "success",
+         "reference": "Group:A, B|Round:1", "timestamp": "2026-01-05T12:00:00"}
+        for i in range(5)
+    ]
+    path = tmp_path / "momo_transactions.json"
+    path.write_text(json.dumps(transactions, indent=2))
+
+    records = list(iter_mock_transactions(str(path)))
+
+    assert [r["transaction_id"] for r in records] == [f"MOMO{i}" for i in range(5)]
+    assert records[4]["amount"] == 42.0
+    assert records[0]["timestamp"].day == 5
+
+    # The current JSON Lines log reads the same
+    jsonl_path = tmp_path / "momo_transactions.jsonl"
+    jsonl_path.write_text("".join(json.dumps(t) + "\n" for t in transactions))
+
+    assert list(iter_mock_transactions(str(jsonl_path))) == records
+
+
+MTN_STATEMENT = """Id,External Transaction Id,Date,Status,Type,Provider Category,Information,Note/Message,From,From name,To,To name,Initiated By,On Behalf Of,Amount,Currency,External Amount,External FX Rate,External Service Provider,Fee,Discount,Promotion,Coupon,Balance
+8123456701,Payment:Group:Test|Round:1,2026-01-05 12:00:00,SUCCESSFUL,DEBIT,,,,FRI:233244000001/MSISDN,Ama,FRI:susu/USER,Susu,ID:233244000001/MSISDN,,100.00,GHS,,,,0,,,,"1,100.00"
+8123456702,Payout:Group:Test|Round:1|Payout:1,2026-01-06 09:30:00,SUCCESSFUL,TRANSFER,,,,FRI:susu/USER,Susu,FRI:233244000001/MSISDN,Ama,ID:susu/USER,,"-1,200.00",GHS,,,,0,,,,-100.00
+8123456703,Payment:Group:Test|Round:1,2026-01-06 10:00:00,FAILED,DEBIT,,,,FRI:233244000002/MSISDN,Kofi,FRI:susu/USER,Susu,ID:233244000002/MSISDN,,100.00,GHS,,,,0,,,,-100.00
+"""
+
+
+def test_mtn_statement_joins_on_financial_transaction_id(db_session, make_group, tmp_path):
+    """Statement rows match the financial transaction IDs stored on payments and payouts."""
+    group, users = make_group(1)
+    db_session.add(Payment(user_id=users[0].id, group_id=group.id, round_number=1, amount=100.0,
+                           status=PaymentStatus.SUCCESS, transaction_id="8123456701"))
+    db_session.add(Payout(group_id=group.id, round_number=1, recipient_id=users[0].id, amount=1200.0,
+                          status=PayoutStatus.PAID, transaction_id="8123456702"))
+    db_session.commit()
+    path = tmp_path / "statement.csv"
+    path.write_text(MTN_STATEMENT)
+
+    records = list(iter_statement_csv(str(path)))
+    assert [(r["transaction_id"], r["type"], r["amount"]) for r in records] == [
+        ("8123456701", "debit", 100.0), ("8123456702", "credit", 1200.0), ("8123456703", "debit", 100.0)
+    ]
+
+    reported = []
+    result = ReconciliationService.reconcile(db_session, records, on_mismatch=reported.append)
+
+    assert result["matched"] == 2
+    assert result["skipped"] == 1
+    assert reported == []
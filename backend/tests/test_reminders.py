@@ -0,0 +1,105 @@
+"""Tests for the batched payment reminder job."""
+from datetime import date
+
+from app.models import OutboxMessage, Payment, PaymentPreference, PaymentStatus
+from app.services.reminder_service import ReminderService
+from app.utils import decrypt_field
+
+
+def test_due_reminders_follow_days_before(db_session, make_group):
+    """Members are reminded reminder_days_before days ahead of their collection day."""
+    group, users = make_group(4)
+    db_session.add_all([
+        PaymentPreference(user_id=users[0].id, auto_pay_day=15, reminder_days_before=3),
+        PaymentPreference(user_id=users[1].id, auto_pay_day=15, reminder_days_before=1),
+        PaymentPreference(user_id=users[2].id, assigned_pay_day=13, reminder_days_before=1),
+        PaymentPreference(user_id=users[3].id, auto_pay_day=15, reminder_days_before=3,
+                          send_payment_reminders=False),
+    ])
+    db_session.commit()
+
+    due = ReminderService.get_due_reminders(db_session, today=date(2026, 3, 12))
+
+    assert [decrypt_field(r["phone_number"]) for r in due] == [
+        decrypt_field(users[0].phone_number),
+        decrypt_field(users[2].phone_number),
+    ]
+    assert due[0]["due_date"] == date(2026, 3, 15)
+
+
+def test_due_reminders_skip_paid_members(db_session, make_group):
+    """Members who already paid the current round are not reminded."""
+    group, users = make_group(2)
+    for user in users:
+        db_session.add(PaymentPreference(user_id=user.id, auto_pay_day=2))
+    db_session.add(Payment(
+        user_id=users[0].id,
+        group_id=group.id,
+        round_number=1,
+        amount=group.contribution_amount,
+        status=PaymentStatus.SUCCESS
+    ))
+    db_session.commit()
+
+    # Due date wraps into the next month
+    due = ReminderService.get_due_reminders(db_session, today=date(2026, 12, 30))
+
+    assert len(due) == 1
+    assert due[0]["due_date"] == date(2027, 1, 2)
+
+
+def test_send_due_reminders_queues_outbox_sms(db_session, make_group):
+    """Reminders are queued once per member; identical texts share one message body."""
+    first, first_users = make_group(3)
+    second, second_users = make_group(1)
+    for user in first_users + second_users:
+        db_session.add(PaymentPreference(user_id=user.id, auto_pay_day=20, reminder_days_before=3))
+    db_session.commit()
+
+    stats = ReminderService.send_due_reminders(db_session, today=date(2026, 3, 17))
+    rerun = ReminderService.send_due_reminders(db_session, today=date(2026, 3, 17))
+
+    assert stats == {"due": 4, "queued": 4, "duplicates": 0}
+    assert rerun == {"due": 4, "queued": 0, "duplicates": 4}
+    messages = db_session.query(OutboxMessage).order_by(OutboxMessage.id).all()
+    texts = [message.payload["message"] for message in messages]
+    assert len(set(texts[:3])) == 1
+    assert first.name in texts[0] and "20 Mar" in texts[0]
+    assert second.name in texts[3]
+    assert messages[0].payload["phone_number"] == first_users[0].phone_number
+
+
+def test_cash_only_members_are_reminded(db_session, make_group):
+    """Cash-only groups are not collected through MoMo but still get reminders."""
+    group, users = make_group(1, cash_only=True)
+    db_session.add(PaymentPreference(user_id=users[0].id, auto_pay_day=20, reminder_days_before=3))
+    db_session.commit()
+
+    due = ReminderService.get_due_reminders(db_session, today=date(2026, 3, 17))
+
+    assert [r["group_id"] for r in due] == [group.id]
+
+
+def test_reminders_are_queued_in_bulk(db_session, make_group):
+    """Queueing costs one dedupe lookup and one insert, however many members are due."""
+    from sqlalchemy import event
+    group, users = make_group(5)
+    for user in users:
+        db_session.add(PaymentPreference(user_id=user.id, auto_pay_day=20, reminder_days_before=3))
+    db_session.commit()
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "outbox_messages" in statement:
+            statements.append(statement.split()[0])
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        stats = ReminderService.send_due_reminders(db_session, today=date(2026, 3, 17))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert stats == {"due": 5, "queued": 5, "duplicates": 0}
+    assert statements == ["SELECT", "INSERT"]
+    assert db_session.query(OutboxMessage).count() == 5
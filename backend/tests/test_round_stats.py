@@ -0,0 +1,102 @@
+"""Tests for the per-group-round contribution counters."""
+
+from app.models import User, UserType, Payment, GroupRoundStats, PaymentStatus
+from app.services import PaymentService, GroupService
+from app.services.round_stats_service import RoundStatsService
+from app.integrations.momo_mock import momo_api
+from app.utils import encrypt_field
+
+
+def pending_payment(db_session, group, user):
+    """Create a pending payment for the group's current round."""
+    payment = Payment(
+        user_id=user.id,
+        group_id=group.id,
+        round_number=group.current_round,
+        amount=group.contribution_amount,
+        status=PaymentStatus.PENDING
+    )
+    db_session.add(payment)
+    db_session.commit()
+    return payment
+
+
+def test_counters_follow_settled_payments(db_session, make_group):
+    """Successful and cash payments move the counters in their own transaction."""
+    group, users = make_group(3, contribution_amount=40.0)
+
+    PaymentService.settle_success(db_session, pending_payment(db_session, group, users[1]), "TX-1")
+    PaymentService.mark_as_cash_paid(db_session, pending_payment(db_session, group, users[2]).id, users[0].id)
+
+    stats = RoundStatsService.get_stats(db_session, group.id, 1)
+    db_session.refresh(stats)
+    assert (stats.paid_count, stats.collected_amount, stats.active_member_count) == (2, 80.0, 3)
+    assert db_session.query(GroupRoundStats).count() == 1
+
+
+def test_join_and_next_round_carry_member_count(db_session, make_group, monkeypatch):
+    """Joining bumps the member count, which carries over into the next round."""
+    monkeypatch.setattr(momo_api, "validate_account", lambda phone: True)
+    group, users = make_group(2)
+    RoundStatsService.start_round(db_session, group)
+    db_session.commit()
+
+    newcomer = User(
+        phone_number=encrypt_field("+233249990001"),
+        name="Newcomer",
+        user_type=UserType.APP,
+        kyc_verified=True
+    )
+    db_session.add(newcomer)
+    db_session.commit()
+    GroupService.join_group(db_session, group.group_code, newcomer)
+
+    GroupService.advance_round(db_session, group)
+    db_session.commit()
+
+    second = RoundStatsService.get_stats(db_session, group.id, 2)
+    assert (second.paid_count, second.collected_amount, second.active_member_count) == (0, 0.0, 3)
+
+
+def test_reconcile_fixes_drift(db_session, make_group):
+    """Drifted counters are corrected and missing rows created."""
+    drifted, drifted_users = make_group(2)
+    missing, _ = make_group(3)
+    payment = pending_payment(db_session, drifted, drifted_users[0])
+    PaymentService.settle_success(db_session, payment, "TX-2")
+
+    stats = RoundStatsService.get_stats(db_session, drifted.id, 1)
+    stats.paid_count = 5
+    db_session.commit()
+
+    assert RoundStatsService.reconcile(db_session) == {"checked": 2, "corrected": 1, "created": 1}
+
+    db_session.refresh(stats)
+    assert stats.paid_count == 1
+    assert RoundStatsService.get_stats(db_session, missing.id, 1).active_member_count == 3
+    assert RoundStatsService.reconcile(db_session) == {"checked": 2, "corrected": 0, "created": 0}
+
+
+def test_get_or_create_returns_row_inserted_concurrently(db_session, make_group, monkeypatch):
+    """Losing the insert race re-reads the other writer's row instead of failing."""
+    from sqlalchemy.orm import sessionmaker
+
+    group, users = make_group(2)
+    other_session = sessionmaker(bind=db_session.get_bind())()
+    compute = RoundStatsService.compute
+
+    def compute_then_race(db, group_id, round_number):
+        stats = compute(db, group_id, round_number)
+        other_session.add(compute(other_session, group_id, round_number))
+        other_session.commit()
+        return stats
+
+    monkeypatch.setattr(RoundStatsService, "compute", compute_then_race)
+    try:
+        stats = RoundStatsService.get_or_create(db_session, group.id, 1)
+    finally:
+        other_session.close()
+
+    db_session.commit()
+    assert stats.id is not None
+    assert db_session.query(GroupRoundStats).count() == 1
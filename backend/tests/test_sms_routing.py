@@ -0,0 +1,93 @@
+"""Tests for SMS provider circuit breakers and routing."""
+from types import SimpleNamespace
+
+import pytest
+
+from app.integrations import sms_sender
+from app.integrations import provider_health
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Two fake providers whose availability the test controls."""
+    state = {"up": {"MTN": False, "AfricaTalking": True}, "calls": []}
+    clock = [1000.0]
+
+    def provider_send(provider, phone_numbers, message):
+        state["calls"].append(provider)
+        return state["up"][provider]
+
+    monkeypatch.setattr(sms_sender, "_configured_providers", lambda use_africastalking: ["MTN", "AfricaTalking"])
+    monkeypatch.setattr(sms_sender, "_provider_send", provider_send)
+    monkeypatch.setattr(sms_sender, "_log_to_file", lambda *args: None)
+    monkeypatch.setattr(provider_health, "time", SimpleNamespace(monotonic=lambda: clock[0]))
+    sms_sender.sms_router.reset()
+    state["clock"] = clock
+    yield state
+    sms_sender.sms_router.reset()
+
+
+def test_failing_provider_is_routed_last_until_probe_succeeds(providers):
+    """During an MTN outage SMS goes to AfricaTalking first; a later probe restores MTN."""
+    for _ in range(5):
+        assert sms_sender.send_sms("+233241234567", "Hello") is True
+
+    assert providers["calls"] == ["MTN"] + ["AfricaTalking"] * 5
+    providers["calls"].clear()
+
+    providers["up"]["MTN"] = True
+    providers["clock"][0] += provider_health.settings.SMS_BREAKER_COOLDOWN_SECONDS
+    sms_sender.send_bulk_sms(["+233241234567", "+233241234568"], "Hello all")
+    sms_sender.send_sms("+233241234567", "Hello")
+
+    assert providers["calls"] == ["MTN", "MTN"]
+    assert sms_sender.sms_router.get("MTN").healthy
+
+
+def test_open_breakers_skip_providers_until_cooldown(providers):
+    """When every provider keeps failing, breakers open and SMS falls straight back to mock."""
+    providers["up"]["AfricaTalking"] = False
+    threshold = provider_health.settings.SMS_BREAKER_FAILURE_THRESHOLD
+    for _ in range(threshold + 3):
+        assert sms_sender.send_sms("+233241234567", "Hello") is True
+
+    assert providers["calls"].count("MTN") == threshold
+    assert providers["calls"].count("AfricaTalking") == threshold
+    assert sms_sender.sms_router.get("MTN").state == provider_health.OPEN
+    providers["calls"].clear()
+
+    providers["up"]["AfricaTalking"] = True
+    providers["clock"][0] += provider_health.settings.SMS_BREAKER_COOLDOWN_SECONDS
+    sms_sender.send_sms("+233241234567", "Hello")
+    sms_sender.send_sms("+233241234567", "Hello")
+
+    # MTN's probe fails and its cooldown doubles; AfricaTalking's probe closes its breaker
+    assert providers["calls"] == ["MTN", "AfricaTalking", "AfricaTalking"]
+    assert sms_sender.sms_router.get("MTN").cooldown == 2 * provider_health.settings.SMS_BREAKER_COOLDOWN_SECONDS
+    assert sms_sender.sms_router.get("AfricaTalking").state == provider_health.CLOSED
+
+
+def test_low_priority_acquire_leaves_headroom(monkeypatch):
+    """A sender asking for headroom waits while only the reserved tokens are left."""
+    from app.integrations import rate_limiter
+
+    clock = [0.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(rate_limiter, "time", SimpleNamespace(monotonic=lambda: clock[0], sleep=sleep))
+    bucket = rate_limiter.TokenBucket(rate=10.0, capacity=4)
+
+    bucket.acquire(headroom=2)
+    bucket.acquire(headroom=2)
+    assert sleeps == []
+    bucket.acquire(headroom=2)
+    assert sleeps == [pytest.approx(0.1)]
+
+    # Interactive senders still find the reserved tokens
+    bucket.acquire()
+    bucket.acquire()
+    assert sleeps == [pytest.approx(0.1)]
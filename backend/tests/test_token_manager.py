@@ -0,0 +1,60 @@
+"""Tests for the shared MTN OAuth token manager."""
+import threading
+import time
+
+import pytest
+
+from app.integrations import token_manager as token_module
+from app.integrations.token_manager import TokenManager
+
+
+def test_concurrent_callers_share_one_fetch():
+    """Callers that all need a token at once wait for a single fetch."""
+    manager = TokenManager()
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        time.sleep(0.1)
+        return "token-1", 3600
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(manager.get_token("mtn-oauth", ("url", "key", "secret"), fetch)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(fetches) == 1
+    assert results == ["token-1"] * 8
+    assert manager.get_token("mtn-oauth", ("url", "key", "secret"), fetch) == "token-1"
+    assert len(fetches) == 1
+
+
+def test_tokens_are_refreshed_before_expiry(monkeypatch):
+    """Tokens inside the refresh margin are replaced; a failed refresh keeps the still-valid token."""
+    monkeypatch.setattr(token_module.settings, "MTN_TOKEN_REFRESH_MARGIN_SECONDS", 300)
+    now = [1000.0]
+    monkeypatch.setattr(token_module.time, "time", lambda: now[0])
+    manager = TokenManager()
+    tokens = ["token-1", "token-2"]
+
+    def fetch():
+        if not tokens:
+            raise Exception("MTN authentication failed")
+        return tokens.pop(0), 3600
+
+    assert manager.get_token("momo-collection", ("user", "key"), fetch) == "token-1"
+    now[0] += 3000
+    assert manager.get_token("momo-collection", ("user", "key"), fetch) == "token-1"
+    now[0] += 400
+    assert manager.get_token("momo-collection", ("user", "key"), fetch) == "token-2"
+
+    now[0] += 3400
+    assert manager.get_token("momo-collection", ("user", "key"), fetch) == "token-2"
+    now[0] += 200
+    with pytest.raises(Exception, match="authentication failed"):
+        manager.get_token("momo-collection", ("user", "key"), fetch)
@@ -12,6 +12,7 @@ Usage:
 import sys
 import os
 import argparse
+import time
 from datetime import datetime
 
 # Add parent directory to path for imports
@@ -19,9 +20,7 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine
-from app.models import User
 from app.services.kyc_service import kyc_service
-from app.utils import decrypt_field
 from app.config import settings
 
 
@@ -42,64 +41,30 @@ def verify_all_users(db: Session, unverified_only: bool = True):
     print("=" * 80)
     print()
     
-    # Get users to verify
-    query = db.query(User)
-    
     if unverified_only:
-        query = query.filter(User.kyc_verified == False)
         print("📋 Verifying UNVERIFIED users only")
     else:
         print("📋 Verifying ALL users")
     
-    users = query.all()
+    print(
+        f"⚙️  {settings.KYC_BULK_CONCURRENCY} concurrent MTN checks, "
+        f"committing every {settings.KYC_BULK_BATCH_SIZE} users\n"
+    )
     
-    if not users:
-        print("✅ No users to verify!")
-        return
+    started = time.monotonic()
     
-    print(f"📊 Found {len(users)} users to verify\n")
+    def report(processed: int, total: int):
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else 0
+        print(f"  [{processed}/{total}] {rate:.0f} users/s")
     
-    # Verify each user
-    results = {
-        "total": len(users),
-        "verified": 0,
-        "failed": 0,
-        "errors": []
-    }
+    results = kyc_service.bulk_verify_users(db, unverified_only=unverified_only, progress=report)
     
-    for idx, user in enumerate(users, 1):
-        print(f"[{idx}/{len(users)}] Processing User ID {user.id}...")
-        
-        try:
-            # Decrypt phone number
-            phone_number = decrypt_field(user.phone_number)
-            print(f"  Phone: {phone_number[:6]}...{phone_number[-4:]}")
-            
-            # Verify user
-            result = kyc_service.verify_user(db, user.id, phone_number)
-            
-            if result.get("verified"):
-                results["verified"] += 1
-                print(f"  ✅ VERIFIED - Provider: {result.get('provider')}")
-            else:
-                results["failed"] += 1
-                print(f"  ❌ FAILED - {result.get('message')}")
-                results["errors"].append({
-                    "user_id": user.id,
-                    "phone": f"{phone_number[:6]}...{phone_number[-4:]}",
-                    "message": result.get("message")
-                })
-            
-        except Exception as e:
-            results["failed"] += 1
-            error_msg = str(e)
-            print(f"  ❌ ERROR - {error_msg}")
-            results["errors"].append({
-                "user_id": user.id,
-                "message": error_msg
-            })
-        
-        print()
+    if not results["total"]:
+        print("✅ No users to verify!")
+        return
+    
+    print()
     
     # Print summary
     print("=" * 80)